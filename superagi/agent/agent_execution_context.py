@@ -0,0 +1,143 @@
+from sqlalchemy import and_, literal, select
+from sqlalchemy.orm import aliased
+
+from superagi.helper.encyption_helper import decrypt_data
+from superagi.models.agent import Agent
+from superagi.models.agent_config import AgentConfiguration
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_config import AgentExecutionConfiguration
+from superagi.models.models import Models
+from superagi.models.models_config import ModelsConfig
+from superagi.models.organisation import Organisation
+from superagi.models.project import Project
+
+
+class AgentExecutionContext:
+    """
+    Objects of an agent execution needed by every step: the execution, the agent, its organisation, the agent and
+    execution configurations and the model api key.
+
+    A context built with `load` has all of them fetched in two round trips. A context built directly only knows the
+    ids and fetches every object lazily, once, on first access.
+    """
+
+    def __init__(self, session, agent_id: int, agent_execution_id: int, agent_execution: AgentExecution = None,
+                 agent: Agent = None, organisation: Organisation = None, agent_config: dict = None,
+                 agent_execution_config: dict = None, model_configs: dict = None):
+        self.session = session
+        self.agent_id = agent_id
+        self.agent_execution_id = agent_execution_id
+        self._agent_execution = agent_execution
+        self._agent = agent
+        self._organisation = organisation
+        self._agent_config = agent_config
+        self._agent_execution_config = agent_execution_config
+        self._model_configs = model_configs or {}
+
+    @classmethod
+    def load(cls, session, agent_execution_id: int):
+        """
+        Loads the execution context with one joined query for the execution, agent, organisation and model provider
+        and one query for the agent and execution configurations.
+
+        Args:
+            session: The database session.
+            agent_execution_id (int): The id of the agent execution.
+
+        Returns:
+            AgentExecutionContext: The loaded context or None if the execution does not exist.
+        """
+        model_configuration = aliased(AgentConfiguration)
+        row = session.query(AgentExecution, Agent, Organisation, ModelsConfig.provider, ModelsConfig.api_key) \
+            .join(Agent, Agent.id == AgentExecution.agent_id) \
+            .join(Project, Project.id == Agent.project_id) \
+            .join(Organisation, Organisation.id == Project.organisation_id) \
+            .outerjoin(model_configuration, and_(model_configuration.agent_id == Agent.id,
+                                                 model_configuration.key == "model")) \
+            .outerjoin(Models, and_(Models.org_id == Organisation.id,
+                                    Models.model_name == model_configuration.value)) \
+            .outerjoin(ModelsConfig, and_(ModelsConfig.org_id == Organisation.id,
+                                          ModelsConfig.id == Models.model_provider_id)) \
+            .filter(AgentExecution.id == agent_execution_id) \
+            .first()
+        if row is None:
+            return None
+        agent_execution, agent, organisation, provider, api_key = row
+
+        agent_configurations = session.query(literal("agent").label("source"), AgentConfiguration.key,
+                                             AgentConfiguration.value) \
+            .filter(AgentConfiguration.agent_id == select(AgentExecution.agent_id)
+                    .where(AgentExecution.id == agent_execution_id).scalar_subquery())
+        execution_configurations = session.query(literal("execution").label("source"),
+                                                 AgentExecutionConfiguration.key, AgentExecutionConfiguration.value) \
+            .filter(AgentExecutionConfiguration.agent_execution_id == agent_execution_id)
+        configurations = agent_configurations.union_all(execution_configurations).all()
+
+        agent_config = Agent.build_configuration(
+            agent, [configuration for configuration in configurations if configuration.source == "agent"])
+        agent_execution_config = AgentExecutionConfiguration.build_configuration(
+            [configuration for configuration in configurations if configuration.source == "execution"])
+
+        model_configs = {}
+        if provider is not None:
+            model_configs[agent_config["model"]] = {
+                "provider": provider,
+                "api_key": api_key if provider == 'Local LLM' else decrypt_data(api_key)}
+
+        return cls(session, agent.id, agent_execution.id, agent_execution=agent_execution, agent=agent,
+                   organisation=organisation, agent_config=agent_config,
+                   agent_execution_config=agent_execution_config, model_configs=model_configs)
+
+    @property
+    def agent_execution(self) -> AgentExecution:
+        if self._agent_execution is None:
+            self._agent_execution = AgentExecution.get_agent_execution_from_id(self.session, self.agent_execution_id)
+        return self._agent_execution
+
+    @property
+    def agent(self) -> Agent:
+        if self._agent is None:
+            self._agent = Agent.get_agent_from_id(self.session, self.agent_id)
+        return self._agent
+
+    @property
+    def organisation(self) -> Organisation:
+        if self._organisation is None:
+            self._organisation = Agent.find_org_by_agent_id(self.session, agent_id=self.agent_id)
+        return self._organisation
+
+    @property
+    def agent_config(self) -> dict:
+        if self._agent_config is None:
+            self._agent_config = Agent.fetch_configuration(self.session, self.agent_id)
+        return self._agent_config
+
+    @property
+    def agent_execution_config(self) -> dict:
+        if self._agent_execution_config is None:
+            self._agent_execution_config = AgentExecutionConfiguration.fetch_configuration(self.session,
+                                                                                           self.agent_execution_id)
+        return self._agent_execution_config
+
+    def get_model_config(self, model: str = None) -> dict:
+        """
+        Returns the provider and the api key of a model of the agent's organisation.
+
+        Args:
+            model (str): The model name, defaults to the model configured for the agent.
+
+        Returns:
+            dict: The provider and the api key of the model.
+        """
+        model = model or self.agent_config["model"]
+        if model not in self._model_configs:
+            self._model_configs[model] = AgentConfiguration.get_model_api_key(self.session, self.agent_id, model)
+        return self._model_configs[model]
+
+    @property
+    def model_api_key(self) -> str:
+        return self.get_model_config()['api_key']
+
+    @property
+    def model_provider(self) -> str:
+        return self.get_model_config()['provider']
@@ -4,20 +4,25 @@ from sqlalchemy import asc
 from sqlalchemy.sql.operators import and_
 import logging
 import superagi
+from superagi.agent.agent_execution_context import AgentExecutionContext
 from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
 from superagi.agent.agent_prompt_builder import AgentPromptBuilder
+from superagi.agent.agent_prompt_template import AgentPromptTemplate
+from superagi.agent.completion_streamer import CompletionStreamer
+from superagi.agent.context_window import get_context_window
 from superagi.agent.output_handler import ToolOutputHandler, get_output_handler
+from superagi.agent.partial_feed import PartialFeed
+from superagi.agent.pending_completion import PendingCompletion, run_to_completion
+from superagi.agent.step_checkpoint import StepCheckpoint
 from superagi.agent.task_queue import TaskQueue
 from superagi.agent.tool_builder import ToolBuilder
 from superagi.apm.event_handler import EventHandler
-from superagi.config.config import get_config
+from superagi.config.config import get_config, get_config_flag
 from superagi.helper.error_handler import ErrorHandler
 from superagi.helper.token_counter import TokenCounter
 from superagi.lib.logger import logger
 from superagi.models.agent import Agent
-from superagi.models.agent_config import AgentConfiguration
 from superagi.models.agent_execution import AgentExecution
-from superagi.models.agent_execution_config import AgentExecutionConfiguration
 from superagi.models.agent_execution_feed import AgentExecutionFeed
 from superagi.models.agent_execution_permission import AgentExecutionPermission
 from superagi.models.organisation import Organisation
@@ -34,29 +39,38 @@ from superagi.apm.call_log_helper import CallLogHelper
 
 class AgentIterationStepHandler:
     """ Handles iteration workflow steps in the agent workflow."""
-    def __init__(self, session, llm, agent_id: int, agent_execution_id: int, memory=None):
+    def __init__(self, session, llm, agent_id: int, agent_execution_id: int, memory=None,
+                 execution_context: AgentExecutionContext = None):
         self.session = session
         self.llm = llm
         self.agent_execution_id = agent_execution_id
         self.agent_id = agent_id
         self.memory = memory
-        self.organisation = Agent.find_org_by_agent_id(self.session, agent_id=self.agent_id)
+        self.execution_context = execution_context or AgentExecutionContext(session, agent_id, agent_execution_id)
         self.task_queue = TaskQueue(str(self.agent_execution_id))
+        self.partial_feed = PartialFeed(self.agent_execution_id)
 
     def execute_step(self):
-        agent_config = Agent.fetch_configuration(self.session, self.agent_id)
-        execution = AgentExecution.get_agent_execution_from_id(self.session, self.agent_execution_id)
+        run_to_completion(self.iter_step())
+
+    def iter_step(self):
+        """
+        Execute the step as a generator that yields the PendingCompletion of its llm call and is resumed with
+        the response, so that the async agent runner can wait on the llm without holding a thread.
+        """
+        agent_config = self.execution_context.agent_config
+        execution = self.execution_context.agent_execution
         iteration_workflow_step = IterationWorkflowStep.find_by_id(self.session, execution.iteration_workflow_step_id)
-        agent_execution_config = AgentExecutionConfiguration.fetch_configuration(self.session, self.agent_execution_id)
+        agent_execution_config = self.execution_context.agent_execution_config
         if not self._handle_wait_for_permission(execution, agent_config, agent_execution_config,
                                                 iteration_workflow_step):
             return
 
         workflow_step = AgentWorkflowStep.find_by_id(self.session, execution.current_agent_step_id)
-        organisation = Agent.find_org_by_agent_id(self.session, agent_id=self.agent_id)
+        organisation = self.execution_context.organisation
         iteration_workflow = IterationWorkflow.find_by_id(self.session, workflow_step.action_reference_id)
-        agent_feeds = AgentExecutionFeed.fetch_agent_execution_feeds(self.session, self.agent_execution_id)
-        if not agent_feeds:
+        context_window = get_context_window(self.session, execution)
+        if not context_window.num_feeds:
             self.task_queue.clear_tasks()
 
         agent_tools = self._build_tools(agent_config, agent_execution_config)
@@ -65,14 +79,32 @@ class AgentIterationStepHandler:
                                           agent_execution_config=agent_execution_config,
                                           prompt=iteration_workflow_step.prompt,
                                           agent_tools=agent_tools)
+        max_tool_calls = int(get_config("MAX_TOOL_CALLS_PER_ITERATION", 1) or 1)
+        if iteration_workflow_step.output_type == "tools" and max_tool_calls > 1:
+            prompt = prompt + "\n\n" + AgentPromptTemplate.multi_tool_calls(max_tool_calls)
 
-        messages = AgentLlmMessageBuilder(self.session, self.llm, self.llm.get_model(), self.agent_id, self.agent_execution_id) \
-            .build_agent_messages(prompt, agent_feeds, history_enabled=iteration_workflow_step.history_enabled,
-                                  completion_prompt=iteration_workflow_step.completion_prompt)
+        messages = AgentLlmMessageBuilder(self.session, self.llm, self.llm.get_model(), self.agent_id, self.agent_execution_id,
+                                          organisation=organisation) \
+            .build_agent_messages(prompt, history_enabled=iteration_workflow_step.history_enabled,
+                                  completion_prompt=iteration_workflow_step.completion_prompt,
+                                  context_window=context_window)
 
         logger.debug("Prompt messages:", messages)
         current_tokens = TokenCounter.count_message_tokens(messages = messages, model = self.llm.get_model())
-        response = self.llm.chat_completion(messages, TokenCounter(session=self.session, organisation_id=organisation.id).token_limit(self.llm.get_model()) - current_tokens)
+        # a retry of the step after a crash resumes from the response recorded before the side effects
+        step_checkpoint = StepCheckpoint(self.agent_execution_id,
+                                         f"{execution.current_agent_step_id}:{iteration_workflow_step.id}", messages)
+        response = step_checkpoint.get()
+        if response is None:
+            max_tokens = TokenCounter(session=self.session, organisation_id=organisation.id).token_limit(self.llm.get_model()) - current_tokens
+            if get_config_flag("STREAM_AGENT_REPLIES"):
+                response = self._stream_completion(messages, max_tokens)
+            else:
+                response = yield PendingCompletion(self.llm, messages, max_tokens)
+            if response.get('content') is not None:
+                step_checkpoint.save(response)
+        else:
+            logger.info(f"Resuming agent execution {self.agent_execution_id} from the checkpointed llm response")
 
         if 'error' in response and response['message'] is not None:
             ErrorHandler.handle_openai_errors(self.session, self.agent_id, self.agent_execution_id, response['message'])
@@ -86,6 +118,8 @@ class AgentIterationStepHandler:
             content = json.loads(response['content'])
             tool = content.get('tool', {})
             tool_name = tool.get('name', '') if tool else ''
+            if content.get('tools'):
+                tool_name = ", ".join(tool.get('name', '') for tool in content['tools'])
         except json.JSONDecodeError:
             print("Decoding JSON has failed")
             tool_name = ''
@@ -96,8 +130,12 @@ class AgentIterationStepHandler:
         assistant_reply = response['content']
         output_handler = get_output_handler(iteration_workflow_step.output_type,
                                             agent_execution_id=self.agent_execution_id,
-                                            agent_config=agent_config,memory=self.memory, agent_tools=agent_tools)
+                                            agent_config=agent_config,memory=self.memory, agent_tools=agent_tools,
+                                            execution_context=self.execution_context)
         response = output_handler.handle(self.session, assistant_reply)
+        # the reply is now part of the feeds
+        self.partial_feed.clear()
+        step_checkpoint.clear()
         if response.status == "COMPLETE":
             execution.status = "COMPLETED"
             self.session.commit()
@@ -120,6 +158,14 @@ class AgentIterationStepHandler:
 
         self.session.flush()
 
+    def _stream_completion(self, messages: list, max_tokens: int):
+        """
+        Get the reply of the llm, streamed to the partial feed of the execution as it is generated.
+        Parsing starts as soon as the JSON reply is complete.
+        """
+        return CompletionStreamer(self.llm, partial_feed=self.partial_feed, stop_at_json_end=True) \
+            .complete(messages, max_tokens)
+
     def _update_agent_execution_next_step(self, execution, next_step_id, step_response: str = "default"):
         if next_step_id == -1:
             next_step = AgentWorkflowStep.fetch_next_step(self.session, execution.current_agent_step_id, step_response)
@@ -144,7 +190,7 @@ class AgentIterationStepHandler:
             response = self.task_queue.get_last_task_details()
             last_task, last_task_result = (response["task"], response["response"]) if response is not None else ("", "")
             current_task = self.task_queue.get_first_task() or ""
-            token_limit = TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit() - max_token_limit
+            token_limit = TokenCounter(session=self.session, organisation_id=self.execution_context.organisation.id).token_limit() - max_token_limit
             prompt = AgentPromptBuilder.replace_task_based_variables(prompt, current_task, last_task, last_task_result,
                                                                      self.task_queue.get_tasks(),
                                                                      self.task_queue.get_completed_tasks(), token_limit)
@@ -153,10 +199,11 @@ class AgentIterationStepHandler:
     def _build_tools(self, agent_config: dict, agent_execution_config: dict):
         agent_tools = [ThinkingTool()]
 
-        config_data = AgentConfiguration.get_model_api_key(self.session, self.agent_id, agent_config["model"])
-        model_api_key = config_data['api_key']
-        tool_builder = ToolBuilder(self.session, self.agent_id, self.agent_execution_id)
-        resource_summary = ResourceSummarizer(session=self.session, agent_id=self.agent_id, model=agent_config['model']).fetch_or_create_agent_resource_summary(default_summary=agent_config.get("resource_summary"))
+        model_api_key = self.execution_context.get_model_config(agent_config["model"])['api_key']
+        tool_builder = ToolBuilder(self.session, self.agent_id, self.agent_execution_id,
+                                   execution_context=self.execution_context)
+        resource_summary = ResourceSummarizer(session=self.session, agent_id=self.agent_id, model=agent_config['model'],
+                                              organisation_id=self.execution_context.organisation.id).fetch_or_create_agent_resource_summary(default_summary=agent_config.get("resource_summary"))
         if resource_summary is not None:
             agent_tools.append(QueryResourceTool())
         user_tools = self.session.query(Tool).filter(
@@ -190,7 +237,8 @@ class AgentIterationStepHandler:
             return False
         if agent_execution_permission.status == "APPROVED":
             agent_tools = self._build_tools(agent_config, agent_execution_config)
-            tool_output_handler = ToolOutputHandler(self.agent_execution_id, agent_config, agent_tools,self.memory)
+            tool_output_handler = ToolOutputHandler(self.agent_execution_id, agent_config, agent_tools,self.memory,
+                                                    execution_context=self.execution_context)
             tool_result = tool_output_handler.handle_tool_response(self.session,
                                                                    agent_execution_permission.assistant_reply)
             result = tool_result.result
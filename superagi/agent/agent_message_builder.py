@@ -1,30 +1,39 @@
+import bisect
 import time
 from typing import Tuple, List
 from sqlalchemy import asc
 
 from superagi.config.config import get_config
+from superagi.agent.hierarchical_summarizer import HierarchicalLtmSummarizer, is_hierarchical_ltm_summary_enabled
+from superagi.agent.ltm_summarizer import is_background_ltm_summary_enabled, ltm_summary_watermark, \
+    schedule_ltm_summary
+from superagi.agent.step_checkpoint import CURRENT_TIME_MESSAGE_PREFIX
 from superagi.helper.error_handler import ErrorHandler
-from superagi.helper.prompt_reader import PromptReader
+from superagi.lib.logger import logger
+from superagi.helper.prompt_template import get_prompt_registry
 from superagi.helper.token_counter import TokenCounter
+from superagi.llms.llm_router import route_llm
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.agent_execution_feed import AgentExecutionFeed
 from superagi.types.common import BaseMessage
+from superagi.types.llm_task_types import LlmTaskType
 from superagi.models.agent_execution_config import AgentExecutionConfiguration
 from superagi.models.agent import Agent
 
 
 class AgentLlmMessageBuilder:
     """Agent message builder for LLM agent."""
-    def __init__(self, session, llm, llm_model: str, agent_id: int, agent_execution_id: int):
+    def __init__(self, session, llm, llm_model: str, agent_id: int, agent_execution_id: int, organisation=None):
         self.session = session
         self.llm = llm
         self.llm_model = llm_model
         self.agent_id = agent_id
         self.agent_execution_id = agent_execution_id
-        self.organisation = Agent.find_org_by_agent_id(self.session, self.agent_id)
+        self.organisation = organisation or Agent.find_org_by_agent_id(self.session, self.agent_id)
+        self._ltm_summary_llm = None
 
-    def build_agent_messages(self, prompt: str, agent_feeds: list, history_enabled=False,
-                             completion_prompt: str = None):
+    def build_agent_messages(self, prompt: str, agent_feeds: list = None, history_enabled=False,
+                             completion_prompt: str = None, context_window=None):
         """ Build agent messages for LLM agent.
 
         Args:
@@ -32,20 +41,31 @@ class AgentLlmMessageBuilder:
             agent_feeds (list): The list of agent feeds.
             history_enabled (bool): Whether to use history or not.
             completion_prompt (str): The completion prompt to be used for generating the agent messages.
+            context_window (ContextWindow): The context window of the execution, used instead of the agent feeds
+                to only read the feeds fitting in the prompt.
         """
         token_limit = TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit(self.llm_model)
         max_output_token_limit = int(get_config("MAX_TOOL_TOKEN_LIMIT", 800))
         messages = [{"role": "system", "content": prompt}]
         if history_enabled:
-            messages.append({"role": "system", "content": f"The current time and date is {time.strftime('%c')}"})
+            messages.append({"role": "system", "content": CURRENT_TIME_MESSAGE_PREFIX + time.strftime('%c')})
             base_token_limit = TokenCounter.count_message_tokens(messages, self.llm_model)
-            full_message_history = [{'role': agent_feed.role, 'content': agent_feed.feed, 'chat_id': agent_feed.id}
-                                                for agent_feed in agent_feeds]
-            past_messages, current_messages = self._split_history(full_message_history,
-                                                              ((token_limit - base_token_limit - max_output_token_limit) // 4) * 3)
+            history_token_limit = ((token_limit - base_token_limit - max_output_token_limit) // 4) * 3
+            ltm_token_limit = (token_limit - base_token_limit - max_output_token_limit) // 4
+            ltm_summary = None
+            if context_window is not None and is_background_ltm_summary_enabled():
+                past_messages, ltm_summary, current_messages = self._split_context_window_with_prepared_summary(
+                    context_window, history_token_limit, ltm_token_limit)
+            elif context_window is not None:
+                past_messages, current_messages = self._split_context_window(context_window, history_token_limit)
+            else:
+                full_message_history = [{'role': agent_feed.role, 'content': agent_feed.feed, 'chat_id': agent_feed.id,
+                                         'token_count': getattr(agent_feed, 'token_count', None)}
+                                        for agent_feed in agent_feeds]
+                past_messages, current_messages = self._split_history(full_message_history, history_token_limit)
             if past_messages:
-                ltm_summary = self._build_ltm_summary(past_messages=past_messages,
-                                                                   output_token_limit=(token_limit - base_token_limit - max_output_token_limit) // 4)
+                ltm_summary = self._build_ltm_summary(past_messages=past_messages, output_token_limit=ltm_token_limit)
+            if ltm_summary is not None:
                 messages.append({"role": "assistant", "content": ltm_summary})
 
             for history in current_messages:
@@ -53,14 +73,122 @@ class AgentLlmMessageBuilder:
             messages.append({"role": "user", "content": completion_prompt})
 
         # insert initial agent feeds
-        self._add_initial_feeds(agent_feeds, messages)
+        has_feeds = context_window.num_feeds > 0 if context_window is not None else bool(agent_feeds)
+        self._add_initial_feeds(has_feeds, messages)
         return messages
 
+    def _window_cut_point(self, context_window, pending_token_limit: int):
+        # every message is counted on its own in _split_history, with 3 tokens for the reply
+        return context_window.cut_point(pending_token_limit, TokenCounter.tokens_per_message(self.llm_model) + 3)
+
+    def _split_context_window(self, context_window, pending_token_limit: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        cut_point = self._window_cut_point(context_window, pending_token_limit)
+        current_messages = context_window.fetch_messages(self.session, cut_point)
+        if cut_point == 0:
+            return [], current_messages
+        # the overflowing feeds are only read to be summarized
+        past_messages = context_window.fetch_messages(self.session, 0, cut_point)
+        self._add_or_update_last_agent_feed_ltm_summary_id(str(context_window.feed_ids[cut_point - 1]))
+        return past_messages, current_messages
+
+    def _split_context_window_with_prepared_summary(self, context_window, pending_token_limit: int,
+                                                    ltm_token_limit: int):
+        """
+        Split the history using the ltm summary prepared in background, scheduling its refresh once the window
+        passes the watermark so that it is ready before the feeds overflow.
+
+        Returns:
+            tuple: The past messages to summarize now, only when no summary was prepared yet, the prepared summary
+            and the current messages. A prepared summary lagging behind the feeds leaving the window is brought up
+            to date first, so that no feed is left out of both the summary and the messages.
+        """
+        cut_point = self._window_cut_point(context_window, pending_token_limit)
+        watermark_cut_point = self._window_cut_point(context_window,
+                                                     int(pending_token_limit * ltm_summary_watermark()))
+        ltm_summary, summarized_feed_id = self._fetch_prepared_ltm_summary()
+        if watermark_cut_point > 0 and summarized_feed_id < context_window.feed_ids[watermark_cut_point - 1]:
+            schedule_ltm_summary(self.agent_execution_id, context_window.feed_group_id, context_window.feed_ids[0],
+                                 context_window.feed_ids[watermark_cut_point - 1], ltm_token_limit)
+
+        if cut_point == 0:
+            return [], None, context_window.fetch_messages(self.session, 0)
+        if ltm_summary is not None and summarized_feed_id < context_window.feed_ids[cut_point - 1]:
+            ltm_summary = self._summarize_feeds(ltm_summary, summarized_feed_id, context_window.feed_group_id,
+                                                context_window.feed_ids[0], context_window.feed_ids[cut_point - 1],
+                                                ltm_token_limit)
+            summarized_feed_id = context_window.feed_ids[cut_point - 1]
+        if ltm_summary is None:
+            past_messages, current_messages = self._split_context_window(context_window, pending_token_limit)
+            return past_messages, None, current_messages
+        # the feeds of the window already in the summary are left out
+        start = max(cut_point, bisect.bisect_right(context_window.feed_ids, summarized_feed_id))
+        return [], ltm_summary, context_window.fetch_messages(self.session, start)
+
+    def _fetch_prepared_ltm_summary(self):
+        ltm_summary = AgentExecutionConfiguration.fetch_value(self.session, self.agent_execution_id, "ltm_summary")
+        if ltm_summary is None or not ltm_summary.value:
+            return None, 0
+        summarized_feed_id = AgentExecutionConfiguration.fetch_value(self.session, self.agent_execution_id,
+                                                                     "last_agent_feed_ltm_summary_id")
+        if summarized_feed_id is None or not summarized_feed_id.value:
+            return ltm_summary.value, 0
+        return ltm_summary.value, int(summarized_feed_id.value)
+
+    def refresh_ltm_summary(self, feed_group_id: str, first_feed_id: int, last_feed_id: int,
+                            output_token_limit: int):
+        """
+        Summarize the feeds up to the given one into the ltm summary of the execution, continuing the previous summary.
+
+        Args:
+            feed_group_id (str): The feed group of the feeds.
+            first_feed_id (int): The id of the first feed of the history.
+            last_feed_id (int): The id of the last feed to summarize.
+            output_token_limit (int): The maximum tokens of the summary.
+
+        Returns:
+            str: The summary.
+        """
+        previous_ltm_summary, summarized_feed_id = self._fetch_prepared_ltm_summary()
+        if summarized_feed_id >= last_feed_id:
+            return previous_ltm_summary
+        ltm_summary = self._summarize_feeds(previous_ltm_summary, summarized_feed_id, feed_group_id, first_feed_id,
+                                            last_feed_id, output_token_limit)
+        return ltm_summary if ltm_summary is not None else previous_ltm_summary
+
+    def _summarize_feeds(self, previous_ltm_summary, summarized_feed_id: int, feed_group_id: str,
+                         first_feed_id: int, last_feed_id: int, output_token_limit: int):
+        """Summarize the feeds after the summarized one into the stored ltm summary, None when the llm failed."""
+        feeds = AgentExecutionFeed.fetch_feeds_between(self.session, self.agent_execution_id, feed_group_id,
+                                                       max(summarized_feed_id + 1, first_feed_id), last_feed_id)
+        past_messages = [{'role': feed.role, 'content': feed.feed, 'chat_id': feed.id} for feed in feeds]
+        if previous_ltm_summary is not None:
+            ltm_prompt = self._build_prompt_for_recursive_ltm_summary_using_previous_ltm_summary(
+                previous_ltm_summary=previous_ltm_summary, past_messages=past_messages, token_limit=output_token_limit)
+        else:
+            ltm_prompt = self._build_prompt_for_ltm_summary(past_messages=past_messages, token_limit=output_token_limit)
+
+        if is_hierarchical_ltm_summary_enabled() and self._exceeds_token_limit(ltm_prompt, output_token_limit):
+            ltm_summary = self._build_hierarchical_ltm_summary(past_messages, previous_ltm_summary, output_token_limit)
+        else:
+            ltm_summary = self.ltm_summary_llm.chat_completion(
+                [{"role": "system", "content": "You are GPT Prompt writer"},
+                 {"role": "assistant", "content": ltm_prompt}])
+        if 'content' not in ltm_summary or ltm_summary['content'] is None:
+            logger.error(f"Unable to refresh the ltm summary of execution {self.agent_execution_id}: {ltm_summary}")
+            return None
+
+        execution = AgentExecution(id=self.agent_execution_id)
+        AgentExecutionConfiguration.add_or_update_agent_execution_config(
+            session=self.session, execution=execution,
+            agent_execution_configs={"ltm_summary": ltm_summary["content"], "last_agent_feed_ltm_summary_id": last_feed_id})
+        return ltm_summary["content"]
+
     def _split_history(self, history: List, pending_token_limit: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
         hist_token_count = 0
         i = len(history)
         for message in reversed(history):
-            token_count = TokenCounter.count_message_tokens([{"role": message["role"], "content": message["content"]}],
+            token_count = TokenCounter.count_message_tokens([{"role": message["role"], "content": message["content"],
+                                                              "token_count": message.get("token_count")}],
                                                             self.llm_model)
             hist_token_count += token_count
             if hist_token_count > pending_token_limit:
@@ -69,8 +197,8 @@ class AgentLlmMessageBuilder:
             i -= 1
         return [], history
 
-    def _add_initial_feeds(self, agent_feeds: list, messages: list):
-        if agent_feeds:
+    def _add_initial_feeds(self, has_feeds: bool, messages: list):
+        if has_feeds:
             return
         for message in messages:
             agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_execution_id,
@@ -95,9 +223,13 @@ class AgentLlmMessageBuilder:
         summary = AgentExecutionConfiguration.fetch_value(self.session, self.agent_execution_id, "ltm_summary")
         previous_ltm_summary = summary.value if summary is not None else ""
 
-        ltm_summary_base_token_limit = 10
-        if ((TokenCounter.count_text_tokens(ltm_prompt) + ltm_summary_base_token_limit + output_token_limit)
-            - TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit(self.llm_model)) > 0:
+        exceeds_token_limit = self._exceeds_token_limit(ltm_prompt, output_token_limit)
+        if exceeds_token_limit and is_hierarchical_ltm_summary_enabled():
+            # the whole overflowed history is summarized, its unchanged chunks are read from the cache
+            ltm_summary = self._build_hierarchical_ltm_summary(past_messages, None, output_token_limit)
+            return self._store_ltm_summary(ltm_summary)
+
+        if exceeds_token_limit:
             last_agent_feed_ltm_summary_id = AgentExecutionConfiguration.fetch_value(self.session,
                                                        self.agent_execution_id, "last_agent_feed_ltm_summary_id")
             last_agent_feed_ltm_summary_id = (
@@ -121,8 +253,32 @@ class AgentLlmMessageBuilder:
 
         msgs = [{"role": "system", "content": "You are GPT Prompt writer"},
                 {"role": "assistant", "content": ltm_prompt}]
-        ltm_summary = self.llm.chat_completion(msgs)
+        ltm_summary = self.ltm_summary_llm.chat_completion(msgs)
+        return self._store_ltm_summary(ltm_summary)
+
+    @property
+    def ltm_summary_llm(self):
+        """The llm of the ltm summaries, the model routed to summaries or the llm of the agent."""
+        if self._ltm_summary_llm is None:
+            self._ltm_summary_llm = route_llm(self.session, self.organisation.id, LlmTaskType.LTM_SUMMARY, self.llm)
+        return self._ltm_summary_llm
 
+    @property
+    def ltm_summary_model(self) -> str:
+        return self.ltm_summary_llm.get_model() if self.ltm_summary_llm.routed else self.llm_model
+
+    def _exceeds_token_limit(self, ltm_prompt: str, output_token_limit: int) -> bool:
+        ltm_summary_base_token_limit = 10
+        return ((TokenCounter.count_text_tokens(ltm_prompt) + ltm_summary_base_token_limit + output_token_limit)
+                - TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit(self.ltm_summary_model)) > 0
+
+    def _build_hierarchical_ltm_summary(self, past_messages: List[BaseMessage], previous_ltm_summary,
+                                        output_token_limit: int) -> dict:
+        token_limit = TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit(self.ltm_summary_model)
+        return HierarchicalLtmSummarizer(self.ltm_summary_llm, self.ltm_summary_model, token_limit, output_token_limit) \
+            .summarize(past_messages, previous_ltm_summary)
+
+    def _store_ltm_summary(self, ltm_summary: dict) -> str:
         if 'error' in ltm_summary and ltm_summary['message'] is not None:
             ErrorHandler.handle_openai_errors(self.session, self.agent_id, self.agent_execution_id, ltm_summary['message'])
 
@@ -134,28 +290,21 @@ class AgentLlmMessageBuilder:
         return ltm_summary["content"]
 
     def _build_prompt_for_ltm_summary(self, past_messages: List[BaseMessage], token_limit: int):
-        ltm_summary_prompt = PromptReader.read_agent_prompt(__file__, "agent_summary.txt")
+        template = get_prompt_registry().load(__file__, "agent_summary.txt")
 
         past_messages_prompt = ""
         for past_message in past_messages:
             past_messages_prompt += past_message["role"] + ": " + past_message["content"] + "\n"
-        ltm_summary_prompt = ltm_summary_prompt.replace("{past_messages}", past_messages_prompt)
 
-        ltm_summary_prompt = ltm_summary_prompt.replace("{char_limit}", str(token_limit*4))
-
-        return ltm_summary_prompt
+        return template.render({"past_messages": past_messages_prompt, "char_limit": str(token_limit*4)})
 
     def _build_prompt_for_recursive_ltm_summary_using_previous_ltm_summary(self, previous_ltm_summary: str,
                                                                     past_messages: List[BaseMessage], token_limit: int):
-        ltm_summary_prompt = PromptReader.read_agent_prompt(__file__, "agent_recursive_summary.txt")
-
-        ltm_summary_prompt = ltm_summary_prompt.replace("{previous_ltm_summary}", previous_ltm_summary)
+        template = get_prompt_registry().load(__file__, "agent_recursive_summary.txt")
 
         past_messages_prompt = ""
         for past_message in past_messages:
             past_messages_prompt += past_message["role"] + ": " + past_message["content"] + "\n"
-        ltm_summary_prompt = ltm_summary_prompt.replace("{past_messages}", past_messages_prompt)
-
-        ltm_summary_prompt = ltm_summary_prompt.replace("{char_limit}", str(token_limit*4))
 
-        return ltm_summary_prompt
+        return template.render({"previous_ltm_summary": previous_ltm_summary, "past_messages": past_messages_prompt,
+                                "char_limit": str(token_limit*4)})
@@ -1,12 +1,38 @@
 import json
 import re
+import threading
+from collections import OrderedDict
 
 from pydantic.types import List
 
+from superagi.helper.prompt_template import RenderedPrompt, get_prompt_registry
+from superagi.helper.token_budget import TokenBudget
 from superagi.helper.token_counter import TokenCounter
 from superagi.tools.base_tool import BaseTool
 
 FINISH_NAME = "finish"
+MAX_TOOL_SCHEMAS = 1024
+
+
+class ToolSchema:
+    """The string of a tool in the prompt, with its token count counted on first use."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self._token_count = None
+
+    @property
+    def token_count(self) -> int:
+        if self._token_count is None:
+            self._token_count = TokenCounter.count_text_tokens(self.text)
+        return self._token_count
+
+
+_finish_schema = ToolSchema(
+    f"\"{FINISH_NAME}\": use this to signal that you have finished all your objectives, "
+    f"args: \"response\": \"final response to let people know you have finished your objectives\"")
+_tool_schemas = OrderedDict()
+_tool_schemas_lock = threading.Lock()
 
 
 class AgentPromptBuilder:
@@ -29,20 +55,9 @@ class AgentPromptBuilder:
             add_finish (bool): Whether to add finish tool or not.
         """
         final_string = ""
-        print(tools)
         for i, item in enumerate(tools):
-            final_string += f"{i + 1}. {cls._generate_tool_string(item)}\n"
-        finish_description = (
-            "use this to signal that you have finished all your objectives"
-        )
-        finish_args = (
-            '"response": "final response to let '
-            'people know you have finished your objectives"'
-        )
-        finish_string = (
-            f"{len(tools) + 1}. \"{FINISH_NAME}\": "
-            f"{finish_description}, args: {finish_args}"
-        )
+            final_string += f"{i + 1}. {cls.get_tool_schema(item).text}\n"
+        finish_string = f"{len(tools) + 1}. {_finish_schema.text}"
         if add_finish:
             final_string = final_string + finish_string + "\n\n"
         else:
@@ -50,6 +65,38 @@ class AgentPromptBuilder:
 
         return final_string
 
+    @classmethod
+    def get_tool_schema(cls, tool: BaseTool) -> ToolSchema:
+        """Return the string of the tool in the prompt, rendered once per tool class, name, description and schema.
+
+        Args:
+            tool (BaseTool): The tool.
+        """
+        key = (type(tool), tool.name, tool.description, tool.args_schema, getattr(tool, "func", None))
+        with _tool_schemas_lock:
+            tool_schema = _tool_schemas.pop(key, None)
+            if tool_schema is not None:
+                _tool_schemas[key] = tool_schema
+                return tool_schema
+        tool_schema = ToolSchema(cls._generate_tool_string(tool))
+        with _tool_schemas_lock:
+            _tool_schemas[key] = tool_schema
+            while len(_tool_schemas) > MAX_TOOL_SCHEMAS:
+                _tool_schemas.popitem(last=False)
+        return tool_schema
+
+    @classmethod
+    def count_tools_tokens(cls, tools: List[BaseTool], add_finish: bool = True) -> int:
+        """Count the tokens of the tools in the prompt from the token counts of their strings.
+
+        Args:
+            tools (List[BaseTool]): The list of tools.
+            add_finish (bool): Whether the finish tool is added or not.
+        """
+        # the numbering and newline of each tool
+        tool_schemas = [cls.get_tool_schema(tool) for tool in tools] + ([_finish_schema] if add_finish else [])
+        return sum(tool_schema.token_count + 3 for tool_schema in tool_schemas)
+
     @classmethod
     def _generate_tool_string(cls, tool: BaseTool) -> str:
         output = f"\"{tool.name}\": {tool.description}"
@@ -75,22 +122,21 @@ class AgentPromptBuilder:
             tools (List[BaseTool]): The list of tools.
             add_finish_tool (bool): Whether to add finish tool or not.
         """
-        super_agi_prompt = super_agi_prompt.replace("{goals}", AgentPromptBuilder.add_list_items_to_string(goals))
+        values = {"goals": AgentPromptBuilder.add_list_items_to_string(goals), "instructions": '',
+                  "task_instructions": ""}
         if len(instructions) > 0 and len(instructions[0]) > 0:
             task_str = "INSTRUCTION(Follow these instruction to decide the flow of execution and decide the next steps for achieving the task):"
-            super_agi_prompt = super_agi_prompt.replace("{instructions}", "INSTRUCTION: " + '\n' +  AgentPromptBuilder.add_list_items_to_string(instructions))
-            super_agi_prompt = super_agi_prompt.replace("{task_instructions}", task_str + '\n' +  AgentPromptBuilder.add_list_items_to_string(instructions))
-        else:
-            super_agi_prompt = super_agi_prompt.replace("{instructions}", '')
-        super_agi_prompt = super_agi_prompt.replace("{task_instructions}", "")
-        super_agi_prompt = super_agi_prompt.replace("{constraints}",
-                                                    AgentPromptBuilder.add_list_items_to_string(constraints))
-
+            values["instructions"] = "INSTRUCTION: " + '\n' +  AgentPromptBuilder.add_list_items_to_string(instructions)
+            values["task_instructions"] = task_str + '\n' +  AgentPromptBuilder.add_list_items_to_string(instructions)
+        values["constraints"] = AgentPromptBuilder.add_list_items_to_string(constraints)
 
         # logger.info(tools)
-        tools_string = AgentPromptBuilder.add_tools_to_prompt(tools, add_finish_tool)
-        super_agi_prompt = super_agi_prompt.replace("{tools}", tools_string)
-        return super_agi_prompt
+        values["tools"] = AgentPromptBuilder.add_tools_to_prompt(tools, add_finish_tool)
+        template = get_prompt_registry().compile(super_agi_prompt)
+        # the token count of the tools is only needed to budget the task history
+        token_counts = {"tools": AgentPromptBuilder.count_tools_tokens(tools, add_finish_tool)} \
+            if "task_history" in template.slots else {}
+        return template.render_partial(values, token_counts)
 
     @classmethod
     def replace_task_based_variables(cls, super_agi_prompt: str, current_task: str, last_task: str,
@@ -106,31 +152,39 @@ class AgentPromptBuilder:
             completed_tasks (list): The list of completed tasks.
             token_limit (int): The token limit.
         """
-        if "{current_task}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{current_task}", current_task)
-        if "{last_task}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{last_task}", last_task)
-        if "{last_task_result}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{last_task_result}", last_task_result)
-        if "{pending_tasks}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{pending_tasks}", str(pending_tasks))
+        # the prompt rendered by replace_main_variables is filled from its template instead of being parsed again,
+        # so that goals or tool schemas holding braces are not taken for placeholders
+        if isinstance(super_agi_prompt, RenderedPrompt):
+            template, values = super_agi_prompt.template, dict(super_agi_prompt.values)
+            token_counts = super_agi_prompt.token_counts
+        else:
+            template, values, token_counts = get_prompt_registry().compile(super_agi_prompt), {}, {}
+        values.update({"current_task": current_task, "last_task": last_task, "last_task_result": last_task_result,
+                       "pending_tasks": str(pending_tasks)})
 
         completed_tasks.reverse()
-        if "{completed_tasks}" in super_agi_prompt:
+        if "completed_tasks" in template.slots:
             completed_tasks_arr = []
             for task in completed_tasks:
                 completed_tasks_arr.append(task['task'])
-            super_agi_prompt = super_agi_prompt.replace("{completed_tasks}", str(completed_tasks_arr))
+            values["completed_tasks"] = str(completed_tasks_arr)
+
+        if "task_history" not in template.slots:
+            return template.render(values)
 
-        base_token_limit = TokenCounter.count_message_tokens([{"role": "user", "content": super_agi_prompt}])
+        # the values with a known token count, such as the tools, are left out of the prompt counted
+        counted_prompt = template.render({**values, **{name: "" for name in token_counts}})
+        base_token_limit = TokenCounter.count_message_tokens([{"role": "user", "content": counted_prompt}]) + sum(
+            token_count * template.slots.count(name) for name, token_count in token_counts.items())
         pending_tokens = token_limit - base_token_limit
         final_output = ""
-        if "{task_history}" in super_agi_prompt:
-            for task in reversed(completed_tasks[-10:]):
-                final_output = f"Task: {task['task']}\nResult: {task['response']}\n" + final_output
-                token_count = TokenCounter.count_message_tokens([{"role": "user", "content": final_output}])
-                # giving buffer of 100 tokens
-                if token_count > min(600, pending_tokens):
-                    break
-            super_agi_prompt = super_agi_prompt.replace("{task_history}", "\n" + final_output + "\n")
-        return super_agi_prompt
+        # giving buffer of 100 tokens
+        task_history_budget = TokenBudget.for_message(min(600, pending_tokens))
+        for task in reversed(completed_tasks[-10:]):
+            task_output = f"Task: {task['task']}\nResult: {task['response']}\n"
+            final_output = task_output + final_output
+            task_history_budget.add(task_output)
+            if task_history_budget.exceeded:
+                break
+        values["task_history"] = "\n" + final_output + "\n"
+        return template.render(values)
@@ -3,9 +3,26 @@ import re
 from pydantic.types import List
 
 from superagi.helper.prompt_reader import PromptReader
+from superagi.helper.prompt_template import get_prompt_registry
 
 FINISH_NAME = "finish"
 
+# The variables AgentPromptBuilder fills in the prompts of the iteration workflows, a prompt may use any of them
+ITERATION_PROMPT_VARIABLES = ["goals", "instructions", "task_instructions", "constraints", "tools", "current_task",
+                              "last_task", "last_task_result", "pending_tasks", "completed_tasks", "task_history"]
+ITERATION_PROMPTS = ["superagi.txt", "initialize_tasks.txt", "analyse_task.txt", "create_tasks.txt",
+                     "prioritize_tasks.txt"]
+# The variables filled in the prompts of the agent steps, a prompt has to use all of them
+STEP_PROMPT_VARIABLES = {
+    "agent_queue_input.txt": ["instruction"],
+    "agent_recursive_summary.txt": ["previous_ltm_summary", "past_messages", "char_limit"],
+    "agent_reduce_summary.txt": ["summaries", "char_limit"],
+    "agent_summary.txt": ["past_messages", "char_limit"],
+    "agent_tool_input.txt": ["goals", "tool_name", "instruction", "tool_schema"],
+    "agent_tool_output.txt": ["goals", "tool_output", "tool_name", "instruction", "output_options"],
+    "multi_tool_calls.txt": ["max_tool_calls"],
+}
+
 
 class AgentPromptTemplate:
 
@@ -57,3 +74,22 @@ class AgentPromptTemplate:
         super_agi_prompt = PromptReader.read_agent_prompt(__file__, "prioritize_tasks.txt")
         return {"prompt": AgentPromptTemplate.clean_prompt(super_agi_prompt),
                 "variables": ["goals", "instructions", "last_task", "last_task_result", "pending_tasks"]}
+
+    @classmethod
+    def multi_tool_calls(cls, max_tool_calls: int):
+        template = get_prompt_registry().load(__file__, "multi_tool_calls.txt")
+        return template.render({"max_tool_calls": str(max_tool_calls)})
+
+    @classmethod
+    def validate_prompts(cls):
+        """
+        Load the template of every agent prompt, checking its placeholders against the variables filled in it.
+
+        Raises:
+            PromptTemplateError: If a prompt has an unfilled placeholder or misses a variable filled in it.
+        """
+        registry = get_prompt_registry()
+        for prompt_file in ITERATION_PROMPTS:
+            registry.load(__file__, prompt_file, ITERATION_PROMPT_VARIABLES, allow_unused=True)
+        for prompt_file, variables in STEP_PROMPT_VARIABLES.items():
+            registry.load(__file__, prompt_file, variables)
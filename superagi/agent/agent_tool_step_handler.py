@@ -1,20 +1,22 @@
 import json
 
 from superagi.agent.task_queue import TaskQueue
+from superagi.agent.agent_execution_context import AgentExecutionContext
 from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+from superagi.agent.context_window import get_context_window
 from superagi.agent.agent_prompt_builder import AgentPromptBuilder
 from superagi.agent.output_handler import ToolOutputHandler
 from superagi.agent.output_parser import AgentSchemaToolOutputParser
 from superagi.agent.queue_step_handler import QueueStepHandler
+from superagi.agent.step_checkpoint import StepCheckpoint
 from superagi.agent.tool_builder import ToolBuilder
 from superagi.helper.error_handler import ErrorHandler
-from superagi.helper.prompt_reader import PromptReader
+from superagi.helper.prompt_template import get_prompt_registry
 from superagi.helper.token_counter import TokenCounter
 from superagi.lib.logger import logger
+from superagi.llms.llm_router import route_llm
 from superagi.models.agent import Agent
-from superagi.models.agent_config import AgentConfiguration
 from superagi.models.agent_execution import AgentExecution
-from superagi.models.agent_execution_config import AgentExecutionConfiguration
 from superagi.models.agent_execution_feed import AgentExecutionFeed
 from superagi.models.agent_execution_permission import AgentExecutionPermission
 from superagi.models.tool import Tool
@@ -23,25 +25,28 @@ from superagi.models.workflows.agent_workflow_step import AgentWorkflowStep
 from superagi.models.workflows.agent_workflow_step_tool import AgentWorkflowStepTool
 from superagi.resource_manager.resource_summary import ResourceSummarizer
 from superagi.tools.base_tool import BaseTool
+from superagi.types.llm_task_types import LlmTaskType
 from sqlalchemy import and_
 
 class AgentToolStepHandler:
     """Handles the tools steps in the agent workflow"""
-    def __init__(self, session, llm, agent_id: int, agent_execution_id: int, memory=None):
+    def __init__(self, session, llm, agent_id: int, agent_execution_id: int, memory=None,
+                 execution_context: AgentExecutionContext = None):
         self.session = session
         self.llm = llm
         self.agent_execution_id = agent_execution_id
         self.agent_id = agent_id
         self.memory = memory
         self.task_queue = TaskQueue(str(self.agent_execution_id))
-        self.organisation = Agent.find_org_by_agent_id(self.session, self.agent_id)
+        self.execution_context = execution_context or AgentExecutionContext(session, agent_id, agent_execution_id)
+        self._step_checkpoints = []
 
     def execute_step(self):
-        execution = AgentExecution.get_agent_execution_from_id(self.session, self.agent_execution_id)
+        execution = self.execution_context.agent_execution
         workflow_step = AgentWorkflowStep.find_by_id(self.session, execution.current_agent_step_id)
         step_tool = AgentWorkflowStepTool.find_by_id(self.session, workflow_step.action_reference_id)
-        agent_config = Agent.fetch_configuration(self.session, self.agent_id)
-        agent_execution_config = AgentExecutionConfiguration.fetch_configuration(self.session, self.agent_execution_id)
+        agent_config = self.execution_context.agent_config
+        agent_execution_config = self.execution_context.agent_execution_config
         # print(agent_execution_config)
 
         if not self._handle_wait_for_permission(execution, workflow_step):
@@ -61,14 +66,18 @@ class AgentToolStepHandler:
                                                           workflow_step)
         tool_obj = self._build_tool_obj(agent_config, agent_execution_config, step_tool.tool_name)
         tool_output_handler = ToolOutputHandler(self.agent_execution_id, agent_config, [tool_obj],self.memory,
-                                                output_parser=AgentSchemaToolOutputParser())
+                                                output_parser=AgentSchemaToolOutputParser(),
+                                                execution_context=self.execution_context)
         final_response = tool_output_handler.handle(self.session, assistant_reply)
         step_response = "default"
         if step_tool.output_instruction:
-            step_response = self._process_output_instruction(final_response.result, step_tool, workflow_step)
+            step_response = self._process_output_instruction(final_response.result, step_tool, workflow_step,
+                                                             agent_execution_config.get("goal"))
 
         next_step = AgentWorkflowStep.fetch_next_step(self.session, workflow_step.id, step_response)
         self._handle_next_step(next_step)
+        for step_checkpoint in self._step_checkpoints:
+            step_checkpoint.clear()
         self.session.flush()
 
     def _create_permission_request(self, execution, step_tool: AgentWorkflowStepTool):
@@ -99,13 +108,15 @@ class AgentToolStepHandler:
         tool_obj = self._build_tool_obj(agent_config, agent_execution_config, step_tool.tool_name)
         prompt = self._build_tool_input_prompt(step_tool, tool_obj, agent_execution_config)
         logger.info("Prompt: ", prompt)
-        agent_feeds = AgentExecutionFeed.fetch_agent_execution_feeds(self.session, self.agent_execution_id)
-        messages = AgentLlmMessageBuilder(self.session, self.llm, self.llm.get_model(), self.agent_id, self.agent_execution_id) \
-            .build_agent_messages(prompt, agent_feeds, history_enabled=step_tool.history_enabled,
-                                  completion_prompt=step_tool.completion_prompt)
+        context_window = get_context_window(self.session, self.execution_context.agent_execution)
+        messages = AgentLlmMessageBuilder(self.session, self.llm, self.llm.get_model(), self.agent_id, self.agent_execution_id,
+                                          organisation=self.execution_context.organisation) \
+            .build_agent_messages(prompt, history_enabled=step_tool.history_enabled,
+                                  completion_prompt=step_tool.completion_prompt, context_window=context_window)
         # print(messages)
         current_tokens = TokenCounter.count_message_tokens(messages, self.llm.get_model())
-        response = self.llm.chat_completion(messages, TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit(self.llm.get_model()) - current_tokens)
+        max_tokens = TokenCounter(session=self.session, organisation_id=self.execution_context.organisation.id).token_limit(self.llm.get_model()) - current_tokens
+        response = self._get_checkpointed_completion(self.llm, f"{workflow_step.id}:input", messages, max_tokens)
 
         if 'error' in response and response['message'] is not None:
             ErrorHandler.handle_openai_errors(self.session, self.agent_id, self.agent_execution_id, response['message'])
@@ -117,17 +128,35 @@ class AgentToolStepHandler:
         assistant_reply = response['content']
         return assistant_reply
 
+    def _get_checkpointed_completion(self, llm, step_id: str, messages: list, max_tokens: int):
+        """
+        Get the reply of the llm, recorded before the tool runs so that a retry of the step after a crash resumes
+        from it. The checkpoints are cleared once the step moved to the next one.
+        """
+        step_checkpoint = StepCheckpoint(self.agent_execution_id, step_id, messages)
+        self._step_checkpoints.append(step_checkpoint)
+        response = step_checkpoint.get()
+        if response is not None:
+            logger.info(f"Resuming agent execution {self.agent_execution_id} from the checkpointed llm response")
+            return response
+        response = llm.chat_completion(messages, max_tokens)
+        if response.get('content') is not None:
+            step_checkpoint.save(response)
+        return response
+
     def _build_tool_obj(self, agent_config, agent_execution_config, tool_name: str):
-        model_api_key = AgentConfiguration.get_model_api_key(self.session, self.agent_id, agent_config["model"])['api_key']
-        tool_builder = ToolBuilder(self.session, self.agent_id, self.agent_execution_id)
+        model_api_key = self.execution_context.get_model_config(agent_config["model"])['api_key']
+        tool_builder = ToolBuilder(self.session, self.agent_id, self.agent_execution_id,
+                                   execution_context=self.execution_context)
+        organisation = self.execution_context.organisation
         resource_summary = ""
         if tool_name == "QueryResourceTool":
             resource_summary = ResourceSummarizer(session=self.session,
                                                   agent_id=self.agent_id,
-                                                  model=agent_config["model"]).fetch_or_create_agent_resource_summary(
+                                                  model=agent_config["model"],
+                                                  organisation_id=organisation.id).fetch_or_create_agent_resource_summary(
                 default_summary=agent_config.get("resource_summary"))
 
-        organisation = Agent.find_org_by_agent_id(self.session, self.agent_id)
         tool = self.session.query(Tool).join(Toolkit, and_(Tool.toolkit_id == Toolkit.id, Toolkit.organisation_id == organisation.id, Tool.name == tool_name)).first()
         tool_obj = tool_builder.build_tool(tool)
         tool_obj = tool_builder.set_default_params_tool(tool_obj, agent_config, agent_execution_config, model_api_key,
@@ -135,50 +164,48 @@ class AgentToolStepHandler:
         return tool_obj
 
     def _process_output_instruction(self, final_response: str, step_tool: AgentWorkflowStepTool,
-                                    workflow_step: AgentWorkflowStep):
-        prompt = self._build_tool_output_prompt(step_tool, final_response, workflow_step)
+                                    workflow_step: AgentWorkflowStep, goals: list = None):
+        prompt = self._build_tool_output_prompt(step_tool, final_response, workflow_step, goals)
         messages = [{"role": "system", "content": prompt}]
-        current_tokens = TokenCounter.count_message_tokens(messages, self.llm.get_model())
-        response = self.llm.chat_completion(messages,
-                                            TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit(self.llm.get_model()) - current_tokens)
+        organisation_id = self.execution_context.organisation.id
+        llm = route_llm(self.session, organisation_id, LlmTaskType.OUTPUT_INSTRUCTION, self.llm)
+        current_tokens = TokenCounter.count_message_tokens(messages, llm.get_model())
+        max_tokens = TokenCounter(session=self.session, organisation_id=organisation_id).token_limit(llm.get_model()) - current_tokens
+        response = self._get_checkpointed_completion(llm, f"{workflow_step.id}:output", messages, max_tokens)
 
         if 'error' in response and response['message'] is not None:
             ErrorHandler.handle_openai_errors(self.session, self.agent_id, self.agent_execution_id, response['message'])
             
         if 'content' not in response or response['content'] is None:
             raise RuntimeError(f"ToolWorkflowStepHandler: Failed to get output response from llm")
-        total_tokens = current_tokens + TokenCounter.count_message_tokens(response, self.llm.get_model())
+        total_tokens = current_tokens + TokenCounter.count_message_tokens(response, llm.get_model())
         AgentExecution.update_tokens(self.session, self.agent_execution_id, total_tokens)
         step_response = response['content']
         step_response = step_response.replace("'", "").replace("\"", "")
         return step_response
 
     def _build_tool_input_prompt(self, step_tool: AgentWorkflowStepTool, tool: BaseTool, agent_execution_config: dict):
-        super_agi_prompt = PromptReader.read_agent_prompt(__file__, "agent_tool_input.txt")
-        super_agi_prompt = super_agi_prompt.replace("{goals}", AgentPromptBuilder.add_list_items_to_string(
-            agent_execution_config["goal"]))
-        super_agi_prompt = super_agi_prompt.replace("{tool_name}", step_tool.tool_name)
-        super_agi_prompt = super_agi_prompt.replace("{instruction}", step_tool.input_instruction)
-
-        tool_schema = f"\"{tool.name}\": {tool.description}, args json schema: {json.dumps(tool.args)}"
-        super_agi_prompt = super_agi_prompt.replace("{tool_schema}", tool_schema)
-        return super_agi_prompt
+        template = get_prompt_registry().load(__file__, "agent_tool_input.txt")
+        tool_schema = AgentPromptBuilder.get_tool_schema(tool).text
+        return template.render({"goals": AgentPromptBuilder.add_list_items_to_string(agent_execution_config["goal"]),
+                                "tool_name": step_tool.tool_name,
+                                "instruction": step_tool.input_instruction,
+                                "tool_schema": tool_schema})
 
     def _get_step_responses(self, workflow_step: AgentWorkflowStep):
         return [step["step_response"] for step in workflow_step.next_steps]
 
     def _build_tool_output_prompt(self, step_tool: AgentWorkflowStepTool, tool_output: str,
-                                  workflow_step: AgentWorkflowStep):
-        super_agi_prompt = PromptReader.read_agent_prompt(__file__, "agent_tool_output.txt")
-        super_agi_prompt = super_agi_prompt.replace("{tool_output}", tool_output)
-        super_agi_prompt = super_agi_prompt.replace("{tool_name}", step_tool.tool_name)
-        super_agi_prompt = super_agi_prompt.replace("{instruction}", step_tool.output_instruction)
-
+                                  workflow_step: AgentWorkflowStep, goals: list = None):
+        template = get_prompt_registry().load(__file__, "agent_tool_output.txt")
         step_responses = self._get_step_responses(workflow_step)
         if "default" in step_responses:
             step_responses.remove("default")
-        super_agi_prompt = super_agi_prompt.replace("{output_options}", str(step_responses))
-        return super_agi_prompt
+        values = {"tool_output": tool_output, "tool_name": step_tool.tool_name,
+                  "instruction": step_tool.output_instruction, "output_options": str(step_responses)}
+        if goals is not None:
+            values["goals"] = AgentPromptBuilder.add_list_items_to_string(goals)
+        return template.render(values)
 
     def _handle_wait_for_permission(self, agent_execution, workflow_step: AgentWorkflowStep):
         """
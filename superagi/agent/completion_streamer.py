@@ -0,0 +1,104 @@
+import time
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+
+PARTIAL_FEED_INTERVAL = 0.5  # Seconds
+
+
+class JsonObjectTracker:
+    """Follows a streamed reply to find where its first top level JSON object or array closes."""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.position = 0
+
+    def feed(self, text: str):
+        """
+        Feed the next chunk of the reply.
+
+        Args:
+            text (str): The chunk.
+
+        Returns:
+            int: The length of the reply up to the end of the JSON value, or None while it is still open.
+        """
+        for char in text:
+            self.position += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.depth > 0:
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    return self.position
+        return None
+
+
+class CompletionStreamer:
+    """
+    Gets a chat completion through the streaming interface of the llm, publishing the reply as a throttled
+    partial feed while it is generated, and optionally stopping as soon as the JSON reply is complete.
+
+    Falls back to the plain chat completion (and its retries and error responses) when the llm does not stream
+    or the stream fails, the partial reply of a stream broken midway being discarded.
+    """
+
+    def __init__(self, llm, partial_feed=None, stop_at_json_end: bool = False, interval: float = None,
+                 clock=time.monotonic):
+        self.llm = llm
+        self.partial_feed = partial_feed
+        self.stop_at_json_end = stop_at_json_end
+        self.interval = interval if interval is not None else float(
+            get_config("PARTIAL_FEED_INTERVAL", PARTIAL_FEED_INTERVAL))
+        self.clock = clock
+
+    def complete(self, messages: list, max_tokens: int):
+        """
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            dict: The response, with the same content and error keys as chat_completion.
+        """
+        content = ""
+        try:
+            chunks = self.llm.stream_chat_completion(messages, max_tokens)
+            tracker = JsonObjectTracker() if self.stop_at_json_end else None
+            published_at = None
+            for chunk in chunks:
+                content += chunk
+                end = tracker.feed(chunk) if tracker is not None else None
+                if end is not None:
+                    content = content[:end]
+                    # the rest of the reply is not needed, stop generating it
+                    if hasattr(chunks, "close"):
+                        chunks.close()
+                    break
+                if self.partial_feed is not None and (published_at is None or
+                                                      self.clock() - published_at >= self.interval):
+                    self.partial_feed.update(content)
+                    published_at = self.clock()
+        except Exception as exception:
+            if content:
+                logger.error(f"Completion stream interrupted, retrying with chat completion: {exception}")
+                content = ""
+            else:
+                logger.info(f"Streaming not available, using chat completion: {exception}")
+
+        if not content:
+            return self.llm.chat_completion(messages, max_tokens)
+        if self.partial_feed is not None:
+            self.partial_feed.update(content)
+        return {"content": content}
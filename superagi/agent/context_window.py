@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+
+from superagi.config.config import get_config
+from superagi.models.agent_execution_feed import AgentExecutionFeed
+
+MAX_CONTEXT_WINDOWS = 1000
+
+
+class ContextWindow:
+    """
+    Incrementally maintained history of an agent execution for the prompt.
+
+    Keeps the ids of the feeds of the current feed group with running prefix sums of their token counts, so that
+    the next prompt only reads the feeds added since the previous step and the contents of the feeds that fit in
+    it, instead of every feed of the execution.
+    """
+
+    def __init__(self, agent_execution_id: int):
+        self.agent_execution_id = agent_execution_id
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, feed_group_id):
+        self.feed_group_id = feed_group_id
+        self.feed_ids = []
+        # prefix_tokens[i] is the number of content tokens of the first i feeds
+        self.prefix_tokens = [0]
+        # the first feeds of the default feed group hold the prompt and are not part of the history
+        self.skipped_feeds = 0
+        self.last_feed_id = 0
+        # the latest updated_at of the synced feeds, a later one means that a feed was edited since
+        self.last_update = None
+
+    @property
+    def num_feeds(self):
+        return len(self.feed_ids)
+
+    def sync(self, session, feed_group_id: str):
+        """
+        Add the feeds stored since the last sync, starting over when the execution moved to another feed group or
+        a synced feed was edited, which changes its token count.
+
+        Args:
+            session (Session): The database session.
+            feed_group_id (str): The current feed group of the execution.
+        """
+        with self._lock:
+            if feed_group_id != self.feed_group_id or (self.last_feed_id and AgentExecutionFeed.fetch_last_update(
+                    session, self.agent_execution_id, feed_group_id, self.last_feed_id) != self.last_update):
+                self._reset(feed_group_id)
+            for feed_id, token_count, updated_at in AgentExecutionFeed.fetch_feed_token_counts(
+                    session, self.agent_execution_id, feed_group_id, self.last_feed_id):
+                self.last_feed_id = max(self.last_feed_id, feed_id)
+                if updated_at is not None and (self.last_update is None or updated_at > self.last_update):
+                    self.last_update = updated_at
+                if feed_group_id == "DEFAULT" and self.skipped_feeds < 2:
+                    self.skipped_feeds += 1
+                    continue
+                self.feed_ids.append(feed_id)
+                self.prefix_tokens.append(self.prefix_tokens[-1] + token_count)
+
+    def _tokens_from(self, index: int, tokens_per_message: int):
+        return self.prefix_tokens[-1] - self.prefix_tokens[index] + (self.num_feeds - index) * tokens_per_message
+
+    def cut_point(self, token_limit: int, tokens_per_message: int):
+        """
+        Find the first feed of the longest run of latest feeds fitting in the token limit.
+
+        Args:
+            token_limit (int): The tokens available for the history.
+            tokens_per_message (int): The tokens added to the content of every message.
+
+        Returns:
+            int: The index of the first feed in the window, the earlier feeds overflow it.
+        """
+        low, high = 0, self.num_feeds
+        while low < high:
+            middle = (low + high) // 2
+            if self._tokens_from(middle, tokens_per_message) > token_limit:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def fetch_messages(self, session, start: int, end: int = None):
+        """
+        Read the feeds of the window between two indexes as messages.
+
+        Args:
+            session (Session): The database session.
+            start (int): The index of the first feed.
+            end (int): The index after the last feed, the end of the window when not given.
+
+        Returns:
+            list: The messages, with the role, content, chat_id and token_count of each feed.
+        """
+        end = self.num_feeds if end is None else end
+        if start >= end:
+            return []
+        feeds = AgentExecutionFeed.fetch_feeds_between(session, self.agent_execution_id, self.feed_group_id,
+                                                       self.feed_ids[start], self.feed_ids[end - 1])
+        return [{'role': feed.role, 'content': feed.feed, 'chat_id': feed.id, 'token_count': feed.token_count}
+                for feed in feeds]
+
+
+_context_windows = OrderedDict()
+_context_windows_lock = threading.Lock()
+
+
+def get_context_window(session, agent_execution):
+    """
+    Return the context window of the agent execution, synced with its latest feeds. The windows of the most recent
+    executions are kept in the memory of the process, a worker picking up another execution builds its window once
+    from the token counts of its feeds.
+
+    Args:
+        session (Session): The database session.
+        agent_execution (AgentExecution): The agent execution.
+
+    Returns:
+        ContextWindow: The context window.
+    """
+    with _context_windows_lock:
+        context_window = _context_windows.pop(agent_execution.id, None) or ContextWindow(agent_execution.id)
+        _context_windows[agent_execution.id] = context_window
+        while len(_context_windows) > int(get_config("MAX_CONTEXT_WINDOWS", MAX_CONTEXT_WINDOWS)):
+            _context_windows.popitem(last=False)
+    context_window.sync(session, agent_execution.current_feed_group_id)
+    return context_window
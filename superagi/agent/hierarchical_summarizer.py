@@ -0,0 +1,170 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import redis
+
+from superagi.config.config import get_config, get_config_flag
+from superagi.helper.prompt_template import get_prompt_registry
+from superagi.helper.token_counter import TokenCounter
+from superagi.lib.logger import logger
+from superagi.types.common import BaseMessage
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+
+
+def is_hierarchical_ltm_summary_enabled():
+    return get_config_flag("HIERARCHICAL_LTM_SUMMARY", False)
+
+
+class HierarchicalLtmSummarizer:
+    """
+    Map-reduce summarizer for histories that do not fit in one context of the model.
+
+    The messages are split in chunks fitting the context, the chunks are summarized concurrently and the summaries
+    are combined, in as many rounds as needed, into one summary. Every summary is cached by the hash of its prompt,
+    so the chunks summarized in a previous step are never sent to the llm again.
+    """
+    MAX_WORKERS = 4
+    CHUNK_SUMMARY_TTL = 86400  # Seconds
+    BASE_TOKEN_LIMIT = 10
+
+    def __init__(self, llm, llm_model: str, token_limit: int, output_token_limit: int, max_workers: int = None):
+        self.llm = llm
+        self.llm_model = llm_model
+        self.output_token_limit = output_token_limit
+        self.max_workers = max_workers or int(get_config("LTM_SUMMARY_MAX_WORKERS", self.MAX_WORKERS))
+        self.summary_prompt = get_prompt_registry().load(__file__, "agent_summary.txt")
+        self.reduce_prompt = get_prompt_registry().load(__file__, "agent_reduce_summary.txt")
+        prompt_token_count = max(TokenCounter.count_text_tokens(self.summary_prompt.text),
+                                 TokenCounter.count_text_tokens(self.reduce_prompt.text))
+        # the tokens left in the context for the content of a chunk
+        self.chunk_token_limit = token_limit - prompt_token_count - output_token_limit - self.BASE_TOKEN_LIMIT
+
+    def summarize(self, past_messages: List[BaseMessage], previous_ltm_summary: str = None) -> dict:
+        """
+        Summarize the messages, continuing the previous summary.
+
+        Args:
+            past_messages (list): The messages to summarize.
+            previous_ltm_summary (str): The summary of the messages before them.
+
+        Returns:
+            dict: The llm response with the summary as content, or the first error of the llm.
+        """
+        chunks = self.chunk(past_messages)
+        logger.info(f"Summarizing {len(past_messages)} messages in {len(chunks)} chunks")
+        responses = self._map([self._build_summary_prompt(chunk) for chunk in chunks])
+        error = self._first_error(responses)
+        if error is not None:
+            return error
+        summaries = [response["content"] for response in responses]
+        if previous_ltm_summary:
+            summaries.insert(0, previous_ltm_summary)
+        return self._reduce(summaries)
+
+    def chunk(self, messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+        """
+        Split the messages in consecutive chunks whose content fits the token budget of a chunk. A message larger
+        than the budget is a chunk of its own.
+
+        Args:
+            messages (list): The messages to split.
+
+        Returns:
+            list: The chunks.
+        """
+        chunks, chunk, chunk_token_count = [], [], 0
+        for message in messages:
+            token_count = TokenCounter.count_message_tokens(
+                [{"role": message["role"], "content": message["content"], "token_count": message.get("token_count")}],
+                self.llm_model)
+            if chunk and chunk_token_count + token_count > self.chunk_token_limit:
+                chunks.append(chunk)
+                chunk, chunk_token_count = [], 0
+            chunk.append(message)
+            chunk_token_count += token_count
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _reduce(self, summaries: List[str]) -> dict:
+        while len(summaries) > 1:
+            groups = self._group(summaries)
+            responses = self._map([self._build_reduce_prompt(group) for group in groups])
+            error = self._first_error(responses)
+            if error is not None:
+                return error
+            summaries = [response["content"] for response in responses]
+        return {"content": summaries[0]}
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        # every group holds at least two summaries, so that each round shrinks the summaries
+        groups, group, group_token_count = [], [], 0
+        for summary in summaries:
+            token_count = TokenCounter.count_text_tokens(summary)
+            if len(group) > 1 and group_token_count + token_count > self.chunk_token_limit:
+                groups.append(group)
+                group, group_token_count = [], 0
+            group.append(summary)
+            group_token_count += token_count
+        if len(group) == 1 and groups:
+            groups[-1].append(group[0])
+        elif group:
+            groups.append(group)
+        return groups
+
+    def _map(self, prompts: List[str]) -> List[dict]:
+        if len(prompts) == 1:
+            return [self._summarize_prompt(prompts[0])]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(prompts))) as executor:
+            return list(executor.map(self._summarize_prompt, prompts))
+
+    def _summarize_prompt(self, prompt: str) -> dict:
+        cache_key = self._cache_key(prompt)
+        summary = self._get_cached_summary(cache_key)
+        if summary is not None:
+            return {"content": summary}
+        response = self.llm.chat_completion([{"role": "system", "content": "You are GPT Prompt writer"},
+                                             {"role": "assistant", "content": prompt}])
+        if "error" in response or response.get("content") is None:
+            return response
+        self._cache_summary(cache_key, response["content"])
+        return response
+
+    def _build_summary_prompt(self, messages: List[BaseMessage]) -> str:
+        past_messages_prompt = ""
+        for message in messages:
+            past_messages_prompt += message["role"] + ": " + message["content"] + "\n"
+        return self.summary_prompt.render({"past_messages": past_messages_prompt,
+                                           "char_limit": str(self.output_token_limit * 4)})
+
+    def _build_reduce_prompt(self, summaries: List[str]) -> str:
+        summaries_prompt = ""
+        for index, summary in enumerate(summaries):
+            summaries_prompt += "Summary " + str(index + 1) + ": " + summary + "\n"
+        return self.reduce_prompt.render({"summaries": summaries_prompt, "char_limit": str(self.output_token_limit * 4)})
+
+    @staticmethod
+    def _first_error(responses: List[dict]):
+        for response in responses:
+            if "error" in response or response.get("content") is None:
+                return response
+        return None
+
+    def _cache_key(self, prompt: str):
+        return "ltm_chunk_summary:" + hashlib.sha256((self.llm_model + "\n" + prompt).encode()).hexdigest()
+
+    def _get_cached_summary(self, cache_key: str):
+        try:
+            return redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True).get(cache_key)
+        except Exception as exception:
+            logger.warning(f"Unable to read the cached ltm summary: {exception}")
+            return None
+
+    def _cache_summary(self, cache_key: str, summary: str):
+        try:
+            redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True) \
+                .set(cache_key, summary, ex=int(get_config("LTM_CHUNK_SUMMARY_TTL", self.CHUNK_SUMMARY_TTL)))
+        except Exception as exception:
+            logger.warning(f"Unable to cache the ltm summary: {exception}")
@@ -0,0 +1,98 @@
+import redis
+
+from superagi.config.config import get_config, get_config_flag
+from superagi.lib.logger import logger
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+LTM_SUMMARY_WATERMARK = 0.8
+LTM_SUMMARY_TASK_PRIORITY = 9  # Lowest
+LTM_SUMMARY_LOCK_TTL = 300  # Seconds
+
+
+def is_background_ltm_summary_enabled():
+    return get_config_flag("BACKGROUND_LTM_SUMMARY", False)
+
+
+def ltm_summary_watermark():
+    """Share of the history token limit past which the oldest feeds of the window are summarized in background."""
+    return float(get_config("LTM_SUMMARY_WATERMARK", LTM_SUMMARY_WATERMARK))
+
+
+def _lock_key(agent_execution_id: int):
+    return "agent_execution_" + str(agent_execution_id) + "_ltm_summary"
+
+
+def _redis():
+    return redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+
+def schedule_ltm_summary(agent_execution_id: int, feed_group_id: str, first_feed_id: int, last_feed_id: int,
+                         output_token_limit: int):
+    """
+    Queue a low priority task summarizing the feeds of the execution up to the given feed, unless one is already
+    queued or running for the execution.
+
+    Args:
+        agent_execution_id (int): The id of the agent execution.
+        feed_group_id (str): The feed group of the feeds.
+        first_feed_id (int): The id of the first feed of the history.
+        last_feed_id (int): The id of the last feed to summarize.
+        output_token_limit (int): The maximum tokens of the summary.
+
+    Returns:
+        bool: Whether a task was queued.
+    """
+    try:
+        if not _redis().set(_lock_key(agent_execution_id), last_feed_id, nx=True, ex=LTM_SUMMARY_LOCK_TTL):
+            return False
+    except Exception as exception:
+        logger.warning(f"Unable to lock the ltm summary of execution {agent_execution_id}: {exception}")
+        return False
+    from superagi.worker import summarize_ltm
+    summarize_ltm.apply_async((agent_execution_id, feed_group_id, first_feed_id, last_feed_id, output_token_limit),
+                              priority=LTM_SUMMARY_TASK_PRIORITY)
+    logger.info(f"Scheduled the ltm summary of execution {agent_execution_id} up to feed {last_feed_id}")
+    return True
+
+
+def release_ltm_summary(agent_execution_id: int):
+    try:
+        _redis().delete(_lock_key(agent_execution_id))
+    except Exception as exception:
+        logger.warning(f"Unable to release the ltm summary of execution {agent_execution_id}: {exception}")
+
+
+def refresh_ltm_summary(session, agent_execution_id: int, feed_group_id: str, first_feed_id: int, last_feed_id: int,
+                        output_token_limit: int):
+    """
+    Summarize the feeds of the execution up to the given feed with the llm of its agent, continuing the previous
+    summary of the execution.
+
+    Args:
+        session (Session): The database session.
+        agent_execution_id (int): The id of the agent execution.
+        feed_group_id (str): The feed group of the feeds.
+        first_feed_id (int): The id of the first feed of the history.
+        last_feed_id (int): The id of the last feed to summarize.
+        output_token_limit (int): The maximum tokens of the summary.
+    """
+    from superagi.agent.agent_execution_context import AgentExecutionContext
+    from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+    from superagi.llms.llm_model_factory import get_model
+    from superagi.llms.llm_response_cache import with_llm_response_cache
+
+    try:
+        execution_context = AgentExecutionContext.load(session, agent_execution_id)
+        if execution_context is None:
+            logger.error(f"Agent execution not found. {agent_execution_id}")
+            return
+        organisation = execution_context.organisation
+        llm = with_llm_response_cache(get_model(model=execution_context.agent_config["model"],
+                                                api_key=execution_context.model_api_key,
+                                                organisation_id=organisation.id),
+                                      execution_context.agent_config)
+        AgentLlmMessageBuilder(session, llm, llm.get_model(), execution_context.agent_id, agent_execution_id,
+                               organisation=organisation) \
+            .refresh_ltm_summary(feed_group_id, first_feed_id, last_feed_id, output_token_limit)
+    finally:
+        release_ltm_summary(agent_execution_id)
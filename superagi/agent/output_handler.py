@@ -3,6 +3,7 @@ from superagi.agent.common_types import TaskExecutorResponse, ToolExecutorRespon
 from superagi.agent.output_parser import AgentSchemaOutputParser
 from superagi.agent.task_queue import TaskQueue
 from superagi.agent.tool_executor import ToolExecutor
+from superagi.config.config import get_config
 from superagi.helper.json_cleaner import JsonCleaner
 from superagi.lib.logger import logger
 from langchain.text_splitter import TokenTextSplitter
@@ -22,13 +23,15 @@ class ToolOutputHandler:
                  agent_config: dict,
                  tools: list,
                  memory:VectorStore=None,
-                 output_parser=AgentSchemaOutputParser()):
+                 output_parser=AgentSchemaOutputParser(),
+                 execution_context=None):
         self.agent_execution_id = agent_execution_id
         self.task_queue = TaskQueue(str(agent_execution_id))
         self.agent_config = agent_config
         self.tools = tools
         self.output_parser = output_parser
         self.memory=memory
+        self.execution_context = execution_context
 
     def handle(self, session, assistant_reply):
         """Handles the tool output response from the thinking step.
@@ -45,7 +48,10 @@ class ToolOutputHandler:
         tool_response = self.handle_tool_response(session, assistant_reply)
         # print(tool_response)
 
-        agent_execution = AgentExecution.find_by_id(session, self.agent_execution_id)
+        if self.execution_context is not None:
+            agent_execution = self.execution_context.agent_execution
+        else:
+            agent_execution = AgentExecution.find_by_id(session, self.agent_execution_id)
         agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_execution_id,
                                                   agent_id=self.agent_config["agent_id"],
                                                   feed=assistant_reply,
@@ -97,25 +103,44 @@ class ToolOutputHandler:
 
     def handle_tool_response(self, session, assistant_reply):
         """Only handle processing of tool response"""
-        action = self.output_parser.parse(assistant_reply)
-        agent = session.query(Agent).filter(Agent.id == self.agent_config["agent_id"]).first()
-        organisation = agent.get_agent_organisation(session)
-        tool_executor = ToolExecutor(organisation_id=organisation.id, agent_id=agent.id, tools=self.tools, agent_execution_id=self.agent_execution_id)
-        return tool_executor.execute(session, action.name, action.args)
+        actions = self._parse_actions(assistant_reply)
+        if self.execution_context is not None:
+            organisation = self.execution_context.organisation
+        else:
+            agent = session.query(Agent).filter(Agent.id == self.agent_config["agent_id"]).first()
+            organisation = agent.get_agent_organisation(session)
+        tool_executor = ToolExecutor(organisation_id=organisation.id, agent_id=self.agent_config["agent_id"],
+                                     tools=self.tools, agent_execution_id=self.agent_execution_id)
+        if len(actions) == 1:
+            return tool_executor.execute(session, actions[0].name, actions[0].args)
+        return ToolExecutor.combine_responses(tool_executor.execute_all(session, actions))
+
+    def _parse_actions(self, assistant_reply: str):
+        """Parses the tool calls of the reply, several independent ones when MAX_TOOL_CALLS_PER_ITERATION
+        allows it"""
+        max_tool_calls = int(get_config("MAX_TOOL_CALLS_PER_ITERATION", 1) or 1)
+        if max_tool_calls <= 1:
+            return [self.output_parser.parse(assistant_reply)]
+        actions = self.output_parser.parse_all(assistant_reply)
+        if len(actions) > max_tool_calls:
+            logger.info(f"Ignoring {len(actions) - max_tool_calls} tool calls over the limit of {max_tool_calls}")
+        return actions[:max_tool_calls]
 
     def _check_permission_in_restricted_mode(self, session, assistant_reply: str):
-        action = self.output_parser.parse(assistant_reply)
+        actions = self._parse_actions(assistant_reply)
         tools = {t.name: t for t in self.tools}
 
         excluded_tools = [ToolExecutor.FINISH, '', None]
 
-        if self.agent_config["permission_type"].upper() == "RESTRICTED" and action.name not in excluded_tools and \
-                tools.get(action.name) and tools[action.name].permission_required:
+        # the tool calls of a reply run together, a single restricted tool holds back all of them
+        restricted_actions = [action for action in actions if action.name not in excluded_tools and
+                              tools.get(action.name) and tools[action.name].permission_required]
+        if self.agent_config["permission_type"].upper() == "RESTRICTED" and restricted_actions:
             new_agent_execution_permission = AgentExecutionPermission(
                 agent_execution_id=self.agent_execution_id,
                 status="PENDING",
                 agent_id=self.agent_config["agent_id"],
-                tool_name=action.name,
+                tool_name=", ".join(action.name for action in restricted_actions),
                 assistant_reply=assistant_reply)
 
             session.add(new_agent_execution_permission)
@@ -139,10 +164,11 @@ class TaskOutputHandler:
     handler adds every task to the task queue.
     """
 
-    def __init__(self, agent_execution_id: int, agent_config: dict):
+    def __init__(self, agent_execution_id: int, agent_config: dict, execution_context=None):
         self.agent_execution_id = agent_execution_id
         self.task_queue = TaskQueue(str(agent_execution_id))
         self.agent_config = agent_config
+        self.execution_context = execution_context
 
     def handle(self, session, assistant_reply):
         assistant_reply = JsonCleaner.extract_json_array_section(assistant_reply)
@@ -152,7 +178,10 @@ class TaskOutputHandler:
             self.task_queue.add_task(task)
         if len(tasks) > 0:
             logger.info("Adding task to queue: " + str(tasks))
-        agent_execution = AgentExecution.find_by_id(session, self.agent_execution_id)
+        if self.execution_context is not None:
+            agent_execution = self.execution_context.agent_execution
+        else:
+            agent_execution = AgentExecution.find_by_id(session, self.agent_execution_id)
         for task in tasks:
             agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_execution_id,
                                                       agent_id=self.agent_config["agent_id"],
@@ -188,11 +217,14 @@ class ReplaceTaskOutputHandler:
         return TaskExecutorResponse(status=status, retry=False)
 
 
-def get_output_handler(output_type: str, agent_execution_id: int, agent_config: dict, agent_tools: list = [],memory=None):
+def get_output_handler(output_type: str, agent_execution_id: int, agent_config: dict, agent_tools: list = [],memory=None,
+                       execution_context=None):
     if output_type == "tools":
-        return ToolOutputHandler(agent_execution_id, agent_config, agent_tools,memory=memory)
+        return ToolOutputHandler(agent_execution_id, agent_config, agent_tools,memory=memory,
+                                 execution_context=execution_context)
     elif output_type == "replace_tasks":
         return ReplaceTaskOutputHandler(agent_execution_id, agent_config)
     elif output_type == "tasks":
-        return TaskOutputHandler(agent_execution_id, agent_config)
-    return ToolOutputHandler(agent_execution_id, agent_config, agent_tools,memory=memory)
+        return TaskOutputHandler(agent_execution_id, agent_config, execution_context=execution_context)
+    return ToolOutputHandler(agent_execution_id, agent_config, agent_tools,memory=memory,
+                             execution_context=execution_context)
@@ -23,6 +23,10 @@ class BaseOutputParser(ABC):
     def parse(self, text: str) -> AgentGPTAction:
         """Return AgentGPTAction"""
 
+    def parse_all(self, text: str) -> List[AgentGPTAction]:
+        """Return all the AgentGPTActions of the response, for formats allowing several tool calls"""
+        return [self.parse(text)]
+
 
 class AgentSchemaOutputParser(BaseOutputParser):
     """Parses the output from the agent schema"""
@@ -46,6 +50,22 @@ class AgentSchemaOutputParser(BaseOutputParser):
             logger.info(f"AgentSchemaOutputParser: Error parsing JSON response {e}")
             raise e
 
+    def parse_all(self, response: str) -> List[AgentGPTAction]:
+        """Parses the "tools" list of independent tool calls of the response, or its single "tool" object"""
+        cleaned_response = response
+        if cleaned_response.startswith("```") and cleaned_response.endswith("```"):
+            cleaned_response = "```".join(cleaned_response.split("```")[1:-1])
+        cleaned_response = JsonCleaner.clean_boolean(JsonCleaner.extract_json_section(cleaned_response))
+        try:
+            response_obj = ast.literal_eval(cleaned_response)
+        except BaseException:
+            response_obj = None
+        if not isinstance(response_obj, dict) or not isinstance(response_obj.get('tools'), list) \
+                or not response_obj['tools']:
+            return [self.parse(response)]
+        return [AgentGPTAction(name=tool['name'], args=tool['args'] if 'args' in tool else {})
+                for tool in response_obj['tools']]
+
 
 class AgentSchemaToolOutputParser(BaseOutputParser):
     """Parses the output from the agent schema for the tool"""
@@ -0,0 +1,36 @@
+import json
+import time
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+PARTIAL_FEED_TTL = 300  # Seconds
+
+"""PartialFeed holds the assistant reply of an agent execution in redis while it is streamed from the llm"""
+class PartialFeed:
+    def __init__(self, agent_execution_id: int):
+        self.key = "agent_execution_" + str(agent_execution_id) + "_partial_feed"
+        self.db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+    def update(self, feed: str):
+        try:
+            self.db.set(self.key, json.dumps({"feed": feed, "updated_at": time.time()}), ex=PARTIAL_FEED_TTL)
+        except Exception as exception:
+            logger.warning(f"Unable to update the partial feed: {exception}")
+
+    def get(self):
+        try:
+            partial_feed = self.db.get(self.key)
+        except Exception as exception:
+            logger.warning(f"Unable to read the partial feed: {exception}")
+            return None
+        return json.loads(partial_feed) if partial_feed else None
+
+    def clear(self):
+        try:
+            self.db.delete(self.key)
+        except Exception as exception:
+            logger.warning(f"Unable to clear the partial feed: {exception}")
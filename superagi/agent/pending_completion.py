@@ -0,0 +1,46 @@
+class PendingCompletion:
+    """
+    The llm call a step is waiting on. A step written as a generator yields it and is resumed with the response,
+    so that the caller decides how to wait on the llm: blocking in the thread of the step, or on an event loop
+    while the thread runs other steps.
+    """
+
+    def __init__(self, llm, messages: list, max_tokens: int):
+        """
+        Args:
+            llm (BaseLlm): The llm.
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+        """
+        self.llm = llm
+        self.messages = messages
+        self.max_tokens = max_tokens
+
+    def complete(self) -> dict:
+        return self.llm.chat_completion(self.messages, self.max_tokens)
+
+    async def acomplete(self) -> dict:
+        return await self.llm.achat_completion(self.messages, self.max_tokens)
+
+
+def run_to_completion(steps):
+    """
+    Run a step generator, completing every llm call it waits on with a blocking call.
+
+    Args:
+        steps (Generator): The step, yielding PendingCompletion.
+
+    Returns:
+        The value returned by the step.
+    """
+    try:
+        pending = next(steps)
+        while True:
+            try:
+                response = pending.complete()
+            except Exception as exception:
+                pending = steps.throw(exception)
+            else:
+                pending = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
@@ -3,10 +3,11 @@ import time
 import numpy as np
 
 from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+from superagi.agent.context_window import get_context_window
 from superagi.agent.task_queue import TaskQueue
 from superagi.helper.error_handler import ErrorHandler
 from superagi.helper.json_cleaner import JsonCleaner
-from superagi.helper.prompt_reader import PromptReader
+from superagi.helper.prompt_template import get_prompt_registry
 from superagi.helper.token_counter import TokenCounter
 from superagi.lib.logger import logger
 from superagi.models.agent_execution import AgentExecution
@@ -84,11 +85,12 @@ class QueueStepHandler:
     def _process_input_instruction(self, step_tool):
         prompt = self._build_queue_input_prompt(step_tool)
         logger.info("Prompt: ", prompt)
-        agent_feeds = AgentExecutionFeed.fetch_agent_execution_feeds(self.session, self.agent_execution_id)
+        context_window = get_context_window(self.session,
+                                            AgentExecution.find_by_id(self.session, self.agent_execution_id))
         print(".........//////////////..........2")
         messages = AgentLlmMessageBuilder(self.session, self.llm, self.llm.get_model(), self.agent_id, self.agent_execution_id) \
-            .build_agent_messages(prompt, agent_feeds, history_enabled=step_tool.history_enabled,
-                                  completion_prompt=step_tool.completion_prompt)
+            .build_agent_messages(prompt, history_enabled=step_tool.history_enabled,
+                                  completion_prompt=step_tool.completion_prompt, context_window=context_window)
         current_tokens = TokenCounter.count_message_tokens(messages, self.llm.get_model())
         response = self.llm.chat_completion(messages, TokenCounter(session=self.session, organisation_id=self.organisation.id).token_limit(self.llm.get_model()) - current_tokens)
         
@@ -103,7 +105,5 @@ class QueueStepHandler:
         return assistant_reply
 
     def _build_queue_input_prompt(self, step_tool: AgentWorkflowStepTool):
-        queue_input_prompt = PromptReader.read_agent_prompt(__file__, "agent_queue_input.txt")
-        queue_input_prompt = queue_input_prompt.replace("{instruction}", step_tool.input_instruction)
-
-        return queue_input_prompt
+        template = get_prompt_registry().load(__file__, "agent_queue_input.txt")
+        return template.render({"instruction": step_tool.input_instruction})
@@ -0,0 +1,47 @@
+import hashlib
+import json
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+STEP_CHECKPOINT_TTL = 3600  # Seconds
+# the message telling the llm the current time differs on every retry, it is left out of the key
+CURRENT_TIME_MESSAGE_PREFIX = "The current time and date is "
+
+"""StepCheckpoint records the llm response of an agent execution step in redis before any of its side effects run,
+so that a retry of the step after a crash resumes from the response instead of paying for the llm call again"""
+class StepCheckpoint:
+    def __init__(self, agent_execution_id: int, step_id: str, messages: list):
+        self.key = "agent_execution_" + str(agent_execution_id) + "_step_checkpoint:" + str(step_id) + ":" + \
+                   self.messages_hash(messages)
+        self.db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+    @staticmethod
+    def messages_hash(messages: list):
+        messages = [message for message in messages
+                    if not str(message.get("content") or "").startswith(CURRENT_TIME_MESSAGE_PREFIX)]
+        return hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self):
+        try:
+            response = self.db.get(self.key)
+        except Exception as exception:
+            logger.warning(f"Unable to read the step checkpoint: {exception}")
+            return None
+        return json.loads(response) if response else None
+
+    def save(self, response: dict):
+        try:
+            self.db.set(self.key, json.dumps(response),
+                        ex=int(get_config("STEP_CHECKPOINT_TTL", STEP_CHECKPOINT_TTL)))
+        except Exception as exception:
+            logger.warning(f"Unable to save the step checkpoint: {exception}")
+
+    def clear(self):
+        try:
+            self.db.delete(self.key)
+        except Exception as exception:
+            logger.warning(f"Unable to clear the step checkpoint: {exception}")
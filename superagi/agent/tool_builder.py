@@ -1,13 +1,19 @@
+import copy
 import importlib
 import os
+from pydantic import BaseModel
 from superagi.config.config import get_config
+from superagi.helper.tool_helper import handle_tools_import
 from superagi.llms.llm_model_factory import get_model
+from superagi.llms.llm_response_cache import with_llm_response_cache
+from superagi.llms.llm_router import route_llm
 from superagi.models.tool import Tool
 from superagi.models.tool_config import ToolConfig
 from superagi.models.agent import Agent
 from superagi.resource_manager.file_manager import FileManager
 from superagi.tools.base_tool import BaseToolkitConfiguration
 from superagi.tools.tool_response_query_manager import ToolResponseQueryManager
+from superagi.types.llm_task_types import LlmTaskType
 from superagi.helper.encyption_helper import decrypt_data, is_encrypted
 
 class DBToolkitConfiguration(BaseToolkitConfiguration):
@@ -28,10 +34,11 @@ class DBToolkitConfiguration(BaseToolkitConfiguration):
         return super().get_tool_config(key=key)
 
 class ToolBuilder:
-    def __init__(self, session, agent_id: int, agent_execution_id: int = None):
+    def __init__(self, session, agent_id: int, agent_execution_id: int = None, execution_context=None):
         self.session = session
         self.agent_id = agent_id
         self.agent_execution_id = agent_execution_id
+        self.execution_context = execution_context
 
     def __validate_filename(self, filename):
         """
@@ -71,7 +78,12 @@ class ToolBuilder:
         # module_name = f"superagi.tools.{folder_name}.{file_name}"
 
         # Load the module dynamically
-        module = importlib.import_module(module_name)
+        try:
+            module = importlib.import_module(module_name)
+        except ModuleNotFoundError:
+            # the tool may have been installed after the tool folders were registered
+            handle_tools_import(refresh=True)
+            module = importlib.import_module(module_name)
 
         # Get the class from the loaded module
         obj_class = getattr(module, tool.class_name)
@@ -81,6 +93,29 @@ class ToolBuilder:
         new_object.toolkit_config = DBToolkitConfiguration(session=self.session, toolkit_id=tool.toolkit_id)
         return new_object
 
+    @staticmethod
+    def bind_session(tool, session):
+        """
+        Copy a built tool so that its toolkit configuration, file manager and tool response manager use the given
+        session, for the tools running at the same time not to share one session.
+
+        Args:
+            tool : Tool object.
+            session (Session): The database session of the tool.
+
+        Returns:
+            object: The copy of the tool.
+        """
+        # a copy of a pydantic model made by the copy module shares the fields of the model
+        tool = tool.copy() if isinstance(tool, BaseModel) else copy.copy(tool)
+        for attribute in ("toolkit_config", "resource_manager", "tool_response_manager"):
+            component = getattr(tool, attribute, None)
+            if getattr(component, "session", None) is not None:
+                component = copy.copy(component)
+                component.session = session
+                setattr(tool, attribute, component)
+        return tool
+
     def set_default_params_tool(self, tool, agent_config, agent_execution_config, model_api_key: str,
                                 resource_summary: str = "",memory=None):
         """
@@ -96,7 +131,10 @@ class ToolBuilder:
         Returns:
             list: The list of tools with default parameters.
         """
-        organisation = Agent.find_org_by_agent_id(self.session, agent_id=agent_config['agent_id'])
+        if self.execution_context is not None:
+            organisation = self.execution_context.organisation
+        else:
+            organisation = Agent.find_org_by_agent_id(self.session, agent_id=agent_config['agent_id'])
         if hasattr(tool, 'goals'):
             tool.goals = agent_execution_config["goal"]
         if hasattr(tool, 'instructions'):
@@ -106,6 +144,10 @@ class ToolBuilder:
             tool.llm = get_model(model="gpt-3.5-turbo", api_key=model_api_key, organisation_id=organisation.id , temperature=0.4)
         elif hasattr(tool, 'llm'):
             tool.llm = get_model(model=agent_config["model"], api_key=model_api_key, organisation_id=organisation.id, temperature=0.4)
+        if hasattr(tool, 'llm') and tool.name != "QueryResource":
+            tool.llm = route_llm(self.session, organisation.id, LlmTaskType.TOOL, tool.llm, temperature=0.4)
+        if hasattr(tool, 'llm'):
+            tool.llm = with_llm_response_cache(tool.llm, agent_config)
         if hasattr(tool, 'agent_id'):
             tool.agent_id = self.agent_id
         if hasattr(tool, 'agent_execution_id'):
@@ -1,13 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+
 from pydantic import ValidationError
+from sqlalchemy.orm import sessionmaker
 
 from superagi.agent.common_types import ToolExecutorResponse
+from superagi.agent.tool_builder import ToolBuilder
 from superagi.apm.event_handler import EventHandler
+from superagi.config.config import get_config
 from superagi.lib.logger import logger
 
 
 class ToolExecutor:
     """Executes the tool with the given args."""
     FINISH = "finish"
+    TOOL_CALL_TIMEOUT = 300  # Seconds
 
     def __init__(self, organisation_id: int, agent_id: int, tools: list, agent_execution_id: int):
         self.organisation_id = organisation_id
@@ -29,28 +35,9 @@ class ToolExecutor:
             logger.info("\nTask Finished :) \n")
             return ToolExecutorResponse(status="COMPLETE", result="")
         if tool_name in tools.keys():
-            status = "SUCCESS"
             tool = tools[tool_name]
-            retry = False
-            EventHandler(session=session).create_event('tool_used', {'tool_name': tool.name, 'agent_execution_id': self.agent_execution_id}, self.agent_id,
-                                                       self.organisation_id),
-            try:
-                parsed_args = self.clean_tool_args(tool_args)
-                observation = tool.execute(parsed_args)
-            except ValidationError as e:
-                status = "ERROR"
-                retry = True
-                observation = (
-                    f"Validation Error in args: {str(e)}, args: {tool_args}"
-                )
-            except Exception as e:
-                status = "ERROR"
-                retry = True
-                observation = (
-                    f"Error1: {str(e)}, {type(e).__name__}, args: {tool_args}"
-                )
-            output = ToolExecutorResponse(status=status, result=f"Tool {tool.name} returned: {observation}",
-                                          retry=retry)
+            self._create_tool_used_event(session, tool)
+            output = self._run_tool(tool, tool_args)
         elif tool_name == "ERROR":
             output = ToolExecutorResponse(status="ERROR", result=f"Error Tool Name: {tool_args}. ", retry=False)
         else:
@@ -64,6 +51,110 @@ class ToolExecutor:
         logger.info("Tool Response : " + str(output) + "\n")
         return output
 
+    def execute_all(self, session, actions: list, max_workers: int = None, timeout: float = None):
+        """Executes independent tool calls concurrently in a bounded pool, within one timeout. Every call in the
+        pool runs on a copy of its tool bound to a database session of its own.
+
+        Args:
+            session (Session): The database session.
+            actions (list): The AgentGPTActions to execute.
+            max_workers (int): The maximum number of tools running at once.
+            timeout (float): The seconds after which the tools still running are reported as timed out.
+
+        Returns:
+            list: The ToolExecutorResponse of every action, in the order of the actions.
+        """
+        max_workers = max_workers or max(len(actions), 1)
+        timeout = timeout if timeout is not None else float(get_config("TOOL_CALL_TIMEOUT",
+                                                                        ToolExecutor.TOOL_CALL_TIMEOUT))
+        tools = {t.name.lower().replace(" ", ""): t for t in self.tools}
+        session_factory = sessionmaker(bind=session.get_bind()) if session is not None else None
+        responses = [None] * len(actions)
+        futures = {}
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool_executor")
+        try:
+            for index, action in enumerate(actions):
+                tool = tools.get(action.name.lower().replace(" ", ""))
+                if tool is None:
+                    # finish, errors and unknown tools don't run anything
+                    responses[index] = self.execute(session, action.name, action.args)
+                    continue
+                # the session of the step is only used from this thread, the tools get their own
+                self._create_tool_used_event(session, tool)
+                futures[index] = pool.submit(self._run_pooled_tool, tool, action.args, session_factory)
+            wait(futures.values(), timeout=timeout)
+            for index, future in futures.items():
+                if future.done():
+                    responses[index] = future.result()
+                    continue
+                tool_name = actions[index].name
+                logger.error(f"Tool {tool_name} timed out after {timeout}s")
+                responses[index] = ToolExecutorResponse(
+                    status="ERROR", result=f"Tool {tool_name} timed out after {timeout} seconds", retry=True)
+        finally:
+            # timed out tools can't be interrupted, don't wait for them
+            pool.shutdown(wait=False)
+        logger.info("Tool Responses : " + str(responses) + "\n")
+        return responses
+
+    @staticmethod
+    def combine_responses(responses: list):
+        """Combines the responses of tool calls made in the same iteration into a single response.
+
+        Args:
+            responses (list): The ToolExecutorResponses.
+
+        Returns:
+            ToolExecutorResponse: Complete when every call finished, successful when any call succeeded and
+            retried only when every call asks for it.
+        """
+        if len(responses) == 1:
+            return responses[0]
+        statuses = [response.status for response in responses]
+        if all(status == "COMPLETE" for status in statuses):
+            status = "COMPLETE"
+        elif "SUCCESS" in statuses:
+            status = "SUCCESS"
+        else:
+            status = next(status for status in statuses if status != "COMPLETE")
+        result = "\n".join(response.result for response in responses if response.result)
+        return ToolExecutorResponse(status=status, result=result,
+                                    retry=all(response.retry for response in responses))
+
+    def _create_tool_used_event(self, session, tool):
+        EventHandler(session=session).create_event('tool_used', {'tool_name': tool.name,
+                                                                 'agent_execution_id': self.agent_execution_id},
+                                                   self.agent_id, self.organisation_id)
+
+    def _run_pooled_tool(self, tool, tool_args, session_factory):
+        if session_factory is None:
+            return self._run_tool(tool, tool_args)
+        tool_session = session_factory()
+        try:
+            return self._run_tool(ToolBuilder.bind_session(tool, tool_session), tool_args)
+        finally:
+            tool_session.close()
+
+    def _run_tool(self, tool, tool_args):
+        status = "SUCCESS"
+        retry = False
+        try:
+            parsed_args = self.clean_tool_args(tool_args)
+            observation = tool.execute(parsed_args)
+        except ValidationError as e:
+            status = "ERROR"
+            retry = True
+            observation = (
+                f"Validation Error in args: {str(e)}, args: {tool_args}"
+            )
+        except Exception as e:
+            status = "ERROR"
+            retry = True
+            observation = (
+                f"Error1: {str(e)}, {type(e).__name__}, args: {tool_args}"
+            )
+        return ToolExecutorResponse(status=status, result=f"Tool {tool.name} returned: {observation}", retry=retry)
+
     def clean_tool_args(self, args):
         parsed_args = {}
         for key in args.keys():
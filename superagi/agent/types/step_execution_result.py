@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class StepExecutionResult(Enum):
+    CONTINUE = 'CONTINUE'
+    RETRY = 'RETRY'
+    STOP = 'STOP'
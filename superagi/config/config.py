@@ -48,4 +48,25 @@ _config_instance = Config(ROOT_DIR + "/" + CONFIG_FILE)
 
 
 def get_config(key: str, default: str = None) -> str:
-    return _config_instance.get_config(key, default)
\ No newline at end of file
+    return _config_instance.get_config(key, default)
+
+
+def get_config_flag(key: str, default: bool = False) -> bool:
+    """Read a boolean setting, which is a string such as "False" when it comes from an environment variable."""
+    value = get_config(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes", "on")
+    return bool(value)
+
+def get_config_mapping(key: str, default: dict = None) -> dict:
+    """Read a mapping setting, which is a JSON or YAML string when it comes from an environment variable."""
+    value = get_config(key)
+    if isinstance(value, str):
+        try:
+            value = yaml.safe_load(value)
+        except yaml.YAMLError as exception:
+            logger.warning(f"Unable to parse {key}: {exception}")
+            value = None
+    if not isinstance(value, dict):
+        return {} if default is None else default
+    return value
@@ -13,13 +13,13 @@ from superagi.models.agent_execution_config import AgentExecutionConfiguration
 from superagi.models.workflows.agent_workflow import AgentWorkflow
 from superagi.models.agent_schedule import AgentSchedule
 from superagi.models.workflows.iteration_workflow import IterationWorkflow
-from superagi.worker import execute_agent
+from superagi.jobs.execution_scheduler import schedule_agent_execution, get_scheduler, is_fair_share_enabled
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.agent import Agent
 from superagi.models.models import Models
 from fastapi import APIRouter
 from sqlalchemy import desc
-from superagi.helper.auth import check_auth
+from superagi.helper.auth import check_auth, get_user_organisation
 from superagi.controllers.types.agent_schedule import AgentScheduleInput
 from superagi.apm.event_handler import EventHandler
 from superagi.controllers.tool import ToolOut
@@ -145,7 +145,8 @@ def create_agent_execution(agent_execution: AgentExecutionIn,
                                                         organisation.id if organisation else 0)
     Models.api_key_from_configurations(session=db.session, organisation_id=organisation.id)
     if db_agent_execution.status == "RUNNING":
-      execute_agent.delay(db_agent_execution.id, datetime.now())
+      schedule_agent_execution(db_agent_execution.id, organisation_id=organisation.id if organisation else None,
+                               project_id=agent.project_id)
 
     return db_agent_execution
 
@@ -226,7 +227,8 @@ def create_agent_run(agent_execution: AgentRunIn, Authorize: AuthJWT = Depends(c
                                                         organisation.id if organisation else 0)
 
     if db_agent_execution.status == "RUNNING":
-      execute_agent.delay(db_agent_execution.id, datetime.now())
+      schedule_agent_execution(db_agent_execution.id, organisation_id=organisation.id if organisation else None,
+                               project_id=agent.project_id)
 
     return db_agent_execution
 
@@ -351,7 +353,7 @@ def update_agent_execution(agent_execution_id: int,
     db.session.commit()
 
     if db_agent_execution.status == "RUNNING":
-        execute_agent.delay(db_agent_execution.id, datetime.now())
+        schedule_agent_execution(db_agent_execution.id)
 
     return db_agent_execution
 
@@ -405,4 +407,12 @@ def get_agent_by_latest_execution(project_id: int,
         "id": agent.id,
         "status": isRunning,
         "contentType": "Agents"
-    }
\ No newline at end of file
+    }
+
+@router.get("/get/queue/depth")
+def get_queue_depth(organisation=Depends(get_user_organisation)):
+    """Get the queued, ready and running agent executions of the organisation in the fair share scheduler"""
+
+    if not is_fair_share_enabled():
+        return {}
+    return get_scheduler().queue_depths(organisation_id=organisation.id)
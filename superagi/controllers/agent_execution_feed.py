@@ -1,9 +1,10 @@
-import asyncio
+import json
 from datetime import datetime
 import time
 from typing import Optional
 
 from fastapi import APIRouter, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from fastapi import HTTPException, Depends
 from fastapi_jwt_auth import AuthJWT
 from fastapi_sqlalchemy import db
@@ -11,11 +12,13 @@ from pydantic import BaseModel
 
 from sqlalchemy.sql import asc
 
+from superagi.agent.partial_feed import PartialFeed
 from superagi.agent.task_queue import TaskQueue
-from superagi.helper.auth import check_auth
+from superagi.helper.auth import check_auth, get_user_organisation
 from superagi.helper.time_helper import get_time_difference
 from superagi.models.agent_execution_permission import AgentExecutionPermission
 from superagi.helper.feed_parser import parse_feed
+from superagi.models.agent import Agent
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.agent_execution_feed import AgentExecutionFeed
 from superagi.lib.logger import logger
@@ -28,6 +31,9 @@ import re
 
 router = APIRouter()
 
+PARTIAL_FEED_POLL_INTERVAL = 0.25  # Seconds
+PARTIAL_FEED_STREAM_TIMEOUT = 300  # Seconds
+
 
 class AgentExecutionFeedOut(BaseModel):
     id: int
@@ -241,4 +247,50 @@ def get_execution_tasks(agent_execution_id: int,
     return {
         "tasks": tasks,
         "completed_tasks": completed_tasks
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/stream/execution/{agent_execution_id}")
+def stream_agent_execution_feed(agent_execution_id: int,
+                                organisation=Depends(get_user_organisation)):
+    """
+    Stream the reply the agent is generating as server-sent events.
+
+    A "partial_feed" event is sent whenever the reply grows and a "feed_completed" event once it has been
+    added to the feeds of the execution. The stream ends after a few minutes, clients reconnect.
+
+    Args:
+        agent_execution_id (int): The ID of the agent execution.
+
+    Returns:
+        StreamingResponse: The event stream.
+
+    Raises:
+        HTTPException (Status Code=400): If the agent run is not found.
+        HTTPException (Status Code=403): If the agent run belongs to another organisation.
+    """
+
+    agent_execution = db.session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
+    if agent_execution is None:
+        raise HTTPException(status_code=400, detail="Agent Run not found!")
+    agent_organisation = Agent.find_org_by_agent_id(db.session, agent_execution.agent_id)
+    if agent_organisation is None or agent_organisation.id != organisation.id:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    partial_feed = PartialFeed(agent_execution_id)
+
+    # a plain generator, iterated by starlette in its thread pool, since the partial feed is read from redis with
+    # blocking calls
+    def partial_feed_events():
+        last_update = None
+        started_at = time.monotonic()
+        while time.monotonic() - started_at < PARTIAL_FEED_STREAM_TIMEOUT:
+            current_feed = partial_feed.get()
+            if current_feed is not None and current_feed["updated_at"] != last_update:
+                last_update = current_feed["updated_at"]
+                yield "event: partial_feed\ndata: " + json.dumps({"feed": current_feed["feed"]}) + "\n\n"
+            elif current_feed is None and last_update is not None:
+                last_update = None
+                yield "event: feed_completed\ndata: {}\n\n"
+            time.sleep(PARTIAL_FEED_POLL_INTERVAL)
+
+    return StreamingResponse(partial_feed_events(), media_type="text/event-stream")
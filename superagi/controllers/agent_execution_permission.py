@@ -8,7 +8,7 @@ from pydantic import BaseModel
 
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.agent_execution_permission import AgentExecutionPermission
-from superagi.worker import execute_agent
+from superagi.jobs.execution_scheduler import schedule_agent_execution
 from fastapi import APIRouter
 
 from superagi.helper.auth import check_auth
@@ -153,6 +153,6 @@ def update_agent_execution_permission_status(agent_execution_permission_id: int,
     agent_execution_permission.user_feedback = user_feedback.strip() if len(user_feedback.strip()) > 0 else None
     db.session.commit()
 
-    execute_agent.delay(agent_execution_permission.agent_execution_id, datetime.now())
+    schedule_agent_execution(agent_execution_permission.agent_execution_id)
 
     return {"success": True}
@@ -4,7 +4,7 @@ from fastapi import HTTPException, Depends ,Security
 from fastapi_sqlalchemy import db
 from pydantic import BaseModel
 
-from superagi.worker import execute_agent
+from superagi.jobs.execution_scheduler import schedule_agent_execution
 from superagi.helper.auth import validate_api_key,get_organisation_from_api_key
 from superagi.models.agent import Agent
 from superagi.models.agent_execution_config import AgentExecutionConfiguration
@@ -174,7 +174,7 @@ def create_run(agent_id:int,agent_execution: AgentExecutionIn,api_key: str = Sec
                                                         )
 
     if db_agent_execution.status == "RUNNING":
-      execute_agent.delay(db_agent_execution.id, datetime.now())
+      schedule_agent_execution(db_agent_execution.id, organisation_id=organisation.id, project_id=agent.project_id)
     return {
         "run_id":db_agent_execution.id
     }
@@ -331,7 +331,7 @@ def resume_agent_runs(agent_id:int,execution_state_change_input:ExecutionStateCh
 
     for ind_execution in db_execution_arr:
         ind_execution.status="RUNNING"
-        execute_agent.delay(ind_execution.id, datetime.now())
+        schedule_agent_execution(ind_execution.id, organisation_id=organisation.id, project_id=agent.project_id)
         
     db.session.commit()
     db.session.flush()
@@ -9,9 +9,13 @@ from superagi.models.models_config import ModelsConfig
 from superagi.config.config import get_config
 from superagi.controllers.types.models_types import ModelsTypes
 from fastapi_sqlalchemy import db
+from fastapi_jwt_auth import AuthJWT
 import logging
 from pydantic import BaseModel
 from superagi.helper.llm_loader import LLMLoader
+from superagi.llms.llm_registry import llm_registry
+from superagi.llms.llm_response_cache import response_cache_metrics
+from superagi.llms.llm_router import route_stats
 
 router = APIRouter()
 
@@ -37,7 +41,9 @@ class ModelName (BaseModel):
 @router.post("/store_api_keys", status_code=200)
 async def store_api_keys(request: ValidateAPIKeyRequest, organisation=Depends(get_user_organisation)):
     try:
-        return ModelsConfig.store_api_key(db.session, organisation.id, request.model_provider, request.model_api_key)
+        response = ModelsConfig.store_api_key(db.session, organisation.id, request.model_provider, request.model_api_key)
+        llm_registry.invalidate(organisation.id)
+        return response
     except Exception as e:
         logging.error(f"Error while storing API key: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -76,9 +82,11 @@ async def store_model(request: StoreModelRequest, organisation=Depends(get_user_
         #context_length = 4096
         logger.info(request)
         if 'context_length' in request.dict():
-            return Models.store_model_details(db.session, organisation.id, request.model_name, request.description, request.end_point, request.model_provider_id, request.token_limit, request.type, request.version, request.context_length)
+            response = Models.store_model_details(db.session, organisation.id, request.model_name, request.description, request.end_point, request.model_provider_id, request.token_limit, request.type, request.version, request.context_length)
         else:
-            return Models.store_model_details(db.session, organisation.id, request.model_name, request.description, request.end_point, request.model_provider_id, request.token_limit, request.type, request.version, 0)
+            response = Models.store_model_details(db.session, organisation.id, request.model_name, request.description, request.end_point, request.model_provider_id, request.token_limit, request.type, request.version, 0)
+        llm_registry.invalidate(organisation.id)
+        return response
     except Exception as e:
         logging.error(f"Error storing the Model Details: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -93,6 +101,16 @@ async def fetch_models(organisation=Depends(get_user_organisation)):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/llm_metrics", status_code=200)
+def fetch_llm_metrics(Authorize: AuthJWT = Depends(check_auth)):
+    """Statistics of the llm calls of every worker: the hit rate of the llm response cache and the calls per route."""
+    try:
+        return {"response_cache": response_cache_metrics.get(), "routes": route_stats.get()}
+    except Exception as e:
+        logging.error(f"Error Fetching LLM Metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.get("/fetch_model/{model_id}", status_code=200)
 async def fetch_model_details(model_id: int, organisation=Depends(get_user_organisation)):
     try:
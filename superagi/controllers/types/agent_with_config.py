@@ -20,6 +20,8 @@ class AgentConfigInput(BaseModel):
     max_iterations: int
     user_timezone: Optional[str]
     knowledge: Optional[int]
+    llm_response_cache: Optional[bool] = False
+    hedge_models: Optional[List[str]] = None
 
 
 
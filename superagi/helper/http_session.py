@@ -0,0 +1,88 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from superagi.config.config import get_config, get_config_flag
+
+HTTP_CONNECT_TIMEOUT = 10  # Seconds
+HTTP_READ_TIMEOUT = 600  # Seconds
+HTTP_POOL_CONNECTIONS = 10  # Hosts
+HTTP_POOL_MAXSIZE = 10  # Connections per host
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter applying a default timeout to the requests sent without one."""
+
+    def __init__(self, timeout=None, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def _setting(provider: str, key: str, default):
+    # a setting of a provider, such as HUGGING_FACE_HTTP_READ_TIMEOUT, overrides the setting of every provider
+    return get_config(provider.upper() + "_" + key, get_config(key, default))
+
+
+def build_http_adapter(provider: str, max_retries=0) -> TimeoutHTTPAdapter:
+    """
+    Build a keep-alive adapter with the timeouts and pool sizes configured for the provider.
+
+    Args:
+        provider (str): The provider, such as hugging_face.
+        max_retries (int | Retry): The retries of the adapter.
+
+    Returns:
+        TimeoutHTTPAdapter: The adapter.
+    """
+    timeout = (float(_setting(provider, "HTTP_CONNECT_TIMEOUT", HTTP_CONNECT_TIMEOUT)),
+               float(_setting(provider, "HTTP_READ_TIMEOUT", HTTP_READ_TIMEOUT)))
+    return TimeoutHTTPAdapter(timeout=timeout,
+                              pool_connections=int(_setting(provider, "HTTP_POOL_CONNECTIONS", HTTP_POOL_CONNECTIONS)),
+                              pool_maxsize=int(_setting(provider, "HTTP_POOL_MAXSIZE", HTTP_POOL_MAXSIZE)),
+                              pool_block=get_config_flag(provider.upper() + "_HTTP_POOL_BLOCK",
+                                                         get_config_flag("HTTP_POOL_BLOCK")),
+                              max_retries=max_retries)
+
+
+def mount_http_adapters(session: requests.Session, provider: str, max_retries=0):
+    adapter = build_http_adapter(provider, max_retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_http_session(provider: str) -> requests.Session:
+    """
+    Return the session of the provider shared by the process, so that the requests to its endpoints reuse the open
+    connections instead of paying the TCP and TLS setup every time.
+
+    Args:
+        provider (str): The provider, such as hugging_face.
+
+    Returns:
+        requests.Session: The session.
+    """
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            mount_http_adapters(session, provider)
+            _sessions[provider] = session
+        return session
+
+
+def close_http_sessions():
+    """Close the shared sessions, the next requests open new connections with the current settings."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -1,38 +1,210 @@
-from llama_cpp import Llama
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Sequence
+
+from llama_cpp import BaseLlamaCache, Llama, LlamaDiskCache, LlamaRAMCache
 from llama_cpp import LlamaGrammar
-from superagi.config.config import get_config
+from superagi.config.config import get_config, get_config_flag
 from superagi.lib.logger import logger
 
+LOCAL_LLM_CACHE_CAPACITY = 2 << 30  # Bytes
+LOCAL_MODEL_PATH = "/app/local_model_path"
+
+
+class TieredLlamaCache(BaseLlamaCache):
+    """
+    Prompt prefix cache of the local model kept in memory, written through to disk so that the states outlive the
+    memory tier and the process.
+    """
+
+    def __init__(self, ram_cache: LlamaRAMCache, disk_cache: LlamaDiskCache):
+        super().__init__(ram_cache.capacity_bytes)
+        self.ram_cache = ram_cache
+        self.disk_cache = disk_cache
+
+    @property
+    def cache_size(self):
+        return self.ram_cache.cache_size
+
+    def __getitem__(self, key: Sequence[int]):
+        if key in self.ram_cache:
+            return self.ram_cache[key]
+        return self.disk_cache[key]
+
+    def __contains__(self, key: Sequence[int]) -> bool:
+        return key in self.ram_cache or key in self.disk_cache
+
+    def __setitem__(self, key: Sequence[int], value):
+        self.ram_cache[key] = value
+        self.disk_cache[key] = value
+
+
+def build_llama_cache():
+    """
+    Build the cache of the evaluated prompt states of the local model. A prompt sharing its prefix with a cached one,
+    such as the next step of an execution with the same system prompt, tools and history, only evaluates the tokens
+    after the prefix.
+
+    Returns:
+        BaseLlamaCache: The cache, None when disabled.
+    """
+    capacity = int(get_config("LOCAL_LLM_CACHE_CAPACITY", LOCAL_LLM_CACHE_CAPACITY))
+    if capacity <= 0:
+        return None
+    ram_cache = LlamaRAMCache(capacity_bytes=capacity)
+    disk_cache_dir = get_config("LOCAL_LLM_DISK_CACHE_DIR")
+    if not disk_cache_dir:
+        return ram_cache
+    disk_capacity = int(get_config("LOCAL_LLM_DISK_CACHE_CAPACITY", LOCAL_LLM_CACHE_CAPACITY))
+    return TieredLlamaCache(ram_cache, LlamaDiskCache(cache_dir=disk_cache_dir, capacity_bytes=disk_capacity))
+
+
+def resolve_local_model_path(model_name: str = None) -> str:
+    """
+    Resolve the file of a local model. A model named after a file of LOCAL_LLM_MODELS_DIR loads that file, any other
+    model loads the default model file.
+
+    Args:
+        model_name (str): The name of the model.
+
+    Returns:
+        str: The path of the model file.
+    """
+    models_dir = get_config("LOCAL_LLM_MODELS_DIR")
+    if models_dir and model_name:
+        model_path = os.path.join(models_dir, os.path.basename(model_name))
+        if os.path.isfile(model_path):
+            return model_path
+    return get_config("LOCAL_LLM_MODEL_PATH", LOCAL_MODEL_PATH)
+
+
+def load_llama(model_path: str, context_length: int) -> Llama:
+    model = Llama(model_path=model_path, n_ctx=context_length, n_gpu_layers=int(get_config('GPU_LAYERS', '-1')),
+                  use_mmap=get_config_flag("LOCAL_LLM_USE_MMAP", True),
+                  use_mlock=get_config_flag("LOCAL_LLM_USE_MLOCK", False))
+    model.set_cache(build_llama_cache())
+    return model
+
+
+class LocalModelPool:
+    """
+    Local models of the process keyed by model file and context length, so that agents configured with different
+    local models share a worker. The models are held in least recently used order and the least recently used ones
+    are evicted before a load would take the pool beyond its memory limit. A model is accounted by the size of its
+    file, and an evicted model is freed once the llms still using it are done with it. A model is loaded outside
+    the lock of the pool, so that the models already loaded are served meanwhile, and once for the callers asking
+    for it together.
+    """
+
+    def __init__(self, memory_limit: int = 0, load_model: Callable[[str, int], object] = load_llama):
+        """
+        Args:
+            memory_limit (int): The bytes of model files held at once, 0 holds a single model.
+            load_model (Callable): The function loading a model from its path and context length.
+        """
+        self.memory_limit = memory_limit
+        self.load_model = load_model
+        self.metrics = {"loads": 0, "hits": 0, "evictions": 0, "load_seconds": 0.0}
+        self._models = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def get(self, model_path: str, context_length: int):
+        """
+        Return the model, loading it when it is not in the pool.
+
+        Args:
+            model_path (str): The path of the model file.
+            context_length (int): The context length of the model.
+
+        Returns:
+            The model.
+        """
+        key = (os.path.realpath(model_path), context_length)
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.metrics["hits"] += 1
+                    return self._models[key][0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    self._loading[key] = threading.Event()
+                    break
+            # the model is being loaded by another caller, a failed load is retried by the callers waiting for it
+            loading.wait()
+        try:
+            size = os.path.getsize(model_path)
+            with self._lock:
+                self._evict(size)
+            start = time.monotonic()
+            model = self.load_model(model_path, context_length)
+            load_seconds = time.monotonic() - start
+            with self._lock:
+                # the models loaded meanwhile are accounted before the model joins the pool
+                self._evict(size)
+                self._models[key] = (model, size)
+                self.metrics["loads"] += 1
+                self.metrics["load_seconds"] += load_seconds
+                logger.info(f"Loaded local model {model_path} with context length {context_length} in "
+                            f"{load_seconds:.2f}s, {len(self._models)} models in {self.resident_bytes} bytes")
+            return model
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.metrics, models=[key for key in self._models], resident_bytes=self.resident_bytes)
+
+    def _evict(self, size: int):
+        while self._models and (self.memory_limit <= 0 or self.resident_bytes + size > self.memory_limit):
+            (model_path, context_length), _ = self._models.popitem(last=False)
+            self.metrics["evictions"] += 1
+            logger.info(f"Evicted local model {model_path} with context length {context_length}")
+        if 0 < self.memory_limit < size:
+            logger.warning(f"Local model of {size} bytes exceeds the pool limit of {self.memory_limit} bytes")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_local_model_pool() -> LocalModelPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LocalModelPool(int(get_config("LOCAL_LLM_POOL_MEMORY_LIMIT", 0)))
+        return _pool
+
 
 class LLMLoader:
-    _instance = None
-    _model = None
     _grammar = None
 
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super(LLMLoader, cls).__new__(cls)
-        return cls._instance
-
-    def __init__(self, context_length):
+    def __init__(self, context_length, model_path=None):
         self.context_length = context_length
+        self.model_path = model_path or resolve_local_model_path()
 
     @property
     def model(self):
-        if self._model is None:
-            try:
-                self._model = Llama(
-                    model_path="/app/local_model_path", n_ctx=self.context_length, n_gpu_layers=int(get_config('GPU_LAYERS', '-1')))
-            except Exception as e:
-                logger.error(e)
-        return self._model
+        try:
+            return get_local_model_pool().get(self.model_path, self.context_length)
+        except Exception as e:
+            logger.error(e)
+            return None
 
     @property
     def grammar(self):
-        if self._grammar is None:
+        if LLMLoader._grammar is None:
             try:
-                self._grammar = LlamaGrammar.from_file(
+                LLMLoader._grammar = LlamaGrammar.from_file(
                     "superagi/llms/grammar/json.gbnf")
             except Exception as e:
                 logger.error(e)
-        return self._grammar
+        return LLMLoader._grammar
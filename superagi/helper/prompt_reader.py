@@ -1,14 +1,11 @@
-from pathlib import Path
+from superagi.helper.prompt_template import get_prompt_registry
 
 
 class PromptReader:
     @staticmethod
     def read_tools_prompt(current_file: str, prompt_file: str) -> str:
-        file_path = str(Path(current_file).resolve().parent) + "/prompts/" + prompt_file
         try:
-            f = open(file_path, "r")
-            file_content = f.read()
-            f.close()
+            file_content = get_prompt_registry().load(current_file, prompt_file).text
         except FileNotFoundError as e:
             print(e.__str__())
             raise e
@@ -16,11 +13,8 @@ class PromptReader:
 
     @staticmethod
     def read_agent_prompt(current_file: str, prompt_file: str) -> str:
-        file_path = str(Path(current_file).resolve().parent) + "/prompts/" + prompt_file
         try:
-            f = open(file_path, "r")
-            file_content = f.read()
-            f.close()
+            file_content = get_prompt_registry().load(current_file, prompt_file).text
         except FileNotFoundError as e:
             print(e.__str__())
             raise e
@@ -0,0 +1,163 @@
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+
+PLACEHOLDER_PATTERN = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+class PromptTemplateError(ValueError):
+    """Raised when the placeholders of a prompt do not match the variables filled in it."""
+
+
+class PromptTemplate:
+    """
+    Prompt parsed once into its literal segments and the slots of its placeholders, so that it is rendered in a
+    single pass instead of one copy of the prompt per replaced placeholder.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # segments[i] is the text before slots[i], the last segment is the text after the last slot
+        self.segments = []
+        self.slots = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            self.segments.append(text[position:match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        self.segments.append(text[position:])
+
+    @property
+    def variables(self) -> List[str]:
+        return list(dict.fromkeys(self.slots))
+
+    def render(self, values: Dict[str, object]) -> str:
+        """
+        Fill the placeholders of the template. Placeholders without a value are kept as they are, so that a prompt
+        can be filled in stages.
+
+        Args:
+            values (dict): The values of the variables.
+
+        Returns:
+            str: The rendered prompt.
+        """
+        parts = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            parts.append(str(values[slot]) if slot in values else "{" + slot + "}")
+            parts.append(segment)
+        return "".join(parts)
+
+    def render_partial(self, values: Dict[str, object], token_counts: Dict[str, int] = None) -> "RenderedPrompt":
+        """
+        Fill some of the placeholders of the template, keeping the template and the values with the prompt so that
+        the other placeholders are filled later without parsing the rendered prompt again.
+
+        Args:
+            values (dict): The values of the variables.
+            token_counts (dict): The token counts of the values already known, so that they are not counted again.
+
+        Returns:
+            RenderedPrompt: The rendered prompt.
+        """
+        return RenderedPrompt(self.render(values), self, values, token_counts)
+
+    def validate(self, variables: List[str], allow_unused: bool = False, name: str = "prompt"):
+        """
+        Check that the variables filled in the template are exactly its placeholders.
+
+        Args:
+            variables (list): The variables filled in the template.
+            allow_unused (bool): Whether variables without a placeholder are allowed, for prompts that are only
+                known at runtime and may use any of the variables.
+            name (str): The name of the template in the error.
+
+        Raises:
+            PromptTemplateError: If a placeholder is not filled or a variable has no placeholder.
+        """
+        unfilled = [variable for variable in self.variables if variable not in variables]
+        unknown = [] if allow_unused else [variable for variable in variables if variable not in self.slots]
+        if unfilled or unknown:
+            raise PromptTemplateError(f"{name} has unfilled placeholders {unfilled} and unknown variables {unknown}")
+
+
+class RenderedPrompt(str):
+    """
+    Prompt rendered in stages, holding the template it was rendered from, the values filled so far and the token
+    counts known for some of them.
+    """
+
+    def __new__(cls, text: str, template: PromptTemplate, values: Dict[str, object],
+                token_counts: Dict[str, int] = None):
+        prompt = super().__new__(cls, text)
+        prompt.template = template
+        prompt.values = dict(values)
+        prompt.token_counts = dict(token_counts or {})
+        return prompt
+
+    def render(self, values: Dict[str, object]) -> str:
+        """Fill the remaining placeholders of the template, the values filled before are kept."""
+        return self.template.render({**self.values, **values})
+
+
+class PromptTemplateRegistry:
+    """Prompt templates of the process, each prompt file is read and parsed once."""
+    MAX_COMPILED_TEMPLATES = 256
+
+    def __init__(self):
+        self._file_templates = {}
+        self._compiled_templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, current_file: str, prompt_file: str, variables: List[str] = None,
+             allow_unused: bool = False) -> PromptTemplate:
+        """
+        Return the template of a prompt file in the prompts folder next to the given file, validating it when the
+        variables filled in it are given.
+
+        Args:
+            current_file (str): The file whose prompts folder holds the prompt.
+            prompt_file (str): The name of the prompt file.
+            variables (list): The variables filled in the prompt.
+            allow_unused (bool): Whether variables without a placeholder are allowed.
+
+        Returns:
+            PromptTemplate: The template.
+        """
+        file_path = str(Path(current_file).resolve().parent) + "/prompts/" + prompt_file
+        template = self._file_templates.get(file_path)
+        if template is None:
+            with open(file_path, "r") as f:
+                template = PromptTemplate(f.read())
+            with self._lock:
+                template = self._file_templates.setdefault(file_path, template)
+        if variables is not None:
+            template.validate(variables, allow_unused=allow_unused, name=prompt_file)
+        return template
+
+    def compile(self, text: str) -> PromptTemplate:
+        """
+        Return the template of a prompt known at runtime, such as the prompts of the workflow steps. The templates
+        of the most recent prompts are kept.
+
+        Args:
+            text (str): The prompt.
+
+        Returns:
+            PromptTemplate: The template.
+        """
+        with self._lock:
+            template = self._compiled_templates.pop(text, None) or PromptTemplate(text)
+            self._compiled_templates[text] = template
+            if len(self._compiled_templates) > self.MAX_COMPILED_TEMPLATES:
+                self._compiled_templates.popitem(last=False)
+        return template
+
+
+_registry = PromptTemplateRegistry()
+
+
+def get_prompt_registry() -> PromptTemplateRegistry:
+    return _registry
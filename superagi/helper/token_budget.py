@@ -0,0 +1,65 @@
+from typing import Callable
+
+from superagi.helper.token_counter import TokenCounter, TEXT_BASE_TOKENS
+
+
+class TokenBudget:
+    """
+    Running token count of a prompt section filled item by item. Each item is counted once when it is added, so
+    packing a list into a token limit is linear in the items instead of counting the whole section after every item.
+    """
+
+    def __init__(self, token_limit: int, count_tokens: Callable[[str], int], base_tokens: int = 0,
+                 tokens_per_item: int = 0):
+        """
+        Args:
+            token_limit (int): The tokens available for the section.
+            count_tokens (Callable): The function counting the tokens of an item.
+            base_tokens (int): The tokens of the empty section.
+            tokens_per_item (int): The tokens added with every item, such as a separator.
+        """
+        self.token_limit = token_limit
+        self.count_tokens = count_tokens
+        self.base_tokens = base_tokens
+        self.tokens_per_item = tokens_per_item
+        self.total = base_tokens
+
+    @classmethod
+    def for_text(cls, token_limit: int, tokens_per_item: int = 0):
+        """Budget of a text counted as TokenCounter.count_text_tokens counts it."""
+        return cls(token_limit, lambda text: TokenCounter.count_text_tokens(text) - TEXT_BASE_TOKENS,
+                   base_tokens=TEXT_BASE_TOKENS, tokens_per_item=tokens_per_item)
+
+    @classmethod
+    def for_message(cls, token_limit: int, model: str = "gpt-3.5-turbo-0301"):
+        """Budget of the content of a message counted as TokenCounter.count_message_tokens counts it."""
+        base_tokens = TokenCounter.count_message_tokens([{"role": "user", "content": ""}], model)
+        return cls(token_limit,
+                   lambda text: TokenCounter.count_message_tokens([{"role": "user", "content": text}], model)
+                                - base_tokens,
+                   base_tokens=base_tokens)
+
+    @property
+    def remaining(self) -> int:
+        return self.token_limit - self.total
+
+    @property
+    def exceeded(self) -> bool:
+        return self.total > self.token_limit
+
+    def add(self, item: str) -> int:
+        """
+        Add an item to the section.
+
+        Args:
+            item (str): The item.
+
+        Returns:
+            int: The tokens of the item.
+        """
+        token_count = self.count_tokens(item) + self.tokens_per_item
+        self.total += token_count
+        return token_count
+
+    def reset(self):
+        self.total = self.base_tokens
@@ -1,12 +1,42 @@
+from functools import lru_cache
 from typing import List
 
 import tiktoken
+from tiktoken.model import MODEL_PREFIX_TO_ENCODING, MODEL_TO_ENCODING
 
 from superagi.types.common import BaseMessage
 from superagi.lib.logger import logger
-from superagi.models.models import Models
 from sqlalchemy.orm import Session
 
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_TOKENS_PER_MESSAGE = 4
+TEXT_BASE_TOKENS = 4
+MODEL_TOKENS_PER_MESSAGE = {"gpt-3.5-turbo-0301": 4, "gpt-4-0314": 3, "gpt-3.5-turbo": 4, "gpt-4": 3,
+                            "gpt-3.5-turbo-16k": 4, "gpt-4-32k": 3, "gpt-4-32k-0314": 3,
+                            "models/chat-bison-001": 4}
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = DEFAULT_ENCODING):
+    """Returns the tiktoken encoding, built once per process."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def get_encoding_name(model: str) -> str:
+    """Returns the name of the tiktoken encoding of the model, cl100k_base for models unknown to tiktoken."""
+    if model in MODEL_TO_ENCODING:
+        return MODEL_TO_ENCODING[model]
+    for model_prefix, encoding_name in MODEL_PREFIX_TO_ENCODING.items():
+        if str(model).startswith(model_prefix):
+            return encoding_name
+    return DEFAULT_ENCODING
+
+
+@lru_cache(maxsize=None)
+def get_encoding_for_model(model: str):
+    """Returns the tiktoken encoding of the model, built once per process."""
+    return get_encoding(get_encoding_name(model))
+
 
 class TokenCounter:
 
@@ -21,18 +51,15 @@ class TokenCounter:
         Args:
             model (str): The model to return the token limit for.
 
-        Raises:
-            KeyError: If the model is not found.
-
         Returns:
             int: The token limit.
         """
-        try:
-            model_token_limit_dict = (Models.fetch_model_tokens(self.session, self.organisation_id))
-            return model_token_limit_dict[model]
-        except KeyError:
-            logger.warning("Warning: model not found. Using cl100k_base encoding.")
+        from superagi.llms.model_metadata import get_model_metadata
+        model_metadata = get_model_metadata(self.session, self.organisation_id, model)
+        if model_metadata is None:
+            logger.warning(f"Warning: model {model} not found. Using a token limit of 8092.")
             return 8092
+        return model_metadata.token_limit
 
     @staticmethod
     def count_message_tokens(messages: List[BaseMessage], model: str = "gpt-3.5-turbo-0301") -> int:
@@ -43,45 +70,40 @@ class TokenCounter:
             messages (List[BaseMessage]): The list of messages to count the tokens for.
             model (str): The model to count the tokens for.
 
-        Raises:
-            KeyError: If the model is not found.
-
         Returns:
             int: The number of tokens in the messages.
         """
-        try:
-            default_tokens_per_message = 4
-            model_token_per_message_dict = {"gpt-3.5-turbo-0301": 4, "gpt-4-0314": 3, "gpt-3.5-turbo": 4, "gpt-4": 3,
-                                            "gpt-3.5-turbo-16k": 4, "gpt-4-32k": 3, "gpt-4-32k-0314": 3,
-                                            "models/chat-bison-001": 4}
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            logger.warning("Warning: model not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-
-        if model in model_token_per_message_dict.keys():
-            tokens_per_message = model_token_per_message_dict[model]
-        else:
-            tokens_per_message = default_tokens_per_message
-
-        if tokens_per_message is None:
-            raise NotImplementedError(
-                f"num_tokens_from_messages() is not implemented for model {model}.\n"
-                " See https://github.com/openai/openai-python/blob/main/chatml.md for"
-                " information on how messages are converted to tokens."
-            )
+        encoding = get_encoding_for_model(model)
+        tokens_per_message = TokenCounter.tokens_per_message(model)
 
         num_tokens = 0
         for message in messages:
             if isinstance(message, str):
                 message = {'content': message}
             num_tokens += tokens_per_message
-            num_tokens += len(encoding.encode(message['content']))
+            if message.get('token_count') is not None and encoding.name == DEFAULT_ENCODING:
+                # counted once when the feed was stored
+                num_tokens += message['token_count']
+            else:
+                num_tokens += len(encoding.encode(message['content']))
 
         num_tokens += 3
         print("tokens",num_tokens)
         return num_tokens
 
+    @staticmethod
+    def tokens_per_message(model: str = "gpt-3.5-turbo-0301") -> int:
+        """
+        Function to return the tokens added to the content of every message of a model.
+
+        Args:
+            model (str): The model.
+
+        Returns:
+            int: The number of tokens per message.
+        """
+        return MODEL_TOKENS_PER_MESSAGE.get(model, DEFAULT_TOKENS_PER_MESSAGE)
+
     @staticmethod
     def count_text_tokens(message: str) -> int:
         """
@@ -93,6 +115,24 @@ class TokenCounter:
         Returns:
             int: The number of tokens in the text.
         """
-        encoding = tiktoken.get_encoding("cl100k_base")
-        num_tokens = len(encoding.encode(message)) + 4
+        num_tokens = len(get_encoding(DEFAULT_ENCODING).encode(message)) + TEXT_BASE_TOKENS
         return num_tokens
+
+    @staticmethod
+    def count_content_tokens(content: str):
+        """
+        Function to count the tokens of the content of a message, as stored with the agent execution feeds.
+
+        Args:
+            content (str): The content of the message.
+
+        Returns:
+            int: The number of tokens in the content, or None when the encoding is not available.
+        """
+        if content is None:
+            return 0
+        try:
+            return len(get_encoding(DEFAULT_ENCODING).encode(content))
+        except Exception as exception:
+            logger.warning(f"Unable to count the tokens of the content: {exception}")
+            return None
@@ -3,6 +3,7 @@ import inspect
 import json
 import os
 import sys
+import threading
 import zipfile
 from urllib.parse import urlparse
 
@@ -129,7 +130,7 @@ def init_tools(folder_paths, session, tool_name_to_toolkit):
             if not os.path.isdir(folder_dir):
                 continue
                 # sys.path.append(os.path.abspath('superagi/tools/email'))
-            sys.path.append(folder_dir)
+            add_tool_dir_to_sys_path(folder_dir)
             for file_name in os.listdir(folder_dir):
                 file_path = os.path.join(folder_dir, file_name)
                 if file_name.endswith(".py") and not file_name.startswith("__init__"):
@@ -164,7 +165,7 @@ def init_toolkits(code_link, existing_toolkits, folder_paths, organisation, sess
             if not os.path.isdir(folder_dir):
                 continue
                 # sys.path.append(os.path.abspath('superagi/tools/email'))
-            sys.path.append(folder_dir)
+            add_tool_dir_to_sys_path(folder_dir)
             # Iterate over all files in the subfolder
             for file_name in os.listdir(folder_dir):
                 file_path = os.path.join(folder_dir, file_name)
@@ -294,16 +295,40 @@ def add_tool_to_json(repo_link):
         json.dump(tools_data, file, indent=2)
 
 
-def handle_tools_import():
-    print("Handling tools import")
-    tool_paths = ["superagi/tools", "superagi/tools/marketplace_tools", "superagi/tools/external_tools"]
-    for tool_path in tool_paths:
+TOOL_PATHS = ["superagi/tools", "superagi/tools/marketplace_tools", "superagi/tools/external_tools"]
+_tool_dirs_lock = threading.Lock()
+_tools_imported = False
+
+
+def add_tool_dir_to_sys_path(folder_dir):
+    """Add a tool folder to sys.path unless it is already there."""
+    with _tool_dirs_lock:
+        if folder_dir not in sys.path:
+            sys.path.append(folder_dir)
+
+
+def handle_tools_import(refresh: bool = False):
+    """
+    Register the tool folders on sys.path once per process.
+
+    Args:
+        refresh (bool): Walk the tool folders again, to pick up newly installed tools.
+    """
+    global _tools_imported
+    if _tools_imported and not refresh:
+        return
+    logger.info("Handling tools import")
+    for tool_path in TOOL_PATHS:
         if not os.path.exists(tool_path):
             continue
         for folder_name in os.listdir(tool_path):
             folder_dir = os.path.join(tool_path, folder_name)
             if os.path.isdir(folder_dir):
-                sys.path.append(folder_dir)
+                add_tool_dir_to_sys_path(folder_dir)
+    if refresh:
+        importlib.invalidate_caches()
+    _tools_imported = True
+
 
 def compare_tools(tool1, tool2):
     fields = ["name", "description"]
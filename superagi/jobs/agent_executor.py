@@ -1,22 +1,25 @@
+import time
 from datetime import datetime, timedelta
 
 from sqlalchemy.orm import sessionmaker
 from superagi.llms.local_llm import LocalLLM
 
-import superagi.worker
+from superagi.agent.agent_execution_context import AgentExecutionContext
 from superagi.agent.agent_iteration_step_handler import AgentIterationStepHandler
 from superagi.agent.agent_tool_step_handler import AgentToolStepHandler
 from superagi.agent.agent_workflow_step_wait_handler import AgentWaitStepHandler
+from superagi.agent.pending_completion import run_to_completion
 from superagi.agent.types.wait_step_status import AgentWorkflowStepWaitStatus
 from superagi.apm.event_handler import EventHandler
 from superagi.config.config import get_config
+from superagi.jobs.execution_scheduler import schedule_agent_execution
 from superagi.lib.logger import logger
 from superagi.llms.google_palm import GooglePalm
+from superagi.llms.hedged_llm import with_hedged_models
 from superagi.llms.hugging_face import HuggingFace
 from superagi.llms.llm_model_factory import get_model
+from superagi.llms.llm_response_cache import with_llm_response_cache
 from superagi.llms.replicate import Replicate
-from superagi.models.agent import Agent
-from superagi.models.agent_config import AgentConfiguration
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.db import connect_db
 from superagi.models.workflows.agent_workflow_step import AgentWorkflowStep
@@ -24,9 +27,9 @@ from superagi.models.workflows.agent_workflow_step_wait import AgentWorkflowStep
 from superagi.types.vector_store_types import VectorStoreType
 from superagi.vector_store.embedding.openai import OpenAiEmbedding
 from superagi.vector_store.vector_factory import VectorFactory
-from superagi.worker import execute_agent
 from superagi.agent.types.agent_workflow_step_action_types import AgentWorkflowStepAction
 from superagi.agent.types.agent_execution_status import AgentExecutionStatus
+from superagi.agent.types.step_execution_result import StepExecutionResult
 
 # from superagi.helper.tool_helper import get_tool_config_by_key
 
@@ -37,92 +40,158 @@ Session = sessionmaker(bind=engine)
 class AgentExecutor:
 
     def execute_next_step(self, agent_execution_id):
+        """
+        Executes the next step(s) of the agent execution and schedules the following ones.
+
+        By default a task runs a single step and re-queues the execution. When
+        AGENT_EXECUTION_MAX_STEPS_PER_TASK is set above 1 the task keeps the session, the memory and the
+        llm client warm and runs steps back to back until the step or AGENT_EXECUTION_TIME_SLICE budget
+        is used up, then re-queues the execution so that other executions get their turn.
+
+        Args:
+            agent_execution_id (int): The id of the agent execution.
+        """
         global engine
         # try:
         engine.dispose()
         session = Session()
         try:
-            agent_execution = session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
-            '''Avoiding running old agent executions'''
-            if agent_execution and agent_execution.created_at < datetime.utcnow() - timedelta(days=1):
-                logger.error("Older agent execution found, skipping execution")
-                return
-
-            agent = session.query(Agent).filter(Agent.id == agent_execution.agent_id).first()
-            agent_config = Agent.fetch_configuration(session, agent.id)
-            if agent.is_deleted or (
-                    agent_execution.status != AgentExecutionStatus.RUNNING.value and agent_execution.status != AgentExecutionStatus.WAITING_FOR_PERMISSION.value):
-                logger.error(f"Agent execution stopped. {agent.id}: {agent_execution.status}")
-                return
-
-            organisation = Agent.find_org_by_agent_id(session, agent_id=agent.id)
-            if self._check_for_max_iterations(session, organisation.id, agent_config, agent_execution_id):
-                logger.error(f"Agent execution stopped. Max iteration exceeded. {agent.id}: {agent_execution.status}")
-                return
-
-            try:
-                model_config = AgentConfiguration.get_model_api_key(session, agent_execution.agent_id,
-                                                                    agent_config["model"])
-                model_api_key = model_config['api_key']
-                model_llm_source = model_config['provider']
-            except Exception as e:
-                logger.info(f"Unable to get model config...{e}")
-                return
-
-            try:
-                memory = None
-                if "OpenAI" in model_llm_source:
-                    vector_store_type = VectorStoreType.get_vector_store_type(get_config("LTM_DB", "Redis"))
-                    memory = VectorFactory.get_vector_storage(vector_store_type, "super-agent-index1",
-                                                              AgentExecutor.get_embedding(model_llm_source,
-                                                                                          model_api_key))
-            except Exception as e:
-                logger.info(f"Unable to setup the connection...{e}")
-                memory = None
-
-            agent_workflow_step = session.query(AgentWorkflowStep).filter(
-                AgentWorkflowStep.id == agent_execution.current_agent_step_id).first()
-            try:
-                self.__execute_workflow_step(agent, agent_config, agent_execution_id, agent_workflow_step, memory,
-                                             model_api_key, organisation, session)
-
-            except Exception as e:
-                logger.info("Exception in executing the step: {}".format(e))
-                superagi.worker.execute_agent.apply_async((agent_execution_id, datetime.now()), countdown=15)
-                return
-
-            agent_execution = session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
-            if agent_execution.status == "COMPLETED" or agent_execution.status == "WAITING_FOR_PERMISSION":
-                logger.info("Agent Execution is completed or waiting for permission")
-                session.close()
-                return
-            superagi.worker.execute_agent.apply_async((agent_execution_id, datetime.now()), countdown=2)
-            # superagi.worker.execute_agent.delay(agent_execution_id, datetime.now())
+            max_steps = max(int(get_config("AGENT_EXECUTION_MAX_STEPS_PER_TASK", 1)), 1)
+            time_slice = float(get_config("AGENT_EXECUTION_TIME_SLICE", 60))
+            slice_started_at = time.monotonic()
+            warm_resources = {}
+            for step_count in range(1, max_steps + 1):
+                step_result = self._execute_step(session, agent_execution_id, warm_resources)
+                if step_result == StepExecutionResult.RETRY:
+                    schedule_agent_execution(agent_execution_id, countdown=15)
+                    return
+                if step_result == StepExecutionResult.STOP:
+                    return
+                if step_count == max_steps or time.monotonic() - slice_started_at >= time_slice:
+                    break
+                # statuses can be changed by other processes (pause, stop, permission), always read them fresh
+                session.expire_all()
+
+            countdown = 2 if max_steps == 1 else 0
+            schedule_agent_execution(agent_execution_id, countdown=countdown)
         finally:
             session.close()
             engine.dispose()
 
-    def __execute_workflow_step(self, agent, agent_config, agent_execution_id, agent_workflow_step, memory,
-                                model_api_key, organisation, session):
+    def _execute_step(self, session, agent_execution_id, warm_resources: dict):
+        """
+        Executes a single step of the agent execution.
+
+        Args:
+            session (Session): The database session.
+            agent_execution_id (int): The id of the agent execution.
+            warm_resources (dict): Memory and llm clients kept between the steps of the same task.
+
+        Returns:
+            StepExecutionResult: Whether the execution can continue, has to be retried or has to stop.
+        """
+        return run_to_completion(self._iter_step(session, agent_execution_id, warm_resources))
+
+    def _iter_step(self, session, agent_execution_id, warm_resources: dict):
+        """
+        Executes a single step of the agent execution as a generator yielding the PendingCompletion of the llm
+        call of the step, if any, and resumed with the response.
+
+        Args:
+            session (Session): The database session.
+            agent_execution_id (int): The id of the agent execution.
+            warm_resources (dict): Memory and llm clients kept between the steps of the same task.
+
+        Returns:
+            StepExecutionResult: Whether the execution can continue, has to be retried or has to stop.
+        """
+        execution_context = AgentExecutionContext.load(session, agent_execution_id)
+        if execution_context is None:
+            logger.error(f"Agent execution not found. {agent_execution_id}")
+            return StepExecutionResult.STOP
+        agent_execution = execution_context.agent_execution
+        '''Avoiding running old agent executions'''
+        if agent_execution.created_at < datetime.utcnow() - timedelta(days=1):
+            logger.error("Older agent execution found, skipping execution")
+            return StepExecutionResult.STOP
+
+        agent = execution_context.agent
+        agent_config = execution_context.agent_config
+        if agent.is_deleted or (
+                agent_execution.status != AgentExecutionStatus.RUNNING.value and agent_execution.status != AgentExecutionStatus.WAITING_FOR_PERMISSION.value):
+            logger.error(f"Agent execution stopped. {agent.id}: {agent_execution.status}")
+            return StepExecutionResult.STOP
+
+        organisation = execution_context.organisation
+        if self._check_for_max_iterations(session, organisation.id, agent_config, agent_execution):
+            logger.error(f"Agent execution stopped. Max iteration exceeded. {agent.id}: {agent_execution.status}")
+            return StepExecutionResult.STOP
+
+        try:
+            model_api_key = execution_context.model_api_key
+            model_llm_source = execution_context.model_provider
+        except Exception as e:
+            logger.info(f"Unable to get model config...{e}")
+            return StepExecutionResult.STOP
+
+        memory_key = (model_llm_source, model_api_key)
+        if warm_resources.get("memory_key") != memory_key:
+            warm_resources["memory"] = self._get_memory(model_llm_source, model_api_key)
+            warm_resources["memory_key"] = memory_key
+        memory = warm_resources["memory"]
+
+        llm_key = (organisation.id, agent_config["model"], model_api_key, agent_config.get("llm_response_cache"),
+                   agent_config.get("llm_response_cache_ttl"), tuple(agent_config.get("hedge_models") or ()))
+        if warm_resources.get("llm_key") != llm_key:
+            llm = get_model(model=agent_config["model"], api_key=model_api_key, organisation_id=organisation.id)
+            warm_resources["llm"] = with_llm_response_cache(
+                with_hedged_models(llm, agent_config, execution_context), agent_config)
+            warm_resources["llm_key"] = llm_key
+        llm = warm_resources["llm"]
+
+        agent_workflow_step = session.query(AgentWorkflowStep).filter(
+            AgentWorkflowStep.id == agent_execution.current_agent_step_id).first()
+        try:
+            yield from self.__execute_workflow_step(execution_context, agent_workflow_step, memory, llm, session)
+        except Exception as e:
+            logger.info("Exception in executing the step: {}".format(e))
+            return StepExecutionResult.RETRY
+
+        agent_execution = session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
+        if agent_execution.status == "COMPLETED" or agent_execution.status == "WAITING_FOR_PERMISSION":
+            logger.info("Agent Execution is completed or waiting for permission")
+            return StepExecutionResult.STOP
+        return StepExecutionResult.CONTINUE
+
+    def _get_memory(self, model_llm_source, model_api_key):
+        try:
+            memory = None
+            if "OpenAI" in model_llm_source:
+                vector_store_type = VectorStoreType.get_vector_store_type(get_config("LTM_DB", "Redis"))
+                memory = VectorFactory.get_vector_storage(vector_store_type, "super-agent-index1",
+                                                          AgentExecutor.get_embedding(model_llm_source,
+                                                                                      model_api_key))
+        except Exception as e:
+            logger.info(f"Unable to setup the connection...{e}")
+            memory = None
+        return memory
+
+    def __execute_workflow_step(self, execution_context, agent_workflow_step, memory, llm, session):
         logger.info("Executing Workflow step : ", agent_workflow_step.action_type)
+        agent_id = execution_context.agent_id
+        agent_execution_id = execution_context.agent_execution_id
         if agent_workflow_step.action_type == AgentWorkflowStepAction.TOOL.value:
-            tool_step_handler = AgentToolStepHandler(session,
-                                                     llm=get_model(model=agent_config["model"], api_key=model_api_key,
-                                                                   organisation_id=organisation.id)
-                                                     , agent_id=agent.id, agent_execution_id=agent_execution_id,
-                                                     memory=memory)
+            tool_step_handler = AgentToolStepHandler(session, llm=llm, agent_id=agent_id,
+                                                     agent_execution_id=agent_execution_id, memory=memory,
+                                                     execution_context=execution_context)
             tool_step_handler.execute_step()
         elif agent_workflow_step.action_type == AgentWorkflowStepAction.ITERATION_WORKFLOW.value:
-            iteration_step_handler = AgentIterationStepHandler(session,
-                                                               llm=get_model(model=agent_config["model"],
-                                                                             api_key=model_api_key,
-                                                                             organisation_id=organisation.id)
-                                                               , agent_id=agent.id,
-                                                               agent_execution_id=agent_execution_id, memory=memory)
-            print(get_model(model=agent_config["model"], api_key=model_api_key, organisation_id=organisation.id))
-            iteration_step_handler.execute_step()
+            iteration_step_handler = AgentIterationStepHandler(session, llm=llm, agent_id=agent_id,
+                                                               agent_execution_id=agent_execution_id, memory=memory,
+                                                               execution_context=execution_context)
+            yield from iteration_step_handler.iter_step()
         elif agent_workflow_step.action_type == AgentWorkflowStepAction.WAIT_STEP.value:
-            (AgentWaitStepHandler(session=session, agent_id=agent.id,
+            (AgentWaitStepHandler(session=session, agent_id=agent_id,
                                   agent_execution_id=agent_execution_id)
              .execute_step())
 
@@ -140,8 +209,7 @@ class AgentExecutor:
             return LocalLLM()
         return None
 
-    def _check_for_max_iterations(self, session, organisation_id, agent_config, agent_execution_id):
-        db_agent_execution = session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
+    def _check_for_max_iterations(self, session, organisation_id, agent_config, db_agent_execution):
         if agent_config["max_iterations"] <= db_agent_execution.num_of_calls:
             db_agent_execution.status = AgentExecutionStatus.ITERATION_LIMIT_EXCEEDED.value
 
@@ -182,5 +250,5 @@ class AgentExecutor:
                     session.flush()
                     AgentWaitStepHandler(session=session, agent_id=agent_execution.agent_id,
                                          agent_execution_id=agent_execution.id).handle_next_step()
-                    execute_agent.delay(agent_execution.id, datetime.now())
+                    schedule_agent_execution(agent_execution.id)
         session.close()
\ No newline at end of file
@@ -0,0 +1,246 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+from superagi.agent.pending_completion import PendingCompletion
+from superagi.agent.types.step_execution_result import StepExecutionResult
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+
+RETRY_DELAY = 15  # Seconds
+MAX_CONSECUTIVE_FAILURES = 5
+HEARTBEAT_INTERVAL = 30  # Seconds
+AGENT_RUNNER_LEASE = 120  # Seconds
+
+
+class RunnerLeases:
+    """
+    Leases of the executions driven by the runners, kept in redis with the time of their last heartbeat. The celery
+    task handing an execution to a runner is acknowledged right away, so the lease is what tells that the runner
+    still drives the execution. The lease of a runner that died expires, and the execution is queued again.
+    """
+
+    def __init__(self, key: str = "agent_runner:leases"):
+        self.key = key
+
+    def _db(self):
+        return redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+    def renew(self, agent_execution_ids: list, now: float = None):
+        if not agent_execution_ids:
+            return
+        now = time.time() if now is None else now
+        try:
+            self._db().zadd(self.key, {str(agent_execution_id): now for agent_execution_id in agent_execution_ids})
+        except Exception as exception:
+            logger.warning(f"Unable to renew the agent runner leases: {exception}")
+
+    def release(self, agent_execution_id: int):
+        try:
+            self._db().zrem(self.key, str(agent_execution_id))
+        except Exception as exception:
+            logger.warning(f"Unable to release the agent runner lease: {exception}")
+
+    def claim_expired(self, lease: float, now: float = None) -> list:
+        """
+        Remove the leases not renewed within the lease duration.
+
+        Args:
+            lease (float): The seconds after which a lease that was not renewed expires.
+            now (float): The current time.
+
+        Returns:
+            list: The ids of the executions whose lease expired, claimed by this call only.
+        """
+        now = time.time() if now is None else now
+        try:
+            db = self._db()
+            expired = db.zrangebyscore(self.key, "-inf", now - lease)
+            # zrem tells which of the processes looking at the same lease removed it
+            return [int(agent_execution_id) for agent_execution_id in expired if db.zrem(self.key, agent_execution_id)]
+        except Exception as exception:
+            logger.warning(f"Unable to read the agent runner leases: {exception}")
+            return []
+
+
+def requeue_orphaned_executions(leases: RunnerLeases = None) -> list:
+    """
+    Queue again the executions whose runner stopped renewing their lease, such as a worker that was killed.
+
+    Args:
+        leases (RunnerLeases): The leases, the ones in redis by default.
+
+    Returns:
+        list: The ids of the queued executions.
+    """
+    from superagi.jobs.execution_scheduler import schedule_agent_execution
+    leases = leases or RunnerLeases()
+    agent_execution_ids = leases.claim_expired(float(get_config("AGENT_RUNNER_LEASE", AGENT_RUNNER_LEASE)))
+    for agent_execution_id in agent_execution_ids:
+        logger.warning(f"Agent runner lease of execution {agent_execution_id} expired, queuing it again")
+        schedule_agent_execution(agent_execution_id)
+    return agent_execution_ids
+
+
+class AsyncAgentRunner:
+    """
+    Drives many agent executions concurrently from a single process.
+
+    Every execution is a coroutine on one event loop, so an execution waiting between steps costs nothing
+    but a task. The database work of a step (building the prompt, handling the reply) uses the synchronous session
+    and tools and runs in a bounded thread pool, while the llm call of the step is awaited on the event loop with the
+    async client of the llm (achat_completion), holding neither a thread nor a database connection.
+    AGENT_RUNNER_MAX_CONCURRENCY caps how many steps do database work (and hence hold a connection) at once, the
+    number of llm calls in flight is only bounded by the rate limits of the llm dispatcher.
+
+    Enabled with AGENT_EXECUTION_RUNNER: "async", in which case the execute_agent task hands the execution
+    to the runner of the worker process instead of running one step and re-queuing it. The runner renews a lease
+    on each execution it drives, the executions of a runner that died are queued again once their lease expires.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_concurrency: int = None, retry_delay: float = RETRY_DELAY, leases: RunnerLeases = None,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL):
+        self.max_concurrency = max_concurrency or int(get_config("AGENT_RUNNER_MAX_CONCURRENCY", 50))
+        self.retry_delay = retry_delay
+        self.leases = leases or RunnerLeases()
+        self.heartbeat_interval = heartbeat_interval
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="agent-step")
+        self._semaphore = None
+        self._loop = None
+        self._executions = {}
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Returns the runner of the process, starting its event loop in a background thread on first use.
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                runner = cls()
+                runner.start()
+                cls._instance = runner
+            return cls._instance
+
+    def start(self):
+        """Start the event loop of the runner in a daemon thread."""
+        self._loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=self._loop.run_forever, name="agent-runner", daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(self._heartbeat(), self._loop)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            # redis calls block, they are kept off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.leases.renew, self.running_executions)
+
+    def submit(self, agent_execution_id: int):
+        """
+        Schedule an agent execution on the runner. Thread safe, an execution that is already being driven
+        by the runner is not scheduled twice.
+
+        Args:
+            agent_execution_id (int): The id of the agent execution.
+        """
+        asyncio.run_coroutine_threadsafe(self._schedule(agent_execution_id), self._loop)
+
+    async def _schedule(self, agent_execution_id: int):
+        if agent_execution_id in self._executions:
+            return
+        task = asyncio.create_task(self._run_leased(agent_execution_id))
+        self._executions[agent_execution_id] = task
+        task.add_done_callback(lambda _: self._executions.pop(agent_execution_id, None))
+
+    async def _run_leased(self, agent_execution_id: int):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.leases.renew, [agent_execution_id])
+        try:
+            await self.run_execution(agent_execution_id)
+        finally:
+            await loop.run_in_executor(None, self.leases.release, agent_execution_id)
+
+    @property
+    def running_executions(self):
+        return list(self._executions.keys())
+
+    async def run_execution(self, agent_execution_id: int):
+        """
+        Run the steps of an agent execution until it completes, stops or waits for an external event.
+
+        Args:
+            agent_execution_id (int): The id of the agent execution.
+        """
+        warm_resources = {}
+        failures = 0
+        while True:
+            try:
+                step_result = await self._run_step(agent_execution_id, warm_resources)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.error(f"Exception in executing agent execution {agent_execution_id}: {e}")
+                if failures >= MAX_CONSECUTIVE_FAILURES:
+                    return
+                step_result = StepExecutionResult.RETRY
+
+            if step_result == StepExecutionResult.STOP:
+                return
+            await asyncio.sleep(self.retry_delay if step_result == StepExecutionResult.RETRY else 0)
+
+    async def _run_step(self, agent_execution_id: int, warm_resources: dict):
+        from superagi.jobs.agent_executor import AgentExecutor, Session
+
+        # A session per step, so that idle executions do not hold on to a database connection
+        session = Session()
+        steps = AgentExecutor()._iter_step(session, agent_execution_id, warm_resources)
+        try:
+            pending = await self._in_thread(self._advance_step, session, steps.send, None)
+            while isinstance(pending, PendingCompletion):
+                try:
+                    response = await pending.acomplete()
+                except Exception as exception:
+                    pending = await self._in_thread(self._advance_step, session, steps.throw, exception)
+                else:
+                    pending = await self._in_thread(self._advance_step, session, steps.send, response)
+            return pending
+        finally:
+            session.close()
+
+    async def _in_thread(self, function, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    @staticmethod
+    def _advance_step(session, resume, value):
+        """
+        Run the step up to its next llm call.
+
+        Returns:
+            PendingCompletion | StepExecutionResult: The llm call the step waits on, or its result once it is done.
+        """
+        try:
+            pending = resume(value)
+        except StopIteration as stop:
+            return stop.value
+        # the transaction ends so that no database connection is held while waiting on the llm
+        session.commit()
+        return pending
+
+    async def run(self, agent_execution_ids: list):
+        """
+        Run the given agent executions concurrently on the current event loop until they all finish.
+
+        Args:
+            agent_execution_ids (list): The ids of the agent executions.
+        """
+        await asyncio.gather(*[self.run_execution(agent_execution_id) for agent_execution_id in agent_execution_ids])
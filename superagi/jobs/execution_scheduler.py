@@ -0,0 +1,361 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import redis
+from sqlalchemy.orm import sessionmaker
+
+from superagi.config.config import get_config, get_config_flag, get_config_mapping
+from superagi.lib.logger import logger
+from superagi.models.db import connect_db
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+
+
+class InMemorySchedulerBroker:
+    """Scheduler state kept in the memory of the process, used by the tests and single process setups."""
+
+    def __init__(self):
+        self._queues = defaultdict(dict)
+        self._running = defaultdict(dict)
+        self._tenants = {}
+        self._virtual_times = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def lock(self):
+        with self._lock:
+            yield
+
+    def enqueue(self, tenant: str, agent_execution_id: int, ready_at: float):
+        self._queues[tenant].setdefault(agent_execution_id, ready_at)
+
+    def dequeue(self, tenant: str, agent_execution_id: int):
+        self._queues[tenant].pop(agent_execution_id, None)
+        if not self._queues[tenant]:
+            del self._queues[tenant]
+
+    def queued(self, tenant: str, ready_before: float = float("inf")):
+        queue = self._queues.get(tenant, {})
+        return [execution_id for execution_id, ready_at in sorted(queue.items(), key=lambda item: item[1])
+                if ready_at <= ready_before]
+
+    def queued_tenants(self):
+        return list(self._queues.keys())
+
+    def add_running(self, tenant: str, agent_execution_id: int, expires_at: float):
+        self._running[tenant][agent_execution_id] = expires_at
+
+    def remove_running(self, tenant: str, agent_execution_id: int):
+        self._running[tenant].pop(agent_execution_id, None)
+
+    def running(self, tenant: str):
+        return list(self._running.get(tenant, {}).keys())
+
+    def running_tenants(self):
+        return [tenant for tenant, running in self._running.items() if running]
+
+    def expire_running(self, tenant: str, now: float):
+        for execution_id, expires_at in list(self._running.get(tenant, {}).items()):
+            if expires_at <= now:
+                del self._running[tenant][execution_id]
+
+    def get_tenant(self, agent_execution_id: int):
+        return self._tenants.get(agent_execution_id)
+
+    def set_tenant(self, agent_execution_id: int, tenant: str):
+        self._tenants[agent_execution_id] = tenant
+
+    def get_virtual_time(self, tenant: str):
+        return self._virtual_times.get(tenant, 0.0)
+
+    def set_virtual_time(self, tenant: str, virtual_time: float):
+        self._virtual_times[tenant] = virtual_time
+
+    def delete_tenant(self, agent_execution_id: int):
+        self._tenants.pop(agent_execution_id, None)
+
+    def delete_virtual_time(self, tenant: str):
+        self._virtual_times.pop(tenant, None)
+
+
+class RedisSchedulerBroker:
+    """Scheduler state shared by all the processes through redis."""
+
+    def __init__(self, prefix: str = "agent_scheduler"):
+        self.prefix = prefix
+        self.db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+    def _key(self, *parts):
+        return ":".join([self.prefix] + [str(part) for part in parts])
+
+    @contextmanager
+    def lock(self):
+        with self.db.lock(self._key("lock"), timeout=30, blocking_timeout=30):
+            yield
+
+    def enqueue(self, tenant: str, agent_execution_id: int, ready_at: float):
+        self.db.zadd(self._key("queue", tenant), {str(agent_execution_id): ready_at}, nx=True)
+        self.db.sadd(self._key("tenants"), tenant)
+
+    def dequeue(self, tenant: str, agent_execution_id: int):
+        self.db.zrem(self._key("queue", tenant), str(agent_execution_id))
+        if self.db.zcard(self._key("queue", tenant)) == 0:
+            self.db.srem(self._key("tenants"), tenant)
+
+    def queued(self, tenant: str, ready_before: float = float("inf")):
+        return [int(execution_id) for execution_id in
+                self.db.zrangebyscore(self._key("queue", tenant), "-inf", ready_before)]
+
+    def queued_tenants(self):
+        return list(self.db.smembers(self._key("tenants")))
+
+    def add_running(self, tenant: str, agent_execution_id: int, expires_at: float):
+        self.db.zadd(self._key("running", tenant), {str(agent_execution_id): expires_at})
+        self.db.sadd(self._key("running_tenants"), tenant)
+
+    def remove_running(self, tenant: str, agent_execution_id: int):
+        self.db.zrem(self._key("running", tenant), str(agent_execution_id))
+
+    def running(self, tenant: str):
+        return [int(execution_id) for execution_id in self.db.zrange(self._key("running", tenant), 0, -1)]
+
+    def running_tenants(self):
+        tenants = []
+        for tenant in self.db.smembers(self._key("running_tenants")):
+            if self.db.zcard(self._key("running", tenant)) > 0:
+                tenants.append(tenant)
+            else:
+                self.db.srem(self._key("running_tenants"), tenant)
+        return tenants
+
+    def expire_running(self, tenant: str, now: float):
+        self.db.zremrangebyscore(self._key("running", tenant), "-inf", now)
+
+    def get_tenant(self, agent_execution_id: int):
+        return self.db.hget(self._key("execution_tenants"), str(agent_execution_id))
+
+    def set_tenant(self, agent_execution_id: int, tenant: str):
+        self.db.hset(self._key("execution_tenants"), str(agent_execution_id), tenant)
+
+    def get_virtual_time(self, tenant: str):
+        return float(self.db.hget(self._key("virtual_times"), tenant) or 0.0)
+
+    def set_virtual_time(self, tenant: str, virtual_time: float):
+        self.db.hset(self._key("virtual_times"), tenant, virtual_time)
+
+    def delete_tenant(self, agent_execution_id: int):
+        self.db.hdel(self._key("execution_tenants"), str(agent_execution_id))
+
+    def delete_virtual_time(self, tenant: str):
+        self.db.hdel(self._key("virtual_times"), tenant)
+
+
+class FairShareScheduler:
+    """
+    Schedules the agent execution tasks fairly between the organisations (or projects) instead of sending
+    them straight to the shared celery queue.
+
+    Every tenant has its own sub-queue. Whenever a slot is free the dispatcher sends the ready execution of
+    the tenant that has received the least service relative to its weight (AGENT_SCHEDULER_WEIGHTS), as long
+    as the tenant is below AGENT_SCHEDULER_MAX_RUNNING_PER_TENANT running executions and the cluster is below
+    AGENT_SCHEDULER_MAX_RUNNING. A running execution holds its slot until its task finishes or its lease runs
+    out, in case the worker died.
+    """
+
+    def __init__(self, broker=None, dispatch_task=None, max_running: int = None,
+                 max_running_per_tenant: int = None, weights: dict = None, by_project: bool = None,
+                 lease: int = None):
+        self.broker = broker or RedisSchedulerBroker()
+        self.dispatch_task = dispatch_task or self._send_execute_agent
+        self.max_running = max_running or int(get_config("AGENT_SCHEDULER_MAX_RUNNING", 20))
+        self.max_running_per_tenant = max_running_per_tenant or int(
+            get_config("AGENT_SCHEDULER_MAX_RUNNING_PER_TENANT", 5))
+        self.weights = weights if weights is not None else get_config_mapping("AGENT_SCHEDULER_WEIGHTS")
+        self.by_project = by_project if by_project is not None else get_config_flag("AGENT_SCHEDULER_BY_PROJECT")
+        self.lease = lease or int(get_config("AGENT_SCHEDULER_LEASE", 900))
+
+    @staticmethod
+    def _send_execute_agent(agent_execution_id: int):
+        import superagi.worker
+        superagi.worker.execute_agent.delay(agent_execution_id, datetime.now())
+
+    def tenant_of(self, organisation_id: int, project_id: int = None):
+        if self.by_project and project_id is not None:
+            return f"{organisation_id}:{project_id}"
+        return str(organisation_id)
+
+    def weight_of(self, tenant: str):
+        organisation_id = tenant.split(":")[0]
+        weight = self.weights.get(organisation_id, self.weights.get(int(organisation_id), 1)) \
+            if organisation_id.isdigit() else 1
+        return max(float(weight), 0.01)
+
+    def schedule(self, agent_execution_id: int, organisation_id: int = None, project_id: int = None,
+                 countdown: float = 0):
+        """
+        Add an agent execution to the sub-queue of its tenant and dispatch what can be dispatched.
+
+        Args:
+            agent_execution_id (int): The id of the agent execution.
+            organisation_id (int): The id of the organisation, looked up when not given.
+            project_id (int): The id of the project, looked up when not given.
+            countdown (float): Seconds before the execution is ready to run.
+        """
+        tenant = self.broker.get_tenant(agent_execution_id) if organisation_id is None else None
+        if tenant is None:
+            if organisation_id is None:
+                organisation_id, project_id = self._fetch_owner(agent_execution_id)
+            tenant = self.tenant_of(organisation_id, project_id)
+
+        with self.broker.lock():
+            if not self.broker.queued(tenant) and not self.broker.running(tenant):
+                # a tenant coming back from idle starts level with the active ones instead of catching up
+                active_virtual_times = [self.broker.get_virtual_time(active_tenant) for active_tenant in
+                                        set(self.broker.queued_tenants() + self.broker.running_tenants())]
+                if active_virtual_times:
+                    self.broker.set_virtual_time(tenant, max(self.broker.get_virtual_time(tenant),
+                                                             min(active_virtual_times)))
+            # set under the lock, so that a concurrent release can not forget the tenant of a queued execution
+            self.broker.set_tenant(agent_execution_id, tenant)
+            self.broker.enqueue(tenant, agent_execution_id, time.time() + countdown)
+        self.dispatch()
+
+    def release(self, agent_execution_id: int):
+        """
+        Free the slot held by an agent execution once its task has finished. An execution that did not queue its
+        next step has completed or stopped, its tenant is forgotten, and so is the virtual time of a tenant left
+        without executions, which starts level with the active tenants when it comes back.
+
+        Args:
+            agent_execution_id (int): The id of the agent execution.
+        """
+        tenant = self.broker.get_tenant(agent_execution_id)
+        if tenant is None:
+            return
+        with self.broker.lock():
+            self.broker.remove_running(tenant, agent_execution_id)
+            if agent_execution_id not in self.broker.queued(tenant):
+                self.broker.delete_tenant(agent_execution_id)
+                if not self.broker.queued(tenant) and not self.broker.running(tenant):
+                    self.broker.delete_virtual_time(tenant)
+
+    def dispatch(self):
+        """
+        Send the ready executions to the workers in weighted fair order while there are free slots.
+
+        Returns:
+            list: The ids of the dispatched agent executions.
+        """
+        dispatched = []
+        with self.broker.lock():
+            now = time.time()
+            tenants = set(self.broker.queued_tenants() + self.broker.running_tenants())
+            running = {}
+            for tenant in tenants:
+                self.broker.expire_running(tenant, now)
+                running[tenant] = self.broker.running(tenant)
+            total_running = sum(len(executions) for executions in running.values())
+
+            while total_running < self.max_running:
+                candidates = []
+                for tenant in self.broker.queued_tenants():
+                    tenant_running = running.get(tenant, [])
+                    if len(tenant_running) >= self.max_running_per_tenant:
+                        continue
+                    ready = [execution_id for execution_id in self.broker.queued(tenant, ready_before=now)
+                             if execution_id not in tenant_running]
+                    if ready:
+                        candidates.append((self.broker.get_virtual_time(tenant), tenant, ready[0]))
+                if not candidates:
+                    break
+
+                virtual_time, tenant, agent_execution_id = min(candidates)
+                self.broker.dequeue(tenant, agent_execution_id)
+                self.broker.add_running(tenant, agent_execution_id, now + self.lease)
+                self.broker.set_virtual_time(tenant, virtual_time + 1 / self.weight_of(tenant))
+                running.setdefault(tenant, []).append(agent_execution_id)
+                total_running += 1
+                dispatched.append(agent_execution_id)
+
+        for agent_execution_id in dispatched:
+            self.dispatch_task(agent_execution_id)
+        return dispatched
+
+    def queue_depths(self, organisation_id: int = None):
+        """
+        Returns the queued, ready and running executions of every tenant.
+
+        Args:
+            organisation_id (int): Only return the tenants of this organisation.
+
+        Returns:
+            dict: The depths keyed by tenant.
+        """
+        now = time.time()
+        depths = {}
+        for tenant in set(self.broker.queued_tenants() + self.broker.running_tenants()):
+            if organisation_id is not None and tenant.split(":")[0] != str(organisation_id):
+                continue
+            depths[tenant] = {"queued": len(self.broker.queued(tenant)),
+                              "ready": len(self.broker.queued(tenant, ready_before=now)),
+                              "running": len(self.broker.running(tenant))}
+        return depths
+
+    def _fetch_owner(self, agent_execution_id: int):
+        from superagi.models.agent import Agent
+        from superagi.models.agent_execution import AgentExecution
+        from superagi.models.project import Project
+
+        session = sessionmaker(bind=connect_db())()
+        try:
+            owner = session.query(Project.organisation_id, Agent.project_id) \
+                .join(Agent, Agent.project_id == Project.id) \
+                .join(AgentExecution, AgentExecution.agent_id == Agent.id) \
+                .filter(AgentExecution.id == agent_execution_id).first()
+        finally:
+            session.close()
+        if owner is None:
+            logger.error(f"Owner of agent execution {agent_execution_id} not found")
+            return 0, None
+        return owner.organisation_id, owner.project_id
+
+
+_scheduler = None
+
+
+def is_fair_share_enabled():
+    return get_config("AGENT_EXECUTION_SCHEDULER", "direct") == "fair_share"
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairShareScheduler()
+    return _scheduler
+
+
+def schedule_agent_execution(agent_execution_id: int, organisation_id: int = None, project_id: int = None,
+                             countdown: float = None):
+    """
+    Queue the next step(s) of an agent execution, through the fair share scheduler when
+    AGENT_EXECUTION_SCHEDULER is "fair_share" or straight on the celery queue otherwise.
+
+    Args:
+        agent_execution_id (int): The id of the agent execution.
+        organisation_id (int): The id of the organisation of the execution.
+        project_id (int): The id of the project of the execution.
+        countdown (float): Seconds before the execution is ready to run.
+    """
+    if is_fair_share_enabled():
+        get_scheduler().schedule(agent_execution_id, organisation_id=organisation_id, project_id=project_id,
+                                 countdown=countdown or 0)
+        return
+
+    import superagi.worker
+    if countdown is not None:
+        superagi.worker.execute_agent.apply_async((agent_execution_id, datetime.now()), countdown=countdown)
+    else:
+        superagi.worker.execute_agent.delay(agent_execution_id, datetime.now())
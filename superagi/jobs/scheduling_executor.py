@@ -6,7 +6,7 @@ from sqlalchemy.orm import sessionmaker
 from superagi.models.tool import Tool
 
 from superagi.models.workflows.iteration_workflow import IterationWorkflow
-from superagi.worker import execute_agent
+from superagi.jobs.execution_scheduler import schedule_agent_execution
 from superagi.models.workflows.agent_workflow import AgentWorkflow
 from superagi.models.agent import Agent
 from superagi.models.agent_config import AgentConfiguration
@@ -80,6 +80,7 @@ class ScheduledAgentExecutor:
         session.commit()
 
         if db_agent_execution.status == "RUNNING":
-            execute_agent.delay(db_agent_execution.id, datetime.now())
+            schedule_agent_execution(db_agent_execution.id, organisation_id=organisation.id if organisation else None,
+                                     project_id=agent.project_id)
 
         session.close()
\ No newline at end of file
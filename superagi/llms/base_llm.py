@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 
 
@@ -6,6 +7,20 @@ class BaseLlm(ABC):
     def chat_completion(self, prompt):
         pass
 
+    async def achat_completion(self, *args, **kwargs):
+        """
+        Async variant of chat_completion. Providers without an async client run the blocking call in a
+        thread so that the event loop is not blocked.
+        """
+        return await asyncio.to_thread(self.chat_completion, *args, **kwargs)
+
+    def stream_chat_completion(self, messages, max_tokens=None):
+        """
+        Yields the content of the chat completion in chunks as it is generated. Providers that do not support
+        streaming raise NotImplementedError, callers then use chat_completion.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
     @abstractmethod
     def get_source(self):
         pass
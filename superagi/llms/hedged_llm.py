@@ -0,0 +1,244 @@
+import math
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+from superagi.llms.base_llm import BaseLlm
+
+HEDGED_LLM_PERCENTILE = 95
+HEDGED_LLM_INITIAL_DELAY = 30  # Seconds
+HEDGED_LLM_MIN_SAMPLES = 20
+HEDGED_LLM_LATENCY_SAMPLES = 200
+HEDGED_LLM_MAX_WORKERS = 32
+
+
+def with_hedged_models(llm, agent_config: dict, execution_context):
+    """
+    Race the llm of an agent against the models configured as its hedge_models.
+
+    Args:
+        llm (BaseLlm): The llm of the agent.
+        agent_config (dict): The configuration of the agent.
+        execution_context (AgentExecutionContext): The context resolving the api keys of the models.
+
+    Returns:
+        BaseLlm: The hedged llm, or the llm itself when the agent has no hedge models that can be built.
+    """
+    from superagi.llms.llm_model_factory import get_model
+    hedge_models = agent_config.get("hedge_models")
+    if not hedge_models:
+        return llm
+    llms = [llm]
+    for model in hedge_models:
+        # a misconfigured hedge model, such as one without an api key, must not fail the step
+        try:
+            llms.append(get_model(model=model, api_key=execution_context.get_model_config(model)["api_key"],
+                                  organisation_id=execution_context.organisation.id))
+        except Exception as exception:
+            logger.error(f"Unable to build the hedge model {model}, racing without it: {exception}")
+    return HedgedLlm(llms) if len(llms) > 1 else llm
+
+
+def is_valid_response(response: dict) -> bool:
+    return "error" not in response and response.get("content") is not None
+
+
+def backend_of(llm: BaseLlm) -> str:
+    return f"{llm.get_source()}:{llm.get_model()}"
+
+
+class HedgedLlmStats:
+    """
+    Latencies and wins of the hedged llm calls of the process per primary llm, shared by the hedged llms built for
+    each execution so that the hedge delay is learnt across them.
+    """
+
+    def __init__(self):
+        self._latencies = {}
+        self._wins = {}
+        self._lock = threading.Lock()
+
+    def record_latency(self, primary: str, latency: float):
+        with self._lock:
+            self._latencies.setdefault(primary, deque(maxlen=HEDGED_LLM_LATENCY_SAMPLES)).append(latency)
+
+    def latencies(self, primary: str) -> list:
+        with self._lock:
+            return sorted(self._latencies.get(primary, ()))
+
+    def record_win(self, primary: str, backend: str):
+        with self._lock:
+            self._wins.setdefault(primary, Counter())[backend] += 1
+
+    def wins(self, primary: str) -> Counter:
+        with self._lock:
+            return Counter(self._wins.get(primary, ()))
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._wins.clear()
+
+
+hedged_llm_stats = HedgedLlmStats()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hedged_llm_executor() -> ThreadPoolExecutor:
+    """The threads calling the llms of all the hedged llms of the process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(get_config("HEDGED_LLM_MAX_WORKERS", HEDGED_LLM_MAX_WORKERS)),
+                thread_name_prefix="hedged_llm")
+        return _executor
+
+
+class HedgedLlm(BaseLlm):
+    """
+    Composite llm racing a primary llm against fallbacks. The primary is called first. When it has not answered
+    within a percentile of its past latencies the next llm is called as well, and when it fails the next llm is
+    called right away. The first valid response wins and is returned at once. The calls still queued in the
+    executor are dropped. The calls already running can not be interrupted: they finish in the background, holding
+    their executor thread and their provider quota, and their responses are discarded.
+    """
+
+    def __init__(self, llms: List[BaseLlm], percentile: float = None, initial_delay: float = None,
+                 min_samples: int = HEDGED_LLM_MIN_SAMPLES):
+        """
+        Args:
+            llms (list): The primary llm followed by the fallbacks, in the order they are called.
+            percentile (float): The percentile of the latencies of the primary after which the next llm is called.
+            initial_delay (float): The seconds after which the next llm is called until enough latencies are known.
+            min_samples (int): The latencies of the primary needed to use the percentile.
+        """
+        self.llms = llms
+        self.percentile = float(percentile or get_config("HEDGED_LLM_PERCENTILE", HEDGED_LLM_PERCENTILE))
+        self.initial_delay = float(initial_delay if initial_delay is not None
+                                   else get_config("HEDGED_LLM_INITIAL_DELAY", HEDGED_LLM_INITIAL_DELAY))
+        self.min_samples = min_samples
+
+    def __getattr__(self, name):
+        # the attributes of the primary llm, such as its sampling parameters, are read through the composite
+        if name == "llms":
+            raise AttributeError(name)
+        return getattr(self.llms[0], name)
+
+    @property
+    def primary(self) -> BaseLlm:
+        return self.llms[0]
+
+    @property
+    def wins(self) -> Counter:
+        """The llms that answered first when racing against the primary llm, in this process."""
+        return hedged_llm_stats.wins(backend_of(self.primary))
+
+    def hedge_delay(self) -> float:
+        """The seconds to wait for a call before calling the next llm."""
+        latencies = hedged_llm_stats.latencies(backend_of(self.primary))
+        if len(latencies) < self.min_samples:
+            return self.initial_delay
+        return latencies[max(math.ceil(self.percentile / 100 * len(latencies)) - 1, 0)]
+
+    def record_latency(self, latency: float):
+        hedged_llm_stats.record_latency(backend_of(self.primary), latency)
+
+    def chat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the chat completion of the llms until one of them returns a valid response.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            dict: The first valid response, or the error of the last llm when none of them succeeded.
+        """
+        start = time.monotonic()
+        pending = {}
+        next_index = 0
+        response = {"error": "ERROR", "message": "No llm to call"}
+
+        def launch():
+            nonlocal next_index
+            if next_index >= len(self.llms):
+                return
+            future = get_hedged_llm_executor().submit(self._call, self.llms[next_index], messages, max_tokens)
+            if next_index == 0:
+                future.add_done_callback(self._record_primary_latency)
+            pending[future] = next_index
+            next_index += 1
+
+        launch()
+        while pending:
+            timeout = self.hedge_delay() if next_index < len(self.llms) else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.info(f"No llm response in {timeout:.2f}s, hedging with {self.llms[next_index].get_model()}")
+                launch()
+                continue
+            for future in done:
+                index = pending.pop(future)
+                response, _ = future.result()
+                if is_valid_response(response):
+                    # cancel only drops the calls that have not started, the others are not waited on
+                    running = [loser for loser in pending if not loser.cancel()]
+                    self._record_win(self.llms[index], index, time.monotonic() - start, len(running))
+                    return response
+                logger.warning(f"LLM {self.llms[index].get_model()} failed: {response.get('message')}")
+            # a failed llm is replaced right away instead of after the hedge delay
+            launch()
+        return response
+
+    def stream_chat_completion(self, messages, max_tokens=None):
+        """
+        Yields the content of the winning response at once, since the race is decided on whole responses.
+        """
+        response = self.chat_completion(messages) if max_tokens is None else self.chat_completion(messages, max_tokens)
+        if not is_valid_response(response):
+            raise RuntimeError(response.get("message") or "Failed to get response from llm")
+        yield response["content"]
+
+    @staticmethod
+    def _call(llm: BaseLlm, messages, max_tokens):
+        start = time.monotonic()
+        try:
+            response = llm.chat_completion(messages, max_tokens)
+        except Exception as exception:
+            response = {"error": "ERROR", "message": "Error: " + str(exception)}
+        return response, time.monotonic() - start
+
+    def _record_primary_latency(self, future):
+        if future.cancelled():
+            return
+        response, latency = future.result()
+        if is_valid_response(response):
+            self.record_latency(latency)
+
+    def _record_win(self, llm: BaseLlm, index: int, elapsed: float, running_losers: int = 0):
+        backend = backend_of(llm)
+        hedged_llm_stats.record_win(backend_of(self.primary), backend)
+        logger.info(f"LLM response from {backend} after {elapsed:.2f}s" + (" (hedged)" if index > 0 else "") +
+                    (f", {running_losers} losing calls finish in the background" if running_losers else ""))
+
+    def get_source(self):
+        return self.primary.get_source()
+
+    def get_api_key(self):
+        return self.primary.get_api_key()
+
+    def get_model(self):
+        return self.primary.get_model()
+
+    def get_models(self):
+        return self.primary.get_models()
+
+    def verify_access_key(self, *args, **kwargs):
+        return self.primary.verify_access_key(*args, **kwargs)
@@ -1,7 +1,7 @@
 import os
-import requests
 import json
 from superagi.config.config import get_config
+from superagi.helper.http_session import get_http_session
 from superagi.lib.logger import logger
 from superagi.llms.base_llm import BaseLlm
 from superagi.llms.utils.huggingface_utils.tasks import Tasks, TaskParameters
@@ -60,7 +60,7 @@ class HuggingFace(BaseLlm):
         Returns:
             bool: True if the access key is valid, False otherwise.
         """
-        response = requests.get(ACCOUNT_VERIFICATION_URL, headers=self.headers)
+        response = get_http_session("hugging_face").get(ACCOUNT_VERIFICATION_URL, headers=self.headers)
 
         # A more sophisticated check could be done here.
         # Ideally we should be checking the response from the endpoint along with the status code.
@@ -91,7 +91,8 @@ class HuggingFace(BaseLlm):
                     "wait_for_model": True,
                 }
             }
-            response = requests.post(self.end_point, headers=self.headers, data=json.dumps(payload))
+            response = get_http_session("hugging_face").post(self.end_point, headers=self.headers,
+                                                             data=json.dumps(payload))
             completion = json.loads(response.content.decode("utf-8"))
             logger.info(f"{completion=}")
             if self.task == Tasks.TEXT_GENERATION:
@@ -106,6 +107,6 @@ class HuggingFace(BaseLlm):
 
     def verify_end_point(self):
         data = json.dumps({"inputs": "validating end_point"})
-        response = requests.post(self.end_point, headers=self.headers, data=data)
+        response = get_http_session("hugging_face").post(self.end_point, headers=self.headers, data=data)
 
         return response.json()
\ No newline at end of file
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+import redis
+
+from superagi.config.config import get_config, get_config_mapping
+from superagi.lib.logger import logger
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+
+DEFAULT_COOLDOWN = 20  # Seconds
+MAX_WAIT = 120  # Seconds
+
+
+def take_from_bucket(state: dict, now: float, requests_per_minute: float, tokens_per_minute: float, tokens: int):
+    """
+    Refill the request and token buckets of an api key since the last update and take one request and the
+    given tokens from them when both have enough.
+
+    Args:
+        state (dict): The state of the buckets, updated in place.
+        now (float): The current time.
+        requests_per_minute (float): The request budget, 0 for no limit.
+        tokens_per_minute (float): The token budget, 0 for no limit.
+        tokens (int): The tokens the call is expected to use.
+
+    Returns:
+        float: 0 when the call can be made, else the seconds to wait before trying again.
+    """
+    elapsed = max(now - state.get("updated_at", now), 0)
+    requests = min(requests_per_minute, state.get("requests", requests_per_minute) + elapsed * requests_per_minute / 60)
+    available = min(tokens_per_minute, state.get("tokens", tokens_per_minute) + elapsed * tokens_per_minute / 60)
+    # a call larger than the whole budget waits for a full bucket instead of forever
+    tokens = min(tokens, tokens_per_minute)
+
+    wait = max(state.get("blocked_until", 0) - now, 0)
+    if wait == 0 and requests_per_minute and requests < 1:
+        wait = (1 - requests) * 60 / requests_per_minute
+    if wait == 0 and tokens_per_minute and available < tokens:
+        wait = (tokens - available) * 60 / tokens_per_minute
+    if wait == 0:
+        requests -= 1
+        available -= tokens
+
+    state.update({"requests": requests, "tokens": available, "updated_at": now})
+    return wait
+
+
+class InMemoryRateLimitStore:
+    """Bucket states kept in the memory of the process, used by the tests and single process setups."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, update_state):
+        with self._lock:
+            state = self._states.setdefault(key, {})
+            return update_state(state)
+
+
+class RedisRateLimitStore:
+    """Bucket states shared by all the workers through redis, updated in optimistic transactions."""
+
+    def __init__(self, prefix: str = "llm_rate_limit"):
+        self.prefix = prefix
+        self.db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+    def update(self, key: str, update_state):
+        redis_key = self.prefix + ":" + key
+        with self.db.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(redis_key)
+                    state = json.loads(pipe.get(redis_key) or "{}")
+                    result = update_state(state)
+                    pipe.multi()
+                    pipe.set(redis_key, json.dumps(state), ex=3600)
+                    pipe.execute()
+                    return result
+                except redis.WatchError:
+                    continue
+
+
+class LlmDispatcher:
+    """
+    Gates the LLM calls of all the workers on shared request and token budgets per api key and model, so that
+    callers wait briefly for their turn instead of being rate limited and backing off for minutes.
+
+    The budgets are read from LLM_RATE_LIMITS, e.g. {"gpt-4": {"requests_per_minute": 200,
+    "tokens_per_minute": 40000}}. Models without limits are only held back after a rate limit error, for the
+    retry-after time of the error, across every worker using the same api key.
+    """
+
+    def __init__(self, store=None, limits: dict = None, max_wait: float = None, clock=time.time, sleep=time.sleep):
+        self.store = store or RedisRateLimitStore()
+        self.limits = limits if limits is not None else get_config_mapping("LLM_RATE_LIMITS")
+        self.max_wait = max_wait if max_wait is not None else float(get_config("LLM_DISPATCHER_MAX_WAIT", MAX_WAIT))
+        self.clock = clock
+        self.sleep = sleep
+
+    @staticmethod
+    def _bucket_key(api_key: str, model: str):
+        # never store the api keys themselves
+        return hashlib.sha256((api_key or "").encode()).hexdigest()[:16] + ":" + str(model)
+
+    def _limits_of(self, model: str):
+        limits = self.limits.get(model, {})
+        return float(limits.get("requests_per_minute", 0)), float(limits.get("tokens_per_minute", 0))
+
+    def limits_tokens(self, model: str):
+        """Whether calls of the model have a token budget, and hence need a token estimate."""
+        return bool(self._limits_of(model)[1])
+
+    def _try_acquire(self, api_key: str, model: str, tokens: int):
+        requests_per_minute, tokens_per_minute = self._limits_of(model)
+        now = self.clock()
+        try:
+            return self.store.update(self._bucket_key(api_key, model),
+                                     lambda state: take_from_bucket(state, now, requests_per_minute,
+                                                                    tokens_per_minute, tokens))
+        except Exception as exception:
+            logger.warning(f"LLM dispatcher unavailable, not rate limiting: {exception}")
+            return 0
+
+    def acquire(self, api_key: str, model: str, tokens: int):
+        """
+        Block until the api key has the budget for a call of the model, or max wait has passed.
+
+        Args:
+            api_key (str): The api key the call is made with.
+            model (str): The model.
+            tokens (int): The estimated prompt and completion tokens of the call.
+
+        Returns:
+            float: The seconds waited.
+        """
+        waited = 0
+        while waited < self.max_wait:
+            wait = self._try_acquire(api_key, model, tokens)
+            if wait <= 0:
+                return waited
+            wait = min(wait, self.max_wait - waited)
+            self.sleep(wait)
+            waited += wait
+        logger.warning(f"Waited {waited}s for the rate limit of {model}, calling anyway")
+        return waited
+
+    async def aacquire(self, api_key: str, model: str, tokens: int):
+        """Async variant of acquire, waiting without blocking the event loop."""
+        waited = 0
+        while waited < self.max_wait:
+            wait = self._try_acquire(api_key, model, tokens)
+            if wait <= 0:
+                return waited
+            wait = min(wait, self.max_wait - waited)
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+    def record_usage(self, api_key: str, model: str, estimated_tokens: int, used_tokens: int):
+        """
+        Correct the token bucket with the tokens a call actually used.
+
+        Args:
+            api_key (str): The api key the call was made with.
+            model (str): The model.
+            estimated_tokens (int): The tokens taken from the bucket before the call.
+            used_tokens (int): The tokens reported by the provider.
+        """
+        if used_tokens is None or not self._limits_of(model)[1]:
+            return
+
+        def correct(state):
+            state["tokens"] = state.get("tokens", 0) - (used_tokens - estimated_tokens)
+
+        try:
+            self.store.update(self._bucket_key(api_key, model), correct)
+        except Exception as exception:
+            logger.warning(f"LLM dispatcher unavailable: {exception}")
+
+    def penalize(self, api_key: str, model: str, retry_after: float = None):
+        """
+        Hold back every call of the api key and model after a rate limit error.
+
+        Args:
+            api_key (str): The api key that was rate limited.
+            model (str): The model.
+            retry_after (float): The seconds to wait, from the retry-after header of the error.
+        """
+        blocked_until = self.clock() + (retry_after if retry_after is not None else
+                                        float(get_config("LLM_RATE_LIMIT_COOLDOWN", DEFAULT_COOLDOWN)))
+
+        def block(state):
+            state["blocked_until"] = max(state.get("blocked_until", 0), blocked_until)
+
+        try:
+            self.store.update(self._bucket_key(api_key, model), block)
+        except Exception as exception:
+            logger.warning(f"LLM dispatcher unavailable: {exception}")
+
+
+_dispatcher = None
+
+
+def get_llm_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = LlmDispatcher()
+    return _dispatcher
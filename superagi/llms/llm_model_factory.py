@@ -1,6 +1,7 @@
 from superagi.llms.google_palm import GooglePalm
 from superagi.llms.local_llm import LocalLLM
 from superagi.llms.openai import OpenAi
+from superagi.llms.llm_registry import llm_registry
 from superagi.llms.replicate import Replicate
 from superagi.llms.hugging_face import HuggingFace
 from superagi.models.models_config import ModelsConfig
@@ -10,33 +11,66 @@ from superagi.models.db import connect_db
 
 
 def get_model(organisation_id, api_key, model="gpt-3.5-turbo", **kwargs):
+    """
+    Get the LLM client for a model of the organisation. Clients are reused from the process level
+    registry, so only the first call for an organisation, model, api key and parameters hits the database.
+    """
+    client_key = ("client", model, api_key, tuple(sorted(kwargs.items())))
+    return llm_registry.get_or_create(organisation_id, client_key,
+                                      lambda: build_model(organisation_id, api_key, model, **kwargs))
+
+
+def fetch_model_details(organisation_id, model):
+    """
+    Get the provider and the details of a model of the organisation, cached in the registry.
+    """
+    return llm_registry.get_or_create(organisation_id, ("details", model),
+                                      lambda: _fetch_model_details(organisation_id, model))
+
+
+def _fetch_model_details(organisation_id, model):
     print("Fetching model details from database...")
     engine = connect_db()
     Session = sessionmaker(bind=engine)
     session = Session()
 
-    model_instance = session.query(Models).filter(Models.org_id == organisation_id, Models.model_name == model).first()
-    response = session.query(ModelsConfig.provider).filter(ModelsConfig.org_id == organisation_id,
-                                                                   ModelsConfig.id == model_instance.model_provider_id).first()
-    provider_name = response.provider
+    try:
+        model_instance = session.query(Models).filter(Models.org_id == organisation_id,
+                                                      Models.model_name == model).first()
+        response = session.query(ModelsConfig.provider).filter(ModelsConfig.org_id == organisation_id,
+                                                               ModelsConfig.id == model_instance.model_provider_id).first()
+        return {
+            "provider": response.provider,
+            "model_name": model_instance.model_name,
+            "version": model_instance.version,
+            "end_point": model_instance.end_point,
+            "context_length": model_instance.context_length
+        }
+    finally:
+        session.close()
+
 
-    session.close()
+def build_model(organisation_id, api_key, model="gpt-3.5-turbo", **kwargs):
+    model_details = fetch_model_details(organisation_id, model)
+    provider_name = model_details["provider"]
 
     if provider_name == 'OpenAI':
         print("Provider is OpenAI")
-        return OpenAi(model=model_instance.model_name, api_key=api_key, **kwargs)
+        return OpenAi(model=model_details["model_name"], api_key=api_key, **kwargs)
     elif provider_name == 'Replicate':
         print("Provider is Replicate")
-        return Replicate(model=model_instance.model_name, version=model_instance.version, api_key=api_key, **kwargs)
+        return Replicate(model=model_details["model_name"], version=model_details["version"], api_key=api_key,
+                         **kwargs)
     elif provider_name == 'Google Palm':
         print("Provider is Google Palm")
-        return GooglePalm(model=model_instance.model_name, api_key=api_key, **kwargs)
+        return GooglePalm(model=model_details["model_name"], api_key=api_key, **kwargs)
     elif provider_name == 'Hugging Face':
         print("Provider is Hugging Face")
-        return HuggingFace(model=model_instance.model_name, end_point=model_instance.end_point, api_key=api_key, **kwargs)
+        return HuggingFace(model=model_details["model_name"], end_point=model_details["end_point"], api_key=api_key,
+                           **kwargs)
     elif provider_name == 'Local LLM':
         print("Provider is Local LLM")
-        return LocalLLM(model=model_instance.model_name, context_length=model_instance.context_length)
+        return LocalLLM(model=model_details["model_name"], context_length=model_details["context_length"])
     else:
         print('Unknown provider.')
 
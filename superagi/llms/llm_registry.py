@@ -0,0 +1,117 @@
+import threading
+import time
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+
+LLM_REGISTRY_VERSION_CHECK_INTERVAL = 1  # Seconds
+
+
+class LLMRegistry:
+    """
+    Process level registry of values keyed by organisation, used to reuse the model details and the
+    LLM clients across agent steps instead of resolving them from the database on every call.
+
+    Entries expire after LLM_REGISTRY_TTL seconds so that changes made from another process
+    (the API server stores the models, the celery workers use them) are eventually picked up.
+    Changes are applied sooner through invalidate, which bumps a version of the organisation in redis:
+    the values registered under an older version are dropped by every process once it reads the new
+    version, at most LLM_REGISTRY_VERSION_CHECK_INTERVAL seconds later.
+    """
+    VERSION_KEY = "llm_registry:version:"
+
+    def __init__(self, ttl: int = None, db=None, version_check_interval: float = None):
+        self._ttl = ttl
+        self._db = db
+        self._version_check_interval = version_check_interval
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return int(get_config("LLM_REGISTRY_TTL", 300))
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+        return self._db
+
+    @property
+    def version_check_interval(self) -> float:
+        if self._version_check_interval is not None:
+            return self._version_check_interval
+        return float(get_config("LLM_REGISTRY_VERSION_CHECK_INTERVAL", LLM_REGISTRY_VERSION_CHECK_INTERVAL))
+
+    def _version(self, organisation_id, now: float) -> int:
+        # the version of the organisation is read from redis at most once per check interval
+        with self._lock:
+            cached = self._versions.get(organisation_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        try:
+            version = int(self.db.get(self.VERSION_KEY + str(organisation_id)) or 0)
+        except Exception as exception:
+            logger.warning(f"Unable to read the llm registry version: {exception}")
+            version = cached[0] if cached is not None else 0
+        with self._lock:
+            self._versions[organisation_id] = (version, now + self.version_check_interval)
+        return version
+
+    def get_or_create(self, organisation_id, key, factory):
+        """
+        Return the value registered for the organisation and key, creating it with the factory when
+        it is missing or expired.
+
+        Args:
+            organisation_id (int): The id of the organisation owning the value.
+            key (tuple): The hashable key of the value within the organisation.
+            factory (callable): Called without arguments to build the value.
+
+        Returns:
+            The registered value.
+        """
+        entry_key = (organisation_id, key)
+        now = time.monotonic()
+        version = self._version(organisation_id, now)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[1] > now and entry[2] == version:
+                return entry[0]
+
+        value = factory()
+        if value is not None:
+            with self._lock:
+                self._entries[entry_key] = (value, now + self.ttl, version)
+        return value
+
+    def invalidate(self, organisation_id=None):
+        """
+        Drop the registered values of an organisation in every process, or of every organisation in this process
+        when no id is given.
+
+        Args:
+            organisation_id (int): The id of the organisation.
+        """
+        with self._lock:
+            if organisation_id is None:
+                self._entries.clear()
+                self._versions.clear()
+                return
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == organisation_id]:
+                del self._entries[entry_key]
+            self._versions.pop(organisation_id, None)
+        try:
+            self.db.incr(self.VERSION_KEY + str(organisation_id))
+        except Exception as exception:
+            logger.warning(f"Unable to share the llm registry invalidation: {exception}")
+
+
+llm_registry = LLMRegistry()
@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+from superagi.llms.base_llm import BaseLlm
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+# the connection pool of the client is shared by every cache of the process
+redis_client = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+LLM_RESPONSE_CACHE_TTL = 86400  # Seconds
+SAMPLING_PARAMETERS = ["temperature", "top_p", "top_k", "frequency_penalty", "presence_penalty", "number_of_results"]
+
+
+def is_llm_response_cache_enabled(agent_config: dict) -> bool:
+    return bool(agent_config.get("llm_response_cache"))
+
+
+def with_llm_response_cache(llm, agent_config: dict):
+    """
+    Put the response cache in front of the llm of an agent that opted in to it.
+
+    Args:
+        llm (BaseLlm): The llm.
+        agent_config (dict): The configuration of the agent.
+
+    Returns:
+        BaseLlm: The cached llm, or the llm itself when the agent did not opt in.
+    """
+    if not is_llm_response_cache_enabled(agent_config) or isinstance(llm, CachedLlm):
+        return llm
+    return CachedLlm(llm, ttl=agent_config.get("llm_response_cache_ttl"))
+
+
+def response_cache_key(llm, messages: list, max_tokens) -> str:
+    """
+    Hash of the model, messages and sampling parameters of a chat completion. The messages are reduced to their
+    role and content with the surrounding whitespace stripped, so that identical prompts built with different
+    bookkeeping keys or trailing newlines share their response.
+
+    Args:
+        llm (BaseLlm): The llm.
+        messages (list): The messages.
+        max_tokens (int): The maximum number of tokens.
+
+    Returns:
+        str: The key.
+    """
+    parameters = {name: getattr(llm, name) for name in SAMPLING_PARAMETERS if getattr(llm, name, None) is not None}
+    request = {
+        "source": llm.get_source(),
+        "model": llm.get_model(),
+        "messages": [{"role": message["role"], "content": (message["content"] or "").strip()} for message in messages],
+        "parameters": parameters,
+        "max_tokens": None if max_tokens is None else int(max_tokens),
+    }
+    return "llm_response:" + hashlib.sha256(
+        json.dumps(request, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+class RedisResponseCache:
+    def __init__(self, db=None):
+        self.db = db or redis_client
+
+    def get(self, key: str):
+        try:
+            return self.db.get(key)
+        except Exception as exception:
+            logger.warning(f"Unable to read the cached llm response: {exception}")
+            return None
+
+    def set(self, key: str, content: str, ttl: int):
+        try:
+            self.db.set(key, content, ex=ttl)
+        except Exception as exception:
+            logger.warning(f"Unable to cache the llm response: {exception}")
+
+
+class DiskResponseCache:
+    """Responses kept as one file per key, expired files are removed when they are read."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> str:
+        digest = key.split(":")[-1]
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as exception:
+            logger.warning(f"Unable to read the cached llm response: {exception}")
+            return None
+        if entry["expires_at"] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry["content"]
+
+    def set(self, key: str, content: str, ttl: int):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written to a temporary file first, so that concurrent readers never see a partial entry
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), delete=False) as file:
+                json.dump({"expires_at": time.time() + ttl, "content": content}, file)
+            os.replace(file.name, path)
+        except Exception as exception:
+            logger.warning(f"Unable to cache the llm response: {exception}")
+
+
+def build_response_cache():
+    if get_config("LLM_RESPONSE_CACHE_BACKEND", "redis") == "disk":
+        return DiskResponseCache(get_config("LLM_RESPONSE_CACHE_DIR", os.path.join(tempfile.gettempdir(),
+                                                                                   "superagi_llm_responses")))
+    return RedisResponseCache()
+
+
+class ResponseCacheMetrics:
+    """
+    Hits and misses of the response cache, counted by the process and added up in redis for every process, since the
+    llm calls are made by the workers while the metrics are served by the api.
+    """
+
+    KEY = "llm_response_cache:metrics"
+
+    def __init__(self, db=None):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.db = db or redis_client
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        try:
+            self.db.hincrby(self.KEY, "hits" if hit else "misses", 1)
+        except Exception as exception:
+            logger.debug(f"Unable to record the llm response cache metrics: {exception}")
+
+    def get(self) -> dict:
+        """
+        Returns:
+            dict: The hits, misses and hit rate of every process, or of this process only when redis is unavailable.
+        """
+        try:
+            counts = self.db.hgetall(self.KEY)
+            hits, misses = int(counts.get("hits", 0)), int(counts.get("misses", 0))
+        except Exception as exception:
+            logger.warning(f"Unable to read the llm response cache metrics: {exception}")
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+response_cache_metrics = ResponseCacheMetrics()
+
+
+class CachedLlm(BaseLlm):
+    """
+    Exact match response cache in front of an llm. A chat completion repeating the model, messages and sampling
+    parameters of a previous one returns its content without calling the llm. Only successful responses are cached.
+    """
+
+    def __init__(self, llm: BaseLlm, cache=None, ttl: int = None):
+        """
+        Args:
+            llm (BaseLlm): The llm.
+            cache (RedisResponseCache | DiskResponseCache): The backend, the configured one by default.
+            ttl (int): The seconds a response is kept.
+        """
+        self.llm = llm
+        self.cache = cache or build_response_cache()
+        self.ttl = int(ttl or get_config("LLM_RESPONSE_CACHE_TTL", LLM_RESPONSE_CACHE_TTL))
+
+    def __getattr__(self, name):
+        # the attributes of the llm, such as its sampling parameters, are read through the cache
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _get_cached(self, messages, max_tokens):
+        key = response_cache_key(self.llm, messages, max_tokens)
+        content = self.cache.get(key)
+        response_cache_metrics.record(content is not None)
+        if content is not None:
+            logger.info(f"LLM response cache hit, hit rate {response_cache_metrics.hit_rate:.2f}")
+        return key, content
+
+    def chat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the chat completion of the llm unless the response is cached.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            dict: The response.
+        """
+        key, content = self._get_cached(messages, max_tokens)
+        if content is not None:
+            return {"content": content, "cached": True}
+        response = self.llm.chat_completion(messages, max_tokens)
+        if "error" not in response and response.get("content") is not None:
+            self.cache.set(key, response["content"], self.ttl)
+        return response
+
+    async def achat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """Async variant of chat_completion, the cache backends are read and written in a thread."""
+        key, content = await asyncio.to_thread(self._get_cached, messages, max_tokens)
+        if content is not None:
+            return {"content": content, "cached": True}
+        response = await self.llm.achat_completion(messages, max_tokens)
+        if "error" not in response and response.get("content") is not None:
+            await asyncio.to_thread(self.cache.set, key, response["content"], self.ttl)
+        return response
+
+    def stream_chat_completion(self, messages, max_tokens=None):
+        """
+        Yields the cached content at once. On a miss the completion is not streamed, since a stream the caller stops
+        early never yields the whole response to cache.
+        """
+        response = self.chat_completion(messages) if max_tokens is None else self.chat_completion(messages, max_tokens)
+        if "error" in response or response.get("content") is None:
+            raise RuntimeError(response.get("message") or "Failed to get response from llm")
+        yield response["content"]
+
+    def get_source(self):
+        return self.llm.get_source()
+
+    def get_api_key(self):
+        return self.llm.get_api_key()
+
+    def get_model(self):
+        return self.llm.get_model()
+
+    def get_models(self):
+        return self.llm.get_models()
+
+    def verify_access_key(self, *args, **kwargs):
+        return self.llm.verify_access_key(*args, **kwargs)
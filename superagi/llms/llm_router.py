@@ -0,0 +1,223 @@
+import threading
+import time
+
+import redis
+
+from superagi.config.config import get_config, get_config_flag
+from superagi.lib.logger import logger
+from superagi.llms.base_llm import BaseLlm
+from superagi.llms.llm_registry import llm_registry
+from superagi.models.configuration import Configuration
+from superagi.models.models_config import ModelsConfig
+from superagi.types.llm_task_types import LlmTaskType
+
+redis_url = get_config('REDIS_URL') or "localhost:6379"
+redis_client = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+
+# registered for the tasks without a route, since the registry does not keep None
+NO_ROUTE = object()
+
+
+def is_llm_routing_enabled():
+    return get_config_flag("LLM_ROUTING", False)
+
+
+def fetch_route_model(session, organisation_id: int, task: LlmTaskType):
+    """
+    Get the model configured for a task of the organisation. The llm_route_<task> configuration of the organisation
+    overrides the LLM_ROUTE_<TASK> setting of the deployment.
+
+    Args:
+        session: The database session.
+        organisation_id (int): The id of the organisation.
+        task (LlmTaskType): The task.
+
+    Returns:
+        str: The model, None when the task uses the model of the agent.
+    """
+    model = llm_registry.get_or_create(
+        organisation_id, ("route", task.value),
+        lambda: Configuration.fetch_configuration(session, organisation_id, "llm_route_" + task.value,
+                                                  get_config("LLM_ROUTE_" + task.value.upper())) or NO_ROUTE)
+    return None if model is NO_ROUTE else model
+
+
+def _build_route_llm(session, organisation_id: int, model: str, **kwargs):
+    from superagi.llms.llm_model_factory import fetch_model_details, get_model
+    provider = fetch_model_details(organisation_id, model)["provider"]
+    api_keys = ModelsConfig.fetch_api_key(session, organisation_id, provider)
+    if not api_keys:
+        raise ValueError(f"No api key found for {provider}")
+    return get_model(organisation_id, api_keys[0]["api_key"], model, **kwargs)
+
+
+def route_llm(session, organisation_id: int, task: LlmTaskType, llm: BaseLlm, **kwargs):
+    """
+    Resolve the llm of an auxiliary call, such as a summary or the instruction on a tool output, to the cheaper or
+    faster model configured for its task. The call keeps the llm of the agent when routing is off, the task has no
+    model configured or the model can not be built.
+
+    Args:
+        session: The database session.
+        organisation_id (int): The id of the organisation.
+        task (LlmTaskType): The task of the call.
+        llm (BaseLlm): The llm of the agent.
+        **kwargs: The parameters of the routed llm, such as its temperature.
+
+    Returns:
+        RoutedLlm: The llm of the task, recording the statistics of its route.
+    """
+    if is_llm_routing_enabled():
+        try:
+            model = fetch_route_model(session, organisation_id, task)
+            if model and model != llm.get_model():
+                # the api key of the route is read once, along with its llm
+                route_llm_key = ("route_llm", model, tuple(sorted(kwargs.items())))
+                routed_llm = llm_registry.get_or_create(
+                    organisation_id, route_llm_key, lambda: _build_route_llm(session, organisation_id, model, **kwargs))
+                return RoutedLlm(routed_llm, task, routed=True)
+        except Exception as exception:
+            logger.warning(f"Unable to route the {task.value} llm call, using {llm.get_model()}: {exception}")
+    return RoutedLlm(llm, task)
+
+
+def _reported_tokens(response: dict):
+    # the total tokens as reported by the provider, openai returns an object and llama.cpp a dict
+    raw_response = response.get("response")
+    usage = raw_response.get("usage") if isinstance(raw_response, dict) else getattr(raw_response, "usage", None)
+    if usage is None:
+        return None
+    total_tokens = usage.get("total_tokens") if isinstance(usage, dict) else getattr(usage, "total_tokens", None)
+    return total_tokens if isinstance(total_tokens, int) else None
+
+
+class RouteStats:
+    """
+    Calls, errors, latency and reported tokens of the llm calls per route, a route being a task and a model. Counted
+    by the process and added up in redis for every process, since the llm calls are made by the workers while the
+    statistics are served by the api.
+    """
+
+    KEY = "llm_route_stats:"
+
+    def __init__(self, db=None):
+        self._routes = {}
+        self._lock = threading.Lock()
+        self.db = db or redis_client
+
+    def record(self, route: str, latency: float, tokens: int = None, error: bool = False):
+        with self._lock:
+            stats = self._routes.setdefault(route, {"calls": 0, "errors": 0, "latency_seconds": 0.0, "tokens": 0})
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["latency_seconds"] += latency
+            stats["tokens"] += tokens or 0
+        try:
+            pipeline = self.db.pipeline(transaction=False)
+            pipeline.sadd(self.KEY + "routes", route)
+            pipeline.hincrby(self.KEY + route, "calls", 1)
+            pipeline.hincrby(self.KEY + route, "errors", int(error))
+            pipeline.hincrbyfloat(self.KEY + route, "latency_seconds", latency)
+            pipeline.hincrby(self.KEY + route, "tokens", tokens or 0)
+            pipeline.execute()
+        except Exception as exception:
+            logger.debug(f"Unable to record the llm route statistics: {exception}")
+
+    def _shared_routes(self) -> dict:
+        routes = {}
+        for route in self.db.smembers(self.KEY + "routes"):
+            stats = self.db.hgetall(self.KEY + route)
+            routes[route] = {"calls": int(stats.get("calls", 0)), "errors": int(stats.get("errors", 0)),
+                             "latency_seconds": float(stats.get("latency_seconds", 0)),
+                             "tokens": int(stats.get("tokens", 0))}
+        return routes
+
+    def get(self) -> dict:
+        """
+        Returns:
+            dict: The statistics of every route across the processes, or of this process only when redis is
+                unavailable.
+        """
+        try:
+            routes = self._shared_routes()
+        except Exception as exception:
+            logger.warning(f"Unable to read the llm route statistics: {exception}")
+            with self._lock:
+                routes = {route: dict(stats) for route, stats in self._routes.items()}
+        return {route: dict(stats, average_latency_seconds=stats["latency_seconds"] / stats["calls"])
+                for route, stats in routes.items() if stats["calls"]}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+
+class RoutedLlm(BaseLlm):
+    """Llm of an auxiliary task, recording the statistics of its calls under the route of the task."""
+
+    def __init__(self, llm: BaseLlm, task: LlmTaskType, routed: bool = False):
+        """
+        Args:
+            llm (BaseLlm): The llm resolved for the task.
+            task (LlmTaskType): The task.
+            routed (bool): Whether the llm replaces the llm of the agent.
+        """
+        self.llm = llm
+        self.task = task
+        self.routed = routed
+
+    def __getattr__(self, name):
+        # the attributes of the llm, such as its sampling parameters, are read through the route
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    @property
+    def route(self) -> str:
+        return f"{self.task.value}:{self.llm.get_model()}"
+
+    def chat_completion(self, messages, max_tokens=None):
+        """
+        Call the chat completion of the llm of the task.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens, the default of the llm when None.
+
+        Returns:
+            dict: The response.
+        """
+        start = time.monotonic()
+        try:
+            response = self.llm.chat_completion(messages) if max_tokens is None \
+                else self.llm.chat_completion(messages, max_tokens)
+        except Exception:
+            route_stats.record(self.route, time.monotonic() - start, error=True)
+            raise
+        route_stats.record(self.route, time.monotonic() - start, _reported_tokens(response),
+                           error="error" in response)
+        return response
+
+    def stream_chat_completion(self, messages, max_tokens=None):
+        # an explicit None would override the default of the llm
+        if max_tokens is None:
+            return self.llm.stream_chat_completion(messages)
+        return self.llm.stream_chat_completion(messages, max_tokens)
+
+    def get_source(self):
+        return self.llm.get_source()
+
+    def get_api_key(self):
+        return self.llm.get_api_key()
+
+    def get_model(self):
+        return self.llm.get_model()
+
+    def get_models(self):
+        return self.llm.get_models()
+
+    def verify_access_key(self, *args, **kwargs):
+        return self.llm.verify_access_key(*args, **kwargs)
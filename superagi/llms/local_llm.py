@@ -1,7 +1,8 @@
 from superagi.config.config import get_config
 from superagi.lib.logger import logger
 from superagi.llms.base_llm import BaseLlm
-from superagi.helper.llm_loader import LLMLoader
+from superagi.helper.llm_loader import LLMLoader, resolve_local_model_path
+from superagi.llms.local_llm_server import get_local_llm_client, get_local_llm_server_address
 
 
 class LocalLLM(BaseLlm):
@@ -28,9 +29,24 @@ class LocalLLM(BaseLlm):
         self.number_of_results = number_of_results
         self.context_length = context_length
 
-        llm_loader = LLMLoader(self.context_length)
-        self.llm_model = llm_loader.model
-        self.llm_grammar = llm_loader.grammar
+        # with a local llm server the model is loaded once by the server instead of by every worker
+        self.llm_client = get_local_llm_client() if get_local_llm_server_address() else None
+        if self.llm_client is not None:
+            self.llm_loader = None
+            self.llm_grammar = None
+        else:
+            self.llm_loader = LLMLoader(self.context_length, resolve_local_model_path(self.model))
+            self.llm_grammar = self.llm_loader.grammar
+
+    @property
+    def llm_model(self):
+        # resolved from the pool on every call, so that a model evicted from the pool is not kept alive by the llms
+        # cached in the llm registry
+        return self.llm_loader.model if self.llm_loader is not None else None
+
+    def _completion_params(self, max_tokens) -> dict:
+        return {"temperature": self.temperature, "top_p": self.top_p, "max_tokens": int(max_tokens),
+                "presence_penalty": self.presence_penalty, "frequency_penalty": self.frequency_penalty}
 
     def chat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
         """
@@ -44,12 +60,19 @@ class LocalLLM(BaseLlm):
             dict: The response.
         """
         try:
-            if self.llm_model is None or self.llm_grammar is None:
+            if self.llm_client is not None:
+                response = self.llm_client.chat_completion(messages, self._completion_params(max_tokens))
+                if "content" in response:
+                    logger.info(response["content"])
+                return response
+            llm_model = self.llm_model
+            if llm_model is None or self.llm_grammar is None:
                 logger.error("Model not found.")
                 return {"error": "Model loading error", "message": "Model not found. Please check your model path and try again."}
             else:
-                response = self.llm_model.create_chat_completion(messages=messages, functions=None, function_call=None, temperature=self.temperature, top_p=self.top_p,
-                                                                 max_tokens=int(max_tokens), presence_penalty=self.presence_penalty, frequency_penalty=self.frequency_penalty, grammar=self.llm_grammar)
+                response = llm_model.create_chat_completion(messages=messages, functions=None, function_call=None,
+                                                                 grammar=self.llm_grammar,
+                                                                 **self._completion_params(max_tokens))
                 content = response["choices"][0]["message"]["content"]
                 logger.info(content)
                 return {"response": response, "content": content}
@@ -58,6 +81,35 @@ class LocalLLM(BaseLlm):
             logger.info("Exception:", exception)
             return {"error": "ERROR", "message": "Error: "+str(exception)}
 
+    def stream_chat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the chat completion in streaming mode.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Yields:
+            str: The content of the completion as it is generated.
+        """
+        if self.llm_client is not None:
+            # the server answers with whole completions
+            response = self.llm_client.chat_completion(messages, self._completion_params(max_tokens))
+            if "error" in response:
+                raise RuntimeError(response["message"])
+            yield response["content"]
+            return
+        llm_model = self.llm_model
+        if llm_model is None or self.llm_grammar is None:
+            raise RuntimeError("Model not found. Please check your model path and try again.")
+        chunks = llm_model.create_chat_completion(messages=messages, functions=None, function_call=None,
+                                                       grammar=self.llm_grammar, stream=True,
+                                                       **self._completion_params(max_tokens))
+        for chunk in chunks:
+            content = chunk["choices"][0].get("delta", {}).get("content")
+            if content:
+                yield content
+
     def get_source(self):
         """
         Get the source.
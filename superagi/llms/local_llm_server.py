@@ -0,0 +1,248 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.connection import Client, Listener
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+
+LOCAL_LLM_SERVER_MAX_QUEUE_SIZE = 32
+LOCAL_LLM_SERVER_MAX_BATCH_SIZE = 8
+LOCAL_LLM_SERVER_BATCH_WAIT = 0.05  # Seconds
+LOCAL_LLM_SERVER_TIMEOUT = 600  # Seconds
+LOCAL_LLM_SERVER_CONTEXT_LENGTH = 4096
+
+
+def get_local_llm_server_address():
+    """The address of the local llm server, a unix socket path or host:port, None when the workers load the model."""
+    return get_config("LOCAL_LLM_SERVER_ADDRESS")
+
+
+def _listener_address(address: str):
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def _authkey(address: str):
+    """
+    The key authenticating the connections to the server. The requests are unpickled, so a tcp address is only
+    served with a key, without one the server listens on a unix socket that only its user can connect to.
+
+    Raises:
+        ValueError: If the address is a tcp address and no key is configured.
+    """
+    authkey = get_config("LOCAL_LLM_SERVER_AUTHKEY")
+    if authkey:
+        return str(authkey).encode()
+    if isinstance(_listener_address(address), tuple):
+        raise ValueError("LOCAL_LLM_SERVER_AUTHKEY is required to serve the local llm on a tcp address")
+    return None
+
+
+class InferenceRequest:
+    def __init__(self, messages: list, params: dict):
+        self.messages = messages
+        self.params = params
+        self.response = None
+        self.done = threading.Event()
+
+    @property
+    def key(self):
+        return json.dumps([self.messages, self.params], sort_keys=True)
+
+
+class LocalModelRunner:
+    """Runs the chat completions of the requests on the model of the process."""
+
+    def __init__(self, context_length: int):
+        from superagi.helper.llm_loader import LLMLoader
+        llm_loader = LLMLoader(context_length)
+        self.llm_model = llm_loader.model
+        self.llm_grammar = llm_loader.grammar
+
+    def __call__(self, messages: list, params: dict) -> dict:
+        if self.llm_model is None or self.llm_grammar is None:
+            logger.error("Model not found.")
+            return {"error": "Model loading error", "message": "Model not found. Please check your model path and try again."}
+        response = self.llm_model.create_chat_completion(messages=messages, functions=None, function_call=None,
+                                                         grammar=self.llm_grammar, **params)
+        return {"response": response, "content": response["choices"][0]["message"]["content"]}
+
+
+class LocalLlmServer:
+    """
+    Inference server owning the single instance of the local model, so that the worker processes do not each load
+    their own copy. The requests of the workers arrive over a local socket and are queued up to a limit, beyond
+    which they are turned down for the workers to retry. The requests arriving together are run as a batch, where
+    identical prompts are evaluated once and the others run in prompt order, so that prompts sharing a prefix run
+    back to back and reuse the evaluated state of the model.
+    """
+
+    def __init__(self, model_runner, address: str, max_queue_size: int = LOCAL_LLM_SERVER_MAX_QUEUE_SIZE,
+                 max_batch_size: int = LOCAL_LLM_SERVER_MAX_BATCH_SIZE, batch_wait: float = LOCAL_LLM_SERVER_BATCH_WAIT):
+        self.model_runner = model_runner
+        self.address = address
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.requests = queue.Queue(maxsize=max_queue_size)
+        self.listener = None
+        self._stopped = threading.Event()
+
+    def submit(self, messages: list, params: dict) -> dict:
+        """
+        Queue a chat completion and wait for its response.
+
+        Args:
+            messages (list): The messages.
+            params (dict): The parameters of the completion.
+
+        Returns:
+            dict: The response, or an error when the queue is full.
+        """
+        request = InferenceRequest(messages, params)
+        try:
+            self.requests.put_nowait(request)
+        except queue.Full:
+            logger.warning("Local llm server queue is full.")
+            return {"error": "ERROR_LOCAL_LLM_BUSY", "message": "Local llm server is busy. Please try again later."}
+        request.done.wait()
+        return request.response
+
+    def next_batch(self) -> list:
+        """Wait for a request, then collect the requests arriving within the batch wait."""
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run_batch(self, batch: list):
+        groups = OrderedDict()
+        for request in batch:
+            groups.setdefault(request.key, []).append(request)
+        for key in sorted(groups):
+            requests = groups[key]
+            try:
+                response = self.model_runner(requests[0].messages, requests[0].params)
+            except Exception as exception:
+                logger.error(f"Local llm server exception: {exception}")
+                response = {"error": "ERROR", "message": "Error: " + str(exception)}
+            for request in requests:
+                request.response = response
+                request.done.set()
+
+    def run_batches(self):
+        while not self._stopped.is_set():
+            self.run_batch(self.next_batch())
+
+    def serve(self):
+        """Accept the connections of the workers until the server is closed."""
+        self.listener = Listener(_listener_address(self.address), authkey=_authkey(self.address))
+        if not isinstance(self.listener.address, tuple):
+            os.chmod(self.listener.address, 0o600)
+        threading.Thread(target=self.run_batches, daemon=True).start()
+        logger.info(f"Local llm server listening on {self.address}")
+        while not self._stopped.is_set():
+            try:
+                connection = self.listener.accept()
+            except Exception as exception:
+                if self._stopped.is_set():
+                    break
+                logger.warning(f"Local llm server failed to accept a connection: {exception}")
+                continue
+            threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def close(self):
+        self._stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+
+    def _handle_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                connection.send(self.submit(request["messages"], request.get("params", {})))
+
+
+class LocalLlmClient:
+    """Client of the local llm server, each thread of a worker keeps its own connection open."""
+
+    def __init__(self, address: str, timeout: float = None):
+        self.address = address
+        self.timeout = timeout or float(get_config("LOCAL_LLM_SERVER_TIMEOUT", LOCAL_LLM_SERVER_TIMEOUT))
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = Client(_listener_address(self.address), authkey=_authkey(self.address))
+            self._local.connection = connection
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection.close()
+
+    def chat_completion(self, messages: list, params: dict) -> dict:
+        """
+        Run a chat completion on the model of the server.
+
+        Args:
+            messages (list): The messages.
+            params (dict): The parameters of the completion.
+
+        Returns:
+            dict: The response.
+        """
+        try:
+            connection = self._connection()
+            connection.send({"messages": messages, "params": params})
+            if not connection.poll(self.timeout):
+                raise TimeoutError(f"No response from the local llm server in {self.timeout} seconds")
+            return connection.recv()
+        except Exception:
+            # the connection may hold the response of the failed request, the next one opens a new connection
+            self._close()
+            raise
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_local_llm_client() -> LocalLlmClient:
+    global _client
+    with _client_lock:
+        if _client is None or _client.address != get_local_llm_server_address():
+            _client = LocalLlmClient(get_local_llm_server_address())
+        return _client
+
+
+def main():
+    server = LocalLlmServer(
+        LocalModelRunner(int(get_config("LOCAL_LLM_SERVER_CONTEXT_LENGTH", LOCAL_LLM_SERVER_CONTEXT_LENGTH))),
+        get_local_llm_server_address() or "/tmp/superagi_local_llm.sock",
+        max_queue_size=int(get_config("LOCAL_LLM_SERVER_MAX_QUEUE_SIZE", LOCAL_LLM_SERVER_MAX_QUEUE_SIZE)),
+        max_batch_size=int(get_config("LOCAL_LLM_SERVER_MAX_BATCH_SIZE", LOCAL_LLM_SERVER_MAX_BATCH_SIZE)),
+        batch_wait=float(get_config("LOCAL_LLM_SERVER_BATCH_WAIT", LOCAL_LLM_SERVER_BATCH_WAIT)))
+    server.serve()
+
+
+if __name__ == "__main__":
+    main()
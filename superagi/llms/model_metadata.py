@@ -0,0 +1,57 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+from superagi.lib.logger import logger
+from superagi.llms.llm_registry import llm_registry
+from superagi.models.models import Models
+
+
+class ModelMetadata(BaseModel):
+    model_name: str
+    token_limit: int
+    context_length: int = None
+
+
+def _fetch_models_metadata(session, organisation_id) -> Dict[str, ModelMetadata]:
+    models_metadata = {}
+    for model_name, token_limit, context_length in Models.fetch_model_metadata(session, organisation_id):
+        models_metadata[model_name] = ModelMetadata(model_name=model_name, token_limit=token_limit,
+                                                    context_length=context_length)
+    return models_metadata
+
+
+def get_models_metadata(session, organisation_id) -> Dict[str, ModelMetadata]:
+    """
+    Return the metadata of the models of an organisation, read from the database once and kept in the llm registry
+    until the models are stored again or LLM_REGISTRY_TTL has passed.
+
+    Args:
+        session (Session): The database session.
+        organisation_id (int): The id of the organisation.
+
+    Returns:
+        dict: The ModelMetadata of the models by name.
+    """
+    try:
+        return llm_registry.get_or_create(organisation_id, ("models_metadata",),
+                                          lambda: _fetch_models_metadata(session, organisation_id))
+    except Exception as exception:
+        logger.error(f"Unable to fetch the models of organisation {organisation_id}: {exception}")
+        return {}
+
+
+def get_model_metadata(session, organisation_id, model: str):
+    """
+    Return the metadata of a model of an organisation.
+
+    Args:
+        session (Session): The database session.
+        organisation_id (int): The id of the organisation.
+        model (str): The name of the model.
+
+    Returns:
+        ModelMetadata: The metadata, or None when the organisation has no such model.
+    """
+    return get_models_metadata(session, organisation_id).get(model)
+
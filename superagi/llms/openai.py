@@ -4,12 +4,15 @@ from openai.error import RateLimitError, AuthenticationError, Timeout, TryAgain
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 from superagi.config.config import get_config
+from superagi.helper.token_counter import TokenCounter
 from superagi.lib.logger import logger
 from superagi.llms.base_llm import BaseLlm
+from superagi.llms.llm_dispatcher import get_llm_dispatcher
 
 MAX_RETRY_ATTEMPTS = 5
-MIN_WAIT = 30 # Seconds
-MAX_WAIT = 300 # Seconds
+# the dispatcher holds the calls back for the retry-after time of a rate limit error, the retries only back off briefly
+MIN_WAIT = 1 # Seconds
+MAX_WAIT = 60 # Seconds
 
 def custom_retry_error_callback(retry_state):
     logger.info("OpenAi Exception:", retry_state.outcome.exception())
@@ -19,7 +22,7 @@ def custom_retry_error_callback(retry_state):
 class OpenAi(BaseLlm):
     def __init__(self, api_key, model="gpt-4", temperature=0.6, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT"), top_p=1,
                  frequency_penalty=0,
-                 presence_penalty=0, number_of_results=1):
+                 presence_penalty=0, number_of_results=1, dispatcher=None):
         """
         Args:
             api_key (str): The OpenAI API key.
@@ -30,6 +33,7 @@ class OpenAi(BaseLlm):
             frequency_penalty (float): The frequency penalty.
             presence_penalty (float): The presence penalty.
             number_of_results (int): The number of results.
+            dispatcher (LlmDispatcher): Gates the calls on the rate limits of the api key.
         """
         self.model = model
         self.temperature = temperature
@@ -39,12 +43,39 @@ class OpenAi(BaseLlm):
         self.presence_penalty = presence_penalty
         self.number_of_results = number_of_results
         self.api_key = api_key
-        openai.api_key = api_key
+        self.dispatcher = dispatcher or get_llm_dispatcher()
         openai.api_base = get_config("OPENAI_API_BASE", "https://api.openai.com/v1")
 
     def get_source(self):
         return "openai"
 
+    def _estimate_tokens(self, messages, max_tokens):
+        if not self.dispatcher.limits_tokens(self.model):
+            return 0
+        try:
+            prompt_tokens = TokenCounter.count_message_tokens(messages, self.model)
+        except Exception:
+            prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+        return prompt_tokens + (max_tokens or 0)
+
+    @staticmethod
+    def _count_completion_tokens(content: str):
+        tokens = TokenCounter.count_content_tokens(content)
+        return tokens if tokens is not None else len(content) // 4
+
+    @staticmethod
+    def _retry_after(rate_limit_error):
+        headers = getattr(rate_limit_error, "headers", None) or {}
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _used_tokens(response):
+        usage = response.get("usage") if isinstance(response, dict) else None
+        return usage.get("total_tokens") if isinstance(usage, dict) else None
+
     def get_api_key(self):
         """
         Returns:
@@ -81,8 +112,9 @@ class OpenAi(BaseLlm):
         Returns:
             dict: The response.
         """
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
         try:
-            # openai.api_key = get_config("OPENAI_API_KEY")
+            self.dispatcher.acquire(self.api_key, self.model, estimated_tokens)
             response = openai.ChatCompletion.create(
                 n=self.number_of_results,
                 model=self.model,
@@ -91,12 +123,15 @@ class OpenAi(BaseLlm):
                 max_tokens=max_tokens,
                 top_p=self.top_p,
                 frequency_penalty=self.frequency_penalty,
-                presence_penalty=self.presence_penalty
+                presence_penalty=self.presence_penalty,
+                api_key=self.api_key
             )
+            self.dispatcher.record_usage(self.api_key, self.model, estimated_tokens, self._used_tokens(response))
             content = response.choices[0].message["content"]
             return {"response": response, "content": content}
         except RateLimitError as api_error:
             logger.info("OpenAi RateLimitError:", api_error)
+            self.dispatcher.penalize(self.api_key, self.model, self._retry_after(api_error))
             raise RateLimitError(str(api_error))
         except Timeout as timeout_error:
             logger.info("OpenAi Timeout:", timeout_error)
@@ -114,6 +149,107 @@ class OpenAi(BaseLlm):
             logger.info("OpenAi Exception:", exception)
             return {"error": "ERROR_OPENAI", "message": "Open ai exception: "+str(exception)}
 
+    @retry(
+        retry=(
+            retry_if_exception_type(RateLimitError) |
+            retry_if_exception_type(Timeout) |
+            retry_if_exception_type(TryAgain)
+        ),
+        stop=stop_after_attempt(MAX_RETRY_ATTEMPTS), # Maximum number of retry attempts
+        wait=wait_random_exponential(min=MIN_WAIT, max=MAX_WAIT),
+        before_sleep=lambda retry_state: logger.info(f"{retry_state.outcome.exception()} (attempt {retry_state.attempt_number})"),
+        retry_error_callback=custom_retry_error_callback
+    )
+    async def achat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the OpenAI chat completion API without blocking the event loop.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            dict: The response.
+        """
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
+        try:
+            await self.dispatcher.aacquire(self.api_key, self.model, estimated_tokens)
+            response = await openai.ChatCompletion.acreate(
+                n=self.number_of_results,
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                top_p=self.top_p,
+                frequency_penalty=self.frequency_penalty,
+                presence_penalty=self.presence_penalty,
+                api_key=self.api_key
+            )
+            self.dispatcher.record_usage(self.api_key, self.model, estimated_tokens, self._used_tokens(response))
+            content = response.choices[0].message["content"]
+            return {"response": response, "content": content}
+        except RateLimitError as api_error:
+            logger.info("OpenAi RateLimitError:", api_error)
+            self.dispatcher.penalize(self.api_key, self.model, self._retry_after(api_error))
+            raise
+        except (Timeout, TryAgain) as retryable_error:
+            logger.info("OpenAi retryable error:", retryable_error)
+            raise
+        except AuthenticationError as auth_error:
+            logger.info("OpenAi AuthenticationError:", auth_error)
+            return {"error": "ERROR_AUTHENTICATION", "message": "Authentication error please check the api keys: "+str(auth_error)}
+        except InvalidRequestError as invalid_request_error:
+            logger.info("OpenAi InvalidRequestError:", invalid_request_error)
+            return {"error": "ERROR_INVALID_REQUEST", "message": "Openai invalid request error: "+str(invalid_request_error)}
+        except Exception as exception:
+            logger.info("OpenAi Exception:", exception)
+            return {"error": "ERROR_OPENAI", "message": "Open ai exception: "+str(exception)}
+
+    def stream_chat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the OpenAI chat completion API in streaming mode. Errors are raised, callers fall back to
+        chat_completion to retry them.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Yields:
+            str: The content of the completion as it is generated.
+        """
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
+        self.dispatcher.acquire(self.api_key, self.model, estimated_tokens)
+        try:
+            chunks = openai.ChatCompletion.create(
+                n=self.number_of_results,
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                top_p=self.top_p,
+                frequency_penalty=self.frequency_penalty,
+                presence_penalty=self.presence_penalty,
+                api_key=self.api_key,
+                stream=True
+            )
+        except RateLimitError as api_error:
+            self.dispatcher.penalize(self.api_key, self.model, self._retry_after(api_error))
+            raise
+        completion = ""
+        try:
+            for chunk in chunks:
+                content = chunk["choices"][0].get("delta", {}).get("content")
+                if content:
+                    completion += content
+                    yield content
+        finally:
+            # streamed responses carry no usage, the tokens of the completion are counted as it was generated,
+            # including a stream the caller closed early
+            if estimated_tokens:
+                self.dispatcher.record_usage(self.api_key, self.model, estimated_tokens,
+                                             estimated_tokens - (max_tokens or 0) +
+                                             self._count_completion_tokens(completion))
+
     def verify_access_key(self):
         """
         Verify the access key is valid.
@@ -122,7 +258,7 @@ class OpenAi(BaseLlm):
             bool: True if the access key is valid, False otherwise.
         """
         try:
-            models = openai.Model.list()
+            models = openai.Model.list(api_key=self.api_key)
             return True
         except Exception as exception:
             logger.info("OpenAi Exception:", exception)
@@ -136,7 +272,7 @@ class OpenAi(BaseLlm):
             list: The models.
         """
         try:
-            models = openai.Model.list()
+            models = openai.Model.list(api_key=self.api_key)
             models = [model["id"] for model in models["data"]]
             models_supported = ['gpt-4', 'gpt-3.5-turbo', 'gpt-3.5-turbo-16k', 'gpt-4-32k']
             models = [model for model in models if model in models_supported]
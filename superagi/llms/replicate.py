@@ -1,9 +1,35 @@
-import os
-import requests
+import threading
+
 from superagi.config.config import get_config
+from superagi.helper.http_session import get_http_session, mount_http_adapters
 from superagi.lib.logger import logger
 from superagi.llms.base_llm import BaseLlm
 
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_replicate_client(api_key: str):
+    """
+    Return the Replicate client of the api key shared by the process, whose sessions keep the connections to the
+    api open across the predictions and polls, with the timeouts and pool sizes configured for replicate.
+
+    Args:
+        api_key (str): The Replicate API key.
+
+    Returns:
+        replicate.Client: The client.
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            import replicate
+            client = replicate.Client(api_token=api_key)
+            for session in (client.read_session, client.write_session):
+                mount_http_adapters(session, "replicate", session.get_adapter("https://").max_retries)
+            _clients[api_key] = client
+        return client
+
 
 class Replicate(BaseLlm):
     def __init__(self, api_key, model: str = None, version: str = None, max_length=1000, temperature=0.7,
@@ -69,9 +95,7 @@ class Replicate(BaseLlm):
         else:
             prompt = prompt + "\nResponse:"
         try:
-            os.environ["REPLICATE_API_TOKEN"] = self.api_key
-            import replicate
-            output_generator = replicate.run(
+            output_generator = get_replicate_client(self.api_key).run(
                 self.model + ":" + self.version,
                 input={"prompt": prompt, "max_length": 40000, "temperature": self.temperature,
                        "top_p": self.top_p}
@@ -103,7 +127,7 @@ class Replicate(BaseLlm):
             bool: True if the access key is valid, False otherwise.
         """
         headers = {"Authorization": "Token " + self.api_key}
-        response = requests.get("https://api.replicate.com/v1/collections", headers=headers)
+        response = get_http_session("replicate").get("https://api.replicate.com/v1/collections", headers=headers)
 
         # If the request is successful, status code will be 200
         if response.status_code == 200:
@@ -68,6 +68,21 @@ class Agent(DBBaseModel):
         agent = session.query(Agent).filter_by(id=agent_id).first()
         agent_configurations = session.query(AgentConfiguration).filter_by(
             agent_id=agent_id).all()
+        return cls.build_configuration(agent, agent_configurations)
+
+    @classmethod
+    def build_configuration(cls, agent, agent_configurations: list):
+        """
+        Builds the parsed configuration of an agent from its configuration rows.
+
+        Args:
+            agent (Agent): The agent.
+            agent_configurations (list): Rows having the key and value of the agent configurations.
+
+        Returns:
+            dict: Parsed agent configuration.
+
+        """
         parsed_config = {
             "agent_id": agent.id,
             "name": agent.name,
@@ -110,11 +125,13 @@ class Agent(DBBaseModel):
         if key in ["name", "description", "agent_type", "exit", "model", "permission_type", "LTM_DB",
                    "resource_summary", "knowledge"]:
             return value
-        elif key in ["project_id", "memory_window", "max_iterations", "iteration_interval"]:
+        elif key in ["project_id", "memory_window", "max_iterations", "iteration_interval", "llm_response_cache_ttl"]:
             return int(value)
+        elif key == "llm_response_cache":
+            return value == "True"
         elif key in ["goal", "constraints", "instruction", "is_deleted"]:
             return eval(value)
-        elif key == "tools":
+        elif key in ["tools", "hedge_models"]:
             return list(ast.literal_eval(value))
 
     @classmethod
@@ -169,6 +186,8 @@ class Agent(DBBaseModel):
             "max_iterations": agent_with_config.max_iterations,
             "user_timezone": agent_with_config.user_timezone,
             "knowledge": agent_with_config.knowledge,
+            "llm_response_cache": getattr(agent_with_config, "llm_response_cache", False),
+            "hedge_models": getattr(agent_with_config, "hedge_models", None) or [],
         }
 
         agent_configurations = [
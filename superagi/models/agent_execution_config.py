@@ -81,14 +81,28 @@ class AgentExecutionConfiguration(DBBaseModel):
         """
         agent_configurations = session.query(AgentExecutionConfiguration).filter_by(
             agent_execution_id=execution_id).all()
+        return cls.build_configuration(agent_configurations)
+
+    @classmethod
+    def build_configuration(cls, agent_execution_configurations: list):
+        """
+        Builds the parsed execution configuration from its configuration rows.
+
+        Args:
+            agent_execution_configurations (list): Rows having the key and value of the execution configurations.
+
+        Returns:
+            dict: Parsed agent execution configuration.
+
+        """
         parsed_config = {
             "goal": [],
             "instruction": [],
             "tools": []
         }
-        if not agent_configurations:
+        if not agent_execution_configurations:
             return parsed_config
-        for item in agent_configurations:
+        for item in agent_execution_configurations:
             parsed_config[item.key] = cls.eval_agent_config(item.key, item.value)
         return parsed_config
 
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, Text, String, asc
+from sqlalchemy import Column, Integer, Text, String, asc, event, func, inspect
 from sqlalchemy.orm import Session
 
+from superagi.helper.token_counter import TokenCounter
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.base_model import DBBaseModel
 
@@ -16,6 +17,7 @@ class AgentExecutionFeed(DBBaseModel):
         feed (str): The feed content.
         role (str): The role of the feed entry. Possible values: 'system', 'user', or 'assistant'.
         extra_info (str): Additional information related to the feed entry.
+        token_count (int): The number of tokens of the feed content, counted when the feed is stored or changed.
     """
 
     __tablename__ = 'agent_execution_feeds'
@@ -28,6 +30,7 @@ class AgentExecutionFeed(DBBaseModel):
     extra_info = Column(String)
     feed_group_id = Column(String)
     error_message = Column(String)
+    token_count = Column(Integer)
 
     def __repr__(self):
         """
@@ -57,7 +60,8 @@ class AgentExecutionFeed(DBBaseModel):
     @classmethod
     def fetch_agent_execution_feeds(cls, session, agent_execution_id: int):
         agent_execution = AgentExecution.find_by_id(session, agent_execution_id)
-        agent_feeds = session.query(AgentExecutionFeed.role, AgentExecutionFeed.feed, AgentExecutionFeed.id) \
+        agent_feeds = session.query(AgentExecutionFeed.role, AgentExecutionFeed.feed, AgentExecutionFeed.id,
+                                    AgentExecutionFeed.token_count) \
             .filter(AgentExecutionFeed.agent_execution_id == agent_execution_id,
                     AgentExecutionFeed.feed_group_id == agent_execution.current_feed_group_id) \
             .order_by(asc(AgentExecutionFeed.created_at)) \
@@ -67,3 +71,92 @@ class AgentExecutionFeed(DBBaseModel):
             return agent_feeds
         else:
             return agent_feeds[2:]
+
+    @classmethod
+    def fetch_feed_token_counts(cls, session, agent_execution_id: int, feed_group_id: str, after_feed_id: int = 0):
+        """
+        Fetch the ids and token counts of the feeds of a feed group, without their content.
+
+        Args:
+            session (Session): The database session.
+            agent_execution_id (int): The id of the agent execution.
+            feed_group_id (str): The feed group.
+            after_feed_id (int): Only the feeds stored after this one are fetched.
+
+        Returns:
+            list: The (id, token_count, updated_at) of the feeds, in the order of their ids.
+        """
+        feeds = session.query(AgentExecutionFeed.id, AgentExecutionFeed.token_count, AgentExecutionFeed.updated_at) \
+            .filter(AgentExecutionFeed.agent_execution_id == agent_execution_id,
+                    AgentExecutionFeed.feed_group_id == feed_group_id,
+                    AgentExecutionFeed.id > after_feed_id) \
+            .order_by(asc(AgentExecutionFeed.id)) \
+            .all()
+        uncounted_feed_ids = [feed.id for feed in feeds if feed.token_count is None]
+        counted_feeds = {}
+        if uncounted_feed_ids:
+            # feeds stored before the token counts were, the counts are committed with the step
+            for feed in session.query(AgentExecutionFeed).filter(AgentExecutionFeed.id.in_(uncounted_feed_ids)).all():
+                feed.token_count = TokenCounter.count_content_tokens(feed.feed) or 0
+                counted_feeds[feed.id] = feed
+            session.flush()
+        # the flush bumped the updated_at of the counted feeds
+        return [(feed.id, feed.token_count, feed.updated_at) if feed.token_count is not None else
+                (feed.id, counted_feeds[feed.id].token_count, counted_feeds[feed.id].updated_at) for feed in feeds]
+
+    @classmethod
+    def fetch_last_update(cls, session, agent_execution_id: int, feed_group_id: str, last_feed_id: int):
+        """
+        Fetch when the feeds of a feed group up to a given feed were last stored or changed.
+
+        Args:
+            session (Session): The database session.
+            agent_execution_id (int): The id of the agent execution.
+            feed_group_id (str): The feed group.
+            last_feed_id (int): The id of the last feed.
+
+        Returns:
+            datetime: The latest updated_at of the feeds.
+        """
+        return session.query(func.max(AgentExecutionFeed.updated_at)) \
+            .filter(AgentExecutionFeed.agent_execution_id == agent_execution_id,
+                    AgentExecutionFeed.feed_group_id == feed_group_id,
+                    AgentExecutionFeed.id <= last_feed_id) \
+            .scalar()
+
+    @classmethod
+    def fetch_feeds_between(cls, session, agent_execution_id: int, feed_group_id: str, first_feed_id: int,
+                            last_feed_id: int):
+        """
+        Fetch the feeds of a feed group from the first to the last given feed.
+
+        Args:
+            session (Session): The database session.
+            agent_execution_id (int): The id of the agent execution.
+            feed_group_id (str): The feed group.
+            first_feed_id (int): The id of the first feed.
+            last_feed_id (int): The id of the last feed.
+
+        Returns:
+            list: The role, feed, id and token_count of the feeds, in the order of their ids.
+        """
+        return session.query(AgentExecutionFeed.role, AgentExecutionFeed.feed, AgentExecutionFeed.id,
+                             AgentExecutionFeed.token_count) \
+            .filter(AgentExecutionFeed.agent_execution_id == agent_execution_id,
+                    AgentExecutionFeed.feed_group_id == feed_group_id,
+                    AgentExecutionFeed.id >= first_feed_id,
+                    AgentExecutionFeed.id <= last_feed_id) \
+            .order_by(asc(AgentExecutionFeed.id)) \
+            .all()
+
+
+@event.listens_for(AgentExecutionFeed, "before_insert")
+def count_feed_tokens(mapper, connection, target):
+    if target.token_count is None:
+        target.token_count = TokenCounter.count_content_tokens(target.feed)
+
+
+@event.listens_for(AgentExecutionFeed, "before_update")
+def recount_feed_tokens(mapper, connection, target):
+    if inspect(target).attrs.feed.history.has_changes():
+        target.token_count = TokenCounter.count_content_tokens(target.feed)
@@ -105,6 +105,21 @@ class Models(DBBaseModel):
             logging.error(f"Unexpected Error Occured: {e}")
             return {"error": "Unexpected Error Occured"}
 
+    @classmethod
+    def fetch_model_metadata(cls, session, organisation_id):
+        """
+        Fetch the name, token limit and context length of the models of an organisation.
+
+        Args:
+            session (Session): The database session.
+            organisation_id (int): The id of the organisation.
+
+        Returns:
+            list: The (model_name, token_limit, context_length) of the models.
+        """
+        return session.query(Models.model_name, Models.token_limit, Models.context_length) \
+            .filter(Models.org_id == organisation_id).all()
+
     @classmethod
     def store_model_details(cls, session, organisation_id, model_name, description, end_point, model_provider_id, token_limit, type, version, context_length):
         from superagi.models.models_config import ModelsConfig
@@ -13,10 +13,10 @@ from superagi.types.model_source_types import ModelSourceType
 class ResourceSummarizer:
     """Class to summarize a resource."""
 
-    def __init__(self, session, agent_id: int, model: str):
+    def __init__(self, session, agent_id: int, model: str, organisation_id: int = None):
         self.session = session
         self.agent_id = agent_id
-        self.organisation_id = self.__get_organisation_id()
+        self.organisation_id = organisation_id or self.__get_organisation_id()
         self.model = model
 
     def __get_organisation_id(self):
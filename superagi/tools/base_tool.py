@@ -1,3 +1,4 @@
+import threading
 from abc import abstractmethod
 from functools import wraps
 from inspect import signature
@@ -59,6 +60,25 @@ def create_function_schema(
     )
 
 
+_function_schemas = {}
+_function_schemas_lock = threading.Lock()
+
+
+def get_function_schema_properties(tool) -> dict:
+    """
+    Return the properties of the schema inferred from the execute signature of a tool without args schema. The
+    schema is created once per tool class and name, a tool class imported again after an update is a new key.
+    """
+    key = (type(tool), tool.name)
+    properties = _function_schemas.get(key)
+    if properties is None:
+        args_schema = create_function_schema(f"{tool.name}Schema", tool.execute)
+        properties = args_schema.schema()["properties"]
+        with _function_schemas_lock:
+            _function_schemas[key] = properties
+    return properties
+
+
 class BaseToolkitConfiguration:
 
     def __init__(self):
@@ -88,9 +108,7 @@ class BaseTool(BaseModel):
         if self.args_schema is not None:
             return self.args_schema.schema()["properties"]
         else:
-            name = self.name
-            args_schema = create_function_schema(f"{name}Schema", self.execute)
-            return args_schema.schema()["properties"]
+            return get_function_schema_properties(self)
 
     @abstractmethod
     def _execute(self, *args: Any, **kwargs: Any):
@@ -164,9 +182,7 @@ class FunctionalTool(BaseTool):
         if self.args_schema is not None:
             return self.args_schema.schema()["properties"]
         else:
-            name = self.name
-            args_schema = create_function_schema(f"{name}Schema", self.execute)
-            return args_schema.schema()["properties"]
+            return get_function_schema_properties(self)
 
     def _execute(self, *args: Any, **kwargs: Any):
         return self.func(*args, kwargs)
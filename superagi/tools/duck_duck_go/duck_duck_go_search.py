@@ -7,7 +7,7 @@ from superagi.lib.logger import logger
 from pydantic import BaseModel, Field
 from duckduckgo_search import DDGS
 from itertools import islice
-from superagi.helper.token_counter import TokenCounter
+from superagi.helper.token_budget import TokenBudget
 from superagi.llms.base_llm import BaseLlm
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.agent_execution_feed import AgentExecutionFeed
@@ -91,12 +91,15 @@ class DuckDuckGoSearchTool(BaseTool):
 
         results=[]                                                                          #array to store objects with keys :{"title":snippet , "body":webpage content, "links":link URL}
         i = 0
-        
+        # every result is counted once, with the separator of the json list
+        results_budget = TokenBudget.for_text(3000, tokens_per_item=1)
+
         for webpage in webpages:
             results.append({"title": search_results[i]["title"], "body": webpage, "links": search_results[i]["href"]})
             i += 1
-            if TokenCounter.count_text_tokens(json.dumps(results)) > 3000:
-                break    
+            results_budget.add(json.dumps(results[-1]))
+            if results_budget.exceeded:
+                break
 
         return results
 
@@ -6,7 +6,7 @@ from pydantic import BaseModel, Field
 
 from superagi.helper.imap_email import ImapEmail
 from superagi.helper.read_email import ReadEmail
-from superagi.helper.token_counter import TokenCounter
+from superagi.helper.token_budget import TokenBudget
 from superagi.tools.base_tool import BaseTool
 
 
@@ -53,13 +53,16 @@ class ReadEmailTool(BaseTool):
         status, messages = conn.select("INBOX")
         num_of_messages = int(messages[0])
         messages = []
+        # every email is counted once, with the separator of the json list
+        messages_budget = TokenBudget.for_text(self.max_token_limit, tokens_per_item=1)
         for i in range(num_of_messages, num_of_messages - limit, -1):
             res, msg = conn.fetch(str(i), "(RFC822)")
             email_msg = {}
             for response in msg:
                 self._process_message(email_msg, response)
             messages.append(email_msg)
-            if TokenCounter.count_text_tokens(json.dumps(messages)) > self.max_token_limit:
+            messages_budget.add(json.dumps(email_msg))
+            if messages_budget.exceeded:
                 break
 
         conn.logout()
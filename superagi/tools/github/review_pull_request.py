@@ -7,6 +7,7 @@ from superagi.helper.error_handler import ErrorHandler
 from superagi.helper.github_helper import GithubHelper
 from superagi.helper.json_cleaner import JsonCleaner
 from superagi.helper.prompt_reader import PromptReader
+from superagi.helper.token_budget import TokenBudget
 from superagi.helper.token_counter import TokenCounter
 from superagi.llms.base_llm import BaseLlm
 from superagi.models.agent import Agent
@@ -109,16 +110,17 @@ class GithubReviewPullRequest(BaseTool):
     def split_pull_request_content_into_multiple_parts(self, model_token_limit: int, pull_request_arr):
         pull_request_arr_parts = []
         current_part = ""
+        # we are using 60% of the model token limit
+        part_budget = TokenBudget.for_message(model_token_limit * 0.6, self.llm.get_model())
         for part in pull_request_arr:
-            total_tokens = TokenCounter.count_message_tokens([{"role": "user", "content": current_part}],
-                                                             self.llm.get_model())
-            # we are using 60% of the model token limit
-            if total_tokens >= model_token_limit * 0.6:
+            if part_budget.total >= part_budget.token_limit:
                 # Add the current part to pull_request_arr_parts and reset current_sum and current_part
                 pull_request_arr_parts.append(current_part)
                 current_part = "diff --git" + part
+                part_budget.reset()
             else:
                 current_part += "diff --git" + part
+            part_budget.add("diff --git" + part)
 
         pull_request_arr_parts.append(current_part)
         return pull_request_arr_parts
@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class LlmTaskType(Enum):
+    OUTPUT_INSTRUCTION = 'output_instruction'
+    LTM_SUMMARY = 'ltm_summary'
+    TOOL = 'tool'
+
+    @classmethod
+    def get_llm_task_type(cls, task):
+        if task is None:
+            raise ValueError("Llm task type cannot be None.")
+        task = task.upper()
+        if task in cls.__members__:
+            return cls[task]
+        raise ValueError(f"{task} is not a valid llm task type.")
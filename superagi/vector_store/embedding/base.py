@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 
 
@@ -6,3 +7,6 @@ class BaseEmbedding(ABC):
     @abstractmethod
     def get_embedding(self, text):
         pass
+
+    async def get_embedding_async(self, text):
+        return await asyncio.to_thread(self.get_embedding, text)
@@ -1,8 +1,10 @@
 import openai
 import google.generativeai as palm
 
+from superagi.vector_store.embedding.base import BaseEmbedding
 
-class PalmEmbedding:
+
+class PalmEmbedding(BaseEmbedding):
     def __init__(self, api_key, model="models/embedding-gecko-001"):
         self.model = model
         self.api_key = api_key
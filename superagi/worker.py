@@ -8,7 +8,9 @@ from superagi.lib.logger import logger
 
 from datetime import timedelta
 from celery import Celery
+from celery.signals import worker_process_init
 
+from superagi.agent.agent_prompt_template import AgentPromptTemplate
 from superagi.config.config import get_config
 from superagi.helper.agent_schedule_helper import AgentScheduleHelper
 from superagi.models.configuration import Configuration
@@ -19,6 +21,7 @@ from superagi.types.model_source_types import ModelSourceType
 from sqlalchemy import event
 from superagi.models.agent_execution import AgentExecution
 from superagi.helper.webhook_manager import WebHookManager
+from superagi.jobs.execution_scheduler import get_scheduler, is_fair_share_enabled
 
 redis_url = get_config('REDIS_URL', 'super__redis:6379')
 
@@ -39,8 +42,27 @@ beat_schedule = {
         'schedule': timedelta(minutes=2),
     },
 }
+if is_fair_share_enabled() and get_config("AGENT_EXECUTION_RUNNER", "celery") == "async":
+    # the async runner drives an execution past the end of its task, it would hold its slot until the lease ran out
+    raise ValueError('AGENT_EXECUTION_SCHEDULER "fair_share" can not be used with AGENT_EXECUTION_RUNNER "async"')
+if is_fair_share_enabled():
+    beat_schedule['dispatch_agent_executions'] = {
+        'task': 'dispatch_agent_executions',
+        'schedule': timedelta(seconds=2),
+    }
+if get_config("AGENT_EXECUTION_RUNNER", "celery") == "async":
+    beat_schedule['requeue_orphaned_executions'] = {
+        'task': 'requeue_orphaned_executions',
+        'schedule': timedelta(minutes=1),
+    }
 app.conf.beat_schedule = beat_schedule
 
+@worker_process_init.connect
+def load_prompt_templates(**kwargs):
+    """Parse the agent prompts once per worker process, failing fast on a prompt that does not match its variables."""
+    AgentPromptTemplate.validate_prompts()
+
+
 @event.listens_for(AgentExecution.status, "set")
 def agent_status_change(target, val,old_val,initiator):
     if not hasattr(sys, '_called_from_test'):
@@ -69,7 +91,32 @@ def execute_agent(agent_execution_id: int, time):
     from superagi.jobs.agent_executor import AgentExecutor
     handle_tools_import()
     logger.info("Execute agent:" + str(time) + "," + str(agent_execution_id))
-    AgentExecutor().execute_next_step(agent_execution_id=agent_execution_id)
+    if get_config("AGENT_EXECUTION_RUNNER", "celery") == "async":
+        from superagi.jobs.async_agent_runner import AsyncAgentRunner
+        AsyncAgentRunner.get_instance().submit(agent_execution_id)
+        return
+    if not is_fair_share_enabled():
+        AgentExecutor().execute_next_step(agent_execution_id=agent_execution_id)
+        return
+    try:
+        AgentExecutor().execute_next_step(agent_execution_id=agent_execution_id)
+    finally:
+        scheduler = get_scheduler()
+        scheduler.release(agent_execution_id)
+        scheduler.dispatch()
+
+
+@app.task(name="requeue_orphaned_executions")
+def requeue_orphaned_executions():
+    """Queue again the executions handed to an async runner that stopped renewing their lease."""
+    from superagi.jobs.async_agent_runner import requeue_orphaned_executions
+    requeue_orphaned_executions()
+
+
+@app.task(name="dispatch_agent_executions")
+def dispatch_agent_executions():
+    """Dispatch the scheduled agent executions that became ready or whose slot was freed."""
+    get_scheduler().dispatch()
 
 
 @app.task(name="summarize_resource", autoretry_for=(Exception,), retry_backoff=2, max_retries=5,serializer='pickle')
@@ -103,6 +150,22 @@ def summarize_resource(agent_id: int, resource_id: int):
                                                                documents=documents)
     session.close()
 
+@app.task(name="summarize_ltm", autoretry_for=(Exception,), retry_backoff=2, max_retries=2)
+def summarize_ltm(agent_execution_id: int, feed_group_id: str, first_feed_id: int, last_feed_id: int,
+                  output_token_limit: int):
+    """Summarize the oldest feeds of an agent execution in background."""
+    from superagi.agent.ltm_summarizer import refresh_ltm_summary
+
+    engine = connect_db()
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        refresh_ltm_summary(session, agent_execution_id, feed_group_id, first_feed_id, last_feed_id,
+                            output_token_limit)
+    finally:
+        session.close()
+
+
 @app.task(name="webhook_callback", autoretry_for=(Exception,), retry_backoff=2, max_retries=5,serializer='pickle')
 def webhook_callback(agent_execution_id,val,old_val):
     engine = connect_db()
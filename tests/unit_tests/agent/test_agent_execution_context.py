@@ -0,0 +1,72 @@
+from collections import namedtuple
+from unittest.mock import MagicMock, patch
+
+from superagi.agent.agent_execution_context import AgentExecutionContext
+from superagi.models.agent import Agent
+from superagi.models.agent_config import AgentConfiguration
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_config import AgentExecutionConfiguration
+from superagi.models.organisation import Organisation
+
+ConfigurationRow = namedtuple("ConfigurationRow", ["source", "key", "value"])
+
+
+def test_lazy_context_fetches_every_object_once():
+    session = MagicMock()
+    agent_config = {"agent_id": 1, "model": "gpt-4"}
+    with patch.object(Agent, 'fetch_configuration', return_value=agent_config) as fetch_configuration, \
+            patch.object(Agent, 'find_org_by_agent_id', return_value=Organisation(id=3)) as find_org, \
+            patch.object(AgentExecutionConfiguration, 'fetch_configuration', return_value={"goal": []}) as fetch_execution_config, \
+            patch.object(AgentConfiguration, 'get_model_api_key',
+                         return_value={"provider": "OpenAI", "api_key": "key"}) as get_model_api_key:
+        context = AgentExecutionContext(session, 1, 2)
+        for _ in range(3):
+            assert context.agent_config == agent_config
+            assert context.organisation.id == 3
+            assert context.agent_execution_config == {"goal": []}
+            assert context.model_api_key == "key"
+            assert context.model_provider == "OpenAI"
+
+    fetch_configuration.assert_called_once_with(session, 1)
+    find_org.assert_called_once()
+    fetch_execution_config.assert_called_once_with(session, 2)
+    get_model_api_key.assert_called_once_with(session, 1, "gpt-4")
+
+
+def test_load_returns_none_for_unknown_execution():
+    session = MagicMock()
+    session.query.return_value.join.return_value.join.return_value.join.return_value.outerjoin.return_value \
+        .outerjoin.return_value.outerjoin.return_value.filter.return_value.first.return_value = None
+
+    assert AgentExecutionContext.load(session, 1) is None
+
+
+def test_load_builds_context_from_joined_row():
+    session = MagicMock()
+    agent = Agent(id=1, name="agent", project_id=1, description="", is_deleted=False)
+    agent_execution = AgentExecution(id=2, agent_id=1, status="RUNNING")
+    organisation = Organisation(id=3)
+    session.query.return_value.join.return_value.join.return_value.join.return_value.outerjoin.return_value \
+        .outerjoin.return_value.outerjoin.return_value.filter.return_value.first.return_value = \
+        (agent_execution, agent, organisation, "Local LLM", "EMPTY")
+    session.query.return_value.filter.return_value.union_all.return_value.all.return_value = [
+        ConfigurationRow("agent", "model", "llama"),
+        ConfigurationRow("agent", "max_iterations", "25"),
+        ConfigurationRow("execution", "goal", "['goal']"),
+        ConfigurationRow("execution", "tools", "[1, 2]"),
+    ]
+
+    with patch.object(Agent, 'fetch_configuration') as fetch_configuration, \
+            patch.object(AgentConfiguration, 'get_model_api_key') as get_model_api_key:
+        context = AgentExecutionContext.load(session, 2)
+        assert context.agent_execution is agent_execution
+        assert context.organisation is organisation
+        assert context.agent_config["model"] == "llama"
+        assert context.agent_config["max_iterations"] == 25
+        assert context.agent_execution_config["goal"] == ["goal"]
+        assert context.agent_execution_config["tools"] == [1, 2]
+        assert context.model_api_key == "EMPTY"
+        assert context.model_provider == "Local LLM"
+
+    fetch_configuration.assert_not_called()
+    get_model_api_key.assert_not_called()
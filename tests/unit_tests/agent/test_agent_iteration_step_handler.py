@@ -116,7 +116,7 @@ def test_handle_wait_for_permission(test_handler, mocker):
 
     mock_tool_output = mocker.MagicMock()
     mock_tool_output.result = "Test result"
-    ToolOutputHandler.handle_tool_response = Mock(return_value=mock_tool_output)
+    mocker.patch.object(ToolOutputHandler, 'handle_tool_response', return_value=mock_tool_output)
 
     # Act
     result = test_handler._handle_wait_for_permission(
@@ -2,7 +2,9 @@ import pytest
 from unittest.mock import patch, Mock
 
 from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+from superagi.helper.prompt_template import PromptTemplate
 from superagi.models.agent_execution_feed import AgentExecutionFeed
+from superagi.types.llm_task_types import LlmTaskType
 
 
 @patch('superagi.helper.token_counter.TokenCounter.token_limit')
@@ -77,8 +79,8 @@ def test_build_ltm_summary(mock_token_limit, mock_count_text_tokens, mock_build_
     llm.chat_completion.assert_called_once_with([{"role": "system", "content": "You are GPT Prompt writer"},
                                                  {"role": "assistant", "content": "ltm_summary_prompt"}])
 
-@patch('superagi.helper.prompt_reader.PromptReader.read_agent_prompt')
-def test_build_prompt_for_ltm_summary(mock_read_agent_prompt):
+@patch('superagi.helper.prompt_template.PromptTemplateRegistry.load')
+def test_build_prompt_for_ltm_summary(mock_load):
     mock_session = Mock()
     llm = Mock()
     llm_model = Mock()
@@ -90,7 +92,7 @@ def test_build_prompt_for_ltm_summary(mock_read_agent_prompt):
     past_messages = [{"role": "user", "content": "Hello"}, {"role": "assistant", "content": "Hi"}]
     token_limit = 100
 
-    mock_read_agent_prompt.return_value = "{past_messages}\n{char_limit}"
+    mock_load.return_value = PromptTemplate("{past_messages}\n{char_limit}")
 
     prompt = builder._build_prompt_for_ltm_summary(past_messages, token_limit)
 
@@ -98,8 +100,8 @@ def test_build_prompt_for_ltm_summary(mock_read_agent_prompt):
     assert "400" in prompt
 
 
-@patch('superagi.helper.prompt_reader.PromptReader.read_agent_prompt')
-def test_build_prompt_for_recursive_ltm_summary_using_previous_ltm_summary(mock_read_agent_prompt):
+@patch('superagi.helper.prompt_template.PromptTemplateRegistry.load')
+def test_build_prompt_for_recursive_ltm_summary_using_previous_ltm_summary(mock_load):
     mock_session = Mock()
     llm = Mock()
     llm_model = Mock()
@@ -112,10 +114,38 @@ def test_build_prompt_for_recursive_ltm_summary_using_previous_ltm_summary(mock_
     past_messages = [{"role": "user", "content": "Hello"}, {"role": "assistant", "content": "Hi"}]
     token_limit = 100
 
-    mock_read_agent_prompt.return_value = "{previous_ltm_summary}\n{past_messages}\n{char_limit}"
+    mock_load.return_value = PromptTemplate("{previous_ltm_summary}\n{past_messages}\n{char_limit}")
 
     prompt = builder._build_prompt_for_recursive_ltm_summary_using_previous_ltm_summary(previous_ltm_summary, past_messages, token_limit)
 
     assert "Summary" in prompt
     assert "user: Hello\nassistant: Hi\n" in prompt
     assert "400" in prompt
+
+
+@patch('superagi.models.agent_execution_config.AgentExecutionConfiguration.fetch_value')
+@patch('superagi.models.agent_execution_config.AgentExecutionConfiguration.add_or_update_agent_execution_config')
+@patch('superagi.agent.agent_message_builder.AgentLlmMessageBuilder._build_prompt_for_ltm_summary')
+@patch('superagi.helper.token_counter.TokenCounter.count_text_tokens')
+@patch('superagi.helper.token_counter.TokenCounter.token_limit')
+@patch('superagi.agent.agent_message_builder.route_llm')
+def test_build_ltm_summary_with_routed_model(mock_route_llm, mock_token_limit, mock_count_text_tokens,
+                                             mock_build_prompt_for_ltm_summary,
+                                             mock_add_or_update_agent_execution_config, mock_fetch_value):
+    llm = Mock()
+    summary_llm = Mock(routed=True)
+    summary_llm.get_model.return_value = "gpt-3.5-turbo"
+    summary_llm.chat_completion.return_value = {"content": "ltm_summary"}
+    mock_route_llm.return_value = summary_llm
+    mock_token_limit.return_value = 4096
+    mock_count_text_tokens.return_value = 200
+    mock_build_prompt_for_ltm_summary.return_value = "ltm_summary_prompt"
+    mock_fetch_value.return_value = Mock(value="ltm_summary")
+    builder = AgentLlmMessageBuilder(Mock(), llm, "gpt-4", 1, 1, organisation=Mock(id=1))
+
+    assert builder._build_ltm_summary([{"role": "user", "content": "Hello"}], 100) == "ltm_summary"
+
+    mock_route_llm.assert_called_once_with(builder.session, 1, LlmTaskType.LTM_SUMMARY, llm)
+    mock_token_limit.assert_called_once_with("gpt-3.5-turbo")
+    summary_llm.chat_completion.assert_called_once()
+    llm.chat_completion.assert_not_called()
@@ -2,7 +2,7 @@ from unittest.mock import Mock
 from unittest.mock import patch
 
 from superagi.agent.agent_prompt_builder import AgentPromptBuilder
-from superagi.tools.base_tool import BaseTool
+from superagi.tools.base_tool import BaseTool, create_function_schema
 
 
 def test_add_list_items_to_string():
@@ -82,4 +82,69 @@ def test_replace_task_based_variables(mock_count_message_tokens):
     assert "task3" in result
     assert "task3" in result
     assert "response1" in result
-    assert "response2" in result
\ No newline at end of file
+    assert "response2" in result
+
+@patch('superagi.agent.agent_prompt_builder.TokenCounter.count_message_tokens', return_value=50)
+@patch('superagi.agent.agent_prompt_builder.AgentPromptBuilder.count_tools_tokens', return_value=30)
+@patch('superagi.agent.agent_prompt_builder.AgentPromptBuilder.add_tools_to_prompt', return_value='tools_str')
+def test_replace_task_based_variables_fills_template_of_main_variables(mock_add_tools_to_prompt,
+                                                                       mock_count_tools_tokens,
+                                                                       mock_count_message_tokens):
+    super_agi_prompt = "{goals} {constraints} {tools} {current_task} {task_history}"
+    prompt = AgentPromptBuilder.replace_main_variables(super_agi_prompt, ["reply with {current_task}"], [],
+                                                       ["constraint1"], [])
+
+    with patch('superagi.agent.agent_prompt_builder.get_prompt_registry') as mock_get_prompt_registry:
+        result = AgentPromptBuilder.replace_task_based_variables(prompt, "task1", "", "", [], [], 2000)
+
+    mock_get_prompt_registry.assert_not_called()
+    # the tools are counted from their token count instead of being tokenized with the prompt
+    mock_count_message_tokens.assert_any_call(
+        [{"role": "user", "content": "1. reply with {current_task}\n 1. constraint1\n  task1 {task_history}"}])
+    assert result == "1. reply with {current_task}\n 1. constraint1\n tools_str task1 \n\n"
+
+
+class WeatherTool(BaseTool):
+    name: str = "Weather"
+    description: str = "Get the weather of a city"
+
+    def _execute(self, city: str, days: int = 1):
+        return "sunny"
+
+
+@patch('superagi.agent.agent_prompt_builder.TokenCounter.count_text_tokens', return_value=20)
+@patch('superagi.agent.agent_prompt_builder.AgentPromptBuilder._generate_tool_string',
+       side_effect=lambda tool: '"' + tool.name + '": ' + tool.description)
+def test_tool_schema_rendered_once(mock_generate_tool_string, mock_count_text_tokens):
+    tools = [WeatherTool(), WeatherTool()]
+
+    for _ in range(3):
+        AgentPromptBuilder.add_tools_to_prompt(tools)
+    tools_token_count = AgentPromptBuilder.count_tools_tokens(tools, add_finish=False)
+    AgentPromptBuilder.count_tools_tokens(tools, add_finish=False)
+
+    mock_generate_tool_string.assert_called_once()
+    mock_count_text_tokens.assert_called_once_with('"Weather": Get the weather of a city')
+    assert tools_token_count == 46
+
+
+@patch('superagi.agent.agent_prompt_builder.AgentPromptBuilder._generate_tool_string',
+       side_effect=lambda tool: '"' + tool.name + '": ' + tool.description)
+def test_tool_schema_rendered_again_for_new_description(mock_generate_tool_string):
+    tool = WeatherTool(description="Get the weather forecast")
+    AgentPromptBuilder.get_tool_schema(tool)
+    tool.description = "Get the weather forecast of a city"
+
+    assert AgentPromptBuilder.get_tool_schema(tool).text == '"Weather": Get the weather forecast of a city'
+    assert mock_generate_tool_string.call_count == 2
+
+
+@patch('superagi.tools.base_tool.create_function_schema', wraps=create_function_schema)
+def test_function_schema_created_once_per_tool_class(mock_create_function_schema):
+    class ForecastTool(WeatherTool):
+        name: str = "Forecast"
+
+    assert list(ForecastTool().args) == ["tool_input", "kwargs"]
+    assert ForecastTool().args == ForecastTool().args
+
+    mock_create_function_schema.assert_called_once()
@@ -3,6 +3,14 @@ from unittest.mock import patch, mock_open
 
 from superagi.agent.agent_prompt_template import AgentPromptTemplate
 from superagi.helper.prompt_reader import PromptReader
+from superagi.helper.prompt_template import PromptTemplateError, PromptTemplateRegistry
+
+
+@pytest.fixture(autouse=True)
+def prompt_registry():
+    # the prompt files are read once per registry
+    with patch('superagi.helper.prompt_reader.get_prompt_registry', return_value=PromptTemplateRegistry()):
+        yield
 
 
 @patch("builtins.open", new_callable=mock_open, read_data="test_prompt")
@@ -35,3 +43,20 @@ def test_prioritize_tasks(mock_file):
     expected_result = {"prompt": "test_prompt", "variables": ["goals", "instructions", "last_task", "last_task_result", "pending_tasks"]}
     result = AgentPromptTemplate.prioritize_tasks()
     assert result == expected_result
+
+
+@patch("builtins.open", new_callable=mock_open, read_data="Use at most {max_tool_calls} tools")
+def test_multi_tool_calls(mock_file):
+    assert AgentPromptTemplate.multi_tool_calls(3) == "Use at most 3 tools"
+
+
+def test_validate_prompts():
+    with patch('superagi.agent.agent_prompt_template.get_prompt_registry', return_value=PromptTemplateRegistry()):
+        AgentPromptTemplate.validate_prompts()
+
+
+@patch("builtins.open", new_callable=mock_open, read_data="{goals} {tool_name} {tool_schema}")
+def test_validate_prompts_reports_unfilled_placeholder(mock_file):
+    with patch('superagi.agent.agent_prompt_template.get_prompt_registry', return_value=PromptTemplateRegistry()), \
+            pytest.raises(PromptTemplateError):
+        AgentPromptTemplate.validate_prompts()
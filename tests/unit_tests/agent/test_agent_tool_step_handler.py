@@ -7,6 +7,7 @@ from superagi.agent.agent_tool_step_handler import AgentToolStepHandler
 from superagi.agent.common_types import ToolExecutorResponse
 from superagi.agent.output_handler import ToolOutputHandler
 from superagi.agent.tool_builder import ToolBuilder
+from superagi.helper.prompt_template import PromptTemplate
 from superagi.helper.token_counter import TokenCounter
 from superagi.models.agent import Agent
 from superagi.models.agent_config import AgentConfiguration
@@ -175,6 +176,39 @@ def test_process_output_instruction(handler):
         assert result == mock_response['content']
 
 
+def test_process_output_instruction_resumes_from_checkpoint(handler):
+    step_tool = AgentWorkflowStepTool()
+    workflow_step = AgentWorkflowStep(id=5)
+
+    with patch.object(handler, '_build_tool_output_prompt', return_value="prompt"), \
+            patch.object(TokenCounter, 'count_message_tokens', return_value=10), \
+            patch.object(TokenCounter, 'token_limit', return_value=100), \
+            patch.object(AgentExecution, 'update_tokens'), \
+            patch('superagi.agent.agent_tool_step_handler.StepCheckpoint') as mock_step_checkpoint:
+        mock_step_checkpoint.return_value.get.return_value = {"content": "'checkpointed'"}
+
+        result = handler._process_output_instruction("final_response", step_tool, workflow_step)
+
+    assert result == "checkpointed"
+    handler.llm.chat_completion.assert_not_called()
+    mock_step_checkpoint.assert_called_once_with(1, "5:output", [{"role": "system", "content": "prompt"}])
+
+
+def test_process_output_instruction_checkpoints_response(handler):
+    with patch.object(handler, '_build_tool_output_prompt', return_value="prompt"), \
+            patch.object(TokenCounter, 'count_message_tokens', return_value=10), \
+            patch.object(TokenCounter, 'token_limit', return_value=100), \
+            patch.object(handler.llm, 'chat_completion', return_value={"content": "reply"}), \
+            patch.object(AgentExecution, 'update_tokens'), \
+            patch('superagi.agent.agent_tool_step_handler.StepCheckpoint') as mock_step_checkpoint:
+        mock_step_checkpoint.return_value.get.return_value = None
+
+        handler._process_output_instruction("final_response", AgentWorkflowStepTool(), AgentWorkflowStep(id=5))
+
+    mock_step_checkpoint.return_value.save.assert_called_once_with({"content": "reply"})
+    assert handler._step_checkpoints == [mock_step_checkpoint.return_value]
+
+
 def test_build_tool_input_prompt(handler):
     # Arrange
     step_tool = AgentWorkflowStepTool()
@@ -187,7 +221,8 @@ def test_build_tool_input_prompt(handler):
     agent_execution_config = {"goal": ["Goal1", "Goal2"]}
     mock_prompt = "{goals}{tool_name}{instruction}{tool_schema}"
 
-    with patch('superagi.agent.agent_tool_step_handler.PromptReader.read_agent_prompt', return_value=mock_prompt), \
+    with patch('superagi.helper.prompt_template.PromptTemplateRegistry.load',
+               return_value=PromptTemplate(mock_prompt)), \
             patch('superagi.agent.agent_tool_step_handler.AgentPromptBuilder.add_list_items_to_string', return_value="Goal1, Goal2"):
         # Act
         result = handler._build_tool_input_prompt(step_tool, tool, agent_execution_config)
@@ -213,7 +248,8 @@ def test_build_tool_output_prompt(handler):
     mock_prompt = "{tool_output}{tool_name}{instruction}{output_options}"
     step_responses = ["option1", "option2", "default"]
 
-    with patch('superagi.agent.agent_tool_step_handler.PromptReader.read_agent_prompt', return_value=mock_prompt), \
+    with patch('superagi.helper.prompt_template.PromptTemplateRegistry.load',
+               return_value=PromptTemplate(mock_prompt)), \
             patch.object(handler, '_get_step_responses', return_value=step_responses):
         # Act
         result = handler._build_tool_output_prompt(step_tool, tool_output, workflow_step)
@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock
+
+from superagi.agent.completion_streamer import CompletionStreamer, JsonObjectTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _stream(chunks, clock=None):
+    for chunk in chunks:
+        if clock is not None:
+            clock.now += 0.2
+        yield chunk
+
+
+def test_json_object_tracker_finds_end_of_object():
+    tracker = JsonObjectTracker()
+    reply = 'Sure: {"thoughts": {"text": "a } and \\" inside"}, "tool": {"name": "Search"}} trailing'
+
+    assert tracker.feed(reply[:20]) is None
+    end = tracker.feed(reply[20:])
+
+    assert reply[:end] == 'Sure: {"thoughts": {"text": "a } and \\" inside"}, "tool": {"name": "Search"}}'
+
+
+def test_json_object_tracker_finds_end_of_array():
+    tracker = JsonObjectTracker()
+
+    end = tracker.feed('["task 1", "task [2]"]\n\nmore')
+
+    assert end == len('["task 1", "task [2]"]')
+
+
+def test_complete_publishes_throttled_partial_feeds():
+    clock = FakeClock()
+    llm = MagicMock()
+    llm.stream_chat_completion.return_value = _stream(["a", "b", "c", "d", "e", "f"], clock)
+    partial_feed = MagicMock()
+
+    response = CompletionStreamer(llm, partial_feed=partial_feed, interval=0.5, clock=clock) \
+        .complete([{"role": "user", "content": "hi"}], 100)
+
+    assert response == {"content": "abcdef"}
+    published = [call.args[0] for call in partial_feed.update.call_args_list]
+    assert published == ["a", "abcd", "abcdef"]
+    llm.chat_completion.assert_not_called()
+
+
+def test_complete_stops_when_json_reply_closes():
+    llm = MagicMock()
+    stream = _stream(['{"tool": ', '{"name": "x"}', '}', ' and more'])
+    llm.stream_chat_completion.return_value = stream
+
+    response = CompletionStreamer(llm, stop_at_json_end=True).complete([], 100)
+
+    assert response == {"content": '{"tool": {"name": "x"}}'}
+    # the stream was closed instead of generating the rest of the reply
+    assert stream.gi_frame is None
+
+
+def test_complete_falls_back_to_chat_completion():
+    llm = MagicMock()
+    llm.stream_chat_completion.side_effect = NotImplementedError()
+    llm.chat_completion.return_value = {"content": "full reply"}
+
+    response = CompletionStreamer(llm).complete([], 100)
+
+    assert response == {"content": "full reply"}
+    llm.chat_completion.assert_called_once_with([], 100)
+
+
+def test_complete_retries_with_chat_completion_when_stream_breaks():
+    def broken_stream():
+        yield "partial"
+        raise ConnectionError("connection reset")
+
+    llm = MagicMock()
+    llm.stream_chat_completion.return_value = broken_stream()
+    llm.chat_completion.return_value = {"content": "full reply"}
+
+    response = CompletionStreamer(llm).complete([], 100)
+
+    assert response == {"content": "full reply"}
+    llm.chat_completion.assert_called_once_with([], 100)
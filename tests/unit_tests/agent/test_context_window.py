@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+from superagi.agent.context_window import ContextWindow
+from superagi.models.agent_execution_feed import AgentExecutionFeed
+
+
+def _updated_at(feed_id):
+    return datetime(2026, 1, 1) + timedelta(seconds=feed_id)
+
+
+def _feeds(token_counts, first_id=1):
+    return [(first_id + i, token_count, _updated_at(first_id + i)) for i, token_count in enumerate(token_counts)]
+
+
+def _last_update(session, agent_execution_id, feed_group_id, last_feed_id):
+    return _updated_at(last_feed_id)
+
+
+@patch('superagi.agent.context_window.AgentExecutionFeed')
+def test_sync_only_reads_new_feeds(mock_feed):
+    mock_feed.fetch_last_update.side_effect = _last_update
+    context_window = ContextWindow(1)
+    mock_feed.fetch_feed_token_counts.return_value = _feeds([100, 200, 10, 20])
+    context_window.sync(Mock(), "DEFAULT")
+
+    mock_feed.fetch_feed_token_counts.return_value = _feeds([30], first_id=5)
+    context_window.sync(Mock(), "DEFAULT")
+
+    assert mock_feed.fetch_feed_token_counts.call_args.args[1:] == (1, "DEFAULT", 4)
+    # the two prompt feeds of the default feed group are not part of the history
+    assert context_window.feed_ids == [3, 4, 5]
+    assert context_window.prefix_tokens == [0, 10, 30, 60]
+
+
+@patch('superagi.agent.context_window.AgentExecutionFeed')
+def test_sync_starts_over_on_new_feed_group(mock_feed):
+    context_window = ContextWindow(1)
+    mock_feed.fetch_feed_token_counts.return_value = _feeds([100, 200, 10])
+    context_window.sync(Mock(), "DEFAULT")
+
+    mock_feed.fetch_feed_token_counts.return_value = _feeds([40, 50], first_id=9)
+    context_window.sync(Mock(), "GROUP_2")
+
+    assert mock_feed.fetch_feed_token_counts.call_args.args[1:] == (1, "GROUP_2", 0)
+    assert context_window.feed_ids == [9, 10]
+    assert context_window.prefix_tokens == [0, 40, 90]
+
+
+@patch('superagi.models.agent_execution_feed.TokenCounter.count_content_tokens', side_effect=lambda content: len(content))
+def test_sync_recounts_edited_feeds(mock_count_content_tokens):
+    engine = create_engine("sqlite://")
+    AgentExecutionFeed.__table__.create(engine)
+    session = Session(bind=engine)
+    feeds = [AgentExecutionFeed(id=feed_id, agent_execution_id=1, feed_group_id="GROUP_2", feed="x" * token_count,
+                                role="assistant", created_at=created_at)
+             for feed_id, token_count, created_at in [(1, 10, datetime(2026, 1, 3)), (2, 20, datetime(2026, 1, 2)),
+                                                      (3, 30, datetime(2026, 1, 1))]]
+    session.add_all(feeds)
+    session.commit()
+    context_window = ContextWindow(1)
+    context_window.sync(session, "GROUP_2")
+    # the feeds are in the order of their ids, whatever their creation time
+    assert context_window.feed_ids == [1, 2, 3]
+    assert context_window.prefix_tokens == [0, 10, 30, 60]
+
+    feeds[1].feed = "x" * 5
+    session.commit()
+    context_window.sync(session, "GROUP_2")
+
+    assert context_window.feed_ids == [1, 2, 3]
+    assert context_window.prefix_tokens == [0, 10, 15, 45]
+
+
+@pytest.mark.parametrize("token_limit", [0, 5, 50, 117, 118, 500, 10000])
+@patch('superagi.agent.context_window.AgentExecutionFeed')
+def test_cut_point_matches_reverse_scan(mock_feed, token_limit):
+    token_counts = [12, 90, 3, 44, 7, 61, 25, 8]
+    context_window = ContextWindow(1)
+    mock_feed.fetch_feed_token_counts.return_value = _feeds(token_counts)
+    context_window.sync(Mock(), "GROUP_2")
+
+    expected, total = len(token_counts), 0
+    for token_count in reversed(token_counts):
+        total += token_count + 7
+        if total > token_limit:
+            break
+        expected -= 1
+
+    assert context_window.cut_point(token_limit, 7) == expected
+
+
+@patch('superagi.agent.agent_message_builder.TokenCounter')
+@patch('superagi.agent.context_window.AgentExecutionFeed')
+def test_build_agent_messages_reads_only_the_window(mock_feed, mock_token_counter):
+    mock_token_counter.return_value.token_limit.return_value = 1000
+    mock_token_counter.count_message_tokens.return_value = 100
+    mock_token_counter.tokens_per_message.return_value = 4
+    context_window = ContextWindow(1)
+    mock_feed.fetch_feed_token_counts.return_value = _feeds([400, 300, 300, 100], first_id=7)
+    context_window.sync(Mock(), "GROUP_2")
+    window_feed = Mock(role="assistant", feed="latest reply", id=10, token_count=100)
+    mock_feed.fetch_feeds_between.return_value = [window_feed]
+
+    builder = AgentLlmMessageBuilder(MagicMock(), Mock(), "gpt-4", 1, 1, organisation=Mock(id=1))
+    builder._build_ltm_summary = Mock(return_value="summary")
+    builder._add_or_update_last_agent_feed_ltm_summary_id = Mock()
+    with patch('superagi.agent.agent_message_builder.get_config', return_value=400):
+        messages = builder.build_agent_messages("prompt", history_enabled=True, completion_prompt="next",
+                                                context_window=context_window)
+
+    # 375 tokens are left for the history, only the last feed fits
+    assert mock_feed.fetch_feeds_between.call_args_list[0].args[1:] == (1, "GROUP_2", 10, 10)
+    assert mock_feed.fetch_feeds_between.call_args_list[1].args[1:] == (1, "GROUP_2", 7, 9)
+    builder._add_or_update_last_agent_feed_ltm_summary_id.assert_called_once_with("9")
+    assert messages[2:] == [{"role": "assistant", "content": "summary"},
+                            {"role": "assistant", "content": "latest reply"},
+                            {"role": "user", "content": "next"}]
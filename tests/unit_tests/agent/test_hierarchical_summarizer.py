@@ -0,0 +1,117 @@
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+from superagi.agent.hierarchical_summarizer import HierarchicalLtmSummarizer
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+@pytest.fixture
+def fake_redis():
+    fake_redis = FakeRedis()
+    with patch('superagi.agent.hierarchical_summarizer.redis') as mock_redis:
+        mock_redis.Redis.from_url.return_value = fake_redis
+        yield fake_redis
+
+
+def _messages(count, token_count=100):
+    return [{"role": "assistant", "content": "reply " + str(i), "chat_id": i, "token_count": token_count}
+            for i in range(count)]
+
+
+def _llm():
+    llm = Mock()
+    llm.chat_completion.side_effect = lambda messages: {"content": "summary of " + str(hash(messages[1]["content"]))}
+    return llm
+
+
+def _summarizer(llm, token_limit=1000):
+    with patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_text_tokens', return_value=100):
+        return HierarchicalLtmSummarizer(llm, "gpt-4", token_limit, 200, max_workers=2)
+
+
+@patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_message_tokens',
+       side_effect=lambda messages, model: messages[0]["token_count"])
+def test_chunk_by_token_budget(_):
+    summarizer = _summarizer(Mock())
+
+    # 690 tokens are left for the content of a chunk
+    chunks = summarizer.chunk(_messages(3, 300) + _messages(1, 900) + _messages(1, 10))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1, 1, 1]
+
+
+@patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_text_tokens', return_value=100)
+@patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_message_tokens',
+       side_effect=lambda messages, model: messages[0]["token_count"])
+def test_summarize_maps_chunks_and_reduces(_, __, fake_redis):
+    llm = _llm()
+    summarizer = _summarizer(llm)
+
+    response = summarizer.summarize(_messages(12), previous_ltm_summary="earlier summary")
+
+    # two chunks of six messages, then one reduce of the previous summary and the two chunk summaries
+    assert llm.chat_completion.call_count == 3
+    reduce_prompt = llm.chat_completion.call_args_list[-1].args[0][1]["content"]
+    assert "Summary 1: earlier summary" in reduce_prompt
+    assert response["content"].startswith("summary of")
+
+
+@patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_text_tokens', return_value=100)
+@patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_message_tokens',
+       side_effect=lambda messages, model: messages[0]["token_count"])
+def test_summarized_chunks_are_not_sent_again(_, __, fake_redis):
+    llm = _llm()
+    _summarizer(llm).summarize(_messages(12))
+    llm.chat_completion.reset_mock()
+
+    _summarizer(llm).summarize(_messages(14))
+
+    # only the new third chunk and the reduce are summarized
+    assert llm.chat_completion.call_count == 2
+    assert "reply 13" in llm.chat_completion.call_args_list[0].args[0][1]["content"]
+
+
+@patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_text_tokens', return_value=100)
+@patch('superagi.agent.hierarchical_summarizer.TokenCounter.count_message_tokens',
+       side_effect=lambda messages, model: messages[0]["token_count"])
+def test_summarize_returns_llm_error(_, __, fake_redis):
+    llm = Mock()
+    llm.chat_completion.return_value = {"error": "ERROR_RATE_LIMIT", "message": "rate limited"}
+
+    response = _summarizer(llm).summarize(_messages(12))
+
+    assert response == {"error": "ERROR_RATE_LIMIT", "message": "rate limited"}
+    assert fake_redis.values == {}
+
+
+@patch('superagi.agent.agent_message_builder.is_hierarchical_ltm_summary_enabled', return_value=True)
+@patch('superagi.agent.agent_message_builder.AgentExecutionConfiguration')
+@patch('superagi.agent.agent_message_builder.HierarchicalLtmSummarizer')
+@patch('superagi.agent.agent_message_builder.TokenCounter')
+def test_build_ltm_summary_in_hierarchical_mode(mock_token_counter, mock_summarizer, mock_config, _):
+    mock_token_counter.count_text_tokens.return_value = 5000
+    mock_token_counter.return_value.token_limit.return_value = 4096
+    mock_summarizer.return_value.summarize.return_value = {"content": "summary"}
+    builder = AgentLlmMessageBuilder(MagicMock(), Mock(), "gpt-4", 1, 1, organisation=Mock(id=1))
+    past_messages = _messages(40)
+
+    assert builder._build_ltm_summary(past_messages, 200) == "summary"
+
+    mock_summarizer.assert_called_once_with(builder.ltm_summary_llm, "gpt-4", 4096, 200)
+    assert builder.ltm_summary_llm.llm is builder.llm
+    mock_summarizer.return_value.summarize.assert_called_once_with(past_messages, None)
+    builder.llm.chat_completion.assert_not_called()
+    assert mock_config.add_or_update_agent_execution_config.call_args.kwargs["agent_execution_configs"] == \
+           {"ltm_summary": "summary"}
@@ -0,0 +1,157 @@
+from unittest.mock import MagicMock, Mock, patch
+
+from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+from superagi.agent.context_window import ContextWindow
+from superagi.agent.ltm_summarizer import schedule_ltm_summary
+
+
+def _context_window(mock_feed, token_counts, first_id=7):
+    context_window = ContextWindow(1)
+    mock_feed.fetch_feed_token_counts.return_value = [(first_id + i, token_count, None)
+                                                      for i, token_count in enumerate(token_counts)]
+    context_window.sync(Mock(), "GROUP_2")
+    return context_window
+
+
+def _builder():
+    builder = AgentLlmMessageBuilder(MagicMock(), Mock(), "gpt-4", 1, 1, organisation=Mock(id=1))
+    builder._build_ltm_summary = Mock(return_value="fresh summary")
+    builder._add_or_update_last_agent_feed_ltm_summary_id = Mock()
+    return builder
+
+
+@patch('superagi.worker.summarize_ltm')
+@patch('superagi.agent.ltm_summarizer.redis')
+def test_schedule_ltm_summary_once_per_execution(mock_redis, mock_task):
+    mock_redis.Redis.from_url.return_value.set.side_effect = [True, None]
+
+    assert schedule_ltm_summary(1, "GROUP_2", 7, 9, 200)
+    assert not schedule_ltm_summary(1, "GROUP_2", 7, 10, 200)
+
+    mock_task.apply_async.assert_called_once_with((1, "GROUP_2", 7, 9, 200), priority=9)
+
+
+@patch('superagi.worker.summarize_ltm')
+@patch('superagi.agent.ltm_summarizer.redis')
+def test_schedule_ltm_summary_without_redis(mock_redis, mock_task):
+    mock_redis.Redis.from_url.return_value.set.side_effect = ConnectionError("redis is down")
+
+    assert not schedule_ltm_summary(1, "GROUP_2", 7, 9, 200)
+    mock_task.apply_async.assert_not_called()
+
+
+@patch('superagi.agent.agent_message_builder.schedule_ltm_summary')
+@patch('superagi.agent.agent_message_builder.is_background_ltm_summary_enabled', return_value=True)
+@patch('superagi.agent.agent_message_builder.AgentExecutionConfiguration')
+@patch('superagi.agent.agent_message_builder.TokenCounter')
+@patch('superagi.agent.context_window.AgentExecutionFeed')
+def test_build_agent_messages_uses_prepared_summary(mock_feed, mock_token_counter, mock_config, _, mock_schedule):
+    mock_token_counter.return_value.token_limit.return_value = 1000
+    mock_token_counter.count_message_tokens.return_value = 100
+    mock_token_counter.tokens_per_message.return_value = 4
+    context_window = _context_window(mock_feed, [400, 300, 300, 100])
+    mock_config.fetch_value.side_effect = lambda session, execution_id, key: \
+        Mock(value={"ltm_summary": "prepared summary", "last_agent_feed_ltm_summary_id": "9"}[key])
+    mock_feed.fetch_feeds_between.return_value = [Mock(role="assistant", feed="latest reply", id=10, token_count=100)]
+
+    builder = _builder()
+    with patch('superagi.agent.agent_message_builder.get_config', return_value=400):
+        messages = builder.build_agent_messages("prompt", history_enabled=True, completion_prompt="next",
+                                                context_window=context_window)
+
+    # the overflowing feeds are neither read nor summarized in the step
+    mock_feed.fetch_feeds_between.assert_called_once()
+    assert mock_feed.fetch_feeds_between.call_args.args[1:] == (1, "GROUP_2", 10, 10)
+    builder._build_ltm_summary.assert_not_called()
+    builder.llm.chat_completion.assert_not_called()
+    mock_schedule.assert_not_called()
+    assert messages[2:] == [{"role": "assistant", "content": "prepared summary"},
+                            {"role": "assistant", "content": "latest reply"},
+                            {"role": "user", "content": "next"}]
+
+
+@patch('superagi.agent.agent_message_builder.AgentExecutionFeed')
+@patch('superagi.agent.agent_message_builder.schedule_ltm_summary')
+@patch('superagi.agent.agent_message_builder.is_background_ltm_summary_enabled', return_value=True)
+@patch('superagi.agent.agent_message_builder.AgentExecutionConfiguration')
+@patch('superagi.agent.agent_message_builder.TokenCounter')
+@patch('superagi.agent.context_window.AgentExecutionFeed')
+def test_build_agent_messages_catches_up_lagging_summary(mock_feed, mock_token_counter, mock_config, _,
+                                                         mock_schedule, mock_builder_feed):
+    mock_token_counter.return_value.token_limit.return_value = 1000
+    mock_token_counter.count_message_tokens.return_value = 100
+    mock_token_counter.tokens_per_message.return_value = 4
+    context_window = _context_window(mock_feed, [400, 300, 300, 100])
+    # the summary prepared in background stops at feed 8, feed 9 leaves the window too
+    mock_config.fetch_value.side_effect = lambda session, execution_id, key: \
+        Mock(value={"ltm_summary": "prepared summary", "last_agent_feed_ltm_summary_id": "8"}[key])
+    mock_builder_feed.fetch_feeds_between.return_value = [Mock(role="assistant", feed="missed reply", id=9)]
+    mock_feed.fetch_feeds_between.return_value = [Mock(role="assistant", feed="latest reply", id=10, token_count=100)]
+
+    builder = _builder()
+    builder.llm.chat_completion.return_value = {"content": "caught up summary"}
+    with patch('superagi.agent.agent_message_builder.get_config', return_value=400):
+        messages = builder.build_agent_messages("prompt", history_enabled=True, completion_prompt="next",
+                                                context_window=context_window)
+
+    assert mock_builder_feed.fetch_feeds_between.call_args.args[1:] == (1, "GROUP_2", 9, 9)
+    assert "missed reply" in builder.llm.chat_completion.call_args.args[0][1]["content"]
+    builder._build_ltm_summary.assert_not_called()
+    assert messages[2:] == [{"role": "assistant", "content": "caught up summary"},
+                            {"role": "assistant", "content": "latest reply"},
+                            {"role": "user", "content": "next"}]
+
+
+@patch('superagi.agent.agent_message_builder.schedule_ltm_summary')
+@patch('superagi.agent.agent_message_builder.is_background_ltm_summary_enabled', return_value=True)
+@patch('superagi.agent.agent_message_builder.AgentExecutionConfiguration')
+@patch('superagi.agent.agent_message_builder.TokenCounter')
+@patch('superagi.agent.context_window.AgentExecutionFeed')
+def test_build_agent_messages_schedules_summary_past_watermark(mock_feed, mock_token_counter, mock_config, _,
+                                                              mock_schedule):
+    mock_token_counter.return_value.token_limit.return_value = 1000
+    mock_token_counter.count_message_tokens.return_value = 100
+    mock_token_counter.tokens_per_message.return_value = 4
+    # 336 of the 375 history tokens are used, past the watermark of 300 but not overflowing
+    context_window = _context_window(mock_feed, [150, 100, 65])
+    mock_config.fetch_value.return_value = None
+    mock_feed.fetch_feeds_between.return_value = []
+
+    builder = _builder()
+    with patch('superagi.agent.agent_message_builder.get_config', return_value=400):
+        builder.build_agent_messages("prompt", history_enabled=True, completion_prompt="next",
+                                     context_window=context_window)
+
+    mock_schedule.assert_called_once_with(1, "GROUP_2", 7, 7, 125)
+    builder._build_ltm_summary.assert_not_called()
+
+
+@patch('superagi.agent.agent_message_builder.AgentExecutionConfiguration')
+@patch('superagi.agent.agent_message_builder.AgentExecutionFeed')
+def test_refresh_ltm_summary_continues_previous_summary(mock_feed, mock_config):
+    mock_config.fetch_value.side_effect = lambda session, execution_id, key: \
+        Mock(value={"ltm_summary": "old summary", "last_agent_feed_ltm_summary_id": "8"}[key])
+    mock_feed.fetch_feeds_between.return_value = [Mock(role="assistant", feed="reply", id=9)]
+    builder = _builder()
+    builder.llm.chat_completion.return_value = {"content": "new summary"}
+
+    with patch('superagi.agent.agent_message_builder.get_config', return_value=400):
+        assert builder.refresh_ltm_summary("GROUP_2", 7, 9, 200) == "new summary"
+
+    assert mock_feed.fetch_feeds_between.call_args.args[1:] == (1, "GROUP_2", 9, 9)
+    assert "old summary" in builder.llm.chat_completion.call_args.args[0][1]["content"]
+    configs = mock_config.add_or_update_agent_execution_config.call_args.kwargs["agent_execution_configs"]
+    assert configs == {"ltm_summary": "new summary", "last_agent_feed_ltm_summary_id": 9}
+
+
+@patch('superagi.agent.agent_message_builder.AgentExecutionConfiguration')
+@patch('superagi.agent.agent_message_builder.AgentExecutionFeed')
+def test_refresh_ltm_summary_skips_summarized_feeds(mock_feed, mock_config):
+    mock_config.fetch_value.side_effect = lambda session, execution_id, key: \
+        Mock(value={"ltm_summary": "old summary", "last_agent_feed_ltm_summary_id": "9"}[key])
+    builder = _builder()
+
+    assert builder.refresh_ltm_summary("GROUP_2", 7, 9, 200) == "old summary"
+
+    mock_feed.fetch_feeds_between.assert_not_called()
+    builder.llm.chat_completion.assert_not_called()
@@ -152,3 +152,20 @@ def test_handle_method(extract_json_array_section_mock, get_tasks_mock, add_task
     assert add_task_mock.call_count == len(tasks)
     get_tasks_mock.assert_called_once()
     assert response.status == "PENDING"
+
+
+@patch('superagi.agent.output_handler.get_config', return_value=3)
+@patch.object(ToolExecutor, 'execute_all')
+def test_handle_tool_response_with_multiple_tool_calls(execute_all_mock, get_config_mock):
+    agent_config = {"agent_id": 22, "permission_type": "unrestricted"}
+    assistant_reply = '{"tools": [{"name": "tool1", "args": {}}, {"name": "tool2", "args": {}}]}'
+    execute_all_mock.return_value = [ToolExecutorResponse(status="SUCCESS", result="Tool tool1 returned: 1"),
+                                     ToolExecutorResponse(status="SUCCESS", result="Tool tool2 returned: 2")]
+    handler = ToolOutputHandler(11, agent_config, [], None)
+
+    response = handler.handle_tool_response(MagicMock(), assistant_reply)
+
+    actions = execute_all_mock.call_args.args[1]
+    assert actions == [AgentGPTAction(name="tool1", args={}), AgentGPTAction(name="tool2", args={})]
+    assert response.status == "SUCCESS"
+    assert response.result == "Tool tool1 returned: 1\nTool tool2 returned: 2"
@@ -32,4 +32,14 @@ def test_agent_schema_output_parser():
         parsed = parser.parse(response)
 
 
+def test_agent_schema_output_parser_parse_all():
+    parser = AgentSchemaOutputParser()
+
+    response = '{"thoughts": {}, "tools": [{"name": "Tool1", "args": {"a": 1}}, {"name": "Tool2"}]}'
+    assert parser.parse_all(response) == [AgentGPTAction(name='Tool1', args={'a': 1}),
+                                          AgentGPTAction(name='Tool2', args={})]
+
+    # a single tool call is still accepted
+    response = '{"thoughts": {}, "tool": {"name": "Tool1", "args": {}}}'
+    assert parser.parse_all(response) == [AgentGPTAction(name='Tool1', args={})]
 
@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from superagi.agent.pending_completion import PendingCompletion, run_to_completion
+
+
+def test_run_to_completion_resumes_the_step_with_the_response():
+    llm = MagicMock()
+    llm.chat_completion.side_effect = [{"content": "first"}, {"content": "second"}]
+
+    def step():
+        first = yield PendingCompletion(llm, [{"role": "user", "content": "1"}], 10)
+        second = yield PendingCompletion(llm, [{"role": "user", "content": "2"}], 20)
+        return first["content"] + " " + second["content"]
+
+    assert run_to_completion(step()) == "first second"
+    assert [call.args for call in llm.chat_completion.call_args_list] == [
+        ([{"role": "user", "content": "1"}], 10), ([{"role": "user", "content": "2"}], 20)]
+
+
+def test_run_to_completion_raises_llm_errors_in_the_step():
+    llm = MagicMock()
+    llm.chat_completion.side_effect = TimeoutError("llm timed out")
+
+    def step():
+        try:
+            yield PendingCompletion(llm, [], 10)
+        except TimeoutError:
+            return "retry"
+
+    assert run_to_completion(step()) == "retry"
+
+
+def test_run_to_completion_propagates_unhandled_errors():
+    llm = MagicMock()
+    llm.chat_completion.side_effect = TimeoutError("llm timed out")
+
+    def step():
+        yield PendingCompletion(llm, [], 10)
+
+    with pytest.raises(TimeoutError):
+        run_to_completion(step())
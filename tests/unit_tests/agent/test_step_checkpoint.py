@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock, Mock, patch
+
+from superagi.agent.agent_message_builder import AgentLlmMessageBuilder
+from superagi.agent.step_checkpoint import StepCheckpoint
+from superagi.helper.token_counter import TokenCounter
+
+MESSAGES = [{"role": "system", "content": "prompt"}, {"role": "user", "content": "next step"}]
+
+
+@patch('superagi.agent.step_checkpoint.redis')
+def test_checkpoint_round_trip(mock_redis):
+    store = {}
+    db = mock_redis.Redis.from_url.return_value
+    db.set.side_effect = lambda key, value, ex: store.__setitem__(key, value)
+    db.get.side_effect = store.get
+
+    StepCheckpoint(1, "2:3", MESSAGES).save({"content": "reply"})
+
+    assert StepCheckpoint(1, "2:3", [dict(message) for message in MESSAGES]).get() == {"content": "reply"}
+    # a different prompt or step is a different llm call
+    assert StepCheckpoint(1, "2:3", MESSAGES[:1]).get() is None
+    assert StepCheckpoint(1, "2:4", MESSAGES).get() is None
+
+
+@patch('superagi.agent.step_checkpoint.redis')
+def test_checkpoint_fails_open(mock_redis):
+    db = mock_redis.Redis.from_url.return_value
+    db.get.side_effect = ConnectionError("redis down")
+    db.set.side_effect = ConnectionError("redis down")
+    checkpoint = StepCheckpoint(1, "2:3", MESSAGES)
+
+    checkpoint.save({"content": "reply"})
+
+    assert checkpoint.get() is None
+
+
+@patch('superagi.agent.step_checkpoint.redis')
+def test_checkpoint_found_for_messages_rebuilt_by_retry(mock_redis):
+    store = {}
+    db = mock_redis.Redis.from_url.return_value
+    db.set.side_effect = lambda key, value, ex: store.__setitem__(key, value)
+    db.get.side_effect = store.get
+    builder = AgentLlmMessageBuilder(Mock(), Mock(), "gpt-4", 1, 1, organisation=Mock(id=1))
+
+    with patch.object(TokenCounter, 'token_limit', return_value=4000), \
+            patch.object(TokenCounter, 'count_message_tokens', return_value=10), \
+            patch('superagi.agent.agent_message_builder.time') as mock_time:
+        mock_time.strftime.side_effect = ["Mon Oct 12 10:00:00 2026", "Mon Oct 12 10:05:00 2026"]
+        messages = builder.build_agent_messages("prompt", agent_feeds=[], history_enabled=True,
+                                                completion_prompt="next step")
+        StepCheckpoint(1, "2:3", messages).save({"content": "reply"})
+        # the retry of the step builds the messages again, minutes later
+        retried_messages = builder.build_agent_messages("prompt", agent_feeds=[], history_enabled=True,
+                                                        completion_prompt="next step")
+
+    assert retried_messages != messages
+    assert StepCheckpoint(1, "2:3", retried_messages).get() == {"content": "reply"}
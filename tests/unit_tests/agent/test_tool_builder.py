@@ -1,7 +1,9 @@
 import pytest
 from unittest.mock import Mock, patch
 
-from superagi.agent.tool_builder import ToolBuilder
+from superagi.agent.tool_builder import DBToolkitConfiguration, ToolBuilder
+from superagi.resource_manager.file_manager import FileManager
+from superagi.tools.file.read_file import ReadFileTool
 from superagi.models.tool import Tool
 
 
@@ -47,4 +49,16 @@ def test_build_tool(mock_getattr, mock_import_module, tool_builder, tool):
     mock_getattr.assert_called_with(mock_module, tool.class_name)
 
     assert result_tool.toolkit_config.session == tool_builder.session
-    assert result_tool.toolkit_config.toolkit_id == tool.toolkit_id
\ No newline at end of file
+    assert result_tool.toolkit_config.toolkit_id == tool.toolkit_id
+
+def test_bind_session_copies_tool():
+    tool = ReadFileTool()
+    tool.toolkit_config = DBToolkitConfiguration(session="step session", toolkit_id=1)
+    tool.resource_manager = FileManager(session="step session", agent_id=1)
+
+    bound_tool = ToolBuilder.bind_session(tool, "tool session")
+
+    assert bound_tool.toolkit_config.session == "tool session"
+    assert bound_tool.resource_manager.session == "tool session"
+    assert tool.toolkit_config.session == "step session"
+    assert tool.resource_manager.session == "step session"
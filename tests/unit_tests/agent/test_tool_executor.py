@@ -1,9 +1,14 @@
+import threading
+import time
+
 import pytest
 from unittest.mock import Mock, patch
 
 from pydantic import ValidationError
 
 from superagi.agent.common_types import ToolExecutorResponse
+from superagi.agent.output_parser import AgentGPTAction
+from superagi.agent.tool_builder import DBToolkitConfiguration
 from superagi.agent.tool_executor import ToolExecutor
 
 class MockTool:
@@ -54,4 +59,90 @@ def test_tool_executor_unknown_tool(executor):
 def test_clean_tool_args(executor):
     args = {"arg1": {"value": 1}, "arg2": 2}
     clean_args = executor.clean_tool_args(args)
-    assert clean_args == {"arg1": 1, "arg2": 2}
\ No newline at end of file
+    assert clean_args == {"arg1": 1, "arg2": 2}
+
+@patch('superagi.agent.tool_executor.EventHandler')
+def test_execute_all_runs_tools_concurrently(mock_event_handler, executor, mock_tools):
+    # each tool waits for the others, they only all return when they run at the same time
+    barrier = threading.Barrier(3, timeout=5)
+    for tool in mock_tools[:3]:
+        tool.execute = Mock(side_effect=lambda args, name=tool.name: barrier.wait() is not None and name)
+    actions = [AgentGPTAction(name=f'tool{i}', args={}) for i in range(3)]
+
+    responses = executor.execute_all(None, actions, max_workers=3, timeout=5)
+
+    assert [res.result for res in responses] == [f'Tool tool{i} returned: tool{i}' for i in range(3)]
+    assert all(res.status == 'SUCCESS' for res in responses)
+    assert mock_event_handler.return_value.create_event.call_count == 3
+
+
+@patch('superagi.agent.tool_executor.EventHandler')
+def test_execute_all_times_out_slow_tools(mock_event_handler, executor, mock_tools):
+    release = threading.Event()
+    mock_tools[0].execute = Mock(side_effect=lambda args: release.wait(5))
+    actions = [AgentGPTAction(name='tool0', args={}), AgentGPTAction(name='tool1', args={}),
+               AgentGPTAction(name='unknown_tool', args={})]
+
+    responses = executor.execute_all(None, actions, timeout=0.1)
+    release.set()
+
+    assert responses[0].status == 'ERROR'
+    assert responses[0].result == 'Tool tool0 timed out after 0.1 seconds'
+    assert responses[0].retry == True
+    assert responses[1].result == 'Tool tool1 returned: tool1'
+    assert "Unknown tool 'unknown_tool'" in responses[2].result
+
+
+@patch('superagi.agent.tool_executor.EventHandler')
+def test_execute_all_times_out_all_slow_tools_at_once(mock_event_handler, executor, mock_tools):
+    release = threading.Event()
+    for tool in mock_tools[:3]:
+        tool.execute = Mock(side_effect=lambda args: release.wait(5))
+    actions = [AgentGPTAction(name=f'tool{i}', args={}) for i in range(3)]
+
+    started_at = time.monotonic()
+    responses = executor.execute_all(None, actions, timeout=0.2)
+    elapsed = time.monotonic() - started_at
+    release.set()
+
+    assert all(res.result.endswith('timed out after 0.2 seconds') for res in responses)
+    assert elapsed < 0.4
+
+
+class SessionTool(MockTool):
+    def __init__(self, name, session):
+        super().__init__(name)
+        self.toolkit_config = DBToolkitConfiguration(session=session, toolkit_id=1)
+
+    def execute(self, args):
+        return self.toolkit_config.session
+
+
+@patch('superagi.agent.tool_executor.sessionmaker')
+@patch('superagi.agent.tool_executor.EventHandler')
+def test_execute_all_runs_tools_with_their_own_session(mock_event_handler, mock_sessionmaker):
+    step_session = Mock()
+    tool_session = Mock()
+    mock_sessionmaker.return_value.return_value = tool_session
+    tool = SessionTool('session_tool', step_session)
+    executor = ToolExecutor(organisation_id=1, agent_id=1, tools=[tool], agent_execution_id=1)
+
+    responses = executor.execute_all(step_session, [AgentGPTAction(name='session_tool', args={})])
+
+    assert responses[0].result == f'Tool session_tool returned: {tool_session}'
+    mock_sessionmaker.assert_called_once_with(bind=step_session.get_bind.return_value)
+    tool_session.close.assert_called_once()
+    # the tool of the agent keeps the session of the step
+    assert tool.toolkit_config.session is step_session
+
+
+def test_combine_responses():
+    responses = [ToolExecutorResponse(status='ERROR', result='Tool a failed', retry=True),
+                 ToolExecutorResponse(status='SUCCESS', result='Tool b returned: b')]
+
+    combined = ToolExecutor.combine_responses(responses)
+
+    assert combined.status == 'SUCCESS'
+    assert combined.result == 'Tool a failed\nTool b returned: b'
+    assert combined.retry == False
+    assert ToolExecutor.combine_responses([ToolExecutorResponse(status='COMPLETE', result='')] * 2).status == 'COMPLETE'
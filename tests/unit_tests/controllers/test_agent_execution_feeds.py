@@ -1,10 +1,11 @@
+import asyncio
 from unittest.mock import MagicMock, Mock, create_autospec, patch
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import HTTPException
 from main import app
 from fastapi_sqlalchemy import db
-from superagi.controllers.agent_execution_feed import get_agent_execution_feed
+from superagi.controllers.agent_execution_feed import get_agent_execution_feed, stream_agent_execution_feed
 
 @patch('superagi.controllers.agent_execution_feed.db')
 def test_get_agent_execution_feed(mock_query):
@@ -40,4 +41,36 @@ def test_get_agent_execution_feed(mock_query):
     mock_agent_execution = Mock() 
     mock_query.return_value.filter.return_value.first.return_value = mock_agent_execution
     mock_agent_execution_id = 1
-    assert get_agent_execution_feed(mock_agent_execution_id)
\ No newline at end of file
+    assert get_agent_execution_feed(mock_agent_execution_id)
+
+@patch('superagi.controllers.agent_execution_feed.Agent')
+@patch('superagi.controllers.agent_execution_feed.db')
+def test_stream_agent_execution_feed_of_other_organisation(mock_db, mock_agent):
+    mock_db.session.query.return_value.filter.return_value.first.return_value = MagicMock(agent_id=1)
+    mock_agent.find_org_by_agent_id.return_value = MagicMock(id=2)
+
+    with pytest.raises(HTTPException) as exception_info:
+        stream_agent_execution_feed(1, organisation=MagicMock(id=1))
+
+    assert exception_info.value.status_code == 403
+
+
+@patch('superagi.controllers.agent_execution_feed.PARTIAL_FEED_POLL_INTERVAL', 0)
+@patch('superagi.controllers.agent_execution_feed.PartialFeed')
+@patch('superagi.controllers.agent_execution_feed.Agent')
+@patch('superagi.controllers.agent_execution_feed.db')
+def test_stream_agent_execution_feed_events(mock_db, mock_agent, mock_partial_feed):
+    mock_db.session.query.return_value.filter.return_value.first.return_value = MagicMock(agent_id=1)
+    mock_agent.find_org_by_agent_id.return_value = MagicMock(id=1)
+    mock_partial_feed.return_value.get.side_effect = [{"feed": "{\"thou", "updated_at": 1},
+                                                      {"feed": "{\"thoughts\"", "updated_at": 2}, None]
+
+    response = stream_agent_execution_feed(1, organisation=MagicMock(id=1))
+
+    async def receive(count):
+        return [await anext(response.body_iterator) for _ in range(count)]
+
+    received = asyncio.run(receive(3))
+
+    assert received[1] == "event: partial_feed\ndata: {\"feed\": \"{\\\"thoughts\\\"\"}\n\n"
+    assert received[2] == "event: feed_completed\ndata: {}\n\n"
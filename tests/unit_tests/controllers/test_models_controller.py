@@ -115,4 +115,15 @@ def test_get_local_llm():
 
             response = client.get("/models_controller/test_local_llm")
 
-            assert response.status_code == 200
\ No newline at end of file
+            assert response.status_code == 200
+
+@patch('superagi.controllers.models_controller.route_stats')
+@patch('superagi.controllers.models_controller.response_cache_metrics')
+def test_fetch_llm_metrics_success(mock_response_cache_metrics, mock_route_stats):
+    mock_response_cache_metrics.get.return_value = {"hits": 3, "misses": 1, "hit_rate": 0.75}
+    mock_route_stats.get.return_value = {"ltm_summary:gpt-3.5-turbo": {"calls": 2}}
+    with patch('superagi.helper.auth.db') as mock_auth_db:
+        response = client.get("/models_controller/llm_metrics")
+        assert response.status_code == 200
+        assert response.json() == {"response_cache": {"hits": 3, "misses": 1, "hit_rate": 0.75},
+                                   "routes": {"ltm_summary:gpt-3.5-turbo": {"calls": 2}}}
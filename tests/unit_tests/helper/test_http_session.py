@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from superagi.helper.http_session import build_http_adapter, close_http_sessions, get_http_session
+from superagi.llms.hugging_face import HuggingFace
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._reply({"ok": True})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/slow":
+            time.sleep(1)
+        self._reply([{"generated_text": "stub reply"}])
+
+    def _reply(self, body):
+        self.server.client_ports.append(self.client_address[1])
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.client_ports = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    close_http_sessions()
+    yield server
+    close_http_sessions()
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, path="/"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_session_reuses_connection(stub_server):
+    for _ in range(5):
+        assert get_http_session("hugging_face").get(_url(stub_server)).json() == {"ok": True}
+
+    # every request came from the same client socket
+    assert len(stub_server.client_ports) == 5
+    assert len(set(stub_server.client_ports)) == 1
+
+
+def test_hugging_face_reuses_connection(stub_server):
+    hugging_face = HuggingFace("test_api_key", model="test_model", end_point=_url(stub_server, "/generate"))
+
+    responses = [hugging_face.chat_completion([{"role": "system", "content": "Hello"}]) for _ in range(3)]
+
+    assert [response["content"] for response in responses] == ["stub reply"] * 3
+    assert len(set(stub_server.client_ports)) == 1
+
+
+def test_read_timeout(stub_server):
+    config = {"HUGGING_FACE_HTTP_READ_TIMEOUT": 0.2}
+    with patch('superagi.helper.http_session.get_config',
+               side_effect=lambda key, default=None: config.get(key, default)):
+        session = get_http_session("hugging_face")
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session.post(_url(stub_server, "/slow"), data="{}")
+    # an explicit timeout of a request still wins over the default
+    assert session.post(_url(stub_server, "/slow"), data="{}", timeout=5).status_code == 200
+
+
+def test_sessions_are_shared_per_provider(stub_server):
+    assert get_http_session("hugging_face") is get_http_session("hugging_face")
+    assert get_http_session("hugging_face") is not get_http_session("replicate")
+
+
+@pytest.mark.parametrize("config, expected", [({"HTTP_POOL_BLOCK": "False"}, False), ({"HTTP_POOL_BLOCK": "0"}, False),
+                                              ({"HTTP_POOL_BLOCK": "True"}, True), ({"HTTP_POOL_BLOCK": True}, True),
+                                              ({"HTTP_POOL_BLOCK": "True", "HUGGING_FACE_HTTP_POOL_BLOCK": "false"}, False),
+                                              ({}, False)])
+def test_pool_block_setting(config, expected):
+    with patch('superagi.config.config.get_config', side_effect=lambda key, default=None: config.get(key, default)):
+        adapter = build_http_adapter("hugging_face")
+
+    assert adapter._pool_block is expected
@@ -0,0 +1,204 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+from llama_cpp import LlamaRAMCache
+
+from superagi.helper import llm_loader as llm_loader_module
+from superagi.helper.llm_loader import LLMLoader, LocalModelPool, TieredLlamaCache, build_llama_cache, \
+    resolve_local_model_path
+
+
+class FakeLlamaState:
+    def __init__(self, name):
+        self.name = name
+        self.llama_state_size = 10
+
+
+@pytest.fixture
+def llm_loader(tmp_path):
+    model_path = tmp_path / "model.gguf"
+    model_path.write_bytes(b"0" * 10)
+    llm_loader_module._pool = None
+    yield LLMLoader(4096, str(model_path))
+    llm_loader_module._pool = None
+
+
+class FakeLoader:
+    def __init__(self):
+        self.loads = []
+
+    def __call__(self, model_path, context_length):
+        self.loads.append((model_path, context_length))
+        return object()
+
+
+@pytest.fixture
+def model_files(tmp_path):
+    paths = {}
+    for name, size in [("small.gguf", 10), ("medium.gguf", 20), ("large.gguf", 40)]:
+        paths[name] = tmp_path / name
+        paths[name].write_bytes(b"0" * size)
+    return {name: str(path) for name, path in paths.items()}
+
+
+def _config(values):
+    return lambda key, default=None: values.get(key, default)
+
+
+def test_build_llama_cache_in_memory():
+    with patch('superagi.helper.llm_loader.get_config', side_effect=_config({"LOCAL_LLM_CACHE_CAPACITY": 1000})):
+        cache = build_llama_cache()
+
+    assert isinstance(cache, LlamaRAMCache)
+    assert cache.capacity_bytes == 1000
+
+
+def test_build_llama_cache_disabled():
+    with patch('superagi.helper.llm_loader.get_config', side_effect=_config({"LOCAL_LLM_CACHE_CAPACITY": 0})):
+        assert build_llama_cache() is None
+
+
+def test_tiered_cache_reads_prefix_from_disk(tmp_path):
+    with patch('superagi.helper.llm_loader.get_config',
+               side_effect=_config({"LOCAL_LLM_DISK_CACHE_DIR": str(tmp_path)})):
+        cache = build_llama_cache()
+        assert isinstance(cache, TieredLlamaCache)
+        cache[(1, 2, 3)] = FakeLlamaState("step 1")
+
+        # a new process starts with an empty memory tier
+        restarted_cache = build_llama_cache()
+
+    assert (1, 2, 3, 4, 5) in restarted_cache
+    assert (7, 8) not in restarted_cache
+    assert restarted_cache[(1, 2, 3, 4, 5)].name == "step 1"
+
+
+@patch('superagi.helper.llm_loader.build_llama_cache')
+@patch('superagi.helper.llm_loader.Llama')
+def test_model_is_loaded_with_cache(mock_llama, mock_build_llama_cache, llm_loader):
+    model = llm_loader.model
+
+    assert model is mock_llama.return_value
+    model.set_cache.assert_called_once_with(mock_build_llama_cache.return_value)
+
+
+@patch('superagi.helper.llm_loader.build_llama_cache')
+@patch('superagi.helper.llm_loader.Llama')
+def test_model_is_loaded_with_mmap_options(mock_llama, mock_build_llama_cache, llm_loader):
+    # the flags come from environment variables as strings
+    with patch('superagi.config.config.get_config',
+               side_effect=_config({"LOCAL_LLM_USE_MMAP": "False", "LOCAL_LLM_USE_MLOCK": "True"})):
+        llm_loader.model
+
+    _, kwargs = mock_llama.call_args
+    assert kwargs["use_mmap"] is False
+    assert kwargs["use_mlock"] is True
+    assert kwargs["n_ctx"] == 4096
+
+
+def test_missing_model_returns_none(tmp_path):
+    llm_loader_module._pool = None
+    try:
+        assert LLMLoader(4096, str(tmp_path / "missing.gguf")).model is None
+    finally:
+        llm_loader_module._pool = None
+
+
+def test_pool_reuses_models_by_path_and_context_length(model_files):
+    loader = FakeLoader()
+    pool = LocalModelPool(memory_limit=100, load_model=loader)
+
+    model = pool.get(model_files["small.gguf"], 4096)
+
+    assert pool.get(model_files["small.gguf"], 4096) is model
+    assert pool.get(model_files["small.gguf"], 2048) is not model
+    assert pool.get(model_files["medium.gguf"], 4096) is not model
+    assert len(loader.loads) == 3
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["resident_bytes"] == 40
+
+
+def test_pool_evicts_least_recently_used(model_files):
+    loader = FakeLoader()
+    pool = LocalModelPool(memory_limit=45, load_model=loader)
+
+    small = pool.get(model_files["small.gguf"], 4096)
+    pool.get(model_files["medium.gguf"], 4096)
+    # the small model is now the most recently used
+    pool.get(model_files["small.gguf"], 4096)
+    pool.get(model_files["medium.gguf"], 2048)
+
+    stats = pool.stats()
+    assert stats["evictions"] == 1
+    assert stats["resident_bytes"] == 30
+    assert pool.get(model_files["small.gguf"], 4096) is small
+    assert len(loader.loads) == 3
+
+
+def test_pool_loads_model_larger_than_limit(model_files):
+    pool = LocalModelPool(memory_limit=30, load_model=FakeLoader())
+
+    pool.get(model_files["small.gguf"], 4096)
+    pool.get(model_files["large.gguf"], 4096)
+
+    stats = pool.stats()
+    assert stats["evictions"] == 1
+    assert stats["resident_bytes"] == 40
+
+
+def test_pool_without_limit_holds_single_model(model_files):
+    pool = LocalModelPool(load_model=FakeLoader())
+
+    pool.get(model_files["small.gguf"], 4096)
+    pool.get(model_files["medium.gguf"], 4096)
+
+    assert len(pool.stats()["models"]) == 1
+    assert pool.stats()["loads"] == 2
+
+
+def test_pool_does_not_hold_failed_loads(model_files):
+    def failing_loader(model_path, context_length):
+        raise ValueError("Failed to load model")
+
+    pool = LocalModelPool(memory_limit=100, load_model=failing_loader)
+
+    with pytest.raises(ValueError):
+        pool.get(model_files["small.gguf"], 4096)
+    assert pool.stats()["models"] == []
+
+
+def test_pool_serves_loaded_models_during_a_load(model_files):
+    loading = threading.Event()
+    release = threading.Event()
+    loader = FakeLoader()
+
+    def blocking_loader(model_path, context_length):
+        if model_path == model_files["large.gguf"]:
+            loading.set()
+            release.wait(5)
+        return loader(model_path, context_length)
+
+    pool = LocalModelPool(memory_limit=100, load_model=blocking_loader)
+    small = pool.get(model_files["small.gguf"], 4096)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(pool.get(model_files["large.gguf"], 4096)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    loading.wait(5)
+
+    assert pool.get(model_files["small.gguf"], 4096) is small
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert models[0] is models[1]
+    assert loader.loads == [(model_files["small.gguf"], 4096), (model_files["large.gguf"], 4096)]
+
+
+def test_resolve_local_model_path(model_files, tmp_path):
+    config = {"LOCAL_LLM_MODELS_DIR": str(tmp_path), "LOCAL_LLM_MODEL_PATH": "/models/default.gguf"}
+    with patch('superagi.helper.llm_loader.get_config', side_effect=_config(config)):
+        assert resolve_local_model_path("medium.gguf") == model_files["medium.gguf"]
+        assert resolve_local_model_path("unknown.gguf") == "/models/default.gguf"
+        assert resolve_local_model_path(None) == "/models/default.gguf"
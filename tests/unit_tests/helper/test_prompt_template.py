@@ -0,0 +1,58 @@
+from unittest.mock import mock_open, patch
+
+import pytest
+
+from superagi.helper.prompt_template import PromptTemplate, PromptTemplateError, PromptTemplateRegistry
+
+
+def test_render_fills_every_slot_in_one_pass():
+    template = PromptTemplate('Goals: {goals}\n{"key": {value}}\nAgain {goals}')
+
+    result = template.render({"goals": "1. win", "value": "{goals}"})
+
+    assert template.variables == ["goals", "value"]
+    # a value is never filled again, even when it holds a placeholder
+    assert result == 'Goals: 1. win\n{"key": {goals}}\nAgain 1. win'
+
+
+def test_render_keeps_unfilled_placeholders():
+    template = PromptTemplate("{current_task} then {task_history}")
+
+    assert template.render({"current_task": ""}) == " then {task_history}"
+
+
+def test_validate_reports_unfilled_and_unknown_variables():
+    template = PromptTemplate("{goals} {tool_name}")
+
+    template.validate(["goals", "tool_name"])
+    template.validate(["goals", "tool_name", "tools"], allow_unused=True)
+    with pytest.raises(PromptTemplateError, match=r"unfilled placeholders \['tool_name'\]"):
+        template.validate(["goals"])
+    with pytest.raises(PromptTemplateError, match=r"unknown variables \['tools'\]"):
+        template.validate(["goals", "tool_name", "tools"])
+
+
+@patch("builtins.open", new_callable=mock_open, read_data="{instruction}")
+def test_load_reads_prompt_file_once(mock_file):
+    registry = PromptTemplateRegistry()
+
+    first = registry.load("/app/superagi/agent/handler.py", "input.txt", ["instruction"])
+    second = registry.load("/app/superagi/agent/handler.py", "input.txt")
+
+    assert first is second
+    mock_file.assert_called_once_with("/app/superagi/agent/prompts/input.txt", "r")
+    with pytest.raises(PromptTemplateError):
+        registry.load("/app/superagi/agent/handler.py", "input.txt", ["goals"])
+
+
+def test_compile_keeps_most_recent_prompts():
+    registry = PromptTemplateRegistry()
+    registry.MAX_COMPILED_TEMPLATES = 2
+
+    first = registry.compile("{a}")
+    registry.compile("{b}")
+    assert registry.compile("{a}") is first
+    registry.compile("{c}")
+
+    assert registry.compile("{a}") is first
+    assert list(registry._compiled_templates) == ["{c}", "{a}"]
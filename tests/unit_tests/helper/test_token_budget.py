@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from superagi.helper.token_budget import TokenBudget
+
+
+def test_add_counts_each_item_once():
+    counted = []
+    budget = TokenBudget(10, count_tokens=lambda text: counted.append(text) or len(text), base_tokens=2,
+                         tokens_per_item=1)
+
+    for item in ["abc", "de", "fgh"]:
+        budget.add(item)
+        if budget.exceeded:
+            break
+
+    assert counted == ["abc", "de", "fgh"]
+    assert budget.total == 13
+    assert budget.remaining == -3
+
+    budget.reset()
+    assert budget.total == 2
+    assert not budget.exceeded
+
+
+@patch('superagi.helper.token_budget.TokenCounter.count_text_tokens', side_effect=lambda text: len(text) + 4)
+def test_for_text_matches_count_text_tokens(_):
+    budget = TokenBudget.for_text(100)
+
+    budget.add("hello")
+    budget.add("world!")
+
+    assert budget.total == len("helloworld!") + 4
+
+
+@patch('superagi.helper.token_budget.TokenCounter.count_message_tokens',
+       side_effect=lambda messages, model: len(messages[0]["content"]) + 7)
+def test_for_message_counts_message_tokens_once(mock_count_message_tokens):
+    budget = TokenBudget.for_message(20, "gpt-4")
+
+    for _ in range(3):
+        budget.add("12345")
+
+    assert budget.total == 22
+    assert budget.exceeded
+    assert mock_count_message_tokens.call_count == 4
@@ -3,7 +3,8 @@ import pytest
 from typing import List
 from unittest.mock import MagicMock, patch
 from superagi.types.common import BaseMessage
-from superagi.helper.token_counter import TokenCounter
+from superagi.helper.token_counter import TokenCounter, get_encoding, get_encoding_for_model
+from superagi.llms.llm_registry import llm_registry
 from superagi.models.models import Models
 
 
@@ -21,9 +22,11 @@ def setup_model_token_limit():
     return model_token_limit_dict
 
 
-@patch.object(Models, "fetch_model_tokens", autospec=True)
-def test_token_limit(mock_fetch_model_tokens, setup_model_token_limit):
-    mock_fetch_model_tokens.return_value = setup_model_token_limit
+@patch.object(Models, "fetch_model_metadata", autospec=True)
+def test_token_limit(mock_fetch_model_metadata, setup_model_token_limit):
+    llm_registry.invalidate()
+    mock_fetch_model_metadata.return_value = [(model, token_limit, None)
+                                              for model, token_limit in setup_model_token_limit.items()]
 
     tc = TokenCounter(MagicMock(), 1)
 
@@ -31,6 +34,9 @@ def test_token_limit(mock_fetch_model_tokens, setup_model_token_limit):
         assert tc.token_limit(model) == expected_tokens
 
     assert tc.token_limit("non_existing_model") == 8092
+    # the models are read once, not on every call
+    mock_fetch_model_metadata.assert_called_once()
+    llm_registry.invalidate()
 
 
 def test_count_message_tokens():
@@ -52,4 +58,34 @@ def test_count_text_tokens():
     assert TokenCounter.count_text_tokens(text) == 10
 
     text = "What is your name?"
-    assert TokenCounter.count_text_tokens(text) == 9
\ No newline at end of file
+    assert TokenCounter.count_text_tokens(text) == 9
+
+@patch('superagi.helper.token_counter.tiktoken')
+def test_encodings_are_built_once(mock_tiktoken):
+    get_encoding_for_model.cache_clear()
+    get_encoding.cache_clear()
+    mock_tiktoken.get_encoding.return_value.encode.side_effect = lambda text: text.split()
+    try:
+        for _ in range(3):
+            TokenCounter.count_message_tokens([{'content': 'Hello there'}], "gpt-4")
+            TokenCounter.count_text_tokens('Hello there')
+
+        # gpt-4 uses the cl100k_base encoding of the text counts
+        mock_tiktoken.get_encoding.assert_called_once_with("cl100k_base")
+    finally:
+        get_encoding_for_model.cache_clear()
+        get_encoding.cache_clear()
+
+
+@patch('superagi.helper.token_counter.get_encoding_for_model')
+def test_count_message_tokens_uses_stored_token_count(mock_get_encoding_for_model):
+    encoding = mock_get_encoding_for_model.return_value
+    encoding.name = "cl100k_base"
+    encoding.encode.side_effect = lambda text: text.split()
+
+    token_count = TokenCounter.count_message_tokens([{'content': 'one two three', 'token_count': 10},
+                                                     {'content': 'one two three'}], "gpt-4")
+
+    # 3 tokens per message, 3 for the reply and only the message without a stored count is encoded
+    assert token_count == 3 + 10 + 3 + 3 + 3
+    encoding.encode.assert_called_once_with('one two three')
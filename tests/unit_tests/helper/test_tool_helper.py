@@ -110,6 +110,32 @@ def test_handle_tools_import():
         handle_tools_import()
         assert len(sys.path), initial_path_length + 2
 
+
+def test_handle_tools_import_keeps_sys_path_bounded():
+    handle_tools_import()
+    initial_path = list(sys.path)
+
+    for _ in range(5000):
+        handle_tools_import()
+    handle_tools_import(refresh=True)
+
+    assert sys.path == initial_path
+
+
+def test_handle_tools_import_refresh_adds_new_tools(tmp_path):
+    new_tool_dir = tmp_path / "new_toolkit"
+    new_tool_dir.mkdir()
+    handle_tools_import()
+    with patch('superagi.helper.tool_helper.TOOL_PATHS', [str(tmp_path)]):
+        handle_tools_import()
+        assert str(new_tool_dir) not in sys.path
+
+        handle_tools_import(refresh=True)
+        handle_tools_import(refresh=True)
+
+    assert sys.path.count(str(new_tool_dir)) == 1
+    sys.path.remove(str(new_tool_dir))
+
 def test_compare_tools():
     tool1 = {"name": "Tool A", "description": "This is Tool A"}
     tool2 = {"name": "Tool A", "description": "This is Tool A"}
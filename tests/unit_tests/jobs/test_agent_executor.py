@@ -0,0 +1,75 @@
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from superagi.agent.types.step_execution_result import StepExecutionResult
+from superagi.jobs.agent_executor import AgentExecutor
+
+
+@pytest.fixture
+def session_mock():
+    with patch('superagi.jobs.agent_executor.Session') as SessionMock, \
+            patch('superagi.jobs.agent_executor.engine'):
+        session = MagicMock()
+        SessionMock.return_value = session
+        yield session
+
+
+def _config(steps, time_slice=60):
+    values = {"AGENT_EXECUTION_MAX_STEPS_PER_TASK": steps, "AGENT_EXECUTION_TIME_SLICE": time_slice}
+    return lambda key, default=None: values.get(key, default)
+
+
+@patch('superagi.worker.execute_agent.apply_async')
+def test_execute_next_step_single_step_requeues_with_countdown(apply_async_mock, session_mock):
+    with patch('superagi.jobs.agent_executor.get_config', side_effect=_config(1)), \
+            patch.object(AgentExecutor, '_execute_step', return_value=StepExecutionResult.CONTINUE) as step_mock:
+        AgentExecutor().execute_next_step(agent_execution_id=1)
+
+    assert step_mock.call_count == 1
+    assert apply_async_mock.call_args.kwargs["countdown"] == 2
+    session_mock.close.assert_called_once()
+
+
+@patch('superagi.worker.execute_agent.apply_async')
+def test_execute_next_step_warm_mode_runs_steps_back_to_back(apply_async_mock, session_mock):
+    with patch('superagi.jobs.agent_executor.get_config', side_effect=_config(5)), \
+            patch.object(AgentExecutor, '_execute_step', return_value=StepExecutionResult.CONTINUE) as step_mock:
+        AgentExecutor().execute_next_step(agent_execution_id=1)
+
+    assert step_mock.call_count == 5
+    # the same warm resources are shared by all the steps of the task
+    assert len({id(call.args[2]) for call in step_mock.call_args_list}) == 1
+    assert apply_async_mock.call_count == 1
+    assert apply_async_mock.call_args.kwargs["countdown"] == 0
+
+
+@patch('superagi.worker.execute_agent.apply_async')
+def test_execute_next_step_warm_mode_stops_on_status_change(apply_async_mock, session_mock):
+    results = [StepExecutionResult.CONTINUE, StepExecutionResult.STOP]
+    with patch('superagi.jobs.agent_executor.get_config', side_effect=_config(5)), \
+            patch.object(AgentExecutor, '_execute_step', side_effect=results) as step_mock:
+        AgentExecutor().execute_next_step(agent_execution_id=1)
+
+    assert step_mock.call_count == 2
+    apply_async_mock.assert_not_called()
+
+
+@patch('superagi.worker.execute_agent.apply_async')
+def test_execute_next_step_warm_mode_retries_failed_step(apply_async_mock, session_mock):
+    with patch('superagi.jobs.agent_executor.get_config', side_effect=_config(5)), \
+            patch.object(AgentExecutor, '_execute_step', return_value=StepExecutionResult.RETRY) as step_mock:
+        AgentExecutor().execute_next_step(agent_execution_id=1)
+
+    assert step_mock.call_count == 1
+    assert apply_async_mock.call_args.kwargs["countdown"] == 15
+
+
+@patch('superagi.worker.execute_agent.apply_async')
+def test_execute_next_step_warm_mode_yields_after_time_slice(apply_async_mock, session_mock):
+    with patch('superagi.jobs.agent_executor.get_config', side_effect=_config(5, time_slice=0)), \
+            patch.object(AgentExecutor, '_execute_step', return_value=StepExecutionResult.CONTINUE) as step_mock:
+        AgentExecutor().execute_next_step(agent_execution_id=1)
+
+    assert step_mock.call_count == 1
+    assert apply_async_mock.call_args.kwargs["countdown"] == 0
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from superagi.agent.pending_completion import PendingCompletion
+from superagi.agent.types.step_execution_result import StepExecutionResult
+from superagi.jobs.async_agent_runner import AsyncAgentRunner, MAX_CONSECUTIVE_FAILURES, \
+    requeue_orphaned_executions
+
+
+def test_run_drives_executions_concurrently():
+    runner = AsyncAgentRunner(max_concurrency=10, retry_delay=0)
+    steps = {}
+    in_flight = []
+    max_in_flight = []
+    lock = threading.Lock()
+
+    async def run_step(agent_execution_id, warm_resources):
+        with lock:
+            in_flight.append(agent_execution_id)
+            max_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.05)
+        with lock:
+            in_flight.remove(agent_execution_id)
+            steps[agent_execution_id] = steps.get(agent_execution_id, 0) + 1
+            return StepExecutionResult.STOP if steps[agent_execution_id] == 3 else StepExecutionResult.CONTINUE
+
+    with patch.object(runner, '_run_step', side_effect=run_step):
+        asyncio.run(runner.run(list(range(10))))
+
+    assert steps == {agent_execution_id: 3 for agent_execution_id in range(10)}
+    assert max(max_in_flight) > 1
+
+
+def test_run_execution_retries_failed_step():
+    runner = AsyncAgentRunner(max_concurrency=1, retry_delay=0)
+    results = [StepExecutionResult.RETRY, StepExecutionResult.CONTINUE, StepExecutionResult.STOP]
+
+    with patch.object(runner, '_run_step', side_effect=results) as run_step_mock:
+        asyncio.run(runner.run_execution(1))
+
+    assert run_step_mock.call_count == 3
+    # the warm resources are kept for the whole execution
+    assert len({id(call.args[1]) for call in run_step_mock.call_args_list}) == 1
+
+
+def test_run_execution_gives_up_after_consecutive_failures():
+    runner = AsyncAgentRunner(max_concurrency=1, retry_delay=0)
+
+    with patch.object(runner, '_run_step', side_effect=Exception("db down")) as run_step_mock:
+        asyncio.run(runner.run_execution(1))
+
+    assert run_step_mock.call_count == MAX_CONSECUTIVE_FAILURES
+
+
+def test_submit_does_not_schedule_running_execution_twice():
+    leases = MagicMock()
+    runner = AsyncAgentRunner(max_concurrency=2, retry_delay=0, leases=leases)
+    release = threading.Event()
+
+    async def run_step(agent_execution_id, warm_resources):
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return StepExecutionResult.STOP
+
+    with patch.object(runner, '_run_step', side_effect=run_step) as run_step_mock:
+        runner.start()
+        runner.submit(1)
+        runner.submit(1)
+        time.sleep(0.1)
+        assert runner.running_executions == [1]
+        release.set()
+        for _ in range(50):
+            if not runner.running_executions:
+                break
+            time.sleep(0.02)
+
+    assert run_step_mock.call_count == 1
+    assert runner.running_executions == []
+    # the execution is leased while the runner drives it
+    leases.renew.assert_any_call([1])
+    leases.release.assert_called_once_with(1)
+
+
+def test_heartbeat_renews_leases_of_running_executions():
+    leases = MagicMock()
+    runner = AsyncAgentRunner(max_concurrency=1, retry_delay=0, leases=leases, heartbeat_interval=0.02)
+    release = threading.Event()
+
+    async def run_step(agent_execution_id, warm_resources):
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return StepExecutionResult.STOP
+
+    with patch.object(runner, '_run_step', side_effect=run_step):
+        runner.start()
+        runner.submit(7)
+        time.sleep(0.1)
+        release.set()
+
+    assert leases.renew.call_count > 2
+    leases.renew.assert_any_call([7])
+
+
+def _llm(**kwargs):
+    llm = MagicMock()
+    llm.achat_completion = AsyncMock(**kwargs)
+    return llm
+
+
+@patch('superagi.jobs.agent_executor.Session')
+def test_run_step_awaits_the_llm_call_on_the_event_loop(mock_session):
+    runner = AsyncAgentRunner(max_concurrency=1, retry_delay=0)
+    llm = _llm(return_value={"content": "reply"})
+    replies = []
+
+    def iter_step(session, agent_execution_id, warm_resources):
+        replies.append((yield PendingCompletion(llm, [{"role": "user", "content": "hi"}], 100)))
+        return StepExecutionResult.CONTINUE
+
+    with patch('superagi.jobs.agent_executor.AgentExecutor._iter_step', side_effect=iter_step):
+        step_result = asyncio.run(runner._run_step(1, {}))
+
+    assert step_result == StepExecutionResult.CONTINUE
+    assert replies == [{"content": "reply"}]
+    llm.achat_completion.assert_awaited_once_with([{"role": "user", "content": "hi"}], 100)
+    llm.chat_completion.assert_not_called()
+    # the transaction is ended before waiting on the llm
+    mock_session.return_value.commit.assert_called_once()
+    mock_session.return_value.close.assert_called_once()
+
+
+@patch('superagi.jobs.agent_executor.Session')
+def test_run_step_raises_llm_errors_in_the_step(mock_session):
+    runner = AsyncAgentRunner(max_concurrency=1, retry_delay=0)
+    llm = _llm(side_effect=TimeoutError("llm timed out"))
+
+    def iter_step(session, agent_execution_id, warm_resources):
+        try:
+            yield PendingCompletion(llm, [], 100)
+        except TimeoutError:
+            return StepExecutionResult.RETRY
+        return StepExecutionResult.CONTINUE
+
+    with patch('superagi.jobs.agent_executor.AgentExecutor._iter_step', side_effect=iter_step):
+        assert asyncio.run(runner._run_step(1, {})) == StepExecutionResult.RETRY
+
+    mock_session.return_value.close.assert_called_once()
+
+
+@patch('superagi.jobs.execution_scheduler.schedule_agent_execution')
+def test_requeue_orphaned_executions(mock_schedule):
+    leases = MagicMock()
+    leases.claim_expired.return_value = [3, 4]
+
+    assert requeue_orphaned_executions(leases) == [3, 4]
+
+    assert [call.args[0] for call in mock_schedule.call_args_list] == [3, 4]
@@ -0,0 +1,169 @@
+from unittest.mock import patch, ANY
+
+import pytest
+
+from superagi.jobs.execution_scheduler import FairShareScheduler, InMemorySchedulerBroker, schedule_agent_execution
+
+
+@pytest.fixture
+def dispatched():
+    return []
+
+
+def _scheduler(dispatched, **kwargs):
+    options = {"max_running": 1, "max_running_per_tenant": 1, "weights": {}, "by_project": False, "lease": 900}
+    options.update(kwargs)
+    return FairShareScheduler(broker=InMemorySchedulerBroker(), dispatch_task=dispatched.append, **options)
+
+
+def _run_to_completion(scheduler, dispatched):
+    """Each dispatched execution runs one step and finishes, freeing its slot."""
+    served = 0
+    while served < len(dispatched):
+        scheduler.release(dispatched[served])
+        scheduler.dispatch()
+        served += 1
+
+
+def test_dispatch_interleaves_organisations(dispatched):
+    scheduler = _scheduler(dispatched)
+    for agent_execution_id in range(100, 110):
+        scheduler.schedule(agent_execution_id, organisation_id=1)
+    scheduler.schedule(200, organisation_id=2)
+    scheduler.schedule(201, organisation_id=2)
+
+    _run_to_completion(scheduler, dispatched)
+
+    assert sorted(dispatched) == list(range(100, 110)) + [200, 201]
+    # the second organisation does not wait behind the ten executions of the first one
+    assert dispatched.index(201) < 5
+
+
+def test_dispatch_respects_weights(dispatched):
+    scheduler = _scheduler(dispatched, weights={1: 2})
+    for agent_execution_id in range(100, 110):
+        scheduler.schedule(agent_execution_id, organisation_id=1)
+    for agent_execution_id in range(200, 210):
+        scheduler.schedule(agent_execution_id, organisation_id=2)
+
+    _run_to_completion(scheduler, dispatched)
+
+    first_nine = dispatched[:9]
+    assert len([agent_execution_id for agent_execution_id in first_nine if agent_execution_id < 200]) == 6
+
+
+def test_dispatch_caps_running_executions(dispatched):
+    scheduler = _scheduler(dispatched, max_running=3, max_running_per_tenant=2)
+    for agent_execution_id in range(100, 105):
+        scheduler.schedule(agent_execution_id, organisation_id=1)
+
+    assert dispatched == [100, 101]
+
+    scheduler.schedule(200, organisation_id=2)
+    scheduler.schedule(201, organisation_id=2)
+    assert dispatched == [100, 101, 200]
+
+    scheduler.release(100)
+    scheduler.dispatch()
+    assert dispatched == [100, 101, 200, 102]
+
+
+def test_schedule_by_project(dispatched):
+    scheduler = _scheduler(dispatched, max_running=10, max_running_per_tenant=1, by_project=True)
+    scheduler.schedule(100, organisation_id=1, project_id=1)
+    scheduler.schedule(101, organisation_id=1, project_id=1)
+    scheduler.schedule(102, organisation_id=1, project_id=2)
+
+    assert dispatched == [100, 102]
+    assert scheduler.queue_depths(organisation_id=1) == {
+        "1:1": {"queued": 1, "ready": 1, "running": 1},
+        "1:2": {"queued": 0, "ready": 0, "running": 1},
+    }
+
+
+def test_countdown_delays_dispatch(dispatched):
+    scheduler = _scheduler(dispatched, max_running=10)
+    scheduler.schedule(100, organisation_id=1, countdown=60)
+
+    assert dispatched == []
+    assert scheduler.queue_depths() == {"1": {"queued": 1, "ready": 0, "running": 0}}
+
+
+def test_requeued_running_execution_waits_for_its_slot(dispatched):
+    scheduler = _scheduler(dispatched, max_running=10, max_running_per_tenant=10)
+    scheduler.schedule(100, organisation_id=1)
+    # the task of the execution re-queues it before finishing, the organisation is remembered
+    scheduler.schedule(100)
+
+    assert dispatched == [100]
+
+    scheduler.release(100)
+    scheduler.dispatch()
+    assert dispatched == [100, 100]
+
+
+def test_expired_lease_frees_the_slot(dispatched):
+    scheduler = _scheduler(dispatched, lease=-1)
+    scheduler.schedule(100, organisation_id=1)
+    scheduler.schedule(101, organisation_id=1)
+
+    assert dispatched == [100, 101]
+
+
+@patch('superagi.jobs.execution_scheduler.is_fair_share_enabled', return_value=False)
+@patch('superagi.worker.execute_agent')
+def test_schedule_agent_execution_without_fair_share(execute_agent_mock, _):
+    schedule_agent_execution(1)
+    schedule_agent_execution(2, countdown=15)
+
+    execute_agent_mock.delay.assert_called_once_with(1, ANY)
+    execute_agent_mock.apply_async.assert_called_once_with((2, ANY), countdown=15)
+
+
+def test_release_forgets_completed_execution(dispatched):
+    scheduler = _scheduler(dispatched, max_running=10)
+    scheduler.schedule(100, organisation_id=1)
+    scheduler.schedule(101, organisation_id=1)
+    scheduler.schedule(102, organisation_id=1, countdown=60)
+    # the step of 101 queued its next step before its task finished
+    scheduler.schedule(101, organisation_id=1, countdown=60)
+
+    scheduler.release(100)
+    scheduler.release(101)
+
+    assert scheduler.broker.get_tenant(100) is None
+    assert scheduler.broker.get_tenant(101) == "1"
+    assert scheduler.broker.get_virtual_time("1") > 0
+
+
+def test_release_forgets_virtual_time_of_idle_tenant(dispatched):
+    scheduler = _scheduler(dispatched)
+    scheduler.schedule(100, organisation_id=1)
+
+    scheduler.release(100)
+
+    assert scheduler.broker.get_tenant(100) is None
+    assert scheduler.broker._virtual_times == {}
+
+
+@pytest.mark.parametrize("value, expected", [("False", False), ("false", False), ("True", True), (True, True),
+                                             (None, False)])
+def test_by_project_setting(value, expected):
+    config = {"AGENT_SCHEDULER_BY_PROJECT": value}
+    with patch('superagi.config.config._config_instance.get_config',
+               side_effect=lambda key, default=None: config.get(key, default)):
+        scheduler = FairShareScheduler(broker=InMemorySchedulerBroker(), dispatch_task=list().append)
+
+    assert scheduler.by_project is expected
+
+
+@pytest.mark.parametrize("value, expected", [('{"1": 2, "2": 0.5}', 2), ("1: 2\n2: 0.5", 2), ({1: 2}, 2),
+                                             ("not: [valid", 1), (None, 1)])
+def test_weights_setting(value, expected):
+    config = {"AGENT_SCHEDULER_WEIGHTS": value}
+    with patch('superagi.config.config._config_instance.get_config',
+               side_effect=lambda key, default=None: config.get(key, default)):
+        scheduler = FairShareScheduler(broker=InMemorySchedulerBroker(), dispatch_task=list().append)
+
+    assert scheduler.weight_of("1") == expected
+    assert scheduler.weight_of("3") == 1
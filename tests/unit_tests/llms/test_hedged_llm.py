@@ -0,0 +1,225 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from superagi.llms.hedged_llm import HedgedLlm, get_hedged_llm_executor, hedged_llm_stats, with_hedged_models
+from superagi.llms.llm_response_cache import response_cache_key
+
+
+class FakeLlm:
+    """Llm answering once its release event is set, immediately when it has none."""
+
+    def __init__(self, model, content="reply", error=None, release=None):
+        self.model = model
+        self.content = content
+        self.error = error
+        self.release = release
+        self.started = threading.Event()
+        self.temperature = 0.6
+
+    def chat_completion(self, messages, max_tokens=None):
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            return {"error": "ERROR", "message": self.error}
+        return {"content": self.content + " from " + self.model}
+
+    def get_source(self):
+        return "fake"
+
+    def get_model(self):
+        return self.model
+
+    def get_api_key(self):
+        return "test_key"
+
+
+@pytest.fixture(autouse=True)
+def reset_hedged_llm_stats():
+    hedged_llm_stats.reset()
+    yield
+    hedged_llm_stats.reset()
+
+
+@pytest.fixture
+def slow_release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def _messages():
+    return [{"role": "system", "content": "Hello"}]
+
+
+def test_fast_primary_is_not_hedged():
+    primary, fallback = FakeLlm("primary"), FakeLlm("fallback")
+    hedged_llm = HedgedLlm([primary, fallback], initial_delay=5)
+
+    assert hedged_llm.chat_completion(_messages(), 100)["content"] == "reply from primary"
+    assert not fallback.started.is_set()
+    assert hedged_llm.wins == {"fake:primary": 1}
+
+
+def test_slow_primary_is_hedged(slow_release):
+    primary, fallback = FakeLlm("primary", release=slow_release), FakeLlm("fallback")
+    hedged_llm = HedgedLlm([primary, fallback], initial_delay=0.01)
+
+    response = hedged_llm.chat_completion(_messages(), 100)
+
+    assert response["content"] == "reply from fallback"
+    assert primary.started.is_set()
+    assert hedged_llm.wins == {"fake:fallback": 1}
+
+
+def test_failed_primary_fails_over_without_delay():
+    primary, fallback = FakeLlm("primary", error="Rate limit"), FakeLlm("fallback")
+    hedged_llm = HedgedLlm([primary, fallback], initial_delay=30)
+
+    start = time.monotonic()
+    response = hedged_llm.chat_completion(_messages(), 100)
+
+    assert response["content"] == "reply from fallback"
+    assert time.monotonic() - start < 5
+
+
+def test_primary_still_wins_after_hedge(slow_release):
+    fallback_release = threading.Event()
+    primary = FakeLlm("primary", release=slow_release)
+    fallback = FakeLlm("fallback", release=fallback_release)
+    hedged_llm = HedgedLlm([primary, fallback], initial_delay=0.01)
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(hedged_llm.chat_completion(_messages(), 100)))
+    thread.start()
+    assert fallback.started.wait(5)
+    slow_release.set()
+    thread.join(5)
+    fallback_release.set()
+
+    assert result["content"] == "reply from primary"
+    assert hedged_llm.wins == {"fake:primary": 1}
+
+
+def test_all_failures_return_last_error():
+    hedged_llm = HedgedLlm([FakeLlm("primary", error="Timeout"), FakeLlm("fallback", error="Overloaded")],
+                           initial_delay=30)
+
+    assert hedged_llm.chat_completion(_messages(), 100) == {"error": "ERROR", "message": "Overloaded"}
+
+
+def test_exceptions_are_failures():
+    primary = FakeLlm("primary")
+    primary.chat_completion = MagicMock(side_effect=ConnectionError("reset"))
+    hedged_llm = HedgedLlm([primary, FakeLlm("fallback")], initial_delay=30)
+
+    assert hedged_llm.chat_completion(_messages(), 100)["content"] == "reply from fallback"
+
+
+def test_hedge_delay_uses_latency_percentile():
+    hedged_llm = HedgedLlm([FakeLlm("primary"), FakeLlm("fallback")], percentile=90, initial_delay=30,
+                           min_samples=10)
+    for latency in range(1, 10):
+        hedged_llm.record_latency(latency)
+    assert hedged_llm.hedge_delay() == 30
+
+    hedged_llm.record_latency(10)
+    assert hedged_llm.hedge_delay() == 9
+
+
+def test_primary_latency_is_recorded():
+    hedged_llm = HedgedLlm([FakeLlm("primary"), FakeLlm("fallback")], initial_delay=30, min_samples=1)
+
+    hedged_llm.chat_completion(_messages(), 100)
+
+    # the latency is recorded by the worker thread once the call is done
+    deadline = time.monotonic() + 5
+    while hedged_llm.hedge_delay() == 30 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert hedged_llm.hedge_delay() < 5
+
+
+def test_stats_and_executor_are_shared_by_hedged_llms():
+    primary = FakeLlm("primary")
+    hedged_llm = HedgedLlm([primary, FakeLlm("fallback")], initial_delay=30, min_samples=1)
+    hedged_llm.record_latency(2)
+
+    # the hedged llm built for the next execution of the agent
+    next_hedged_llm = HedgedLlm([FakeLlm("primary"), FakeLlm("fallback")], initial_delay=30, min_samples=1)
+    next_hedged_llm.chat_completion(_messages(), 100)
+
+    assert next_hedged_llm.hedge_delay() == 2
+    assert hedged_llm.wins == {"fake:primary": 1}
+    assert get_hedged_llm_executor() is get_hedged_llm_executor()
+
+
+def test_stream_chat_completion_yields_winning_response(slow_release):
+    hedged_llm = HedgedLlm([FakeLlm("primary", release=slow_release), FakeLlm("fallback")], initial_delay=0.01)
+
+    assert list(hedged_llm.stream_chat_completion(_messages(), 100)) == ["reply from fallback"]
+
+
+def test_stream_chat_completion_raises_when_all_fail():
+    hedged_llm = HedgedLlm([FakeLlm("primary", error="Timeout"), FakeLlm("fallback", error="Overloaded")],
+                           initial_delay=30)
+
+    with pytest.raises(RuntimeError, match="Overloaded"):
+        list(hedged_llm.stream_chat_completion(_messages(), 100))
+
+
+def test_hedged_llm_reads_primary_attributes():
+    hedged_llm = HedgedLlm([FakeLlm("primary"), FakeLlm("fallback")])
+
+    assert hedged_llm.get_model() == "primary"
+    assert hedged_llm.temperature == 0.6
+    assert response_cache_key(hedged_llm, _messages(), 100) == response_cache_key(FakeLlm("primary"), _messages(),
+                                                                                  100)
+
+
+@patch('superagi.llms.llm_model_factory.get_model')
+def test_with_hedged_models(mock_get_model):
+    primary = FakeLlm("primary")
+    execution_context = MagicMock()
+    execution_context.get_model_config.return_value = {"provider": "Replicate", "api_key": "replicate_key"}
+    execution_context.organisation.id = 1
+
+    assert with_hedged_models(primary, {"hedge_models": None}, execution_context) is primary
+    hedged_llm = with_hedged_models(primary, {"hedge_models": ["llama-2"]}, execution_context)
+
+    assert hedged_llm.llms == [primary, mock_get_model.return_value]
+    mock_get_model.assert_called_once_with(model="llama-2", api_key="replicate_key", organisation_id=1)
+
+
+@patch('superagi.llms.llm_model_factory.get_model')
+def test_with_hedged_models_skips_misconfigured_models(mock_get_model):
+    primary = FakeLlm("primary")
+    execution_context = MagicMock()
+    execution_context.get_model_config.side_effect = lambda model: {"api_key": "replicate_key"} \
+        if model == "llama-2" else None
+    execution_context.organisation.id = 1
+
+    assert with_hedged_models(primary, {"hedge_models": ["unknown-model"]}, execution_context) is primary
+    hedged_llm = with_hedged_models(primary, {"hedge_models": ["unknown-model", "llama-2"]}, execution_context)
+
+    assert hedged_llm.llms == [primary, mock_get_model.return_value]
+
+
+def test_running_loser_finishes_in_the_background(slow_release):
+    primary, fallback = FakeLlm("primary", release=slow_release), FakeLlm("fallback")
+    hedged_llm = HedgedLlm([primary, fallback], initial_delay=0.01)
+
+    start = time.monotonic()
+    assert hedged_llm.chat_completion(_messages(), 100)["content"] == "reply from fallback"
+    assert time.monotonic() - start < 5
+    assert hedged_llm_stats.latencies("fake:primary") == []
+
+    slow_release.set()
+    for _ in range(100):
+        if hedged_llm_stats.latencies("fake:primary"):
+            break
+        time.sleep(0.01)
+    # the primary was not cancelled, its latency still counts for the hedge delay
+    assert len(hedged_llm_stats.latencies("fake:primary")) == 1
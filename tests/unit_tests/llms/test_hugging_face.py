@@ -40,9 +40,10 @@ class TestHuggingFace(TestCase):
 #         )
 #         assert result == {"response": {0: {"generated_text": "Sure, I can help with that."}}, "content": "Sure, I can help with that."}
 
-    @patch.object(requests, "get")
-    def test_verify_access_key(self, mock_get):
+    @patch("superagi.llms.hugging_face.get_http_session")
+    def test_verify_access_key(self, mock_get_http_session):
         # Arrange
+        mock_get = mock_get_http_session.return_value.get
         api_key = 'test_api_key'
         model = 'test_model'
         end_point = 'test_end_point'
@@ -56,9 +57,10 @@ class TestHuggingFace(TestCase):
         mock_get.assert_called_with(ACCOUNT_VERIFICATION_URL, headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
         assert result is True
 
-    @patch.object(requests, "post")
-    def test_verify_end_point(self, mock_post):
+    @patch("superagi.llms.hugging_face.get_http_session")
+    def test_verify_end_point(self, mock_get_http_session):
         # Arrange
+        mock_post = mock_get_http_session.return_value.post
         api_key = 'test_api_key'
         model = 'test_model'
         end_point = 'test_end_point'
@@ -0,0 +1,122 @@
+from unittest.mock import MagicMock, patch
+
+import openai
+import pytest
+
+from superagi.llms.llm_dispatcher import LlmDispatcher, InMemoryRateLimitStore, take_from_bucket
+from superagi.llms.openai import OpenAi
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _dispatcher(clock, limits=None):
+    return LlmDispatcher(store=InMemoryRateLimitStore(), limits=limits or {}, max_wait=120, clock=clock.time,
+                         sleep=clock.sleep)
+
+
+def test_take_from_bucket_waits_for_the_token_budget():
+    state = {}
+
+    assert take_from_bucket(state, 0, 0, 600, 500) == 0
+    # 100 tokens left, 400 more are refilled in 40 seconds at 10 tokens per second
+    assert take_from_bucket(state, 0, 0, 600, 500) == pytest.approx(40)
+    assert take_from_bucket(state, 40, 0, 600, 500) == 0
+
+
+def test_acquire_spaces_requests_by_the_request_budget(clock):
+    dispatcher = _dispatcher(clock, {"gpt-4": {"requests_per_minute": 2}})
+
+    assert dispatcher.acquire("key", "gpt-4", 0) == 0
+    assert dispatcher.acquire("key", "gpt-4", 0) == 0
+    assert dispatcher.acquire("key", "gpt-4", 0) == pytest.approx(30)
+    # other api keys have their own budget
+    assert dispatcher.acquire("other key", "gpt-4", 0) == 0
+
+
+@pytest.mark.parametrize("value", ['{"gpt-4": {"requests_per_minute": 2}}', "gpt-4: {requests_per_minute: 2}",
+                                   {"gpt-4": {"requests_per_minute": 2}}])
+def test_rate_limits_setting(clock, value):
+    config = {"LLM_RATE_LIMITS": value}
+    with patch('superagi.config.config._config_instance.get_config',
+               side_effect=lambda key, default=None: config.get(key, default)):
+        dispatcher = LlmDispatcher(store=InMemoryRateLimitStore(), max_wait=120, clock=clock.time, sleep=clock.sleep)
+
+    assert dispatcher.limits == {"gpt-4": {"requests_per_minute": 2}}
+    dispatcher.acquire("key", "gpt-4", 0)
+    dispatcher.acquire("key", "gpt-4", 0)
+    assert dispatcher.acquire("key", "gpt-4", 0) == pytest.approx(30)
+
+
+def test_invalid_rate_limits_setting_is_ignored(clock):
+    with patch('superagi.config.config._config_instance.get_config',
+               side_effect=lambda key, default=None: "not: [valid" if key == "LLM_RATE_LIMITS" else default):
+        dispatcher = LlmDispatcher(store=InMemoryRateLimitStore(), max_wait=120, clock=clock.time, sleep=clock.sleep)
+
+    assert dispatcher.limits == {}
+    assert dispatcher.acquire("key", "gpt-4", 0) == 0
+
+
+def test_acquire_waits_after_rate_limit_error(clock):
+    dispatcher = _dispatcher(clock)
+
+    dispatcher.penalize("key", "gpt-4", retry_after=7)
+
+    assert dispatcher.acquire("key", "gpt-4", 100) == pytest.approx(7)
+    assert dispatcher.acquire("key", "gpt-4", 100) == 0
+
+
+def test_acquire_gives_up_after_max_wait(clock):
+    dispatcher = _dispatcher(clock)
+    dispatcher.penalize("key", "gpt-4", retry_after=500)
+
+    assert dispatcher.acquire("key", "gpt-4", 100) == pytest.approx(120)
+
+
+def test_record_usage_corrects_the_estimate(clock):
+    dispatcher = _dispatcher(clock, {"gpt-4": {"tokens_per_minute": 600}})
+
+    dispatcher.acquire("key", "gpt-4", 100)
+    dispatcher.record_usage("key", "gpt-4", 100, 600)
+
+    # the call used the whole budget, the next one waits for 100 tokens to be refilled
+    assert dispatcher.acquire("key", "gpt-4", 100) == pytest.approx(10)
+
+
+@patch('superagi.llms.openai.wait_random_exponential.__call__', return_value=0)
+@patch('superagi.llms.openai.openai')
+def test_chat_completion_against_rate_limited_llm(mock_openai, _, clock):
+    dispatcher = _dispatcher(clock)
+    openai_instance = OpenAi('test_key', model='gpt-4', dispatcher=dispatcher)
+    response = MagicMock()
+    response.choices[0].message = {"content": "done"}
+    mock_openai.ChatCompletion.create.side_effect = [
+        openai.error.RateLimitError("Rate limit reached", headers={"retry-after": "7"}),
+        openai.error.RateLimitError("Rate limit reached", headers={"retry-after": "3"}),
+        response
+    ]
+
+    result = openai_instance.chat_completion([{"role": "user", "content": "Hi"}], 100)
+
+    assert result["content"] == "done"
+    assert mock_openai.ChatCompletion.create.call_count == 3
+    # the calls waited the retry-after times of the errors instead of backing off for minutes
+    assert clock.sleeps == [pytest.approx(7), pytest.approx(3)]
+    # the credentials are passed with every request rather than through the module global
+    assert all(call.kwargs["api_key"] == 'test_key' for call in mock_openai.ChatCompletion.create.call_args_list)
+    assert mock_openai.api_key != 'test_key'
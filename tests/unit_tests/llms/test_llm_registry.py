@@ -0,0 +1,103 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from superagi.llms.llm_model_factory import get_model
+from superagi.llms.llm_registry import LLMRegistry
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+
+@pytest.fixture
+def registry():
+    return LLMRegistry(ttl=300, db=FakeRedis())
+
+
+def test_get_or_create_reuses_value(registry):
+    factory = MagicMock(return_value="llm")
+
+    assert registry.get_or_create(1, ("client", "gpt-4"), factory) == "llm"
+    assert registry.get_or_create(1, ("client", "gpt-4"), factory) == "llm"
+    factory.assert_called_once()
+
+
+def test_get_or_create_does_not_register_none(registry):
+    factory = MagicMock(return_value=None)
+
+    registry.get_or_create(1, ("client", "unknown"), factory)
+    registry.get_or_create(1, ("client", "unknown"), factory)
+    assert factory.call_count == 2
+
+
+def test_get_or_create_recreates_expired_value():
+    registry = LLMRegistry(ttl=0, db=FakeRedis())
+    factory = MagicMock(side_effect=["first", "second"])
+
+    assert registry.get_or_create(1, ("client", "gpt-4"), factory) == "first"
+    assert registry.get_or_create(1, ("client", "gpt-4"), factory) == "second"
+
+
+def test_invalidate_only_drops_organisation_values(registry):
+    registry.get_or_create(1, ("client", "gpt-4"), lambda: "org 1")
+    registry.get_or_create(2, ("client", "gpt-4"), lambda: "org 2")
+
+    registry.invalidate(1)
+
+    assert registry.get_or_create(1, ("client", "gpt-4"), lambda: "org 1 new") == "org 1 new"
+    assert registry.get_or_create(2, ("client", "gpt-4"), lambda: "org 2 new") == "org 2"
+
+
+def test_invalidation_reaches_other_processes():
+    db = FakeRedis()
+    api_registry = LLMRegistry(ttl=300, db=db, version_check_interval=0)
+    worker_registry = LLMRegistry(ttl=300, db=db, version_check_interval=0)
+    assert worker_registry.get_or_create(1, ("client", "gpt-4", "old_key"), lambda: "old client") == "old client"
+    assert worker_registry.get_or_create(2, ("client", "gpt-4", "key"), lambda: "org 2") == "org 2"
+
+    # the api server stores the new api key of the organisation
+    api_registry.invalidate(1)
+
+    assert worker_registry.get_or_create(1, ("client", "gpt-4", "old_key"), lambda: "new client") == "new client"
+    assert worker_registry.get_or_create(2, ("client", "gpt-4", "key"), lambda: "org 2 new") == "org 2"
+
+
+def test_registry_works_without_redis():
+    db = MagicMock()
+    db.get.side_effect = ConnectionError("redis is down")
+    db.incr.side_effect = ConnectionError("redis is down")
+    registry = LLMRegistry(ttl=300, db=db, version_check_interval=0)
+    factory = MagicMock(return_value="llm")
+
+    registry.get_or_create(1, ("client", "gpt-4"), factory)
+    registry.get_or_create(1, ("client", "gpt-4"), factory)
+    registry.invalidate(1)
+    registry.get_or_create(1, ("client", "gpt-4"), factory)
+
+    assert factory.call_count == 2
+
+
+@patch('superagi.llms.llm_model_factory.OpenAi')
+@patch('superagi.llms.llm_model_factory._fetch_model_details')
+def test_get_model_resolves_model_once(mock_fetch_model_details, mock_openai):
+    mock_fetch_model_details.return_value = {"provider": "OpenAI", "model_name": "gpt-4", "version": "",
+                                             "end_point": "", "context_length": None}
+    with patch('superagi.llms.llm_model_factory.llm_registry', LLMRegistry(ttl=300, db=FakeRedis())):
+        first = get_model(organisation_id=1, api_key="key", model="gpt-4")
+        second = get_model(organisation_id=1, api_key="key", model="gpt-4")
+        tool_llm = get_model(organisation_id=1, api_key="key", model="gpt-4", temperature=0.4)
+
+    assert first is second
+    mock_fetch_model_details.assert_called_once_with(1, "gpt-4")
+    assert mock_openai.call_count == 2
+    mock_openai.assert_called_with(model="gpt-4", api_key="key", temperature=0.4)
+    assert tool_llm is mock_openai.return_value
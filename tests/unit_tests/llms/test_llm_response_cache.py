@@ -0,0 +1,185 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from superagi.llms.llm_response_cache import CachedLlm, DiskResponseCache, RedisResponseCache, ResponseCacheMetrics, \
+    response_cache_key, response_cache_metrics, with_llm_response_cache
+from superagi.llms.openai import OpenAi
+
+
+class InMemoryCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, content, ttl):
+        self.entries[key] = content
+
+
+@pytest.fixture
+def llm():
+    llm = OpenAi(api_key="test_key", model="gpt-4", temperature=0.4)
+    llm.chat_completion = MagicMock(return_value={"response": object(), "content": "reply"})
+    return llm
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    response_cache_metrics.reset()
+    yield
+    response_cache_metrics.reset()
+
+
+def _messages(content="Hello"):
+    return [{"role": "system", "content": content}]
+
+
+def test_repeated_completion_is_served_from_cache(llm):
+    cached_llm = CachedLlm(llm, cache=InMemoryCache(), ttl=60)
+
+    first = cached_llm.chat_completion(_messages(), 100)
+    second = cached_llm.chat_completion(_messages(), 100)
+
+    assert first["content"] == second["content"] == "reply"
+    assert second["cached"] is True
+    llm.chat_completion.assert_called_once()
+    assert response_cache_metrics.hits == 1
+    assert response_cache_metrics.hit_rate == 0.5
+
+
+def test_async_completion_shares_the_cache(llm):
+    llm.achat_completion = AsyncMock(return_value={"response": object(), "content": "reply"})
+    cached_llm = CachedLlm(llm, cache=InMemoryCache(), ttl=60)
+
+    first = asyncio.run(cached_llm.achat_completion(_messages(), 100))
+    second = cached_llm.chat_completion(_messages(), 100)
+
+    assert first["content"] == second["content"] == "reply"
+    assert second["cached"] is True
+    llm.achat_completion.assert_awaited_once()
+    llm.chat_completion.assert_not_called()
+
+
+def test_errors_are_not_cached(llm):
+    llm.chat_completion.return_value = {"error": "ERROR_OPENAI", "message": "Open ai exception"}
+    cached_llm = CachedLlm(llm, cache=InMemoryCache(), ttl=60)
+
+    cached_llm.chat_completion(_messages(), 100)
+    cached_llm.chat_completion(_messages(), 100)
+
+    assert llm.chat_completion.call_count == 2
+
+
+def test_cache_key_normalizes_messages(llm):
+    key = response_cache_key(llm, _messages("Hello"), 100)
+
+    assert response_cache_key(llm, [{"role": "system", "content": "Hello\n", "token_count": 3}], 100) == key
+    assert response_cache_key(llm, _messages("Hello there"), 100) != key
+    assert response_cache_key(llm, _messages("Hello"), 200) != key
+
+
+def test_cache_key_includes_model_and_sampling_parameters(llm):
+    key = response_cache_key(llm, _messages(), 100)
+
+    assert response_cache_key(OpenAi(api_key="test_key", model="gpt-4", temperature=0.9), _messages(), 100) != key
+    assert response_cache_key(OpenAi(api_key="test_key", model="gpt-3.5-turbo", temperature=0.4),
+                              _messages(), 100) != key
+    # the api key is not part of the request
+    assert response_cache_key(OpenAi(api_key="other_key", model="gpt-4", temperature=0.4), _messages(), 100) == key
+
+
+def test_stream_yields_cached_content(llm):
+    cached_llm = CachedLlm(llm, cache=InMemoryCache(), ttl=60)
+
+    assert list(cached_llm.stream_chat_completion(_messages(), 100)) == ["reply"]
+    assert list(cached_llm.stream_chat_completion(_messages(), 100)) == ["reply"]
+    llm.chat_completion.assert_called_once()
+
+
+def test_cached_llm_delegates_to_llm(llm):
+    cached_llm = CachedLlm(llm, cache=InMemoryCache())
+
+    assert cached_llm.get_model() == "gpt-4"
+    assert cached_llm.get_source() == llm.get_source()
+    assert cached_llm.temperature == 0.4
+
+
+def test_with_llm_response_cache_is_opt_in(llm):
+    assert with_llm_response_cache(llm, {"llm_response_cache": False}) is llm
+    assert with_llm_response_cache(llm, {}) is llm
+
+    with patch('superagi.llms.llm_response_cache.build_response_cache', return_value=InMemoryCache()):
+        cached_llm = with_llm_response_cache(llm, {"llm_response_cache": True, "llm_response_cache_ttl": 120})
+
+    assert isinstance(cached_llm, CachedLlm)
+    assert cached_llm.ttl == 120
+    assert with_llm_response_cache(cached_llm, {"llm_response_cache": True}) is cached_llm
+
+
+def test_disk_cache_expires_entries(tmp_path):
+    cache = DiskResponseCache(str(tmp_path))
+    cache.set("llm_response:abcdef", "reply", 60)
+    cache.set("llm_response:123456", "old reply", -1)
+
+    assert cache.get("llm_response:abcdef") == "reply"
+    assert cache.get("llm_response:123456") is None
+    assert cache.get("llm_response:unknown") is None
+    assert not (tmp_path / "12" / "123456.json").exists()
+
+
+def test_redis_cache_fails_open():
+    db = MagicMock()
+    db.get.side_effect = db.set.side_effect = ConnectionError("down")
+    cache = RedisResponseCache(db)
+    cache.set("llm_response:abcdef", "reply", 60)
+    assert cache.get("llm_response:abcdef") is None
+
+
+def test_redis_cache_sets_ttl():
+    db = MagicMock()
+    RedisResponseCache(db).set("llm_response:abcdef", "reply", 60)
+
+    db.set.assert_called_once_with("llm_response:abcdef", "reply", ex=60)
+
+
+def test_redis_caches_share_the_client():
+    assert RedisResponseCache().db is RedisResponseCache().db
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+def test_metrics_add_up_the_lookups_of_every_process():
+    db = FakeRedis()
+    worker_metrics, other_worker_metrics, api_metrics = ResponseCacheMetrics(db), ResponseCacheMetrics(db), \
+        ResponseCacheMetrics(db)
+
+    worker_metrics.record(True)
+    worker_metrics.record(False)
+    other_worker_metrics.record(True)
+    other_worker_metrics.record(True)
+
+    assert api_metrics.get() == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_metrics_fall_back_to_the_process_without_redis():
+    db = MagicMock()
+    db.hincrby.side_effect = db.hgetall.side_effect = ConnectionError("down")
+    metrics = ResponseCacheMetrics(db)
+
+    metrics.record(True)
+    metrics.record(False)
+
+    assert metrics.get() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
@@ -0,0 +1,209 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from superagi.llms.llm_registry import llm_registry
+from superagi.llms.llm_router import RouteStats, RoutedLlm, route_llm, route_stats
+from superagi.types.llm_task_types import LlmTaskType
+
+
+class FakeLlm:
+    def __init__(self, model, response=None):
+        self.model = model
+        self.temperature = 0.6
+        self.response = response or {"content": "reply"}
+
+    def chat_completion(self, messages, max_tokens=None):
+        return self.response
+
+    def get_model(self):
+        return self.model
+
+
+class FakeRedis:
+    def __init__(self):
+        self.sets = {}
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+    def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+
+    def hincrbyfloat(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(float(fields.get(field, 0)) + amount)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+@pytest.fixture(autouse=True)
+def reset_routes():
+    db = route_stats.db
+    route_stats.db = FakeRedis()
+    route_stats.reset()
+    llm_registry.invalidate()
+    yield
+    route_stats.db = db
+    route_stats.reset()
+    llm_registry.invalidate()
+
+
+def _config(values):
+    return lambda key, default=None: values.get(key, default)
+
+
+def test_routing_is_off_by_default():
+    agent_llm = FakeLlm("gpt-4")
+    session = MagicMock()
+
+    llm = route_llm(session, 1, LlmTaskType.LTM_SUMMARY, agent_llm)
+
+    assert llm.llm is agent_llm
+    assert llm.routed is False
+    session.query.assert_not_called()
+
+
+@patch('superagi.llms.llm_model_factory.get_model')
+@patch('superagi.llms.llm_model_factory.fetch_model_details', return_value={"provider": "OpenAI"})
+@patch('superagi.llms.llm_router.ModelsConfig.fetch_api_key', return_value=[{"api_key": "test_key"}])
+@patch('superagi.llms.llm_router.Configuration.fetch_configuration')
+def test_task_is_routed_to_organisation_model(mock_fetch_configuration, mock_fetch_api_key,
+                                              mock_fetch_model_details, mock_get_model):
+    mock_fetch_configuration.return_value = "gpt-3.5-turbo"
+    session = MagicMock()
+    with patch('superagi.config.config.get_config', side_effect=_config({"LLM_ROUTING": "True"})):
+        llm = route_llm(session, 1, LlmTaskType.TOOL, FakeLlm("gpt-4"), temperature=0.4)
+        route_llm(session, 1, LlmTaskType.TOOL, FakeLlm("gpt-4"), temperature=0.4)
+
+    assert llm.routed is True
+    assert llm.llm is mock_get_model.return_value
+    mock_get_model.assert_called_once_with(1, "test_key", "gpt-3.5-turbo", temperature=0.4)
+    # the route of the organisation and its api key are read once
+    mock_fetch_api_key.assert_called_once_with(session, 1, "OpenAI")
+    mock_fetch_configuration.assert_called_once_with(session, 1, "llm_route_tool", None)
+
+
+@patch('superagi.llms.llm_router.Configuration.fetch_configuration', return_value=None)
+def test_task_without_route_is_read_once(mock_fetch_configuration):
+    agent_llm = FakeLlm("gpt-4")
+    with patch('superagi.config.config.get_config', side_effect=_config({"LLM_ROUTING": True})):
+        route_llm(MagicMock(), 1, LlmTaskType.TOOL, agent_llm)
+        llm = route_llm(MagicMock(), 1, LlmTaskType.TOOL, agent_llm)
+
+    assert llm.llm is agent_llm
+    assert llm.routed is False
+    mock_fetch_configuration.assert_called_once()
+
+
+def test_routing_flag_from_environment_is_off():
+    session = MagicMock()
+    with patch('superagi.config.config.get_config', side_effect=_config({"LLM_ROUTING": "False"})):
+        llm = route_llm(session, 1, LlmTaskType.TOOL, FakeLlm("gpt-4"))
+
+    assert llm.routed is False
+    session.query.assert_not_called()
+
+
+@patch('superagi.llms.llm_router.Configuration.fetch_configuration')
+def test_deployment_route_is_the_default(mock_fetch_configuration):
+    mock_fetch_configuration.side_effect = lambda session, organisation_id, key, default_value=None: default_value
+    config = {"LLM_ROUTING": True, "LLM_ROUTE_LTM_SUMMARY": "gpt-4"}
+    with patch('superagi.config.config.get_config', side_effect=_config(config)), \
+            patch('superagi.llms.llm_router.get_config', side_effect=_config(config)):
+        llm = route_llm(MagicMock(), 1, LlmTaskType.LTM_SUMMARY, FakeLlm("gpt-4"))
+
+    # the task is already routed to the model of the agent
+    assert llm.routed is False
+    mock_fetch_configuration.assert_called_once()
+
+
+@patch('superagi.llms.llm_model_factory.fetch_model_details', side_effect=AttributeError("model not found"))
+@patch('superagi.llms.llm_router.Configuration.fetch_configuration', return_value="unknown-model")
+def test_unknown_route_keeps_agent_llm(mock_fetch_configuration, mock_fetch_model_details):
+    agent_llm = FakeLlm("gpt-4")
+    with patch('superagi.config.config.get_config', side_effect=_config({"LLM_ROUTING": True})):
+        llm = route_llm(MagicMock(), 1, LlmTaskType.OUTPUT_INSTRUCTION, agent_llm)
+
+    assert llm.llm is agent_llm
+    assert llm.routed is False
+
+
+def test_route_stats_record_latency_tokens_and_errors():
+    usage = SimpleNamespace(total_tokens=42)
+    ok_llm = RoutedLlm(FakeLlm("gpt-3.5-turbo", {"response": SimpleNamespace(usage=usage), "content": "reply"}),
+                       LlmTaskType.LTM_SUMMARY)
+    local_llm = RoutedLlm(FakeLlm("llama-2", {"response": {"usage": {"total_tokens": 8}}, "content": "reply"}),
+                          LlmTaskType.LTM_SUMMARY)
+    failing_llm = RoutedLlm(FakeLlm("gpt-4", {"error": "ERROR_OPENAI", "message": "Rate limit"}),
+                            LlmTaskType.OUTPUT_INSTRUCTION)
+
+    ok_llm.chat_completion([{"role": "system", "content": "Hello"}], 100)
+    ok_llm.chat_completion([{"role": "system", "content": "Hello"}])
+    local_llm.chat_completion([{"role": "system", "content": "Hello"}])
+    failing_llm.chat_completion([{"role": "system", "content": "Hello"}], 100)
+
+    stats = route_stats.get()
+    assert stats["ltm_summary:gpt-3.5-turbo"]["calls"] == 2
+    assert stats["ltm_summary:gpt-3.5-turbo"]["tokens"] == 84
+    assert stats["ltm_summary:llama-2"]["tokens"] == 8
+    assert stats["output_instruction:gpt-4"]["errors"] == 1
+    assert stats["output_instruction:gpt-4"]["average_latency_seconds"] >= 0
+
+
+def test_route_stats_add_up_the_calls_of_every_process():
+    db = FakeRedis()
+    worker_stats, api_stats = RouteStats(db), RouteStats(db)
+
+    worker_stats.record("ltm_summary:gpt-3.5-turbo", 1.0, 10)
+    RouteStats(db).record("ltm_summary:gpt-3.5-turbo", 3.0, 20, error=True)
+
+    assert api_stats.get() == {"ltm_summary:gpt-3.5-turbo": {"calls": 2, "errors": 1, "latency_seconds": 4.0,
+                                                             "tokens": 30, "average_latency_seconds": 2.0}}
+
+
+def test_route_stats_fall_back_to_the_process_without_redis():
+    db = MagicMock()
+    db.pipeline.side_effect = db.smembers.side_effect = ConnectionError("down")
+    stats = RouteStats(db)
+
+    stats.record("tool:gpt-4", 2.0, 5)
+
+    assert stats.get() == {"tool:gpt-4": {"calls": 1, "errors": 0, "latency_seconds": 2.0, "tokens": 5,
+                                          "average_latency_seconds": 2.0}}
+
+
+def test_stream_passes_max_tokens_only_when_set():
+    llm = MagicMock()
+    routed_llm = RoutedLlm(llm, LlmTaskType.TOOL)
+
+    routed_llm.stream_chat_completion([])
+    routed_llm.stream_chat_completion([], 100)
+
+    assert [call.args for call in llm.stream_chat_completion.call_args_list] == [([],), ([], 100)]
+
+
+def test_routed_llm_reads_llm_attributes():
+    llm = RoutedLlm(FakeLlm("gpt-4"), LlmTaskType.TOOL)
+
+    assert llm.get_model() == "gpt-4"
+    assert llm.temperature == 0.6
+
+
+def test_get_llm_task_type():
+    assert LlmTaskType.get_llm_task_type("ltm_summary") == LlmTaskType.LTM_SUMMARY
+    with pytest.raises(ValueError):
+        LlmTaskType.get_llm_task_type("unknown")
@@ -0,0 +1,20 @@
+from unittest.mock import MagicMock, patch
+
+from superagi.llms.local_llm import LocalLLM
+
+
+@patch('superagi.llms.local_llm.get_local_llm_server_address', return_value=None)
+@patch('superagi.llms.local_llm.LLMLoader')
+def test_chat_completion_resolves_model_on_every_call(mock_llm_loader, mock_get_local_llm_server_address):
+    evicted_model, reloaded_model = MagicMock(), MagicMock()
+    for model in [evicted_model, reloaded_model]:
+        model.create_chat_completion.return_value = {"choices": [{"message": {"content": "hello"}}]}
+    type(mock_llm_loader.return_value).model = property(MagicMock(side_effect=[evicted_model, reloaded_model]))
+    local_llm = LocalLLM(model="model.gguf")
+
+    local_llm.chat_completion([{"role": "user", "content": "hi"}], max_tokens=100)
+    response = local_llm.chat_completion([{"role": "user", "content": "hi"}], max_tokens=100)
+
+    assert response["content"] == "hello"
+    evicted_model.create_chat_completion.assert_called_once()
+    reloaded_model.create_chat_completion.assert_called_once()
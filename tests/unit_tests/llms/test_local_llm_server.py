@@ -0,0 +1,186 @@
+import os
+import stat
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from superagi.llms.local_llm import LocalLLM
+from superagi.llms.local_llm_server import LocalLlmClient, LocalLlmServer
+
+
+class FakeModelRunner:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, messages, params):
+        self.calls.append(messages[-1]["content"])
+        time.sleep(self.delay)
+        return {"content": "reply to " + messages[-1]["content"]}
+
+
+def _messages(content):
+    return [{"role": "user", "content": content}]
+
+
+def _submit_concurrently(server, contents):
+    responses = {}
+
+    def submit(index, content):
+        responses[index] = server.submit(_messages(content), {"max_tokens": 10})
+
+    threads = [threading.Thread(target=submit, args=(index, content), daemon=True)
+               for index, content in enumerate(contents)]
+    for thread in threads:
+        thread.start()
+    return threads, responses
+
+
+def test_run_batch_dedupes_and_orders_prompts():
+    runner = FakeModelRunner()
+    server = LocalLlmServer(runner, "unused", max_batch_size=8, batch_wait=1)
+
+    threads, responses = _submit_concurrently(server, ["b", "a", "b", "c"])
+    while server.requests.qsize() < 4:
+        time.sleep(0.01)
+    batch = server.next_batch()
+    server.run_batch(batch)
+    for thread in threads:
+        thread.join()
+
+    assert len(batch) == 4
+    assert runner.calls == ["a", "b", "c"]
+    assert [responses[index]["content"] for index in range(4)] == ["reply to b", "reply to a", "reply to b",
+                                                                     "reply to c"]
+
+
+def test_next_batch_is_limited_to_max_batch_size():
+    server = LocalLlmServer(FakeModelRunner(), "unused", max_batch_size=2, batch_wait=1)
+
+    threads, _ = _submit_concurrently(server, ["a", "b", "c"])
+    while server.requests.qsize() < 3:
+        time.sleep(0.01)
+
+    batches = [server.next_batch(), server.next_batch()]
+    for batch in batches:
+        server.run_batch(batch)
+    for thread in threads:
+        thread.join()
+
+    assert [len(batch) for batch in batches] == [2, 1]
+
+
+def test_submit_is_turned_down_when_queue_is_full():
+    server = LocalLlmServer(FakeModelRunner(), "unused", max_queue_size=1)
+
+    threads, _ = _submit_concurrently(server, ["a"])
+    while server.requests.qsize() < 1:
+        time.sleep(0.01)
+
+    response = server.submit(_messages("b"), {})
+
+    assert response["error"] == "ERROR_LOCAL_LLM_BUSY"
+    server.run_batch(server.next_batch())
+    for thread in threads:
+        thread.join()
+
+
+def test_run_batch_returns_error_of_model():
+    def failing_runner(messages, params):
+        raise RuntimeError("out of memory")
+
+    server = LocalLlmServer(failing_runner, "unused", batch_wait=0)
+    threads, responses = _submit_concurrently(server, ["a"])
+    server.run_batch(server.next_batch())
+    for thread in threads:
+        thread.join()
+
+    assert responses[0] == {"error": "ERROR", "message": "Error: out of memory"}
+
+
+@pytest.fixture
+def running_server(tmp_path):
+    runner = FakeModelRunner(delay=0.05)
+    server = LocalLlmServer(runner, str(tmp_path / "local_llm.sock"), batch_wait=0.05)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    while server.listener is None:
+        time.sleep(0.01)
+    yield server, runner
+    server.close()
+
+
+def test_client_round_trip(running_server):
+    server, runner = running_server
+    client = LocalLlmClient(server.address, timeout=5)
+
+    assert client.chat_completion(_messages("hello"), {})["content"] == "reply to hello"
+    # the thread keeps its connection open for the next request
+    connection = client._local.connection
+    assert client.chat_completion(_messages("again"), {})["content"] == "reply to again"
+    assert client._local.connection is connection
+
+
+def test_concurrent_clients_share_the_model(running_server):
+    server, runner = running_server
+    client = LocalLlmClient(server.address, timeout=5)
+    responses = []
+
+    threads = [threading.Thread(target=lambda: responses.append(client.chat_completion(_messages("same"), {})))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response["content"] for response in responses] == ["reply to same"] * 4
+    assert len(runner.calls) < 4
+
+
+def test_local_llm_uses_server(running_server):
+    server, runner = running_server
+    config = {"LOCAL_LLM_SERVER_ADDRESS": server.address}
+    with patch('superagi.llms.local_llm_server.get_config',
+               side_effect=lambda key, default=None: config.get(key, default)), \
+            patch('superagi.llms.local_llm.LLMLoader') as mock_llm_loader:
+        local_llm = LocalLLM(max_tokens=100)
+        response = local_llm.chat_completion(_messages("hello"), max_tokens=100)
+        streamed = list(local_llm.stream_chat_completion(_messages("stream"), max_tokens=100))
+
+    mock_llm_loader.assert_not_called()
+    assert response["content"] == "reply to hello"
+    assert streamed == ["reply to stream"]
+
+
+def test_socket_is_restricted_to_its_user(running_server):
+    server, runner = running_server
+
+    assert stat.S_IMODE(os.stat(server.address).st_mode) == 0o600
+
+
+def test_tcp_address_requires_authkey():
+    server = LocalLlmServer(FakeModelRunner(), "localhost:0")
+
+    with patch('superagi.llms.local_llm_server.get_config', return_value=None):
+        with pytest.raises(ValueError, match="LOCAL_LLM_SERVER_AUTHKEY"):
+            server.serve()
+        with pytest.raises(ValueError, match="LOCAL_LLM_SERVER_AUTHKEY"):
+            LocalLlmClient("localhost:8765", timeout=5).chat_completion(_messages("hello"), {})
+
+
+def test_client_round_trip_over_tcp_with_authkey():
+    config = {"LOCAL_LLM_SERVER_AUTHKEY": "secret"}
+    with patch('superagi.llms.local_llm_server.get_config',
+               side_effect=lambda key, default=None: config.get(key, default)):
+        server = LocalLlmServer(FakeModelRunner(), "localhost:0", batch_wait=0)
+        threading.Thread(target=server.serve, daemon=True).start()
+        while server.listener is None:
+            time.sleep(0.01)
+        host, port = server.listener.address
+        try:
+            client = LocalLlmClient(f"{host}:{port}", timeout=5)
+            assert client.chat_completion(_messages("hello"), {})["content"] == "reply to hello"
+        finally:
+            server.close()
@@ -0,0 +1,39 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from superagi.llms.llm_registry import llm_registry
+from superagi.llms.model_metadata import get_model_metadata
+from superagi.models.models import Models
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    llm_registry.invalidate()
+    yield
+    llm_registry.invalidate()
+
+
+@patch.object(Models, 'fetch_model_metadata')
+def test_get_model_metadata(mock_fetch_model_metadata):
+    mock_fetch_model_metadata.return_value = [("gpt-4", 8092, 8192), ("my-llama", 4032, 0)]
+
+    gpt_4 = get_model_metadata(MagicMock(), 1, "gpt-4")
+    llama = get_model_metadata(MagicMock(), 1, "my-llama")
+
+    assert (gpt_4.token_limit, gpt_4.context_length) == (8092, 8192)
+    assert (llama.token_limit, llama.context_length) == (4032, 0)
+    assert get_model_metadata(MagicMock(), 1, "unknown") is None
+    mock_fetch_model_metadata.assert_called_once()
+
+
+@patch.object(Models, 'fetch_model_metadata')
+def test_model_metadata_is_refreshed_when_models_are_stored(mock_fetch_model_metadata):
+    mock_fetch_model_metadata.return_value = [("gpt-4", 8092, 8192)]
+    assert get_model_metadata(MagicMock(), 1, "gpt-4-32k") is None
+
+    mock_fetch_model_metadata.return_value = [("gpt-4", 8092, 8192), ("gpt-4-32k", 32768, 32768)]
+    llm_registry.invalidate(1)
+
+    assert get_model_metadata(MagicMock(), 1, "gpt-4-32k").token_limit == 32768
+
@@ -1,6 +1,8 @@
+import asyncio
+
 import openai
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from superagi.llms.openai import OpenAi, MAX_RETRY_ATTEMPTS
 
@@ -31,7 +33,8 @@ def test_chat_completion(mock_openai):
         max_tokens=max_tokens,
         top_p=openai_instance.top_p,
         frequency_penalty=openai_instance.frequency_penalty,
-        presence_penalty=openai_instance.presence_penalty
+        presence_penalty=openai_instance.presence_penalty,
+        api_key=api_key
     )
 
 
@@ -113,3 +116,56 @@ def test_verify_access_key():
     openai_instance = OpenAi(api_key, model=model)
     result = openai_instance.verify_access_key()
     assert result is False
+
+
+@patch('superagi.llms.openai.openai')
+def test_achat_completion(mock_openai):
+    openai_instance = OpenAi('test_key', model='gpt-4')
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    mock_chat_response = MagicMock()
+    mock_chat_response.choices[0].message = {"content": "I'm here to help!"}
+    mock_openai.ChatCompletion.acreate = AsyncMock(return_value=mock_chat_response)
+
+    result = asyncio.run(openai_instance.achat_completion(messages, 100))
+
+    assert result == {"response": mock_chat_response, "content": "I'm here to help!"}
+    assert mock_openai.ChatCompletion.acreate.call_args.kwargs["api_key"] == 'test_key'
+    mock_openai.ChatCompletion.create.assert_not_called()
+
+
+@patch('superagi.llms.openai.openai')
+def test_stream_chat_completion(mock_openai):
+    openai_instance = OpenAi('test_key', model='gpt-4')
+    mock_openai.ChatCompletion.create.return_value = iter([
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "I'm "}}]},
+        {"choices": [{"delta": {"content": "here"}}]},
+        {"choices": [{"delta": {}}]},
+    ])
+
+    chunks = list(openai_instance.stream_chat_completion([{"role": "user", "content": "Hi"}], 100))
+
+    assert chunks == ["I'm ", "here"]
+    assert mock_openai.ChatCompletion.create.call_args.kwargs["stream"] is True
+    assert mock_openai.ChatCompletion.create.call_args.kwargs["api_key"] == 'test_key'
+
+
+@patch('superagi.llms.openai.openai')
+def test_stream_chat_completion_records_usage(mock_openai):
+    dispatcher = MagicMock()
+    dispatcher.limits_tokens.return_value = True
+    openai_instance = OpenAi('test_key', model='gpt-4', dispatcher=dispatcher)
+    mock_openai.ChatCompletion.create.return_value = iter([
+        {"choices": [{"delta": {"content": "I'm "}}]},
+        {"choices": [{"delta": {"content": "here"}}]},
+    ])
+
+    with patch.object(OpenAi, '_estimate_tokens', return_value=110), \
+            patch.object(OpenAi, '_count_completion_tokens', return_value=2) as mock_count:
+        chunks = openai_instance.stream_chat_completion([{"role": "user", "content": "Hi"}], 100)
+        next(chunks)
+        # the caller stops reading before the end of the stream
+        chunks.close()
+
+    mock_count.assert_called_once_with("I'm ")
+    dispatcher.record_usage.assert_called_once_with('test_key', 'gpt-4', 110, 12)
@@ -8,10 +8,10 @@ from superagi.config.config import get_config
 
 class TestReplicate(TestCase):
 
-    @patch('os.environ')
-    @patch('replicate.run')
-    def test_chat_completion(self, mock_replicate_run, mock_os_environ):
+    @patch('superagi.llms.replicate.get_replicate_client')
+    def test_chat_completion(self, mock_get_replicate_client):
         # Arrange
+        mock_replicate_run = mock_get_replicate_client.return_value.run
         api_key = 'test_api_key'
         model = 'test_model'
         version = 'test_version'
@@ -29,11 +29,13 @@ class TestReplicate(TestCase):
         result = rep_instance.chat_completion(messages)
 
         # Assert
+        mock_get_replicate_client.assert_called_once_with(api_key)
         assert result == {"response": ['Sure, I can help with that.'], "content": 'Sure, I can help with that.'}
 
-    @patch.object(requests, "get")
-    def test_verify_access_key(self, mock_get):
+    @patch("superagi.llms.replicate.get_http_session")
+    def test_verify_access_key(self, mock_get_http_session):
         # Arrange
+        mock_get = mock_get_http_session.return_value.get
         api_key = 'test_api_key'
         model = 'test_model'
         version = 'test_version'
@@ -47,9 +49,10 @@ class TestReplicate(TestCase):
         assert result is True
         mock_get.assert_called_with("https://api.replicate.com/v1/collections", headers={"Authorization": "Token " + api_key})
 
-    @patch.object(requests, "get")
-    def test_verify_access_key_false(self, mock_get):
+    @patch("superagi.llms.replicate.get_http_session")
+    def test_verify_access_key_false(self, mock_get_http_session):
         # Arrange
+        mock_get = mock_get_http_session.return_value.get
         api_key = 'test_api_key'
         model = 'test_model'
         version = 'test_version'
@@ -60,4 +63,19 @@ class TestReplicate(TestCase):
         result = rep_instance.verify_access_key()
 
         # Assert
-        assert result is False
\ No newline at end of file
+        assert result is False
+
+def test_replicate_client_is_shared_per_api_key():
+    from superagi.helper.http_session import TimeoutHTTPAdapter
+    from superagi.llms.replicate import get_replicate_client
+
+    client = get_replicate_client("test_api_key")
+
+    assert get_replicate_client("test_api_key") is client
+    assert get_replicate_client("other_api_key") is not client
+    for session in (client.read_session, client.write_session):
+        adapter = session.get_adapter("https://api.replicate.com")
+        assert isinstance(adapter, TimeoutHTTPAdapter)
+        assert adapter.timeout == (10.0, 600.0)
+        # the retries of the replicate client are kept
+        assert adapter.max_retries.total == 5
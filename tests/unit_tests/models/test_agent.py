@@ -1,5 +1,6 @@
-from unittest.mock import create_autospec
+from unittest.mock import create_autospec, MagicMock
 from sqlalchemy.orm import Session
+from superagi.controllers.types.agent_with_config import AgentConfigInput
 from superagi.models.agent import Agent
 from unittest.mock import patch
   
@@ -51,3 +52,28 @@ def test_eval_tools_key():
 
     assert result == [1, 2, 3]
 
+
+def test_eval_llm_response_cache_keys():
+    assert Agent.eval_agent_config("llm_response_cache", "True") is True
+    assert Agent.eval_agent_config("llm_response_cache", "None") is False
+    assert Agent.eval_agent_config("llm_response_cache_ttl", "3600") == 3600
+
+def test_eval_hedge_models_key():
+    assert Agent.eval_agent_config("hedge_models", "['gpt-3.5-turbo', 'llama-2']") == ["gpt-3.5-turbo", "llama-2"]
+
+
+@patch('superagi.models.agent.AgentWorkflow.find_by_name')
+def test_create_agent_with_config_persists_hedge_models(mock_find_by_name):
+    db = MagicMock()
+    agent_with_config = AgentConfigInput(name="Test Agent", project_id=1, description="Agent for testing",
+                                         goal=["goal"], instruction=[], agent_workflow="Goal Based Workflow",
+                                         constraints=[], toolkits=[], tools=[], exit="No exit criterion",
+                                         iteration_interval=500, model="gpt-4", permission_type="God Mode",
+                                         LTM_DB="Pinecone", max_iterations=25, user_timezone=None, knowledge=None,
+                                         hedge_models=["llama-2"])
+
+    Agent.create_agent_with_config(db, agent_with_config)
+
+    agent_configurations = {configuration.key: configuration.value
+                            for configuration in db.session.add_all.call_args[0][0]}
+    assert Agent.eval_agent_config("hedge_models", agent_configurations["hedge_models"]) == ["llama-2"]
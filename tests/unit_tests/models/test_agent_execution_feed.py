@@ -1,7 +1,8 @@
 import pytest
-from unittest.mock import Mock, create_autospec
+from unittest.mock import Mock, create_autospec, patch
+from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
-from superagi.models.agent_execution_feed import AgentExecutionFeed
+from superagi.models.agent_execution_feed import AgentExecutionFeed, count_feed_tokens
 
 
 def test_get_last_tool_response():
@@ -25,3 +26,46 @@ def test_get_last_tool_response_with_tool_name():
 
     result = AgentExecutionFeed.get_last_tool_response(mock_session, 2, "test2")
     assert result == agent_execution_feed_2.feed
+
+
+@patch('superagi.models.agent_execution_feed.TokenCounter.count_content_tokens', return_value=7)
+def test_count_feed_tokens_before_insert(mock_count_content_tokens):
+    agent_execution_feed = AgentExecutionFeed(agent_execution_id=2, feed="Tool test1 returned: ok", role='system')
+
+    count_feed_tokens(None, None, agent_execution_feed)
+
+    assert agent_execution_feed.token_count == 7
+    mock_count_content_tokens.assert_called_once_with("Tool test1 returned: ok")
+
+
+@patch('superagi.models.agent_execution_feed.TokenCounter.count_content_tokens', side_effect=lambda content: len(content))
+def test_token_count_follows_feed_updates(mock_count_content_tokens):
+    engine = create_engine("sqlite://")
+    AgentExecutionFeed.__table__.create(engine)
+    session = Session(bind=engine)
+    agent_execution_feed = AgentExecutionFeed(agent_execution_id=2, feed="short", role='system')
+    session.add(agent_execution_feed)
+    session.commit()
+
+    agent_execution_feed.role = 'user'
+    session.commit()
+    assert agent_execution_feed.token_count == 5
+
+    agent_execution_feed.feed = "a longer feed"
+    session.commit()
+    assert agent_execution_feed.token_count == 13
+    assert mock_count_content_tokens.call_count == 2
+
+
+@patch('superagi.models.agent_execution_feed.TokenCounter.count_content_tokens', return_value=4)
+def test_fetch_feed_token_counts_backfills_without_commit(mock_count_content_tokens):
+    mock_session = create_autospec(Session)
+    mock_session.query().filter().order_by().all.return_value = [Mock(id=1, token_count=3, updated_at=1),
+                                                                 Mock(id=2, token_count=None, updated_at=1)]
+    mock_session.query().filter().all.return_value = [AgentExecutionFeed(id=2, feed="Tool test2", updated_at=2)]
+
+    result = AgentExecutionFeed.fetch_feed_token_counts(mock_session, 2, "DEFAULT")
+
+    assert result == [(1, 3, 1), (2, 4, 2)]
+    mock_session.flush.assert_called_once()
+    mock_session.commit.assert_not_called()